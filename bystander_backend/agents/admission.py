@@ -0,0 +1,155 @@
+import threading
+import time
+from collections.abc import Callable
+from typing import Any
+
+if __package__:
+    from .config import env_float
+else:  # pragma: no cover
+    from config import env_float
+
+
+class AdmissionController:
+    """
+    Per-worker admission control for LLM-backed workflows.
+
+    Under gunicorn's gthread worker a worker never runs more workflows than it has
+    threads, so the request threads alone never look overloaded: the queue builds up in
+    front of them, out of sight. What the worker does see is its upstream backlog, from
+    the `backlog` callable: LLM work still running after its response went out, and LLM
+    calls waiting for a provider slot. Admitted workflows plus that backlog are compared
+    with `capacity` (GUNICORN_THREADS by default) to estimate how long a new request
+    would wait, using a moving average of workflow duration. Past `max_in_flight`
+    (2 x capacity by default) or ADMISSION_MAX_QUEUE_WAIT_MS, the caller should answer
+    with a degraded response instead of queueing.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int | None = None,
+        max_queue_wait_ms: float | None = None,
+        capacity: int | None = None,
+        backlog: Callable[[], int] | None = None,
+    ) -> None:
+        self.capacity = max(
+            1,
+            int(
+                capacity
+                if capacity is not None
+                else env_float("ADMISSION_CAPACITY", env_float("GUNICORN_THREADS", 4.0))
+            ),
+        )
+        self.max_in_flight = int(
+            max_in_flight
+            if max_in_flight is not None
+            else env_float("ADMISSION_MAX_IN_FLIGHT", 2.0 * self.capacity)
+        )
+        self.max_queue_wait_ms = float(
+            max_queue_wait_ms
+            if max_queue_wait_ms is not None
+            else env_float("ADMISSION_MAX_QUEUE_WAIT_MS", 8000.0)
+        )
+        self.backlog = backlog
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._avg_duration_sec = env_float("ADMISSION_INITIAL_DURATION_SEC", 6.0)
+        self._admitted = 0
+        self._shed = 0
+        self._spare_refused = 0
+
+    def _backlog(self) -> int:
+        if self.backlog is None:
+            return 0
+        try:
+            return max(0, int(self.backlog()))
+        except Exception:
+            return 0
+
+    def _estimated_wait_sec_locked(self, backlog: int) -> float:
+        # Work beyond `capacity` waits for a slot; each slot turns over once per
+        # average workflow duration.
+        queued_ahead = self._in_flight + backlog + 1 - self.capacity
+        if queued_ahead <= 0:
+            return 0.0
+        return queued_ahead * self._avg_duration_sec / self.capacity
+
+    def estimated_queue_wait_ms(self) -> float:
+        backlog = self._backlog()
+        with self._lock:
+            return round(self._estimated_wait_sec_locked(backlog) * 1000.0, 1)
+
+    def try_acquire(self, queued_ms: float = 0.0) -> bool:
+        """
+        Admit a workflow if capacity allows. `queued_ms` is time already spent waiting
+        before the app saw the request (e.g. from an X-Request-Start header).
+        """
+
+        backlog = self._backlog()
+        with self._lock:
+            wait_ms = self._estimated_wait_sec_locked(backlog) * 1000.0 + max(queued_ms, 0.0)
+            if self._in_flight + backlog >= self.max_in_flight or wait_ms > self.max_queue_wait_ms:
+                self._shed += 1
+                return False
+            self._in_flight += 1
+            self._admitted += 1
+            return True
+
+    def try_acquire_spare(self) -> bool:
+        """
+        Admit work that merely holds a thread (e.g. a long-poll) only while a slot is
+        left over for workflows afterwards. Release it with `release(0.0)` so its
+        duration stays out of the workflow average.
+        """
+
+        with self._lock:
+            if self._in_flight + 1 >= self.capacity:
+                self._spare_refused += 1
+                return False
+            self._in_flight += 1
+            return True
+
+    def release(self, elapsed_sec: float) -> None:
+        with self._lock:
+            self._in_flight = max(0, self._in_flight - 1)
+            if elapsed_sec > 0:
+                self._avg_duration_sec = (0.8 * self._avg_duration_sec) + (0.2 * elapsed_sec)
+
+    def snapshot(self) -> dict[str, Any]:
+        backlog = self._backlog()
+        with self._lock:
+            return {
+                "in_flight": self._in_flight,
+                "backlog": backlog,
+                "capacity": self.capacity,
+                "max_in_flight": self.max_in_flight,
+                "max_queue_wait_ms": self.max_queue_wait_ms,
+                "estimated_queue_wait_ms": round(
+                    self._estimated_wait_sec_locked(backlog) * 1000.0, 1
+                ),
+                "avg_duration_ms": round(self._avg_duration_sec * 1000.0, 1),
+                "admitted": self._admitted,
+                "shed": self._shed,
+                "spare_refused": self._spare_refused,
+            }
+
+
+def queued_ms_from_header(value: Any, now: float | None = None) -> float:
+    """
+    Parse an X-Request-Start style header ("t=<epoch>" or a bare epoch in s/ms/us).
+    Returns 0.0 when absent or unparsable.
+    """
+
+    raw = str(value or "").strip()
+    if raw.startswith("t="):
+        raw = raw[2:]
+    try:
+        started = float(raw)
+    except Exception:
+        return 0.0
+    if started <= 0:
+        return 0.0
+    # Normalize microsecond / millisecond epochs to seconds.
+    while started > 1e11:
+        started /= 1000.0
+    current = time.time() if now is None else now
+    return max(0.0, (current - started) * 1000.0)
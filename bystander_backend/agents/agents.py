@@ -1,11 +1,18 @@
 import asyncio
+import contextvars
+import copy
 import csv
+import hashlib
 import json
 import math
 import os
 import re
 import sys
+import threading
+import time
 import types
+from collections.abc import Callable, Coroutine, Hashable
+from concurrent.futures import Future, ThreadPoolExecutor
 from functools import partial
 from typing import Any
 
@@ -26,22 +33,73 @@ except Exception:  # pragma: no cover
     requests.get = _missing_requests  # type: ignore[attr-defined]
 
 if __package__:
+    from .cancellation import bind_cancel_token, raise_if_cancelled, use_cancel_token
+    from .config import env_flag, env_float, parse_flag
+    from .deadline import (
+        MIN_CALL_TIMEOUT_SEC,
+        Deadline,
+        budget_is_low,
+        current_deadline,
+        remaining_timeout,
+        use_deadline,
+        with_request_deadline,
+    )
+    from .guidance_sessions import GuidanceSessions
+    from .hedging import HEDGE_POLICY
+    from .idempotency import payload_fingerprint
+    from .io_loop import IO_LOOP
     from .judge_service import AsyncJudgeService
+    from .latency import AdaptiveTimeouts
     from .llm_agent import (
+        EMERGENCY_FALLBACK_GUIDANCE,
         GeminiJSONAgent,
         GuidanceAgent,
         OpenAIJSONAgent,
         ScriptAgent,
         TriageAgent,
+        split_guidance_steps,
     )
     from .observability import observe, record_exception
+    from .reranker import ProtocolReranker
+    from .singleflight import SingleFlight, await_shared, location_tile, normalize_scenario_key
+    from .speculation import SpeculationStore
+    from .triage_classifier import TriageFastPath
 else:  # pragma: no cover
+    from config import env_flag, env_float, parse_flag
+
     current_dir = os.path.dirname(os.path.abspath(__file__))
     if current_dir not in sys.path:
         sys.path.insert(0, current_dir)
+    from cancellation import bind_cancel_token, raise_if_cancelled, use_cancel_token
+    from deadline import (
+        MIN_CALL_TIMEOUT_SEC,
+        Deadline,
+        budget_is_low,
+        current_deadline,
+        remaining_timeout,
+        use_deadline,
+        with_request_deadline,
+    )
+    from guidance_sessions import GuidanceSessions
+    from hedging import HEDGE_POLICY
+    from idempotency import payload_fingerprint
+    from io_loop import IO_LOOP
     from judge_service import AsyncJudgeService
-    from llm_agent import GeminiJSONAgent, GuidanceAgent, OpenAIJSONAgent, ScriptAgent, TriageAgent
+    from latency import AdaptiveTimeouts
+    from llm_agent import (
+        EMERGENCY_FALLBACK_GUIDANCE,
+        GeminiJSONAgent,
+        GuidanceAgent,
+        OpenAIJSONAgent,
+        ScriptAgent,
+        TriageAgent,
+        split_guidance_steps,
+    )
     from observability import observe, record_exception
+    from reranker import ProtocolReranker
+    from singleflight import SingleFlight, await_shared, location_tile, normalize_scenario_key
+    from speculation import SpeculationStore
+    from triage_classifier import TriageFastPath
 
 try:
     from google.adk.agents import LlmAgent  # type: ignore # noqa: F401
@@ -131,11 +189,9 @@ class ProtocolRetriever:
     """
 
     def __init__(self, csv_path: str | None = None) -> None:
-        base_dir = os.path.dirname(os.path.dirname(__file__))
-        self.csv_path = csv_path or os.path.join(
-            base_dir, "finetuning", "instructions_raw_final.csv"
-        )
+        self.csv_path = csv_path or self._default_csv_path()
         self.rows = self._load_rows()
+        self.reranker = ProtocolReranker(self.rows)
         self.vertex_project = _normalize_text(os.getenv("GOOGLE_CLOUD_PROJECT"))
         self.vertex_project_number = _normalize_text(os.getenv("VERTEX_PROJECT_NUMBER"))
         self.vertex_location = _normalize_text(os.getenv("VERTEX_LOCATION") or "global")
@@ -152,13 +208,27 @@ class ProtocolRetriever:
         rag_threshold_raw = _normalize_text(os.getenv("VERTEX_RAG_VECTOR_DISTANCE_THRESHOLD"))
         self.rag_vector_distance_threshold = _safe_float(rag_threshold_raw)
         self.last_vertex_error: str = ""
-        self.last_vertex_attempts: list[dict[str, str]] = []
+        self.last_vertex_attempts: list[dict[str, Any]] = []
         self.adc_project = self._detect_adc_project()
         self.vertex_project_candidates = self._build_project_candidates()
         self.rag_project = self._select_rag_project()
         self.rag_initialized = self._init_rag()
         self.rag_corpus_resource = self._resolve_rag_corpus_resource()
 
+    @staticmethod
+    def _default_csv_path() -> str:
+        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        candidates = [
+            os.path.join(base_dir, "finetuning", "instructions_raw_final.csv"),
+            os.path.join(
+                os.path.dirname(base_dir), "ml", "finetuning", "instructions_raw_final.csv"
+            ),
+        ]
+        for path in candidates:
+            if os.path.exists(path):
+                return path
+        return candidates[0]
+
     def _load_rows(self) -> list[dict[str, str]]:
         if not os.path.exists(self.csv_path):
             return []
@@ -291,7 +361,12 @@ class ProtocolRetriever:
                 top_k if isinstance(top_k, int) and top_k > 0 else self.rag_similarity_top_k_default
             )
             final_top_k = max(1, min(query_top_k, 20))
-            retrieval_config_kwargs: dict[str, Any] = {"top_k": final_top_k}
+            if self.reranker.enabled:
+                # Over-fetch and let the local reranker keep the best final_top_k.
+                fetch_top_k = max(final_top_k, min(self.reranker.fetch_k, 20))
+            else:
+                fetch_top_k = final_top_k
+            retrieval_config_kwargs: dict[str, Any] = {"top_k": fetch_top_k}
             if self.rag_vector_distance_threshold is not None:
                 retrieval_config_kwargs["filter"] = rag.Filter(
                     vector_distance_threshold=self.rag_vector_distance_threshold
@@ -330,6 +405,8 @@ class ProtocolRetriever:
                     }
                 )
 
+            fetched = len(docs)
+            docs = self.reranker.rerank(query, docs, keep=final_top_k)
             self.last_vertex_attempts.append(
                 {
                     "mode": "rag_retrieval_query",
@@ -338,6 +415,8 @@ class ProtocolRetriever:
                     "corpus": self.rag_corpus_resource,
                     "status": "ok" if docs else "no_results",
                     "error": "",
+                    "fetched": fetched,
+                    "kept": len(docs),
                 }
             )
             if not docs:
@@ -388,14 +467,21 @@ class ProtocolRetriever:
                 }
 
         # Fallback: local CSV retrieval.
+        result = self.retrieve_local(query=query, severity=severity, top_k=top_k)
+        result["vertex_error"] = self.last_vertex_error
+        result["vertex_attempts"] = self.last_vertex_attempts
+        return result
+
+    def retrieve_local(self, query: str, severity: str, top_k: int = 3) -> dict[str, Any]:
+        """Keyword retrieval over the local CSV index only (no network calls)."""
         if not self.rows:
             return {
                 "source": "none",
                 "context": "ไม่มีบริบทจากฐานข้อมูลโปรโตคอล ให้ยึดหลักความปลอดภัยและโทร 1669 "
                 "เมื่อสงสัยว่าเป็นเหตุฉุกเฉิน",
                 "count": 0,
-                "vertex_error": self.last_vertex_error,
-                "vertex_attempts": self.last_vertex_attempts,
+                "matches": [],
+                "top_score": 0,
             }
 
         ranked = sorted(
@@ -404,6 +490,7 @@ class ProtocolRetriever:
             reverse=True,
         )
         top = [r for r in ranked if self._score_row(query, r, severity) > 0][:top_k]
+        top_score = self._score_row(query, top[0], severity) if top else 0
         if not top:
             top = ranked[: min(top_k, len(ranked))]
 
@@ -420,8 +507,8 @@ class ProtocolRetriever:
             "source": "csv",
             "context": "\n\n".join(chunks),
             "count": len(top),
-            "vertex_error": self.last_vertex_error,
-            "vertex_attempts": self.last_vertex_attempts,
+            "matches": top,
+            "top_score": top_score,
         }
 
     def debug_vertex_status(self, scenario: str, severity: str, top_k: int = 3) -> dict[str, Any]:
@@ -830,7 +917,7 @@ class MapAgent:
                 response = requests.get(
                     "https://maps.googleapis.com/maps/api/distancematrix/json",
                     params=params,
-                    timeout=10,
+                    timeout=remaining_timeout(10.0),
                 )
                 response.raise_for_status()
                 payload = response.json() if response.content else {}
@@ -947,7 +1034,7 @@ class MapAgent:
             response = requests.get(
                 "https://maps.googleapis.com/maps/api/place/nearbysearch/json",
                 params=params,
-                timeout=10,
+                timeout=remaining_timeout(10.0),
             )
             response.raise_for_status()
             data = response.json()
@@ -976,7 +1063,7 @@ class MapAgent:
             response = requests.get(
                 "https://maps.googleapis.com/maps/api/place/details/json",
                 params=params,
-                timeout=10,
+                timeout=remaining_timeout(10.0),
             )
             response.raise_for_status()
             data = response.json()
@@ -1004,7 +1091,7 @@ class MapAgent:
             response = requests.get(
                 "https://maps.googleapis.com/maps/api/geocode/json",
                 params=params,
-                timeout=10,
+                timeout=remaining_timeout(10.0),
             )
             response.raise_for_status()
             data = response.json()
@@ -1065,7 +1152,7 @@ class MapAgent:
             parts.append(f"ที่อยู่จากแผนที่: {address}")
         parts.append(f"พิกัดสำหรับระบบ (ไม่ต้องอ่านให้เจ้าหน้าที่): {latitude:.6f}, {longitude:.6f}")
 
-        landmarks = self._nearby_landmarks(latitude, longitude)
+        landmarks = [] if budget_is_low() else self._nearby_landmarks(latitude, longitude)
         if landmarks:
             parts.append(f"จุดสังเกตใกล้เคียง: {', '.join(landmarks[:3])}")
 
@@ -1240,6 +1327,7 @@ class MapAgent:
         all_candidates: list[dict[str, Any]] = []
         errors: list[str] = []
         for q in self._build_query_plan(requested_facility_type, map_severity):
+            raise_if_cancelled()
             result = self._nearby_search(
                 latitude=latitude,
                 longitude=longitude,
@@ -1279,7 +1367,7 @@ class MapAgent:
                 ambiguous.append(place)
 
         validated: list[dict[str, Any]] = []
-        if ambiguous:
+        if ambiguous and not budget_is_low():
             llm_map = self._llm_validate_candidates(
                 scenario=scenario,
                 requested_facility_type=requested_facility_type,
@@ -1302,7 +1390,14 @@ class MapAgent:
             f_lon = _safe_float(location.get("lng"))
             if f_lat is None or f_lon is None:
                 continue
-            details = self._get_place_details(_normalize_text(place.get("place_id")))
+            raise_if_cancelled()
+            # Place Details is one round-trip per facility; skip it when time is short
+            # and rely on the Nearby Search opening hours instead.
+            details = (
+                {}
+                if budget_is_low()
+                else self._get_place_details(_normalize_text(place.get("place_id")))
+            )
             details_open_now = (details.get("opening_hours") or {}).get("open_now", None)
             place_open_now = (place.get("opening_hours") or {}).get("open_now", None)
             open_now = details_open_now if details_open_now is not None else place_open_now
@@ -1359,32 +1454,65 @@ class MapAgent:
         fallback_result["fallback_facility_type"] = "hospital"
         return fallback_result
 
-    def run(
+    @staticmethod
+    def _requested_facility_type(severity: str, facility_type: str) -> str:
+        if severity == "critical":
+            return "hospital"
+        return facility_type if facility_type in {"hospital", "clinic"} else "hospital"
+
+    def find_candidates(
         self,
         scenario: str,
         severity: str,
         facility_type: str,
         latitude: float | None,
         longitude: float | None,
-    ) -> list[dict[str, Any]]:
-        if latitude is None or longitude is None:
-            return []
+    ) -> dict[str, Any]:
+        """
+        The Places search behind run(): open facilities around the point, before any
+        distance, ETA or ranking. Nothing in it depends on exactly where the caller
+        stands, so callers in the same area can share one search.
+        """
 
-        map_severity = "critical" if severity == "critical" else "mild"
-        requested_facility_type = (
-            "hospital"
-            if severity == "critical"
-            else (facility_type if facility_type in {"hospital", "clinic"} else "hospital")
-        )
-        result = self.search_nearby_facilities(
+        if latitude is None or longitude is None:
+            return {"facilities": [], "total": 0}
+        return self.search_nearby_facilities(
             latitude=latitude,
             longitude=longitude,
-            facility_type=requested_facility_type,
-            severity=map_severity,
+            facility_type=self._requested_facility_type(severity, facility_type),
+            severity="critical" if severity == "critical" else "mild",
             scenario=scenario,
         )
+
+    def run(
+        self,
+        scenario: str,
+        severity: str,
+        facility_type: str,
+        latitude: float | None,
+        longitude: float | None,
+    ) -> list[dict[str, Any]]:
+        if latitude is None or longitude is None:
+            return []
+        result = self.find_candidates(scenario, severity, facility_type, latitude, longitude)
+        return self.rank_facilities(result, scenario, severity, facility_type, latitude, longitude)
+
+    def rank_facilities(
+        self,
+        result: dict[str, Any],
+        scenario: str,
+        severity: str,
+        facility_type: str,
+        latitude: float | None,
+        longitude: float | None,
+    ) -> list[dict[str, Any]]:
+        """Distance, ETA and ranking of find_candidates() results from the caller's point."""
+
+        if latitude is None or longitude is None:
+            return []
         if not isinstance(result, dict) or "error" in result:
             return []
+        requested_facility_type = self._requested_facility_type(severity, facility_type)
 
         facilities = result.get("facilities", []) or []
         fallback_facility_type = _normalize_text(result.get("fallback_facility_type")).lower()
@@ -1411,7 +1539,11 @@ class MapAgent:
                 }
             )
 
-        eta_by_place_id = self._estimate_route_eta_minutes(latitude, longitude, cleaned)
+        eta_by_place_id = (
+            {}
+            if budget_is_low()
+            else self._estimate_route_eta_minutes(latitude, longitude, cleaned)
+        )
         scored: list[dict[str, Any]] = []
         for item in cleaned:
             eta_minutes = eta_by_place_id.get(_normalize_text(item.get("place_id")))
@@ -1491,7 +1623,7 @@ class FirebaseProfileService:
         profile: dict[str, Any] = {}
 
         try:
-            user_doc = db.collection("users").document(user_id).get()
+            user_doc = db.collection("users").document(user_id).get(timeout=remaining_timeout(5.0))
             if user_doc.exists:
                 data = user_doc.to_dict() or {}
                 profile["firstName"] = data.get("firstName") or ""
@@ -1508,7 +1640,7 @@ class FirebaseProfileService:
                 .document(user_id)
                 .collection("medical_histories")
                 .document("current")
-                .get()
+                .get(timeout=remaining_timeout(5.0))
             )
             if med_doc.exists:
                 med = med_doc.to_dict() or {}
@@ -1521,7 +1653,11 @@ class FirebaseProfileService:
 
         try:
             rel_docs = (
-                db.collection("users").document(user_id).collection("relatives").limit(3).stream()
+                db.collection("users")
+                .document(user_id)
+                .collection("relatives")
+                .limit(3)
+                .stream(timeout=remaining_timeout(5.0))
             )
             relatives = []
             for d in rel_docs:
@@ -1548,7 +1684,11 @@ class FirebaseProfileService:
         try:
             db = self.firestore.client()
             friend_docs = (
-                db.collection("users").document(user_id).collection("friends").limit(10).stream()
+                db.collection("users")
+                .document(user_id)
+                .collection("friends")
+                .limit(10)
+                .stream(timeout=remaining_timeout(5.0))
             )
             for doc in friend_docs:
                 data = doc.to_dict() or {}
@@ -1767,6 +1907,76 @@ def _select_target_person(medical_context: dict[str, Any], target_user_id: str)
     return {}
 
 
+# Dedicated pool for blocking SDK/HTTP calls. asyncio.run() joins the loop's default
+# executor on shutdown, so timed-out stages running there would still hold the
+# response open until they finished.
+_BLOCKING_EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(_safe_float(os.getenv("WORKFLOW_BLOCKING_WORKERS")) or 32),
+    thread_name_prefix="bystander-blocking",
+)
+
+# Stage -> (default, min, max) timeout in seconds. Defaults apply until enough latency
+# samples exist; afterwards the timeout follows p99 x ADAPTIVE_TIMEOUT_FACTOR.
+STAGE_TIMEOUTS: dict[str, tuple[float, float, float]] = {
+    "triage": (12.0, 3.0, 15.0),
+    "rag": (3.0, 0.5, 5.0),
+    "guidance": (15.0, 4.0, 20.0),
+    "profile": (0.8, 0.3, 3.0),
+    "medical_network": (0.8, 0.3, 3.0),
+    "support_facilities": (0.8, 0.3, 8.0),
+    "facilities": (8.0, 2.0, 12.0),
+    "script": (15.0, 4.0, 20.0),
+    "script_summary": (4.0, 1.0, 8.0),
+    "fused": (15.0, 4.0, 20.0),
+}
+
+# Identical in-flight work units (triage, retrieval, facility search, non-personalized
+# guidance) share one execution; callers within the same location tile share facilities.
+REQUEST_COALESCING = env_flag("REQUEST_COALESCING", True)
+# One LLM call for triage+guidance when the local classifier confidently says the report is
+# not critical (and there is no medical history to personalize for).
+FUSED_TRIAGE_GUIDANCE = env_flag("FUSED_TRIAGE_GUIDANCE", False)
+FUSED_MIN_CONFIDENCE = env_float("FUSED_MIN_CONFIDENCE", 0.6)
+# Answer critical reports right after triage with the best-matching protocol's own steps
+# and deliver the LLM guidance through a guidance session. A request's "instant_answer"
+# field overrides the default.
+CRITICAL_INSTANT_ANSWER = env_flag("CRITICAL_INSTANT_ANSWER", False)
+# Local-index score a critical protocol needs to be served as the instant answer: a
+# case-name match (5), the same bar the guidance store uses. A keyword or two is not enough.
+CRITICAL_INSTANT_MIN_SCORE = env_float("CRITICAL_INSTANT_MIN_SCORE", 5.0)
+# Deadline for the background guidance that follows an instant answer.
+CRITICAL_REFINE_DEADLINE_SEC = env_float("CRITICAL_REFINE_DEADLINE_SEC", 30.0)
+COALESCE_TILE_DEG = env_float("COALESCE_TILE_DEG", 0.01)
+# Start the facility search alongside triage so a finished result can ride along with
+# the guidance. Most results finish too late or fall out of scope and are discarded
+# after the Places and route calls were paid for; /find_facilities covers the rest.
+SPECULATIVE_FACILITY_SEARCH = env_flag("SPECULATIVE_FACILITY_SEARCH", False)
+# Start the call script in the background once an emergency answer is ready; the app
+# requests /call_script right after /agent_workflow.
+SPECULATIVE_CALL_SCRIPT = env_flag("SPECULATIVE_CALL_SCRIPT", False)
+# A speculated script is only served to a caller within this grid cell (~110 m), so the
+# address it reads out is still right.
+SPECULATIVE_SCRIPT_TILE_DEG = env_float("SPECULATIVE_SCRIPT_TILE_DEG", 0.001)
+
+CALL_SCRIPT_FALLBACK = (
+    "สวัสดีค่ะ/ครับ แจ้งเหตุฉุกเฉิน มีผู้ป่วยต้องการความช่วยเหลือด่วน\n"
+    "จุดเกิดเหตุ: โปรดระบุที่อยู่หรือจุดสังเกตใกล้เคียง\n"
+    "ขอรถพยาบาลด่วนครับ/ค่ะ"
+)
+
+_STEP_NUMBER = re.compile(r"^\d{1,2}[.)]\s*")
+
+
+def _protocol_guidance(row: dict[str, str]) -> str:
+    """A protocol row's instructions as numbered steps ending with the 1669 call."""
+
+    steps = [_STEP_NUMBER.sub("", step) for step in split_guidance_steps(row.get("instructions"))]
+    steps = [step for step in steps if step]
+    if not any("1669" in step for step in steps):
+        steps.append("โทร 1669 ทันทีและทำตามคำแนะนำของเจ้าหน้าที่จนกว่าทีมแพทย์จะมาถึง")
+    return "\n".join(f"{index}. {step}" for index, step in enumerate(steps, start=1))
+
+
 class ByStanderWorkflow:
     def __init__(self) -> None:
         llm = GeminiJSONAgent()
@@ -1777,6 +1987,18 @@ class ByStanderWorkflow:
         self.retriever = ProtocolRetriever()
         self.profile_service = FirebaseProfileService()
         self.judge_service = AsyncJudgeService()
+        self.stage_timeouts = AdaptiveTimeouts(STAGE_TIMEOUTS)
+        self.singleflight = SingleFlight()
+        self.triage_fastpath = TriageFastPath()
+        self.guidance_sessions = GuidanceSessions()
+        self.speculation = SpeculationStore()
+        # Background refinements, kept referenced until they finish.
+        self._refinements: set[Future] = set()
+
+    def background_jobs(self) -> int:
+        """LLM work still running after its response went out (refinements, speculation)."""
+
+        return len(self._refinements) + self.speculation.in_flight()
 
     @observe()
     def run(self, payload: dict[str, Any]) -> dict[str, Any]:
@@ -1788,16 +2010,155 @@ class ByStanderWorkflow:
         *args: Any,
         timeout: float = 0.8,
         default: Any = None,
+        stage: str = "",
+        coalesce_key: Hashable | None = None,
         **kwargs: Any,
     ) -> Any:
-        try:
-            return await asyncio.wait_for(
-                asyncio.to_thread(partial(func, *args, **kwargs)),
-                timeout=timeout,
+        return await self._run_with_timeout(
+            lambda ctx: _BLOCKING_EXECUTOR.submit(partial(ctx.run, func, *args, **kwargs)),
+            timeout=timeout,
+            default=default,
+            stage=stage,
+            coalesce_key=coalesce_key,
+        )
+
+    async def _run_llm_with_timeout(
+        self,
+        func: Callable[..., Coroutine[Any, Any, Any]],
+        *args: Any,
+        timeout: float = 0.8,
+        default: Any = None,
+        stage: str = "",
+        coalesce_key: Hashable | None = None,
+        **kwargs: Any,
+    ) -> Any:
+        """
+        _run_blocking_with_timeout for the agents' async methods: the coroutine runs on
+        the shared I/O loop, so waiting holds no thread, and a timeout (or the last
+        coalesced caller leaving) cancels the provider request itself.
+        """
+
+        return await self._run_with_timeout(
+            lambda ctx: IO_LOOP.submit(func(*args, **kwargs), context=ctx),
+            timeout=timeout,
+            default=default,
+            stage=stage,
+            coalesce_key=coalesce_key,
+        )
+
+    async def _run_with_timeout(
+        self,
+        start: Callable[[contextvars.Context], Future],
+        timeout: float,
+        default: Any,
+        stage: str,
+        coalesce_key: Hashable | None,
+    ) -> Any:
+        if stage:
+            timeout = self.stage_timeouts.timeout_for(stage)
+        deadline = current_deadline()
+        budget = deadline.budget(timeout) if deadline is not None else timeout
+        if budget < MIN_CALL_TIMEOUT_SEC:
+            return default
+        # Copy the context so the request deadline is visible where the work runs.
+        ctx = contextvars.copy_context()
+        shared = False
+        future = None
+        if coalesce_key is not None and REQUEST_COALESCING:
+            # Shared work follows its own token so one caller's cancellation does not
+            # stop it for the others.
+            future, shared = self.singleflight.submit(
+                coalesce_key, lambda token: start(bind_cancel_token(ctx, token))
             )
+            # Each caller waits with its own budget; giving up must not cancel the
+            # execution other callers are attached to.
+            waiter = await_shared(future)
+        else:
+            waiter = asyncio.wrap_future(start(ctx))
+        started = time.perf_counter()
+        finished = False
+        try:
+            result = await asyncio.wait_for(waiter, timeout=budget)
+            finished = True
+        except asyncio.TimeoutError as exc:
+            record_exception(exc)
+            # Only a cut at the stage's own timeout says something about the stage; a cut
+            # by the request deadline would bias the histogram low.
+            if stage and not shared and budget >= timeout:
+                self.stage_timeouts.observe(stage, budget, timed_out=True)
+            return default
         except Exception as exc:
+            finished = True
             record_exception(exc)
             return default
+        finally:
+            if future is not None and not finished:
+                self.singleflight.abandon(coalesce_key, future)
+        # Attached callers only saw part of the execution; keep them out of the histogram.
+        if stage and not shared:
+            self.stage_timeouts.observe(stage, time.perf_counter() - started)
+        if coalesce_key is not None:
+            # A coalesced result is shared between requests; give each caller its own copy.
+            return copy.deepcopy(result)
+        return result
+
+    @staticmethod
+    def _facility_coalesce_key(
+        scenario: str,
+        severity: str,
+        facility_type: str,
+        latitude: float | None,
+        longitude: float | None,
+    ) -> Hashable:
+        return (
+            "facilities",
+            normalize_scenario_key(scenario),
+            severity,
+            facility_type,
+            location_tile(latitude, longitude, COALESCE_TILE_DEG),
+        )
+
+    async def _facilities_async(
+        self,
+        scenario: str,
+        severity: str,
+        facility_type: str,
+        latitude: float | None,
+        longitude: float | None,
+        stage: str,
+    ) -> list[dict[str, Any]]:
+        """
+        MapAgent.run with only the Places search coalesced across callers in the same
+        tile; distance, ETA and ranking are worked out from each caller's own point.
+        """
+
+        candidates = await self._run_blocking_with_timeout(
+            self.map_agent.find_candidates,
+            scenario,
+            severity,
+            facility_type,
+            latitude,
+            longitude,
+            stage=stage,
+            default=None,
+            coalesce_key=self._facility_coalesce_key(
+                scenario, severity, facility_type, latitude, longitude
+            ),
+        )
+        if not isinstance(candidates, dict):
+            return []
+        facilities = await self._run_blocking_with_timeout(
+            self.map_agent.rank_facilities,
+            candidates,
+            scenario,
+            severity,
+            facility_type,
+            latitude,
+            longitude,
+            timeout=self.stage_timeouts.timeout_for(stage),
+            default=[],
+        )
+        return facilities if isinstance(facilities, list) else []
 
     @staticmethod
     async def _return_async(value: Any) -> Any:
@@ -1827,7 +2188,7 @@ class ByStanderWorkflow:
             self._run_blocking_with_timeout(
                 self.profile_service.get_user_profile,
                 target_user_id,
-                timeout=0.8,
+                stage="profile",
                 default={},
             )
             if target_user_id
@@ -1837,22 +2198,20 @@ class ByStanderWorkflow:
             self._run_blocking_with_timeout(
                 self.profile_service.get_medical_network,
                 caller_user_id or target_user_id,
-                timeout=0.8,
+                stage="medical_network",
                 default={"owner": {}, "friends": []},
             )
             if (caller_user_id or target_user_id)
             else self._return_async({"owner": {}, "friends": []})
         )
         facility_coro = (
-            self._run_blocking_with_timeout(
-                self.map_agent.run,
+            self._facilities_async(
                 scenario,
                 severity,
                 facility_type,
                 latitude,
                 longitude,
-                timeout=0.8,
-                default=[],
+                stage="support_facilities",
             )
             if latitude is not None and longitude is not None and facility_type != "none"
             else self._return_async([])
@@ -1868,15 +2227,66 @@ class ByStanderWorkflow:
             "facilities": facilities or [],
         }
 
+    def _provisional_severity(self, scenario: str) -> tuple[str, dict[str, Any]]:
+        """Severity of the best local protocol match; instant, no LLM."""
+
+        local = self.retriever.retrieve_local(query=scenario, severity="", top_k=3)
+        matches = local.get("matches") or []
+        severity = "moderate"
+        if int(local.get("top_score", 0) or 0) > 0 and matches[0].get("severity") == "critical":
+            severity = "critical"
+        return severity, local
+
+    def _speculative_severity(self, scenario: str) -> str:
+        """Cheap severity estimate used to start retrieval before triage returns."""
+
+        prediction = self.triage_fastpath.predict(scenario)
+        if prediction is not None:
+            return "critical" if prediction["severity"] == "critical" else "moderate"
+        severity, _ = self._provisional_severity(scenario)
+        return severity
+
+    @staticmethod
+    def _cancel_tasks(*tasks: asyncio.Task[Any] | None) -> None:
+        for task in tasks:
+            if task is not None and not task.done():
+                task.cancel()
+
     async def _triage_async(self, scenario: str) -> dict[str, Any]:
-        triage = await self._run_blocking_with_timeout(
-            self.triage_agent.run,
+        local = self.triage_fastpath.predict(scenario)
+        if self.triage_fastpath.accepts(local):
+            # Confidently critical: no need to wait for the LLM before guidance starts.
+            return {
+                "is_emergency": True,
+                "severity": "critical",
+                "facility_type": "clinic" if local["facility_type"] == "clinic" else "hospital",
+                "reason_th": "ประเมินเบื้องต้นจากอาการที่แจ้งว่าเป็นเหตุฉุกเฉินวิกฤต",
+                "triage_source": "local",
+            }
+        # Triage for a likely-critical report is hedged across providers.
+        hint, _ = self._provisional_severity(scenario)
+        if local is not None and local["severity"] == "critical":
+            hint = "critical"
+        hedge_kwargs = {"severity_hint": hint} if HEDGE_POLICY.enabled_for(hint) else {}
+        triage = await self._run_llm_with_timeout(
+            self.triage_agent.run_async,
             scenario,
-            timeout=12.0,
+            stage="triage",
             default=None,
+            coalesce_key=("triage", normalize_scenario_key(scenario)),
+            **hedge_kwargs,
         )
         if isinstance(triage, dict):
             return triage
+        if local is not None and local["severity"] == "critical":
+            # The LLM is unavailable; a low-confidence critical call still beats the default.
+            return {
+                "is_emergency": True,
+                "severity": "critical",
+                "facility_type": "hospital",
+                "reason_th": "ระบบวิเคราะห์ฉุกเฉินขัดข้องชั่วคราว ประเมินเบื้องต้นว่าอาจเป็นเหตุวิกฤต",
+                "triage_source": "local",
+            }
         return {
             "is_emergency": True,
             "severity": "moderate",
@@ -1885,10 +2295,15 @@ class ByStanderWorkflow:
         }
 
     async def _retrieve_rag_async(self, scenario: str, severity: str) -> tuple[dict[str, Any], str]:
+        if budget_is_low():
+            # Not enough time left for a Vertex round-trip; the local index is instant.
+            local = self.retriever.retrieve_local(query=scenario, severity=severity, top_k=3)
+            return local, _normalize_text(local.get("context"))
         rag_result = await self._run_blocking_with_timeout(
             self.retriever.retrieve_with_meta,
-            timeout=3.0,
+            stage="rag",
             default=None,
+            coalesce_key=("rag", normalize_scenario_key(scenario), severity),
             query=scenario,
             severity=severity,
             top_k=3,
@@ -1910,8 +2325,16 @@ class ByStanderWorkflow:
             caller_user_id = target_user_id
         return caller_user_id, target_user_id
 
-    @observe()
-    async def run_async(self, payload: dict[str, Any]) -> dict[str, Any]:
+    async def _prepare_guidance_async(
+        self, payload: dict[str, Any], triage: dict[str, Any] | None = None, instant: bool = False
+    ) -> dict[str, Any]:
+        """
+        Triage (unless already known), retrieval and medical context ahead of guidance
+        generation. Returns {"response": ...} when the report is not an emergency.
+        With `instant`, a critical report with a confident protocol match returns right
+        after triage with that protocol's guidance under "instant".
+        """
+
         scenario = _normalize_text(payload.get("scenario") or payload.get("sentence"))
         if not scenario:
             raise ValueError("scenario is required")
@@ -1924,29 +2347,61 @@ class ByStanderWorkflow:
             target_user_id=target_user_id,
         )
 
-        triage = await self._triage_async(scenario)
+        # Retrieval (and, if enabled, facility search) only need an approximate severity:
+        # start them alongside triage and reconcile once triage returns.
+        if triage is not None:
+            provisional = _normalize_text(triage.get("severity")).lower() or "moderate"
+        else:
+            provisional = self._speculative_severity(scenario)
+        rag_task = asyncio.create_task(self._retrieve_rag_async(scenario, provisional))
+        facility_task: asyncio.Task[Any] | None = None
+        provisional_facility = "hospital" if provisional == "critical" else "clinic"
+        if SPECULATIVE_FACILITY_SEARCH and latitude is not None and longitude is not None:
+            facility_task = asyncio.create_task(
+                self._facilities_async(
+                    scenario,
+                    provisional,
+                    provisional_facility,
+                    latitude,
+                    longitude,
+                    # Never awaited on the critical path, so it gets the full search budget.
+                    stage="facilities",
+                )
+            )
+        if triage is None:
+            try:
+                triage = await self._triage_async(scenario)
+            except BaseException:
+                self._cancel_tasks(rag_task, facility_task)
+                raise
         is_emergency = bool(triage.get("is_emergency"))
         severity = _normalize_text(triage.get("severity", "none")).lower()
         if severity not in {"critical", "moderate", "none"}:
             severity = "none"
 
         if not is_emergency or severity == "none":
-            return {
-                "route": "general_info",
-                "is_emergency": False,
-                "adk_available": ADK_AVAILABLE,
-                "severity": "none",
-                "facility_type": "none",
-                "guidance": "",
-                "general_info": (
-                    "สถานการณ์ที่คุณแจ้งเข้ามาไม่ถูกจัดเป็นเหตุฉุกเฉินเร่งด่วน\n"
-                    "หากอาการแย่ลงอย่างรวดเร็ว เช่น หมดสติ หายใจลำบาก เจ็บหน้าอกรุนแรง "
-                    "หรือมีเลือดออกมาก ให้โทร 1669 ทันที"
-                ),
-                "call_script": "",
-                "facilities": [],
-                "triage_reason": triage.get("reason_th", ""),
-            }
+            self._cancel_tasks(rag_task, facility_task)
+            return {"response": self._general_info_response(triage)}
+
+        if instant and severity == "critical":
+            answer = self._instant_guidance(scenario, triage)
+            if answer is not None:
+                # Retrieval and medical context only feed the LLM guidance, which is
+                # generated in the background from here on.
+                self._cancel_tasks(rag_task)
+                local, guidance = answer
+                return {
+                    "scenario": scenario,
+                    "severity": severity,
+                    "triage": triage,
+                    "rag_result": local,
+                    "rag_context": _normalize_text(local.get("context")),
+                    "medical_context": payload_medical_context,
+                    "guidance_key": None,
+                    "facility_task": facility_task,
+                    "facility_scope": (provisional, provisional_facility),
+                    "instant": guidance,
+                }
 
         support_task: asyncio.Task[Any] | None = None
         if _medical_context_has_history(payload_medical_context):
@@ -1961,8 +2416,12 @@ class ByStanderWorkflow:
                     longitude=longitude,
                 )
             )
+        if severity != provisional:
+            # The severity is part of the retrieval query; the speculative result is stale.
+            rag_task.cancel()
+            rag_task = asyncio.create_task(self._retrieve_rag_async(scenario, severity))
         try:
-            rag_result, rag_context = await self._retrieve_rag_async(scenario, severity)
+            rag_result, rag_context = await rag_task
         except Exception as exc:
             record_exception(exc)
             rag_result = {"source": "none", "count": 0}
@@ -1976,30 +2435,131 @@ class ByStanderWorkflow:
             target_user_id=target_user_id,
         )
         medical_context = _merge_medical_context(payload_medical_context, backend_context)
-        guidance_result = await self._run_blocking_with_timeout(
-            self.guidance_agent.run,
+        guidance_key: Hashable | None = None
+        if not GuidanceAgent._extract_relevant_conditions(medical_context):
+            # Only non-personalized guidance is shareable between callers.
+            guidance_key = (
+                "guidance",
+                normalize_scenario_key(scenario),
+                severity,
+                hashlib.sha1(rag_context.encode("utf-8")).hexdigest(),
+            )
+        return {
+            "scenario": scenario,
+            "severity": severity,
+            "triage": triage,
+            "rag_result": rag_result,
+            "rag_context": rag_context,
+            "medical_context": medical_context,
+            "guidance_key": guidance_key,
+            "facility_task": facility_task,
+            "facility_scope": (provisional, provisional_facility),
+        }
+
+    @staticmethod
+    def _general_info_response(triage: dict[str, Any]) -> dict[str, Any]:
+        return {
+            "route": "general_info",
+            "is_emergency": False,
+            "adk_available": ADK_AVAILABLE,
+            "severity": "none",
+            "facility_type": "none",
+            "guidance": "",
+            "general_info": (
+                "สถานการณ์ที่คุณแจ้งเข้ามาไม่ถูกจัดเป็นเหตุฉุกเฉินเร่งด่วน\n"
+                "หากอาการแย่ลงอย่างรวดเร็ว เช่น หมดสติ หายใจลำบาก เจ็บหน้าอกรุนแรง "
+                "หรือมีเลือดออกมาก ให้โทร 1669 ทันที"
+            ),
+            "call_script": "",
+            "facilities": [],
+            "triage_reason": triage.get("reason_th", ""),
+        }
+
+    async def _fused_async(
+        self, payload: dict[str, Any]
+    ) -> tuple[dict[str, Any] | None, dict[str, Any] | None]:
+        """
+        Single-call triage+guidance for likely non-critical reports without medical
+        history. Returns (triage, response): a response when the fused call settled the
+        request, only a triage when it escalated to critical, (None, None) otherwise.
+        """
+
+        if not FUSED_TRIAGE_GUIDANCE:
+            return None, None
+        scenario = _normalize_text(payload.get("scenario") or payload.get("sentence"))
+        if not scenario:
+            return None, None
+        caller_user_id, target_user_id = self._parse_identity_fields(payload)
+        medical_context = _normalize_medical_context_payload(
+            payload.get("medical_context"),
+            caller_user_id=caller_user_id,
+            target_user_id=target_user_id,
+        )
+        if _medical_context_has_history(medical_context):
+            return None, None
+        prediction = self.triage_fastpath.predict(scenario)
+        if (
+            prediction is None
+            or prediction["severity"] == "critical"
+            or float(prediction.get("confidence") or 0.0) < FUSED_MIN_CONFIDENCE
+        ):
+            # Critical or ambiguous: keep the two-stage path.
+            return None, None
+        local = self.retriever.retrieve_local(query=scenario, severity="moderate", top_k=3)
+        rag_context = _normalize_text(local.get("context"))
+        fused = await self._run_llm_with_timeout(
+            self.guidance_agent.run_fused_async,
             scenario,
-            severity,
             rag_context,
-            timeout=15.0,
+            stage="fused",
             default=None,
-            medical_context=medical_context,
+            coalesce_key=("fused", normalize_scenario_key(scenario)),
         )
+        if not isinstance(fused, dict) or not fused:
+            return None, None
+        triage = {
+            "is_emergency": fused["is_emergency"],
+            "severity": fused["severity"],
+            "facility_type": fused["facility_type"],
+            "reason_th": fused["reason_th"],
+        }
+        if not triage["is_emergency"] or triage["severity"] == "none":
+            return triage, self._general_info_response(triage)
+        if triage["severity"] == "critical":
+            # Critical guidance goes through the dedicated model (and hedging).
+            return triage, None
+        prepared = {
+            "scenario": scenario,
+            "severity": "moderate",
+            "triage": triage,
+            "rag_result": local,
+            "rag_context": rag_context,
+            "medical_context": medical_context,
+        }
+        return triage, self._emergency_response(prepared, fused)
+
+    def _emergency_response(
+        self, prepared: dict[str, Any], guidance_result: Any, judge: bool = True
+    ) -> dict[str, Any]:
+        scenario = prepared["scenario"]
+        severity = prepared["severity"]
+        rag_result = prepared["rag_result"]
         if not isinstance(guidance_result, dict):
             guidance_result = {
-                "guidance": (
-                    "สถานการณ์นี้เป็นเหตุฉุกเฉิน\n"
-                    "1. ประเมินความปลอดภัยของพื้นที่\n"
-                    "2. โทร 1669 ทันที\n"
-                    "3. ปฐมพยาบาลตามอาการเท่าที่ปลอดภัย\n"
-                    "4. เฝ้าระวังอาการจนกว่าทีมแพทย์มาถึง"
-                ),
+                "guidance": EMERGENCY_FALLBACK_GUIDANCE,
                 "facility_type": "hospital" if severity == "critical" else "clinic",
             }
         guidance_text = _normalize_text(guidance_result.get("guidance"))
         facility_type = _normalize_text(guidance_result.get("facility_type")).lower()
         if facility_type not in {"hospital", "clinic", "none"}:
             facility_type = "hospital" if severity == "critical" else "clinic"
+        facilities: list[Any] = []
+        facility_task = prepared.get("facility_task")
+        if prepared.get("facility_scope") == (severity, facility_type):
+            # Only attach the speculative search if it is already done and still in scope;
+            # /find_facilities covers everything else.
+            facilities = self._safe_task_result(facility_task, []) or []
+        self._cancel_tasks(facility_task)
 
         response_payload = {
             "route": "emergency_guidance",
@@ -2011,9 +2571,11 @@ class ByStanderWorkflow:
             "general_info": "",
             "call_script": "",
             "location_context": "",
-            "facilities": [],
-            "triage_reason": triage.get("reason_th", ""),
+            "facilities": facilities,
+            "triage_reason": prepared["triage"].get("reason_th", ""),
         }
+        if not judge:
+            return response_payload
         try:
             self.judge_service.submit(
                 {
@@ -2021,9 +2583,9 @@ class ByStanderWorkflow:
                     "severity": severity,
                     "rag_source": rag_result.get("source", "none"),
                     "rag_count": int(rag_result.get("count", 0) or 0),
-                    "rag_context": rag_context,
+                    "rag_context": prepared["rag_context"],
                     "guidance": guidance_text,
-                    "facilities": [],
+                    "facilities": facilities,
                     "call_script": "",
                 }
             )
@@ -2032,6 +2594,253 @@ class ByStanderWorkflow:
         return response_payload
 
     @observe()
+    @with_request_deadline("agent_workflow")
+    async def run_async(self, payload: dict[str, Any]) -> dict[str, Any]:
+        response = await self._workflow_async(payload)
+        if SPECULATIVE_CALL_SCRIPT:
+            self._speculate_call_script(payload, response)
+        return response
+
+    async def _workflow_async(self, payload: dict[str, Any]) -> dict[str, Any]:
+        triage, response = await self._fused_async(payload)
+        if response is not None:
+            return response
+        prepared = await self._prepare_guidance_async(
+            payload, triage=triage, instant=self._instant_answer_requested(payload)
+        )
+        if "response" in prepared:
+            return prepared["response"]
+        if "instant" in prepared:
+            return self._instant_response(payload, prepared)
+        guidance_result = await self._generate_guidance_async(prepared)
+        return self._emergency_response(prepared, guidance_result)
+
+    async def _generate_guidance_async(self, prepared: dict[str, Any]) -> dict[str, Any] | None:
+        stored = self._materialized_guidance(prepared)
+        if stored is not None:
+            return stored
+        return await self._run_llm_with_timeout(
+            self.guidance_agent.run_async,
+            prepared["scenario"],
+            prepared["severity"],
+            prepared["rag_context"],
+            stage="guidance",
+            default=None,
+            coalesce_key=prepared["guidance_key"],
+            medical_context=prepared["medical_context"],
+        )
+
+    @staticmethod
+    def _instant_answer_requested(payload: dict[str, Any]) -> bool:
+        return parse_flag(payload.get("instant_answer"), CRITICAL_INSTANT_ANSWER)
+
+    def _instant_guidance(
+        self, scenario: str, triage: dict[str, Any]
+    ) -> tuple[dict[str, Any], dict[str, Any]] | None:
+        """(local retrieval, guidance) from the top protocol match; None if not confident."""
+
+        local = self.retriever.retrieve_local(query=scenario, severity="critical", top_k=1)
+        matches = local.get("matches") or []
+        score = int(local.get("top_score", 0) or 0)
+        if not matches or score < CRITICAL_INSTANT_MIN_SCORE:
+            return None
+        if _normalize_text(matches[0].get("severity")).lower() != "critical":
+            return None
+        # A pre-generated answer for the same protocol reads better than the raw steps.
+        stored = self.guidance_agent.materialized(matches[0], score, "critical")
+        if stored is not None:
+            return local, stored
+        facility_type = _normalize_text(triage.get("facility_type")).lower()
+        return local, {
+            "guidance": _protocol_guidance(matches[0]),
+            "facility_type": facility_type
+            if facility_type in {"hospital", "clinic"}
+            else "hospital",
+        }
+
+    def _instant_response(
+        self, payload: dict[str, Any], prepared: dict[str, Any]
+    ) -> dict[str, Any]:
+        session_id = self.guidance_sessions.open()
+        # Facilities come from /find_facilities; the background pass only needs guidance.
+        background = {k: v for k, v in payload.items() if k not in {"latitude", "longitude"}}
+        future = IO_LOOP.submit(
+            self._refine_guidance_async(background, prepared["triage"], session_id)
+        )
+        self._refinements.add(future)
+        future.add_done_callback(self._refinements.discard)
+        response = self._emergency_response(prepared, prepared["instant"])
+        response["guidance_source"] = "protocol"
+        response["guidance_session"] = session_id
+        return response
+
+    @observe()
+    async def _refine_guidance_async(
+        self, payload: dict[str, Any], triage: dict[str, Any], session_id: str
+    ) -> None:
+        """LLM guidance for an instantly answered report, published to its session."""
+
+        # The response has gone out: the request's deadline and cancellation no longer apply.
+        with use_deadline(Deadline(CRITICAL_REFINE_DEADLINE_SEC)), use_cancel_token(None):
+            guidance = None
+            try:
+                prepared = await self._prepare_guidance_async(payload, triage=triage)
+                if "response" not in prepared:
+                    guidance = await self._generate_guidance_async(prepared)
+            except Exception as exc:
+                record_exception(exc)
+            if not isinstance(guidance, dict) or _normalize_text(guidance.get("guidance")) in (
+                "",
+                EMERGENCY_FALLBACK_GUIDANCE,
+            ):
+                # The protocol answer already on screen beats the static fallback.
+                self.guidance_sessions.fail(session_id, "personalized guidance is unavailable")
+                return
+            # The instant answer already submitted this request's judge job.
+            response = self._emergency_response(prepared, guidance, judge=False)
+            response["guidance_source"] = "llm"
+            self.guidance_sessions.complete(session_id, response)
+
+    def _materialized_guidance(self, prepared: dict[str, Any]) -> dict[str, Any] | None:
+        if prepared.get("guidance_key") is None:
+            # Personalized guidance is never served from the store.
+            return None
+        local = self.retriever.retrieve_local(
+            query=prepared["scenario"], severity=prepared["severity"], top_k=1
+        )
+        matches = local.get("matches") or []
+        return self.guidance_agent.materialized(
+            matches[0] if matches else None,
+            int(local.get("top_score", 0) or 0),
+            prepared["severity"],
+        )
+
+    def _pump_guidance_stream(
+        self,
+        scenario: str,
+        severity: str,
+        rag_context: str,
+        medical_context: dict[str, Any],
+        emit: Callable[[dict[str, Any]], None],
+    ) -> dict[str, Any] | None:
+        final = None
+        for event in self.guidance_agent.stream(scenario, severity, rag_context, medical_context):
+            if event.get("type") == "final":
+                final = {key: value for key, value in event.items() if key != "type"}
+            else:
+                emit(event)
+        return final
+
+    @observe()
+    @with_request_deadline("agent_workflow")
+    async def stream_async(
+        self, payload: dict[str, Any], emit: Callable[[dict[str, Any]], None]
+    ) -> dict[str, Any]:
+        """
+        `run_async`, but guidance steps are passed to `emit` as the model writes them.
+        Emits a "triage" event first (then an "instant" event with protocol guidance for
+        an instantly answered critical report); returns the response `run_async` would
+        have put in the guidance session.
+        """
+
+        prepared = await self._prepare_guidance_async(
+            payload, instant=self._instant_answer_requested(payload)
+        )
+        if "response" in prepared:
+            return prepared["response"]
+        emit(
+            {
+                "type": "triage",
+                "severity": prepared["severity"],
+                "triage_reason": prepared["triage"].get("reason_th", ""),
+            }
+        )
+        if "instant" in prepared:
+            # Protocol steps first; the LLM steps below then replace them on the client.
+            instant = prepared["instant"]
+            emit(
+                {
+                    "type": "instant",
+                    "guidance": instant["guidance"],
+                    "steps": split_guidance_steps(instant["guidance"]),
+                    "facility_type": instant["facility_type"],
+                }
+            )
+            speculative = prepared["facility_task"]
+            prepared = await self._prepare_guidance_async(payload, triage=prepared["triage"])
+            # The new preparation has attached to the same coalesced facility search.
+            self._cancel_tasks(speculative)
+        stored = self._materialized_guidance(prepared)
+        if stored is not None:
+            for index, step in enumerate(split_guidance_steps(stored["guidance"]), start=1):
+                emit({"type": "step", "index": index, "text": step})
+            return self._emergency_response(prepared, stored)
+        stage_open = threading.Event()
+        stage_open.set()
+
+        def emit_step(event: dict[str, Any]) -> None:
+            # Steps arriving after the stage timed out would contradict the fallback.
+            if stage_open.is_set():
+                emit(event)
+
+        try:
+            guidance_result = await self._run_blocking_with_timeout(
+                self._pump_guidance_stream,
+                prepared["scenario"],
+                prepared["severity"],
+                prepared["rag_context"],
+                prepared["medical_context"],
+                emit_step,
+                stage="guidance",
+                default=None,
+            )
+        finally:
+            stage_open.clear()
+        return self._emergency_response(prepared, guidance_result)
+
+    @observe()
+    def run_degraded(self, payload: dict[str, Any]) -> dict[str, Any]:
+        """
+        Load-shedding answer: static guidance plus local-index protocol context.
+        Makes no LLM or network calls so it returns in milliseconds.
+        """
+
+        scenario = _normalize_text(payload.get("scenario") or payload.get("sentence"))
+        if not scenario:
+            raise ValueError("scenario is required")
+        severity, local = self._provisional_severity(scenario)
+        return {
+            "route": "emergency_guidance",
+            "is_emergency": True,
+            "adk_available": ADK_AVAILABLE,
+            "severity": severity,
+            "facility_type": "hospital" if severity == "critical" else "clinic",
+            "guidance": EMERGENCY_FALLBACK_GUIDANCE,
+            "general_info": "",
+            "call_script": "",
+            "location_context": "",
+            "facilities": [],
+            "triage_reason": "ระบบมีผู้ใช้งานหนาแน่น จึงให้คำแนะนำเบื้องต้นทันที",
+            "protocol_context": _normalize_text(local.get("context")),
+            "degraded": True,
+        }
+
+    def generate_call_script_degraded(self, payload: dict[str, Any]) -> dict[str, Any]:
+        scenario = _normalize_text(payload.get("scenario") or payload.get("sentence"))
+        if not scenario:
+            raise ValueError("scenario is required")
+        return {
+            "call_script": CALL_SCRIPT_FALLBACK,
+            "script_source": "fallback",
+            "used_medical_history": [],
+            "location_context": "",
+            "facilities": [],
+            "total": 0,
+            "degraded": True,
+        }
+
+    @observe()
+    @with_request_deadline("find_facilities")
     async def find_facilities_async(self, payload: dict[str, Any]) -> dict[str, Any]:
         latitude = _safe_float(payload.get("latitude"))
         longitude = _safe_float(payload.get("longitude"))
@@ -2054,17 +2863,9 @@ class ByStanderWorkflow:
         if facility_type == "none":
             return {"facilities": [], "total": 0, "pending_location": False}
 
-        facilities = await self._run_blocking_with_timeout(
-            self.map_agent.run,
-            scenario,
-            severity,
-            facility_type,
-            latitude,
-            longitude,
-            timeout=8.0,
-            default=[],
+        facilities = await self._facilities_async(
+            scenario, severity, facility_type, latitude, longitude, stage="facilities"
         )
-        facilities = facilities if isinstance(facilities, list) else []
         return {
             "facilities": facilities,
             "total": len(facilities),
@@ -2076,8 +2877,71 @@ class ByStanderWorkflow:
             ),
         }
 
+    @staticmethod
+    def _call_script_key(payload: dict[str, Any]) -> Hashable:
+        """The /call_script inputs a speculated script must match to be served."""
+
+        caller_user_id = _normalize_text(payload.get("caller_user_id") or payload.get("user_id"))
+        target_user_id = _normalize_text(payload.get("target_user_id") or payload.get("user_id"))
+        severity = _normalize_text(payload.get("severity")).lower()
+        return (
+            "call_script",
+            normalize_scenario_key(payload.get("scenario") or payload.get("sentence")),
+            _normalize_text(payload.get("guidance")),
+            # The app reports moderate severity as "mild".
+            "moderate" if severity == "mild" else severity,
+            _normalize_text(payload.get("facility_type")).lower(),
+            caller_user_id or target_user_id,
+            target_user_id or caller_user_id,
+            location_tile(
+                _safe_float(payload.get("latitude")),
+                _safe_float(payload.get("longitude")),
+                SPECULATIVE_SCRIPT_TILE_DEG,
+            ),
+            payload_fingerprint(payload.get("medical_context") or {}),
+        )
+
+    def _speculate_call_script(self, payload: dict[str, Any], response: dict[str, Any]) -> None:
+        if response.get("route") != "emergency_guidance" or response.get("degraded"):
+            return
+        script_payload = {
+            **payload,
+            "guidance": response.get("guidance"),
+            "severity": response.get("severity"),
+            "facility_type": response.get("facility_type"),
+            "route": response.get("route"),
+            "is_emergency": True,
+        }
+        self.speculation.offer(
+            self._call_script_key(script_payload),
+            lambda: IO_LOOP.submit(self._speculative_call_script_async(script_payload)),
+        )
+
+    async def _speculative_call_script_async(self, payload: dict[str, Any]) -> dict[str, Any]:
+        # Runs after the workflow response went out, on its own budget; the request's
+        # deadline and cancellation no longer apply.
+        with use_deadline(Deadline(self.speculation.budget_sec)), use_cancel_token(None):
+            return await self._compute_call_script_async(payload)
+
     @observe()
+    @with_request_deadline("call_script")
     async def generate_call_script_async(self, payload: dict[str, Any]) -> dict[str, Any]:
+        speculated = self.speculation.claim(self._call_script_key(payload))
+        if speculated is not None:
+            try:
+                result = await asyncio.wait_for(
+                    asyncio.wrap_future(speculated),
+                    timeout=remaining_timeout(self.speculation.budget_sec),
+                )
+            except Exception as exc:
+                # Timed out (which drops it) or failed: generate it now instead.
+                record_exception(exc)
+            else:
+                if isinstance(result, dict) and result.get("call_script"):
+                    return result
+        return await self._compute_call_script_async(payload)
+
+    async def _compute_call_script_async(self, payload: dict[str, Any]) -> dict[str, Any]:
         scenario = _normalize_text(payload.get("scenario") or payload.get("sentence"))
         if not scenario:
             raise ValueError("scenario is required")
@@ -2097,7 +2961,8 @@ class ByStanderWorkflow:
         route = _normalize_text(payload.get("route"))
         is_emergency = bool(payload.get("is_emergency"))
         if not guidance or severity not in {"critical", "moderate", "none"} or not facility_type:
-            workflow_result = await self.run_async(payload)
+            # Not run_async: the script is computed right here, so nothing to speculate.
+            workflow_result = await self._workflow_async(payload)
             guidance = _normalize_text(workflow_result.get("guidance"))
             severity = _normalize_text(workflow_result.get("severity")).lower()
             facility_type = _normalize_text(workflow_result.get("facility_type")).lower()
@@ -2115,7 +2980,7 @@ class ByStanderWorkflow:
             self._run_blocking_with_timeout(
                 self.profile_service.get_user_profile,
                 target_user_id,
-                timeout=0.8,
+                stage="profile",
                 default={},
             )
             if target_user_id
@@ -2125,7 +2990,7 @@ class ByStanderWorkflow:
             self._run_blocking_with_timeout(
                 self.profile_service.get_user_profile,
                 caller_user_id,
-                timeout=0.8,
+                stage="profile",
                 default={},
             )
             if caller_user_id and caller_user_id != target_user_id
@@ -2135,7 +3000,7 @@ class ByStanderWorkflow:
             self._run_blocking_with_timeout(
                 self.profile_service.get_medical_network,
                 caller_user_id or target_user_id,
-                timeout=0.8,
+                stage="medical_network",
                 default={"owner": {}, "friends": []},
             )
             if _medical_context_has_history(payload_medical_context)
@@ -2182,15 +3047,83 @@ class ByStanderWorkflow:
             longitude=longitude,
             facilities=facilities,
         )
-        call_script = await self._run_blocking_with_timeout(
-            self.script_agent.run,
+        call_script = ""
+        template = self._call_script_template(scenario, severity)
+        if template is not None:
+            summary = scenario
+            if self.script_agent.summary_needed(scenario):
+                summary = await self._run_llm_with_timeout(
+                    self.script_agent.summarize_scenario_async,
+                    scenario,
+                    stage="script_summary",
+                    default=scenario,
+                )
+            call_script = self.script_agent.fill_template(
+                template,
+                summary,
+                patient_profile if isinstance(patient_profile, dict) else {},
+                location_context,
+                caller_profile=caller_profile
+                if isinstance(caller_profile, dict) and caller_profile
+                else None,
+                patient_relationship=_normalize_text(target_person.get("relationship")),
+                patient_medical_history=patient_medical_history,
+            )
+        # Credit whichever step actually produced the script.
+        script_source = "template"
+        if not call_script:
+            script_source = "llm"
+            call_script = await self._generate_call_script_llm(
+                scenario,
+                guidance,
+                patient_profile,
+                caller_profile,
+                location_context,
+                latitude,
+                longitude,
+                target_person,
+                patient_medical_history,
+            )
+        if not call_script:
+            script_source = "fallback"
+            call_script = CALL_SCRIPT_FALLBACK
+        return {
+            "call_script": call_script,
+            "script_source": script_source,
+            "used_medical_history": patient_medical_history,
+            "location_context": location_context,
+            "facilities": facilities,
+            "total": len(facilities),
+        }
+
+    def _call_script_template(self, scenario: str, severity: str) -> str | None:
+        local = self.retriever.retrieve_local(query=scenario, severity=severity, top_k=1)
+        matches = local.get("matches") or []
+        return self.script_agent.template_for(
+            matches[0] if matches else None, int(local.get("top_score", 0) or 0), severity
+        )
+
+    async def _generate_call_script_llm(
+        self,
+        scenario: str,
+        guidance: str,
+        patient_profile: Any,
+        caller_profile: Any,
+        location_context: str,
+        latitude: float | None,
+        longitude: float | None,
+        target_person: dict[str, Any],
+        patient_medical_history: list[str],
+    ) -> str:
+        return await self._run_llm_with_timeout(
+            self.script_agent.run_async,
             scenario,
             guidance,
             patient_profile if isinstance(patient_profile, dict) else {},
             location_context,
             latitude,
             longitude,
-            timeout=15.0,
+            stage="script",
             default="",
             caller_profile=caller_profile
             if isinstance(caller_profile, dict) and caller_profile
@@ -2199,16 +3132,3 @@ class ByStanderWorkflow:
             patient_pronoun=_normalize_text(target_person.get("pronoun")) or "they",
             patient_medical_history=patient_medical_history,
         )
-        if not call_script:
-            call_script = (
-                "สวัสดีค่ะ/ครับ แจ้งเหตุฉุกเฉิน มีผู้ป่วยต้องการความช่วยเหลือด่วน\n"
-                "จุดเกิดเหตุ: โปรดระบุที่อยู่หรือจุดสังเกตใกล้เคียง\n"
-                "ขอรถพยาบาลด่วนครับ/ค่ะ"
-            )
-        return {
-            "call_script": call_script,
-            "used_medical_history": patient_medical_history,
-            "location_context": location_context,
-            "facilities": facilities,
-            "total": len(facilities),
-        }
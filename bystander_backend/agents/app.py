@@ -1,7 +1,12 @@
 import asyncio
+import json
 import os
+import queue
 import sys
+import threading
+import time
 import types
+from functools import partial
 
 try:
     import requests
@@ -16,16 +21,48 @@ except Exception:  # pragma: no cover
 
     requests.RequestException = _RequestException  # type: ignore[attr-defined]
     requests.post = _missing_requests  # type: ignore[attr-defined]
-from flask import Flask, jsonify, make_response, request
+from flask import Flask, Response, jsonify, make_response, request
 
 if __package__:
+    from .admission import AdmissionController, queued_ms_from_header
     from .agents import ByStanderWorkflow
+    from .cancellation import (
+        IDEMPOTENCY_HEADER,
+        CancellationRegistry,
+        CancelToken,
+        RequestCancelled,
+        run_cancellable,
+        socket_disconnect_probe,
+    )
+    from .deadline import DEADLINE_HEADER, Deadline, use_deadline
+    from .hedging import HEDGE_POLICY
+    from .idempotency import IdempotencyInProgress, IdempotencyStore, payload_fingerprint
+    from .io_loop import IO_LOOP
+    from .model_router import MODEL_ROUTER
     from .observability import init_observability
+    from .provider_health import PROVIDER_HEALTH
+    from .rate_limit import PROVIDER_LIMITER
 else:  # pragma: no cover
     current_dir = os.path.dirname(os.path.abspath(__file__))
     if current_dir not in sys.path:
         sys.path.insert(0, current_dir)
+    from admission import AdmissionController, queued_ms_from_header
+    from cancellation import (
+        IDEMPOTENCY_HEADER,
+        CancellationRegistry,
+        CancelToken,
+        RequestCancelled,
+        run_cancellable,
+        socket_disconnect_probe,
+    )
+    from deadline import DEADLINE_HEADER, Deadline, use_deadline
+    from hedging import HEDGE_POLICY
+    from idempotency import IdempotencyInProgress, IdempotencyStore, payload_fingerprint
+    from io_loop import IO_LOOP
+    from model_router import MODEL_ROUTER
     from observability import init_observability
+    from provider_health import PROVIDER_HEALTH
+    from rate_limit import PROVIDER_LIMITER
 
     from agents import ByStanderWorkflow
 
@@ -33,12 +70,21 @@ else:  # pragma: no cover
 app = Flask(__name__)
 OBSERVABILITY_STATUS = init_observability(service_name="bystander-agent-workflow")
 workflow = ByStanderWorkflow()
+# Under gthread the request threads never queue visibly; the upstream backlog does.
+admission = AdmissionController(
+    backlog=lambda: workflow.background_jobs() + PROVIDER_LIMITER.waiting()
+)
+cancellations = CancellationRegistry()
+idempotency = IdempotencyStore()
 
 
 def _build_cors_preflight_response():
     response = make_response()
     response.headers.add("Access-Control-Allow-Origin", "*")
-    response.headers.add("Access-Control-Allow-Headers", "Content-Type,Authorization")
+    response.headers.add(
+        "Access-Control-Allow-Headers",
+        f"Content-Type,Authorization,{DEADLINE_HEADER},{IDEMPOTENCY_HEADER}",
+    )
     response.headers.add("Access-Control-Allow-Methods", "POST,GET,OPTIONS")
     return response
 
@@ -57,6 +103,146 @@ def _safe_float(value):
         return None
 
 
+def _request_deadline(endpoint: str) -> Deadline:
+    return Deadline.for_endpoint(endpoint, request.headers.get(DEADLINE_HEADER))
+
+
+def _run_with_admission(endpoint: str, run_async, run_degraded, data: dict) -> dict:
+    """
+    Run an LLM-backed workflow if admission control lets it in; otherwise answer
+    immediately with the degraded (no-LLM) variant instead of queueing.
+    """
+
+    def compute(has_followers) -> dict:
+        queued_ms = queued_ms_from_header(request.headers.get("X-Request-Start"))
+        if not admission.try_acquire(queued_ms=queued_ms):
+            return run_degraded(data)
+        started = time.perf_counter()
+        try:
+            return _run_cancellable_request(endpoint, run_async, data, has_followers)
+        finally:
+            admission.release(time.perf_counter() - started)
+
+    return _run_idempotent(endpoint, data, compute)
+
+
+def _idempotency_key(endpoint: str) -> str | None:
+    raw = str(request.headers.get(IDEMPOTENCY_HEADER) or "").strip()
+    return f"{endpoint}:{raw}" if raw else None
+
+
+def _run_idempotent(endpoint: str, data: dict, compute) -> dict:
+    """
+    Serve retries carrying the same Idempotency-Key and payload from the store: attach
+    to the running computation or replay its response instead of recomputing.
+    `compute(has_followers)` runs the request when this call owns the key.
+    """
+
+    key = _idempotency_key(endpoint)
+    if key is None:
+        return compute(None)
+    future, owner = idempotency.begin(key, payload_fingerprint(data))
+    if not owner:
+        return idempotency.wait(key, future, _request_deadline(endpoint).remaining())
+    try:
+        result = compute(lambda: idempotency.followers(key, future) > 0)
+    except BaseException as exc:
+        idempotency.fail(key, future, exc)
+        raise
+    # Degraded answers go to whoever is waiting now but are not replayed later.
+    degraded = isinstance(result, dict) and bool(result.get("degraded"))
+    idempotency.complete(key, future, result, cache=not degraded)
+    return result
+
+
+def _run_cancellable_request(endpoint: str, run_async, data: dict, has_followers=None) -> dict:
+    """
+    Run a workflow under the request deadline, cancelling it when the client
+    disconnects or retries with the same Idempotency-Key and a different payload.
+    """
+
+    key = _idempotency_key(endpoint)
+    token = cancellations.register(key)
+    probe = socket_disconnect_probe(request.environ.get("gunicorn.socket"))
+    if probe is not None and has_followers is not None:
+        # A retry attached to this run still wants the result after the first
+        # connection drops.
+        socket_closed = probe
+
+        def probe() -> bool:
+            return socket_closed() and not has_followers()
+
+    try:
+        with use_deadline(_request_deadline(endpoint)):
+            return asyncio.run(run_cancellable(run_async(data), token, probe))
+    except RequestCancelled as exc:
+        if exc.reason == "client_disconnected":
+            cancellations.record_disconnect()
+        raise
+    finally:
+        cancellations.unregister(key, token)
+
+
+def _cancelled_response(exc: RequestCancelled):
+    return _corsify_actual_response(
+        jsonify({"error": "request cancelled", "reason": exc.reason})
+    ), 409
+
+
+def _in_progress_response(exc: IdempotencyInProgress):
+    return _corsify_actual_response(
+        jsonify({"error": "request in progress", "detail": str(exc)})
+    ), 409
+
+
+def _sse(event: dict) -> str:
+    body = json.dumps(event, ensure_ascii=False)
+    return f"event: {event.get('type', 'message')}\ndata: {body}\n\n"
+
+
+def _stream_workflow_events(data: dict, deadline: Deadline, queued_ms: float):
+    """
+    Run the streaming workflow on its own thread and yield its events as SSE frames.
+    Closing the response (client gone) cancels the run.
+    """
+
+    events: queue.Queue = queue.Queue()
+    token = CancelToken()
+
+    def worker() -> None:
+        started = time.perf_counter()
+        try:
+            with use_deadline(deadline):
+                result = asyncio.run(
+                    run_cancellable(workflow.stream_async(data, events.put), token)
+                )
+            events.put({"type": "final", **result})
+        except RequestCancelled:
+            pass
+        except Exception as exc:
+            events.put({"type": "error", "error": "agent workflow failed", "detail": str(exc)})
+        finally:
+            admission.release(time.perf_counter() - started)
+            events.put(None)
+
+    if not admission.try_acquire(queued_ms=queued_ms):
+        yield _sse({"type": "final", **workflow.run_degraded(data)})
+        return
+    threading.Thread(target=worker, name="bystander-sse", daemon=True).start()
+    finished = False
+    try:
+        while True:
+            event = events.get()
+            if event is None:
+                finished = True
+                return
+            yield _sse(event)
+    finally:
+        if not finished:
+            cancellations.record_disconnect()
+            token.cancel("client_disconnected")
+
+
 def _google_tts_api_key() -> str:
     return str(os.getenv("GOOGLE_TTS_API_KEY") or os.getenv("GOOGLE_API_KEY") or "").strip()
 
@@ -102,8 +288,14 @@ def agent_workflow():
 
     try:
         data = request.get_json() or {}
-        result = asyncio.run(workflow.run_async(data))
+        result = _run_with_admission(
+            "agent_workflow", workflow.run_async, workflow.run_degraded, data
+        )
         return _corsify_actual_response(jsonify(result))
+    except RequestCancelled as exc:
+        return _cancelled_response(exc)
+    except IdempotencyInProgress as exc:
+        return _in_progress_response(exc)
     except ValueError as exc:
         return _corsify_actual_response(jsonify({"error": str(exc)})), 400
     except Exception as exc:
@@ -112,6 +304,47 @@ def agent_workflow():
         ), 500
 
 
+@app.route("/agent_workflow_stream", methods=["POST", "OPTIONS"])
+def agent_workflow_stream():
+    if request.method == "OPTIONS":
+        return _build_cors_preflight_response()
+
+    data = request.get_json() or {}
+    if not str(data.get("scenario") or data.get("sentence") or "").strip():
+        return _corsify_actual_response(jsonify({"error": "scenario is required"})), 400
+    events = _stream_workflow_events(
+        data,
+        _request_deadline("agent_workflow"),
+        queued_ms_from_header(request.headers.get("X-Request-Start")),
+    )
+    response = Response(events, mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return _corsify_actual_response(response)
+
+
+@app.route("/guidance_session/<session_id>", methods=["GET", "OPTIONS"])
+def guidance_session(session_id):
+    if request.method == "OPTIONS":
+        return _build_cors_preflight_response()
+
+    wait_sec = _safe_float(request.args.get("wait")) or 0.0
+    # A long-poll holds a worker thread, so it only waits on a spare admission slot;
+    # otherwise it answers with the current state and the client polls again.
+    holding = wait_sec > 0 and admission.try_acquire_spare()
+    try:
+        state = workflow.guidance_sessions.get(session_id, wait_sec=wait_sec if holding else 0.0)
+    finally:
+        if holding:
+            admission.release(0.0)
+    if state is None:
+        return _corsify_actual_response(jsonify({"error": "unknown or expired session"})), 404
+    response = _corsify_actual_response(jsonify(state))
+    if wait_sec > 0 and not holding:
+        response.headers["Retry-After"] = "1"
+    return response
+
+
 @app.route("/find_facilities", methods=["POST", "OPTIONS"])
 def find_facilities():
     if request.method == "OPTIONS":
@@ -129,8 +362,18 @@ def find_facilities():
             return _corsify_actual_response(
                 jsonify({"error": "Invalid latitude or longitude values"})
             ), 400
-        result = asyncio.run(workflow.find_facilities_async(data))
+        result = _run_idempotent(
+            "find_facilities",
+            data,
+            partial(
+                _run_cancellable_request, "find_facilities", workflow.find_facilities_async, data
+            ),
+        )
         return _corsify_actual_response(jsonify(result))
+    except RequestCancelled as exc:
+        return _cancelled_response(exc)
+    except IdempotencyInProgress as exc:
+        return _in_progress_response(exc)
     except Exception as exc:
         return _corsify_actual_response(
             jsonify({"error": "find facilities failed", "detail": str(exc)})
@@ -144,8 +387,17 @@ def call_script():
 
     try:
         data = request.get_json() or {}
-        result = asyncio.run(workflow.generate_call_script_async(data))
+        result = _run_with_admission(
+            "call_script",
+            workflow.generate_call_script_async,
+            workflow.generate_call_script_degraded,
+            data,
+        )
         return _corsify_actual_response(jsonify(result))
+    except RequestCancelled as exc:
+        return _cancelled_response(exc)
+    except IdempotencyInProgress as exc:
+        return _in_progress_response(exc)
     except ValueError as exc:
         return _corsify_actual_response(jsonify({"error": str(exc)})), 400
     except Exception as exc:
@@ -263,6 +515,11 @@ def debug_vertex_resources():
         ), 500
 
 
+@app.route("/debug_stage_latency", methods=["GET"])
+def debug_stage_latency():
+    return _corsify_actual_response(jsonify(workflow.stage_timeouts.snapshot()))
+
+
 @app.route("/health", methods=["GET"])
 def health():
     return jsonify(
@@ -270,6 +527,25 @@ def health():
             "status": "ok",
             "service": "bystander_agent_workflow",
             "observability": OBSERVABILITY_STATUS,
+            "admission": admission.snapshot(),
+            "coalescing": workflow.singleflight.snapshot(),
+            "cancellation": cancellations.snapshot(),
+            "idempotency": idempotency.snapshot(),
+            "providers": PROVIDER_HEALTH.snapshot(),
+            "hedging": HEDGE_POLICY.snapshot(),
+            "rate_limits": PROVIDER_LIMITER.snapshot(),
+            "model_router": MODEL_ROUTER.snapshot(),
+            "triage_fastpath": workflow.triage_fastpath.snapshot(),
+            "guidance_store": workflow.guidance_agent.store.snapshot(),
+            "guidance_cache": workflow.guidance_agent.cache.snapshot(),
+            "guidance_sessions": workflow.guidance_sessions.snapshot(),
+            "script_templates": workflow.script_agent.templates.snapshot(),
+            "speculation": workflow.speculation.snapshot(),
+            "local_llm": workflow.guidance_agent.local_llm.snapshot(),
+            "io_loop": IO_LOOP.snapshot(),
+            "condition_notes": workflow.guidance_agent.condition_notes.snapshot(),
+            "context_budget": workflow.guidance_agent.context_budget.snapshot(),
+            "reranker": workflow.retriever.reranker.snapshot(),
         }
     )
 
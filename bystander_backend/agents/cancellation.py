@@ -0,0 +1,191 @@
+import asyncio
+import contextlib
+import contextvars
+import socket
+import threading
+from collections.abc import Callable, Coroutine, Hashable, Iterator
+from typing import Any
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+
+
+class RequestCancelled(Exception):
+    """Raised when the client went away or its request was superseded by a retry."""
+
+    def __init__(self, reason: str = "cancelled") -> None:
+        super().__init__(reason)
+        self.reason = reason
+
+
+class CancelToken:
+    """Thread-safe cancellation flag shared by a request's event loop and worker threads."""
+
+    def __init__(self) -> None:
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: list[Callable[[], None]] = []
+        self.reason = ""
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = "cancelled") -> None:
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks = list(self._callbacks)
+            self._callbacks.clear()
+        for callback in callbacks:
+            with contextlib.suppress(Exception):
+                callback()
+
+    def add_callback(self, callback: Callable[[], None]) -> None:
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def raise_if_cancelled(self) -> None:
+        if self._event.is_set():
+            raise RequestCancelled(self.reason)
+
+
+_CURRENT_TOKEN: contextvars.ContextVar[CancelToken | None] = contextvars.ContextVar(
+    "bystander_cancel_token", default=None
+)
+
+
+def current_cancel_token() -> CancelToken | None:
+    return _CURRENT_TOKEN.get()
+
+
+@contextlib.contextmanager
+def use_cancel_token(token: CancelToken | None) -> Iterator[CancelToken | None]:
+    reset = _CURRENT_TOKEN.set(token)
+    try:
+        yield token
+    finally:
+        _CURRENT_TOKEN.reset(reset)
+
+
+def is_cancelled() -> bool:
+    token = current_cancel_token()
+    return token is not None and token.cancelled
+
+
+def raise_if_cancelled() -> None:
+    """Checkpoint for blocking code between upstream calls."""
+
+    token = current_cancel_token()
+    if token is not None:
+        token.raise_if_cancelled()
+
+
+def bind_cancel_token(ctx: contextvars.Context, token: CancelToken | None) -> contextvars.Context:
+    """Point `ctx` at another token, e.g. one owned by shared (coalesced) work."""
+
+    ctx.run(_CURRENT_TOKEN.set, token)
+    return ctx
+
+
+class CancellationRegistry:
+    """
+    Active requests keyed by (endpoint, Idempotency-Key). Registering a key that is
+    already active cancels the older request: the client has retried and will never
+    read the first response.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._active: dict[Hashable, CancelToken] = {}
+        self._superseded = 0
+        self._disconnected = 0
+
+    def register(self, key: Hashable | None) -> CancelToken:
+        token = CancelToken()
+        if key is None:
+            return token
+        with self._lock:
+            previous = self._active.get(key)
+            self._active[key] = token
+            if previous is not None:
+                self._superseded += 1
+        if previous is not None:
+            previous.cancel("superseded")
+        return token
+
+    def unregister(self, key: Hashable | None, token: CancelToken) -> None:
+        if key is None:
+            return
+        with self._lock:
+            if self._active.get(key) is token:
+                del self._active[key]
+
+    def record_disconnect(self) -> None:
+        with self._lock:
+            self._disconnected += 1
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "active": len(self._active),
+                "superseded": self._superseded,
+                "disconnected": self._disconnected,
+            }
+
+
+def socket_disconnect_probe(sock: Any) -> Callable[[], bool] | None:
+    """
+    Build a non-blocking "has the peer closed?" check for a client socket (gunicorn
+    exposes it as environ["gunicorn.socket"]). A zero-byte MSG_PEEK read means EOF.
+    """
+
+    flags = getattr(socket, "MSG_PEEK", 0) | getattr(socket, "MSG_DONTWAIT", 0)
+    if sock is None or not hasattr(sock, "recv") or not getattr(socket, "MSG_DONTWAIT", 0):
+        return None
+
+    def probe() -> bool:
+        try:
+            return sock.recv(1, flags) == b""
+        except (BlockingIOError, InterruptedError):
+            return False
+        except OSError:
+            return True
+
+    return probe
+
+
+async def run_cancellable(
+    coro: Coroutine[Any, Any, Any],
+    token: CancelToken,
+    disconnect_probe: Callable[[], bool] | None = None,
+    poll_interval: float = 0.25,
+) -> Any:
+    """
+    Run `coro` as a task that is cancelled as soon as `token` fires or the probe reports
+    a disconnect. Task cancellation cancels the stage awaits (and their queued executor
+    jobs); blocking code already running sees the token at its next checkpoint.
+    """
+
+    loop = asyncio.get_running_loop()
+    with use_cancel_token(token):
+        task = asyncio.ensure_future(coro)
+    token.add_callback(lambda: loop.call_soon_threadsafe(task.cancel))
+    try:
+        while not task.done():
+            await asyncio.wait({task}, timeout=poll_interval)
+            if task.done():
+                break
+            if disconnect_probe is not None and disconnect_probe():
+                token.cancel("client_disconnected")
+                task.cancel()
+                break
+        return await task
+    except asyncio.CancelledError:
+        if token.cancelled:
+            raise RequestCancelled(token.reason) from None
+        raise
@@ -0,0 +1,270 @@
+import asyncio
+import contextlib
+import contextvars
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any
+
+if __package__:
+    from .config import env_float
+    from .deadline import use_deadline
+else:  # pragma: no cover
+    from config import env_float
+    from deadline import use_deadline
+
+DEFAULT_SEED_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "condition_notes.json")
+
+
+_LOOKUP_EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(env_float("CONDITION_LOOKUP_WORKERS", 8)),
+    thread_name_prefix="bystander-condition-notes",
+)
+
+
+def condition_key(condition: str) -> str:
+    return " ".join(str(condition or "").lower().split())
+
+
+class ConditionNotesCache:
+    """
+    Medical-condition web notes keyed by normalized condition name.
+
+    Seeds come from the offline precompute job (CONDITION_NOTES_SEED_PATH); lookups
+    made at request time are kept for CONDITION_NOTES_TTL_SEC (30 days), or for
+    CONDITION_NOTES_EMPTY_TTL_SEC when the search found nothing, so a failing lookup
+    is retried sooner. With CONDITION_NOTES_SQLITE_PATH set, notes survive restarts
+    and are shared between workers.
+    """
+
+    def __init__(
+        self,
+        ttl_sec: float | None = None,
+        empty_ttl_sec: float | None = None,
+        seed_path: str | None = None,
+        sqlite_path: str | None = None,
+    ) -> None:
+        self.ttl_sec = float(
+            ttl_sec
+            if ttl_sec is not None
+            else env_float("CONDITION_NOTES_TTL_SEC", 30 * 24 * 3600.0)
+        )
+        self.empty_ttl_sec = float(
+            empty_ttl_sec
+            if empty_ttl_sec is not None
+            else env_float("CONDITION_NOTES_EMPTY_TTL_SEC", 3600.0)
+        )
+        self.seed_path = (
+            seed_path
+            if seed_path is not None
+            else str(os.getenv("CONDITION_NOTES_SEED_PATH") or DEFAULT_SEED_PATH)
+        )
+        self.sqlite_path = (
+            sqlite_path
+            if sqlite_path is not None
+            else str(os.getenv("CONDITION_NOTES_SQLITE_PATH") or "").strip()
+        )
+        self._lock = threading.Lock()
+        self._notes: dict[str, tuple[str, float]] = {}
+        self._seeds: dict[str, str] = {}
+        self._inflight: dict[str, Future] = {}
+        self._hits = 0
+        self._misses = 0
+        self._late = 0
+        self._load_seeds()
+        if self.sqlite_path:
+            self._init_sqlite()
+
+    def _load_seeds(self) -> None:
+        if not os.path.exists(self.seed_path):
+            return
+        try:
+            with open(self.seed_path, encoding="utf-8") as f:
+                data = json.load(f)
+            notes = data.get("notes") or {}
+            self._seeds = {condition_key(k): str(v) for k, v in notes.items() if str(v).strip()}
+        except Exception as exc:
+            print(f"[condition_notes] seeds ignored: {exc}")
+
+    @contextlib.contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.sqlite_path, timeout=2.0)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _init_sqlite(self) -> None:
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS condition_notes ("
+                    "condition TEXT PRIMARY KEY, notes TEXT NOT NULL, expires_at REAL NOT NULL)"
+                )
+        except Exception as exc:
+            print(f"[condition_notes] sqlite disabled: {exc}")
+            self.sqlite_path = ""
+
+    def _load_sqlite(self, key: str) -> tuple[str, float] | None:
+        if not self.sqlite_path:
+            return None
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT notes, expires_at FROM condition_notes "
+                    "WHERE condition = ? AND expires_at > ?",
+                    (key, time.time()),
+                ).fetchone()
+        except Exception:
+            return None
+        return (str(row[0]), float(row[1])) if row else None
+
+    def _save_sqlite(self, key: str, notes: str, expires_at: float) -> None:
+        if not self.sqlite_path:
+            return
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO condition_notes VALUES (?, ?, ?)",
+                    (key, notes, expires_at),
+                )
+        except Exception as exc:
+            print(f"[condition_notes] sqlite write failed: {exc}")
+
+    def get(self, condition: str) -> str | None:
+        """Cached notes ("" when the last search found nothing), or None if unknown."""
+
+        key = condition_key(condition)
+        now = time.time()
+        with self._lock:
+            cached = self._notes.get(key)
+            if cached is not None and cached[1] > now:
+                self._hits += 1
+                return cached[0]
+        stored = self._load_sqlite(key)
+        with self._lock:
+            if stored is not None:
+                self._notes[key] = stored
+                self._hits += 1
+                return stored[0]
+            if key in self._seeds:
+                self._hits += 1
+                return self._seeds[key]
+            self._misses += 1
+        return None
+
+    def put(self, condition: str, notes: str) -> None:
+        key = condition_key(condition)
+        notes = str(notes or "").strip()
+        expires_at = time.time() + (self.ttl_sec if notes else self.empty_ttl_sec)
+        with self._lock:
+            self._notes[key] = (notes, expires_at)
+        self._save_sqlite(key, notes, expires_at)
+
+    def _lookup_future(self, condition: str, fetch: Callable[[str], str]) -> Future:
+        key = condition_key(condition)
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                return future
+
+            def run() -> str:
+                try:
+                    # Shared by every request waiting on this condition, so it runs
+                    # on its own timeout rather than the first caller's deadline.
+                    with use_deadline(None):
+                        notes = fetch(condition)
+                    self.put(condition, notes)
+                    return notes
+                finally:
+                    with self._lock:
+                        self._inflight.pop(key, None)
+
+            ctx = contextvars.copy_context()
+            future = _LOOKUP_EXECUTOR.submit(ctx.run, run)
+            self._inflight[key] = future
+            return future
+
+    def fetch_many(
+        self, conditions: list[str], fetch: Callable[[str], str], cutoff_sec: float
+    ) -> dict[str, str]:
+        """
+        Notes for every condition answered by the cache or by `fetch` within
+        `cutoff_sec`. Misses are fetched concurrently (one in-flight lookup per
+        condition across requests); lookups still running at the cutoff are left to
+        finish in the background and fill the cache for later requests.
+        """
+
+        found, pending = self._start_lookups(conditions, fetch)
+        if pending:
+            done, not_done = wait(list(pending), timeout=max(0.0, cutoff_sec))
+            self._collect(pending, done, not_done, found)
+        return {condition: found[condition] for condition in conditions if condition in found}
+
+    async def fetch_many_async(
+        self, conditions: list[str], fetch: Callable[[str], str], cutoff_sec: float
+    ) -> dict[str, str]:
+        """`fetch_many` for coroutines: waits on the loop instead of blocking a thread."""
+
+        found, pending = self._start_lookups(conditions, fetch)
+        if pending:
+            waiters = {asyncio.wrap_future(future): future for future in pending}
+            # asyncio.wait never cancels what it waits on, so stragglers keep running
+            # and still fill the cache.
+            done, not_done = await asyncio.wait(list(waiters), timeout=max(0.0, cutoff_sec))
+            self._collect(
+                pending,
+                [waiters[waiter] for waiter in done],
+                [waiters[waiter] for waiter in not_done],
+                found,
+            )
+        return {condition: found[condition] for condition in conditions if condition in found}
+
+    def _start_lookups(
+        self, conditions: list[str], fetch: Callable[[str], str]
+    ) -> tuple[dict[str, str], dict[Future, str]]:
+        found: dict[str, str] = {}
+        pending: dict[Future, str] = {}
+        for condition in conditions:
+            notes = self.get(condition)
+            if notes is None:
+                pending[self._lookup_future(condition, fetch)] = condition
+            elif notes:
+                found[condition] = notes
+        return found, pending
+
+    def _collect(
+        self,
+        pending: dict[Future, str],
+        done: Iterable[Future],
+        not_done: Iterable[Future],
+        found: dict[str, str],
+    ) -> None:
+        for future in done:
+            try:
+                notes = future.result()
+            except Exception:
+                continue
+            if notes:
+                found[pending[future]] = notes
+        late = len(list(not_done))
+        if late:
+            with self._lock:
+                self._late += late
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "cached": len(self._notes),
+                "seeds": len(self._seeds),
+                "sqlite": bool(self.sqlite_path),
+                "inflight": len(self._inflight),
+                "hits": self._hits,
+                "misses": self._misses,
+                "late": self._late,
+            }
@@ -0,0 +1,35 @@
+import os
+
+_TRUE = {"1", "true", "yes", "on"}
+_FALSE = {"0", "false", "no", "off"}
+
+
+def env_float(name: str, default: float) -> float:
+    """Numeric setting from the environment; unset or unparsable values give `default`."""
+
+    raw = str(os.getenv(name) or "").strip()
+    if not raw:
+        return default
+    try:
+        return float(raw)
+    except Exception:
+        return default
+
+
+def parse_flag(value: object, default: bool) -> bool:
+    """1/true/yes/on or 0/false/no/off (any case); anything else gives `default`."""
+
+    if isinstance(value, bool):
+        return value
+    raw = str(value if value is not None else "").strip().lower()
+    if raw in _TRUE:
+        return True
+    if raw in _FALSE:
+        return False
+    return default
+
+
+def env_flag(name: str, default: bool) -> bool:
+    """Feature flag from the environment, parsed with parse_flag."""
+
+    return parse_flag(os.getenv(name), default)
@@ -0,0 +1,190 @@
+import math
+import re
+import threading
+from typing import Any
+
+if __package__:
+    from .config import env_float
+    from .triage_classifier import featurize
+else:  # pragma: no cover
+    from config import env_float
+    from triage_classifier import featurize
+
+# Token budget for retrieved context per guidance model, keyed by the canonical model
+# name (gemini-2.5-flash-lite runs as gemini-2.5-flash); anything else gets
+# CONTEXT_TOKEN_BUDGET. CONTEXT_TOKEN_BUDGET_<MODEL> (non-alphanumerics as "_",
+# upper-cased) overrides a single model.
+DEFAULT_TOKEN_BUDGET = 1500
+MODEL_TOKEN_BUDGETS = {
+    # About the 1600-character cap the DeepSeek path used before budgeting.
+    "deepseek-chat": 1100,
+    "gemini-2.5-pro": 2500,
+    # Fine-tuned 1B model served locally; keeps prompts inside a small per-slot context.
+    "bystander-typhoon2-1b": 800,
+}
+
+_HEADER = re.compile(r"^\[(?:vertex )?protocol \d+\]\s*", re.IGNORECASE)
+_METADATA_PREFIXES = ("- keywords:", "- severity:", "- facility:", "- source=")
+_SIMILARITY_DIM = 1 << 15
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough tokenizer-free count: ~4 characters per token for ASCII, ~1.5 for Thai and
+    other scripts. Good enough to budget with; not a billing figure.
+    """
+
+    ascii_chars = sum(1 for ch in text if ch.isascii())
+    return math.ceil(ascii_chars / 4 + (len(text) - ascii_chars) / 1.5)
+
+
+def split_snippets(rag_context: str) -> list[str]:
+    """
+    Retrieval chunks as single-line snippets in retrieval order: chunk headers become
+    a "title:" prefix and keyword / severity / facility / source lines are dropped.
+    """
+
+    out = []
+    for chunk in re.split(r"\n\s*\n", str(rag_context or "").strip()):
+        title = ""
+        lines = []
+        for line in chunk.splitlines():
+            line = " ".join(line.split())
+            if not line:
+                continue
+            lower = line.lower()
+            if _HEADER.match(line):
+                title = _HEADER.sub("", line)
+                continue
+            if lower.startswith(_METADATA_PREFIXES):
+                continue
+            if lower.startswith("- guidance:"):
+                line = line[len("- guidance:") :].strip()
+            lines.append(line)
+        body = " ".join(lines).strip()
+        if len(body) < 20:
+            continue
+        out.append(f"{title}: {body}" if title and title.lower() not in body.lower() else body)
+    return out
+
+
+def _cosine(a: dict[int, float], b: dict[int, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(value * b.get(bucket, 0.0) for bucket, value in a.items())
+
+
+def _truncate_to_tokens(text: str, budget: int) -> str:
+    if estimate_tokens(text) <= budget:
+        return text
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if estimate_tokens(text[:mid]) <= budget:
+            low = mid
+        else:
+            high = mid - 1
+    cut = text[:low]
+    return (cut.rsplit(" ", 1)[0] if " " in cut else cut).strip()
+
+
+class ContextBudgeter:
+    """
+    Packs retrieved protocol context into a per-model token budget for guidance
+    prompts. Snippets that are near-duplicates of a better-ranked one are dropped,
+    the rest are ranked by similarity to the scenario (with a prior for retrieval
+    order) and added until the budget is spent. Token savings are counted for /health.
+    """
+
+    def __init__(
+        self,
+        default_budget: int | None = None,
+        dedup_threshold: float | None = None,
+        max_snippets: int = 6,
+    ) -> None:
+        self.default_budget = int(
+            default_budget
+            if default_budget is not None
+            else env_float("CONTEXT_TOKEN_BUDGET", DEFAULT_TOKEN_BUDGET)
+        )
+        self.dedup_threshold = (
+            dedup_threshold
+            if dedup_threshold is not None
+            else env_float("CONTEXT_DEDUP_THRESHOLD", 0.85)
+        )
+        self.max_snippets = max_snippets
+        self._lock = threading.Lock()
+        self._packed = 0
+        self._tokens_in = 0
+        self._tokens_out = 0
+        self._duplicates = 0
+        self._dropped = 0
+
+    def budget_for(self, model_name: str) -> int:
+        env_name = "CONTEXT_TOKEN_BUDGET_" + re.sub(r"[^0-9A-Za-z]+", "_", model_name).upper()
+        fallback = MODEL_TOKEN_BUDGETS.get(model_name, self.default_budget)
+        return max(1, int(env_float(env_name, fallback)))
+
+    def pack(self, scenario: str, rag_context: str, model_name: str) -> dict[str, Any]:
+        """
+        {"text", "tokens_before", "tokens_after", "budget", "snippets", "duplicates",
+        "dropped"}; "text" is "- snippet" lines, best first.
+        """
+
+        budget = self.budget_for(model_name)
+        snippets = split_snippets(rag_context)
+        query = featurize(scenario, _SIMILARITY_DIM)
+        kept: list[tuple[float, str, dict[int, float]]] = []
+        duplicates = 0
+        for position, snippet in enumerate(snippets):
+            vector = featurize(snippet, _SIMILARITY_DIM)
+            if any(_cosine(vector, other) >= self.dedup_threshold for _, _, other in kept):
+                duplicates += 1
+                continue
+            score = _cosine(query, vector) + 0.1 / (1 + position)
+            kept.append((score, snippet, vector))
+        kept.sort(key=lambda item: item[0], reverse=True)
+
+        lines: list[str] = []
+        used = 0
+        for _, snippet, _ in kept[: self.max_snippets]:
+            line = f"- {snippet}"
+            cost = estimate_tokens(line) + 1
+            if used + cost > budget:
+                if lines:
+                    continue
+                # Never send an empty context just because the best snippet is long.
+                line = _truncate_to_tokens(line, budget - 1)
+                cost = budget
+            lines.append(line)
+            used += cost
+        text = "\n".join(lines)
+        result = {
+            "text": text,
+            "tokens_before": estimate_tokens(str(rag_context or "")),
+            "tokens_after": estimate_tokens(text),
+            "budget": budget,
+            "snippets": len(lines),
+            "duplicates": duplicates,
+            "dropped": len(kept) - len(lines),
+        }
+        with self._lock:
+            self._packed += 1
+            self._tokens_in += result["tokens_before"]
+            self._tokens_out += result["tokens_after"]
+            self._duplicates += duplicates
+            self._dropped += result["dropped"]
+        return result
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "default_budget": self.default_budget,
+                "dedup_threshold": self.dedup_threshold,
+                "packed": self._packed,
+                "tokens_in": self._tokens_in,
+                "tokens_out": self._tokens_out,
+                "tokens_saved": self._tokens_in - self._tokens_out,
+                "duplicates": self._duplicates,
+                "dropped": self._dropped,
+            }
@@ -0,0 +1,114 @@
+import contextlib
+import contextvars
+import functools
+import time
+from collections.abc import Callable, Iterator
+from typing import Any
+
+if __package__:
+    from .config import env_float
+else:  # pragma: no cover
+    from config import env_float
+
+
+# Header carrying the client's remaining wait budget in milliseconds (relative, so it
+# is immune to clock skew between the phone and the backend).
+DEADLINE_HEADER = "X-Request-Timeout-Ms"
+
+ENDPOINT_DEFAULT_DEADLINES_SEC = {
+    "agent_workflow": env_float("AGENT_WORKFLOW_DEADLINE_SEC", 25.0),
+    "find_facilities": env_float("FIND_FACILITIES_DEADLINE_SEC", 12.0),
+    "call_script": env_float("CALL_SCRIPT_DEADLINE_SEC", 25.0),
+}
+
+# Below this much remaining time, stages switch to their cheaper fallbacks.
+LOW_BUDGET_SEC = env_float("DEADLINE_LOW_BUDGET_SEC", 3.0)
+
+# Smallest timeout handed to a downstream call; anything shorter is not worth starting.
+MIN_CALL_TIMEOUT_SEC = 0.05
+
+
+class Deadline:
+    """Absolute point in (monotonic) time by which a request must be answered."""
+
+    def __init__(self, timeout_sec: float, now: float | None = None) -> None:
+        started = time.monotonic() if now is None else now
+        self.timeout_sec = max(0.0, float(timeout_sec))
+        self.expires_at = started + self.timeout_sec
+
+    @classmethod
+    def for_endpoint(cls, endpoint: str, header_value: Any = None) -> "Deadline":
+        default_sec = ENDPOINT_DEFAULT_DEADLINES_SEC.get(endpoint, 25.0)
+        raw = str(header_value or "").strip()
+        try:
+            requested_sec = float(raw) / 1000.0 if raw else 0.0
+        except Exception:
+            requested_sec = 0.0
+        if requested_sec <= 0:
+            return cls(default_sec)
+        # Never let a client ask for more than the endpoint default.
+        return cls(min(requested_sec, default_sec))
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0.0
+
+    def is_low(self, threshold: float = LOW_BUDGET_SEC) -> bool:
+        return self.remaining() < threshold
+
+    def budget(self, stage_budget: float) -> float:
+        """min(stage budget, remaining time)."""
+        return max(0.0, min(float(stage_budget), self.remaining()))
+
+
+_CURRENT_DEADLINE: contextvars.ContextVar[Deadline | None] = contextvars.ContextVar(
+    "bystander_request_deadline", default=None
+)
+
+
+def current_deadline() -> Deadline | None:
+    return _CURRENT_DEADLINE.get()
+
+
+@contextlib.contextmanager
+def use_deadline(deadline: Deadline | None) -> Iterator[Deadline | None]:
+    token = _CURRENT_DEADLINE.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _CURRENT_DEADLINE.reset(token)
+
+
+def remaining_timeout(default: float) -> float:
+    """Timeout for a downstream call: its usual timeout, capped by the request deadline."""
+
+    deadline = current_deadline()
+    if deadline is None:
+        return default
+    return max(MIN_CALL_TIMEOUT_SEC, deadline.budget(default))
+
+
+def budget_is_low(threshold: float = LOW_BUDGET_SEC) -> bool:
+    deadline = current_deadline()
+    return deadline is not None and deadline.is_low(threshold)
+
+
+def with_request_deadline(endpoint: str) -> Callable:
+    """
+    Decorate an async workflow entry point so it runs under a request deadline.
+    An already-active deadline (set by the HTTP layer or an outer workflow) wins.
+    """
+
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if current_deadline() is not None:
+                return await func(*args, **kwargs)
+            with use_deadline(Deadline.for_endpoint(endpoint)):
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
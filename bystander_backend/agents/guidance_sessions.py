@@ -0,0 +1,243 @@
+import contextlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import Iterator
+from concurrent.futures import Future
+from concurrent.futures import wait as wait_futures
+from typing import Any
+
+if __package__:
+    from .config import env_float
+else:  # pragma: no cover
+    from config import env_float
+
+DEFAULT_SQLITE_PATH = os.path.join(tempfile.gettempdir(), "bystander_guidance_sessions.sqlite3")
+# How often a long-poll for another worker's session re-reads SQLite.
+REMOTE_POLL_SEC = 0.2
+
+
+class _Session:
+    __slots__ = ("future", "expires_at")
+
+    def __init__(self, expires_at: float) -> None:
+        self.future: Future = Future()
+        self.expires_at = expires_at
+
+
+class GuidanceSessions:
+    """
+    Bounded TTL store of guidance still being generated after a response went out.
+
+    A critical report is answered at once with protocol guidance and a session id; the
+    LLM guidance generated afterwards is published here, and the client polls
+    (or long-polls with `wait_sec`, capped at GUIDANCE_SESSION_MAX_WAIT_SEC) until the
+    session is "ready" or "failed". A failed session means the protocol answer stands.
+
+    The refinement runs on the worker that answered, but the poll may reach any
+    worker, so sessions are also written to SQLite at GUIDANCE_SESSION_SQLITE_PATH
+    (a file in the temp dir by default, shared by the workers of one container; set it
+    to a shared volume across containers, or empty to keep sessions in memory only).
+    """
+
+    def __init__(
+        self,
+        ttl_sec: float | None = None,
+        max_entries: int | None = None,
+        max_wait_sec: float | None = None,
+        sqlite_path: str | None = None,
+    ) -> None:
+        self.ttl_sec = float(
+            ttl_sec if ttl_sec is not None else env_float("GUIDANCE_SESSION_TTL_SEC", 600.0)
+        )
+        self.max_entries = max(
+            1,
+            int(
+                max_entries
+                if max_entries is not None
+                else env_float("GUIDANCE_SESSION_MAX_ENTRIES", 1024.0)
+            ),
+        )
+        self.max_wait_sec = (
+            max_wait_sec
+            if max_wait_sec is not None
+            else env_float("GUIDANCE_SESSION_MAX_WAIT_SEC", 10.0)
+        )
+        self.sqlite_path = (
+            sqlite_path
+            if sqlite_path is not None
+            else str(os.getenv("GUIDANCE_SESSION_SQLITE_PATH", DEFAULT_SQLITE_PATH)).strip()
+        )
+        self._lock = threading.Lock()
+        self._sessions: OrderedDict[str, _Session] = OrderedDict()
+        self._opened = 0
+        self._ready = 0
+        self._failed = 0
+        self._remote_reads = 0
+        if self.sqlite_path:
+            self._init_sqlite()
+
+    @contextlib.contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.sqlite_path, timeout=2.0)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _init_sqlite(self) -> None:
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS guidance_sessions ("
+                    "session_id TEXT PRIMARY KEY, status TEXT NOT NULL, "
+                    "result TEXT, error TEXT NOT NULL, expires_at REAL NOT NULL)"
+                )
+        except Exception as exc:
+            print(f"[guidance_sessions] sqlite disabled: {exc}")
+            self.sqlite_path = ""
+
+    def _save_sqlite(
+        self, session_id: str, status: str, result: Any = None, error: str = ""
+    ) -> None:
+        if not self.sqlite_path:
+            return
+        try:
+            body = None if result is None else json.dumps(result, ensure_ascii=False, default=str)
+            with self._connect() as conn:
+                if status == "pending":
+                    conn.execute(
+                        "DELETE FROM guidance_sessions WHERE expires_at <= ?", (time.time(),)
+                    )
+                    conn.execute(
+                        "INSERT OR REPLACE INTO guidance_sessions VALUES (?, ?, ?, ?, ?)",
+                        (session_id, status, body, error, time.time() + self.ttl_sec),
+                    )
+                else:
+                    conn.execute(
+                        "UPDATE guidance_sessions SET status = ?, result = ?, error = ? "
+                        "WHERE session_id = ?",
+                        (status, body, error, session_id),
+                    )
+        except Exception as exc:
+            print(f"[guidance_sessions] sqlite write failed: {exc}")
+
+    def _load_sqlite(self, session_id: str) -> dict[str, Any] | None:
+        if not self.sqlite_path:
+            return None
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT status, result, error FROM guidance_sessions "
+                    "WHERE session_id = ? AND expires_at > ?",
+                    (session_id, time.time()),
+                ).fetchone()
+        except Exception:
+            return None
+        if not row:
+            return None
+        try:
+            result = json.loads(row[1]) if row[1] is not None else None
+        except Exception:
+            result = None
+        return {"session_id": session_id, "status": row[0], "result": result, "error": row[2]}
+
+    def _purge_locked(self, now: float) -> None:
+        for key in [k for k, session in self._sessions.items() if session.expires_at <= now]:
+            del self._sessions[key]
+        while len(self._sessions) > self.max_entries:
+            self._sessions.popitem(last=False)
+
+    def open(self) -> str:
+        session_id = uuid.uuid4().hex
+        now = time.monotonic()
+        with self._lock:
+            self._sessions[session_id] = _Session(now + self.ttl_sec)
+            self._opened += 1
+            self._purge_locked(now)
+        self._save_sqlite(session_id, "pending")
+        return session_id
+
+    def _future(self, session_id: str) -> Future | None:
+        with self._lock:
+            self._purge_locked(time.monotonic())
+            session = self._sessions.get(session_id)
+            return session.future if session is not None else None
+
+    def complete(self, session_id: str, result: dict[str, Any]) -> None:
+        future = self._future(session_id)
+        if future is None or future.done():
+            return
+        # Stored before waking local waiters, so no worker reads it as still pending.
+        self._save_sqlite(session_id, "ready", result=result)
+        future.set_result(result)
+        with self._lock:
+            self._ready += 1
+
+    def fail(self, session_id: str, reason: str) -> None:
+        future = self._future(session_id)
+        if future is None or future.done():
+            return
+        self._save_sqlite(session_id, "failed", error=reason)
+        future.set_exception(RuntimeError(reason))
+        with self._lock:
+            self._failed += 1
+
+    def get(self, session_id: str, wait_sec: float = 0.0) -> dict[str, Any] | None:
+        """Session state, waiting up to `wait_sec` for a pending one; None if unknown."""
+
+        wait_sec = min(max(float(wait_sec), 0.0), self.max_wait_sec)
+        future = self._future(session_id)
+        if future is None:
+            return self._get_remote(session_id, wait_sec)
+        if not future.done() and wait_sec > 0:
+            wait_futures([future], timeout=wait_sec)
+        state: dict[str, Any] = {
+            "session_id": session_id,
+            "status": "pending",
+            "result": None,
+            "error": "",
+        }
+        if future.done():
+            exc = future.exception()
+            if exc is not None:
+                state.update(status="failed", error=str(exc))
+            else:
+                state.update(status="ready", result=future.result())
+        return state
+
+    def _get_remote(self, session_id: str, wait_sec: float) -> dict[str, Any] | None:
+        """A session opened by another worker, re-read until it settles or `wait_sec`."""
+
+        give_up_at = time.monotonic() + wait_sec
+        while True:
+            state = self._load_sqlite(session_id)
+            with self._lock:
+                self._remote_reads += 1
+            if state is None or state["status"] != "pending":
+                return state
+            remaining = give_up_at - time.monotonic()
+            if remaining <= 0:
+                return state
+            time.sleep(min(REMOTE_POLL_SEC, remaining))
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            pending = sum(1 for session in self._sessions.values() if not session.future.done())
+            return {
+                "entries": len(self._sessions),
+                "pending": pending,
+                "max_entries": self.max_entries,
+                "ttl_sec": self.ttl_sec,
+                "sqlite": bool(self.sqlite_path),
+                "opened": self._opened,
+                "ready": self._ready,
+                "failed": self._failed,
+                "remote_reads": self._remote_reads,
+            }
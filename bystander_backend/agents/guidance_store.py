@@ -0,0 +1,122 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from typing import Any
+
+if __package__:
+    from .config import env_float
+else:  # pragma: no cover
+    from config import env_float
+
+DEFAULT_STORE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "guidance_store.json")
+STORE_SEVERITIES = ("critical", "moderate")
+STORE_FORMAT = 1
+
+_NUMBERED_STEP = re.compile(r"(^|\n)\s*\d{1,2}[.)]\s")
+
+
+def protocol_fingerprint(row: dict[str, Any]) -> str:
+    """Changes whenever the protocol text a stored answer was generated from changes."""
+
+    body = "\n".join(
+        str(row.get(field) or "").strip()
+        for field in ("case_name_th", "keywords", "instructions", "severity", "facility_type")
+    )
+    return hashlib.sha1(body.encode("utf-8")).hexdigest()
+
+
+def entry_key(row: dict[str, Any], severity: str) -> str:
+    return f"{str(row.get('case_name_th') or '').strip()}|{severity}"
+
+
+def validate_guidance(guidance: str, facility_type: str, severity: str) -> list[str]:
+    """Problems that disqualify a generated answer from being served verbatim."""
+
+    problems = []
+    text = str(guidance or "").strip()
+    if not text:
+        problems.append("empty guidance")
+    if len(_NUMBERED_STEP.findall(text)) < 2:
+        problems.append("fewer than two numbered steps")
+    if len(text) > 2000:
+        problems.append("guidance too long")
+    if severity == "critical" and "1669" not in text:
+        problems.append("critical guidance must tell the caller to dial 1669")
+    if facility_type not in {"hospital", "clinic", "none"}:
+        problems.append(f"invalid facility_type {facility_type!r}")
+    return problems
+
+
+class GuidanceStore:
+    """
+    Versioned guidance pre-generated offline for every protocol row × severity by
+    ml/guidance_store/build_guidance_store.py. An entry is only served while the
+    protocol row it was generated from is unchanged (its fingerprint still matches)
+    and it still passes `validate_guidance`.
+    """
+
+    def __init__(self, path: str | None = None, min_score: float | None = None) -> None:
+        self.path = (
+            path
+            if path is not None
+            else str(os.getenv("GUIDANCE_STORE_PATH") or DEFAULT_STORE_PATH)
+        )
+        self.min_score = (
+            min_score if min_score is not None else env_float("GUIDANCE_STORE_MIN_SCORE", 5.0)
+        )
+        self.version = ""
+        self.entries: dict[str, dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._stale = 0
+        self._load()
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as exc:
+            print(f"[guidance_store] disabled: {exc}")
+            return
+        if int(data.get("format") or 0) != STORE_FORMAT:
+            print(f"[guidance_store] unsupported format: {data.get('format')}")
+            return
+        self.version = str(data.get("version") or "")
+        for key, entry in (data.get("entries") or {}).items():
+            severity = key.rsplit("|", 1)[-1]
+            if not validate_guidance(entry.get("guidance"), entry.get("facility_type"), severity):
+                self.entries[key] = entry
+
+    def lookup(self, match: dict[str, Any] | None, score: float, severity: str) -> dict | None:
+        """Stored {"guidance", "facility_type"} for a confident protocol match, or None."""
+
+        if not self.entries or match is None or severity not in STORE_SEVERITIES:
+            return None
+        entry = self.entries.get(entry_key(match, severity)) if score >= self.min_score else None
+        stale = entry is not None and entry.get("protocol_sha1") != protocol_fingerprint(match)
+        with self._lock:
+            if entry is None:
+                self._misses += 1
+            elif stale:
+                self._stale += 1
+            else:
+                self._hits += 1
+        if entry is None or stale:
+            return None
+        return {"guidance": entry["guidance"], "facility_type": entry["facility_type"]}
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "version": self.version,
+                "entries": len(self.entries),
+                "min_score": self.min_score,
+                "hits": self._hits,
+                "misses": self._misses,
+                "stale": self._stale,
+            }
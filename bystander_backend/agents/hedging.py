@@ -0,0 +1,236 @@
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from collections.abc import Awaitable, Callable
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any
+
+if __package__:
+    from .config import env_float
+    from .latency import LatencyHistogram
+else:  # pragma: no cover
+    from config import env_float
+    from latency import LatencyHistogram
+
+
+class HedgePolicy:
+    """
+    When to hedge and how long to wait before firing the backup request.
+
+    Hedging is enabled per severity (HEDGE_SEVERITIES, default "critical") so moderate
+    traffic never pays for duplicate calls. The delay is the HEDGE_PERCENTILE latency of
+    the primary (provider, model), clamped to [HEDGE_MIN_DELAY_SEC, HEDGE_MAX_DELAY_SEC];
+    until enough samples exist HEDGE_DEFAULT_DELAY_SEC is used.
+    """
+
+    def __init__(
+        self,
+        severities: set[str] | None = None,
+        percentile: float | None = None,
+        default_delay_sec: float | None = None,
+        min_delay_sec: float | None = None,
+        max_delay_sec: float | None = None,
+        min_samples: int | None = None,
+    ) -> None:
+        if severities is None:
+            raw = str(os.getenv("HEDGE_SEVERITIES") or "critical")
+            severities = {item.strip().lower() for item in raw.split(",") if item.strip()}
+        self.severities = severities
+        self.percentile = (
+            percentile if percentile is not None else env_float("HEDGE_PERCENTILE", 90.0)
+        )
+        self.default_delay_sec = (
+            default_delay_sec
+            if default_delay_sec is not None
+            else env_float("HEDGE_DEFAULT_DELAY_SEC", 3.0)
+        )
+        self.min_delay_sec = (
+            min_delay_sec if min_delay_sec is not None else env_float("HEDGE_MIN_DELAY_SEC", 0.5)
+        )
+        self.max_delay_sec = (
+            max_delay_sec if max_delay_sec is not None else env_float("HEDGE_MAX_DELAY_SEC", 8.0)
+        )
+        self.min_samples = int(
+            min_samples if min_samples is not None else env_float("HEDGE_MIN_SAMPLES", 10)
+        )
+        self._lock = threading.Lock()
+        self._histograms: dict[str, LatencyHistogram] = {}
+        self._hedged = 0
+        self._backup_wins = 0
+
+    def enabled_for(self, severity: str) -> bool:
+        return str(severity or "").strip().lower() in self.severities
+
+    def observe(self, label: str, seconds: float) -> None:
+        with self._lock:
+            histogram = self._histograms.get(label)
+            if histogram is None:
+                histogram = LatencyHistogram(256)
+                self._histograms[label] = histogram
+        histogram.observe(seconds)
+
+    def delay_for(self, label: str) -> float:
+        with self._lock:
+            histogram = self._histograms.get(label)
+        if histogram is None or len(histogram) < self.min_samples:
+            return self.default_delay_sec
+        value = histogram.percentile(self.percentile)
+        if value is None:
+            return self.default_delay_sec
+        return min(self.max_delay_sec, max(self.min_delay_sec, value))
+
+    def record_outcome(self, hedged: bool, backup_won: bool) -> None:
+        with self._lock:
+            self._hedged += int(hedged)
+            self._backup_wins += int(backup_won)
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            labels = dict(self._histograms)
+            hedged = self._hedged
+            backup_wins = self._backup_wins
+        return {
+            "severities": sorted(self.severities),
+            "hedged": hedged,
+            "backup_wins": backup_wins,
+            "delays_sec": {label: round(self.delay_for(label), 3) for label in labels},
+        }
+
+
+HEDGE_POLICY = HedgePolicy()
+
+_HEDGE_EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(env_float("HEDGE_WORKERS", 16)),
+    thread_name_prefix="bystander-hedge",
+)
+
+
+def run_hedged(
+    attempts: list[tuple[str, Callable[[], Any]]],
+    delay_sec: float,
+    is_valid: Callable[[Any], bool],
+    timeout: float,
+    policy: HedgePolicy = HEDGE_POLICY,
+) -> tuple[str, Any] | None:
+    """
+    Start attempts[0]; each time `delay_sec` passes without a valid answer (or the
+    running attempts all failed) start the next one. Return (label, result) for the
+    first valid result, or None once `timeout` expires. Losers that have not started
+    are cancelled; ones already on the wire are left to finish and discarded.
+    """
+
+    if not attempts:
+        return None
+    started = time.monotonic()
+    give_up_at = started + max(0.0, timeout)
+    pending: dict[Future, str] = {}
+    next_index = 0
+    next_launch_at = started
+
+    def launch() -> None:
+        nonlocal next_index, next_launch_at
+        label, func = attempts[next_index]
+        ctx = contextvars.copy_context()
+        pending[_HEDGE_EXECUTOR.submit(ctx.run, func)] = label
+        next_index += 1
+        next_launch_at = time.monotonic() + max(0.0, delay_sec)
+
+    winner: tuple[str, Any] | None = None
+    launch()
+    try:
+        while pending or next_index < len(attempts):
+            now = time.monotonic()
+            if now >= give_up_at:
+                break
+            if next_index < len(attempts) and (now >= next_launch_at or not pending):
+                launch()
+                continue
+            wake_at = give_up_at
+            if next_index < len(attempts):
+                wake_at = min(wake_at, next_launch_at)
+            done, _ = wait(
+                list(pending), timeout=max(0.0, wake_at - now), return_when=FIRST_COMPLETED
+            )
+            for future in done:
+                label = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception:
+                    continue
+                if is_valid(result):
+                    winner = (label, result)
+                    break
+            if winner is not None:
+                break
+    finally:
+        for future in pending:
+            future.cancel()
+        policy.record_outcome(
+            hedged=next_index > 1,
+            backup_won=winner is not None and winner[0] != attempts[0][0],
+        )
+    return winner
+
+
+async def run_hedged_async(
+    attempts: list[tuple[str, Callable[[], Awaitable[Any]]]],
+    delay_sec: float,
+    is_valid: Callable[[Any], bool],
+    timeout: float,
+    policy: HedgePolicy = HEDGE_POLICY,
+) -> tuple[str, Any] | None:
+    """
+    Async variant of run_hedged with the same launch schedule. Losers are cancelled
+    outright, which aborts their in-flight HTTP requests.
+    """
+
+    if not attempts:
+        return None
+    loop = asyncio.get_running_loop()
+    give_up_at = loop.time() + max(0.0, timeout)
+    pending: dict[asyncio.Task[Any], str] = {}
+    next_index = 0
+    next_launch_at = loop.time()
+
+    def launch() -> None:
+        nonlocal next_index, next_launch_at
+        label, func = attempts[next_index]
+        pending[asyncio.ensure_future(func())] = label
+        next_index += 1
+        next_launch_at = loop.time() + max(0.0, delay_sec)
+
+    winner: tuple[str, Any] | None = None
+    launch()
+    try:
+        while pending or next_index < len(attempts):
+            now = loop.time()
+            if now >= give_up_at:
+                break
+            if next_index < len(attempts) and (now >= next_launch_at or not pending):
+                launch()
+                continue
+            wake_at = give_up_at
+            if next_index < len(attempts):
+                wake_at = min(wake_at, next_launch_at)
+            done, _ = await asyncio.wait(
+                list(pending), timeout=max(0.0, wake_at - now), return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                label = pending.pop(task)
+                if task.cancelled() or task.exception() is not None:
+                    continue
+                if is_valid(task.result()):
+                    winner = (label, task.result())
+                    break
+            if winner is not None:
+                break
+    finally:
+        for task in pending:
+            task.cancel()
+        policy.record_outcome(
+            hedged=next_index > 1,
+            backup_won=winner is not None and winner[0] != attempts[0][0],
+        )
+    return winner
@@ -0,0 +1,240 @@
+import contextlib
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Iterator
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any
+
+if __package__:
+    from .config import env_float
+else:  # pragma: no cover
+    from config import env_float
+
+
+class IdempotencyInProgress(Exception):
+    """The original request for this key is still running past the caller's deadline."""
+
+
+def payload_fingerprint(payload: Any) -> str:
+    body = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+
+class _Entry:
+    __slots__ = ("fingerprint", "future", "expires_at", "followers")
+
+    def __init__(self, fingerprint: str, future: Future, expires_at: float) -> None:
+        self.fingerprint = fingerprint
+        self.future = future
+        self.expires_at = expires_at
+        self.followers = 0
+
+
+class IdempotencyStore:
+    """
+    Bounded TTL store of Idempotency-Key responses shared by the threads of a worker.
+
+    A retry with the same key and payload attaches to the still-running computation or
+    replays its stored response; a different payload under the same key starts over.
+    With IDEMPOTENCY_SQLITE_PATH set, completed responses are also written to SQLite so
+    retries landing on another worker replay them too.
+    """
+
+    def __init__(
+        self,
+        ttl_sec: float | None = None,
+        max_entries: int | None = None,
+        sqlite_path: str | None = None,
+    ) -> None:
+        self.ttl_sec = float(
+            ttl_sec if ttl_sec is not None else env_float("IDEMPOTENCY_TTL_SEC", 600.0)
+        )
+        self.max_entries = max(
+            1,
+            int(
+                max_entries
+                if max_entries is not None
+                else env_float("IDEMPOTENCY_MAX_ENTRIES", 1024.0)
+            ),
+        )
+        self.sqlite_path = (
+            sqlite_path
+            if sqlite_path is not None
+            else str(os.getenv("IDEMPOTENCY_SQLITE_PATH") or "").strip()
+        )
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._started = 0
+        self._attached = 0
+        self._replayed = 0
+        if self.sqlite_path:
+            self._init_sqlite()
+
+    @contextlib.contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.sqlite_path, timeout=2.0)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _init_sqlite(self) -> None:
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS idempotency ("
+                    "key TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, "
+                    "response TEXT NOT NULL, expires_at REAL NOT NULL)"
+                )
+        except Exception as exc:
+            print(f"[idempotency] sqlite disabled: {exc}")
+            self.sqlite_path = ""
+
+    def _load_sqlite(self, key: str, fingerprint: str) -> Any:
+        if not self.sqlite_path:
+            return None
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT response FROM idempotency "
+                    "WHERE key = ? AND fingerprint = ? AND expires_at > ?",
+                    (key, fingerprint, time.time()),
+                ).fetchone()
+        except Exception:
+            return None
+        if not row:
+            return None
+        try:
+            return json.loads(row[0])
+        except Exception:
+            return None
+
+    def _save_sqlite(self, key: str, fingerprint: str, result: Any) -> None:
+        if not self.sqlite_path:
+            return
+        try:
+            body = json.dumps(result, ensure_ascii=False, default=str)
+            with self._connect() as conn:
+                conn.execute("DELETE FROM idempotency WHERE expires_at <= ?", (time.time(),))
+                conn.execute(
+                    "INSERT OR REPLACE INTO idempotency VALUES (?, ?, ?, ?)",
+                    (key, fingerprint, body, time.time() + self.ttl_sec),
+                )
+        except Exception as exc:
+            print(f"[idempotency] sqlite write failed: {exc}")
+
+    def _purge_locked(self, now: float) -> None:
+        for key in [k for k, entry in self._entries.items() if entry.expires_at <= now]:
+            del self._entries[key]
+        while len(self._entries) > self.max_entries:
+            # Evict the oldest finished entry; in-flight ones are still being awaited.
+            victim = next(
+                (k for k, entry in self._entries.items() if entry.future.done()),
+                None,
+            )
+            if victim is None:
+                break
+            del self._entries[victim]
+
+    def begin(self, key: str, fingerprint: str) -> tuple[Future, bool]:
+        """
+        Return (future, owner). The owner must run the request and call `complete` or
+        `fail`; everyone else waits on the future.
+        """
+
+        now = time.time()
+        with self._lock:
+            self._purge_locked(now)
+            entry = self._entries.get(key)
+            if entry is not None and entry.fingerprint == fingerprint:
+                if entry.future.done():
+                    self._replayed += 1
+                else:
+                    self._attached += 1
+                    entry.followers += 1
+                return entry.future, False
+        stored = self._load_sqlite(key, fingerprint)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.fingerprint == fingerprint:
+                # Another thread started it while SQLite was being checked.
+                self._attached += 1
+                entry.followers += 1
+                return entry.future, False
+            future: Future = Future()
+            if stored is not None:
+                future.set_result(stored)
+                self._replayed += 1
+                return future, False
+            self._entries[key] = _Entry(fingerprint, future, now + self.ttl_sec)
+            self._entries.move_to_end(key)
+            self._started += 1
+            self._purge_locked(now)
+            return future, True
+
+    def followers(self, key: str, future: Future) -> int:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.future is not future:
+                return 0
+            return entry.followers
+
+    def complete(self, key: str, future: Future, result: Any, cache: bool = True) -> None:
+        """Publish the owner's response; `cache=False` hands it to current waiters only."""
+
+        fingerprint = ""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.future is future:
+                fingerprint = entry.fingerprint
+                if not cache:
+                    del self._entries[key]
+        if not future.done():
+            future.set_result(result)
+        if cache and fingerprint:
+            self._save_sqlite(key, fingerprint, result)
+
+    def fail(self, key: str, future: Future, exc: BaseException) -> None:
+        """Errors are not replayed: the next retry starts a fresh computation."""
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.future is future:
+                del self._entries[key]
+        if not future.done():
+            future.set_exception(exc)
+
+    def wait(self, key: str, future: Future, timeout: float) -> Any:
+        """Wait as a follower of `begin`; the follower is counted off however this ends."""
+
+        try:
+            return future.result(timeout=max(0.0, timeout))
+        except FutureTimeoutError:
+            raise IdempotencyInProgress("original request still in progress") from None
+        finally:
+            self._leave(key, future)
+
+    def _leave(self, key: str, future: Future) -> None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.future is future and entry.followers > 0:
+                entry.followers -= 1
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_sec": self.ttl_sec,
+                "sqlite": bool(self.sqlite_path),
+                "started": self._started,
+                "attached": self._attached,
+                "replayed": self._replayed,
+            }
@@ -0,0 +1,92 @@
+import asyncio
+import concurrent.futures
+import contextvars
+import threading
+from collections.abc import Coroutine
+from typing import Any
+
+
+class IOLoop:
+    """
+    One event loop thread per worker for the async LLM clients.
+
+    Flask handlers each run their own short-lived `asyncio.run` loop, but async SDK
+    clients keep connection pools bound to the loop that created them, so every async
+    LLM call runs here instead. Thousands of calls can wait on sockets on this one
+    thread. `submit` returns a concurrent.futures.Future that any loop or thread can
+    wait on; cancelling it cancels the task, which aborts the HTTP request.
+    """
+
+    def __init__(self, name: str = "bystander-io-loop") -> None:
+        self.name = name
+        self._lock = threading.Lock()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._in_flight = 0
+        self._submitted = 0
+        self._cancelled = 0
+
+    def _loop_locked(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name=self.name, daemon=True).start()
+            self._loop = loop
+        return self._loop
+
+    def submit(
+        self, coro: Coroutine[Any, Any, Any], context: contextvars.Context | None = None
+    ) -> concurrent.futures.Future:
+        """Run `coro` on the I/O loop inside `context` (default: a copy of the caller's)."""
+
+        ctx = context if context is not None else contextvars.copy_context()
+        result: concurrent.futures.Future = concurrent.futures.Future()
+        with self._lock:
+            loop = self._loop_locked()
+            self._submitted += 1
+            self._in_flight += 1
+
+        def finish(task: asyncio.Task[Any]) -> None:
+            with self._lock:
+                self._in_flight -= 1
+                self._cancelled += int(task.cancelled())
+            if result.done():
+                return
+            try:
+                if task.cancelled():
+                    result.cancel()
+                elif task.exception() is not None:
+                    result.set_exception(task.exception())
+                else:
+                    result.set_result(task.result())
+            except concurrent.futures.InvalidStateError:
+                # Cancelled by the waiter meanwhile.
+                pass
+
+        def start() -> None:
+            if result.cancelled():
+                coro.close()
+                with self._lock:
+                    self._in_flight -= 1
+                    self._cancelled += 1
+                return
+            # A task copies the context current at creation, so create it inside ctx.
+            task = ctx.run(loop.create_task, coro)
+            task.add_done_callback(finish)
+            result.add_done_callback(
+                lambda done: loop.call_soon_threadsafe(task.cancel) if done.cancelled() else None
+            )
+
+        loop.call_soon_threadsafe(start)
+        return result
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "running": self._loop is not None,
+                "in_flight": self._in_flight,
+                "submitted": self._submitted,
+                "cancelled": self._cancelled,
+            }
+
+
+# Shared by every request in the worker; see IOLoop.
+IO_LOOP = IOLoop()
@@ -23,8 +23,10 @@ except Exception:  # pragma: no cover
 
 if __package__:
     from .observability import observe, record_exception
+    from .rate_limit import BACKGROUND, PROVIDER_LIMITER, estimate_call_tokens
 else:  # pragma: no cover
     from observability import observe, record_exception
+    from rate_limit import BACKGROUND, PROVIDER_LIMITER, estimate_call_tokens
 
 
 ENV_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), ".env")
@@ -292,16 +294,20 @@ class AsyncJudgeService:
         if not self.enabled or self.client is None:
             return dict(default)
 
+        # Judge calls share the OpenAI quota with the request path and yield to it.
+        tokens = estimate_call_tokens(system_prompt, user_prompt)
+
         # Preferred path: Responses API (supports reasoning controls).
         try:
-            response = self.client.responses.create(
-                model=self.model,
-                reasoning={"effort": "high"},
-                input=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt},
-                ],
-            )
+            with PROVIDER_LIMITER.slot("openai-responses", tokens, priority=BACKGROUND):
+                response = self.client.responses.create(
+                    model=self.model,
+                    reasoning={"effort": "high"},
+                    input=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": user_prompt},
+                    ],
+                )
             text = _normalize_text(getattr(response, "output_text", ""))
             if not text:
                 text = _normalize_text(str(response))
@@ -311,14 +317,15 @@ class AsyncJudgeService:
 
         # Compatibility path: Chat Completions.
         try:
-            chat = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt},
-                ],
-                response_format={"type": "json_object"},
-            )
+            with PROVIDER_LIMITER.slot("openai-chat", tokens, priority=BACKGROUND):
+                chat = self.client.chat.completions.create(
+                    model=self.model,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": user_prompt},
+                    ],
+                    response_format={"type": "json_object"},
+                )
             text = ""
             if getattr(chat, "choices", None):
                 msg = chat.choices[0].message
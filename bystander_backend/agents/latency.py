@@ -0,0 +1,129 @@
+import math
+import threading
+from collections import deque
+from typing import Any
+
+if __package__:
+    from .config import env_flag, env_float
+else:  # pragma: no cover
+    from config import env_flag, env_float
+
+
+class LatencyHistogram:
+    """Rolling window of recent latencies (seconds), safe to share across threads."""
+
+    def __init__(self, window: int = 256) -> None:
+        self._samples: deque[float] = deque(maxlen=max(1, window))
+        self._lock = threading.Lock()
+        self._total = 0
+        self._timeouts = 0
+
+    def observe(self, seconds: float, timed_out: bool = False) -> None:
+        with self._lock:
+            self._samples.append(max(0.0, float(seconds)))
+            self._total += 1
+            if timed_out:
+                self._timeouts += 1
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._samples)
+
+    def percentile(self, q: float) -> float | None:
+        with self._lock:
+            ordered = sorted(self._samples)
+        if not ordered:
+            return None
+        # Nearest-rank percentile.
+        rank = max(1, math.ceil((q / 100.0) * len(ordered)))
+        return ordered[min(rank, len(ordered)) - 1]
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            ordered = sorted(self._samples)
+            total = self._total
+            timeouts = self._timeouts
+
+        def pick(q: float) -> float | None:
+            if not ordered:
+                return None
+            rank = max(1, math.ceil((q / 100.0) * len(ordered)))
+            return round(ordered[min(rank, len(ordered)) - 1] * 1000.0, 1)
+
+        return {
+            "window": len(ordered),
+            "total": total,
+            "timeouts": timeouts,
+            "p50_ms": pick(50),
+            "p95_ms": pick(95),
+            "p99_ms": pick(99),
+            "max_ms": round(ordered[-1] * 1000.0, 1) if ordered else None,
+        }
+
+
+class AdaptiveTimeouts:
+    """
+    Per-stage timeouts learned from observed latency: p99 x safety factor, clamped to
+    each stage's [min, max]. Until a stage has enough samples its default is used.
+
+    `stages` maps stage name -> (default_sec, min_sec, max_sec). Bounds can be
+    overridden with <STAGE>_TIMEOUT_MIN_SEC / <STAGE>_TIMEOUT_MAX_SEC env vars.
+    """
+
+    def __init__(
+        self,
+        stages: dict[str, tuple[float, float, float]],
+        factor: float | None = None,
+        min_samples: int | None = None,
+        window: int | None = None,
+    ) -> None:
+        self.factor = factor if factor is not None else env_float("ADAPTIVE_TIMEOUT_FACTOR", 1.5)
+        self.min_samples = int(
+            min_samples
+            if min_samples is not None
+            else env_float("ADAPTIVE_TIMEOUT_MIN_SAMPLES", 20)
+        )
+        window_size = int(window if window is not None else env_float("LATENCY_WINDOW", 256))
+        self.enabled = env_flag("ADAPTIVE_TIMEOUTS", True)
+        self._bounds: dict[str, tuple[float, float, float]] = {}
+        for stage, (default, low, high) in stages.items():
+            prefix = stage.upper()
+            low = env_float(f"{prefix}_TIMEOUT_MIN_SEC", low)
+            high = env_float(f"{prefix}_TIMEOUT_MAX_SEC", high)
+            self._bounds[stage] = (default, low, max(low, high))
+        self._histograms = {stage: LatencyHistogram(window_size) for stage in self._bounds}
+
+    def histogram(self, stage: str) -> LatencyHistogram | None:
+        return self._histograms.get(stage)
+
+    def timeout_for(self, stage: str) -> float:
+        default, low, high = self._bounds[stage]
+        histogram = self._histograms[stage]
+        if not self.enabled or len(histogram) < self.min_samples:
+            return default
+        p99 = histogram.percentile(99)
+        if p99 is None:
+            return default
+        return round(min(high, max(low, p99 * self.factor)), 3)
+
+    def observe(self, stage: str, seconds: float, timed_out: bool = False) -> None:
+        histogram = self._histograms.get(stage)
+        if histogram is not None:
+            histogram.observe(seconds, timed_out=timed_out)
+
+    def snapshot(self) -> dict[str, Any]:
+        out: dict[str, Any] = {}
+        for stage, (default, low, high) in self._bounds.items():
+            out[stage] = {
+                "timeout_sec": self.timeout_for(stage),
+                "default_sec": default,
+                "min_sec": low,
+                "max_sec": high,
+                **self._histograms[stage].snapshot(),
+            }
+        return {
+            "enabled": self.enabled,
+            "factor": self.factor,
+            "min_samples": self.min_samples,
+            "stages": out,
+        }
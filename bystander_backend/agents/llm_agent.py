@@ -1,9 +1,15 @@
+import asyncio
+import hashlib
 import json
 import os
 import re
 import sys
+import threading
+import time
 import types as py_types
 import warnings
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Coroutine, Iterator
 from typing import Any
 
 from dotenv import load_dotenv
@@ -30,8 +36,9 @@ except Exception:  # pragma: no cover
     types = None
 
 try:
-    from openai import OpenAI
+    from openai import AsyncOpenAI, OpenAI
 except Exception:  # pragma: no cover
+    AsyncOpenAI = None
     OpenAI = None
 
 try:
@@ -50,18 +57,70 @@ warnings.filterwarnings(
 )
 
 if __package__:
+    from .cancellation import RequestCancelled, raise_if_cancelled
+    from .condition_notes import ConditionNotesCache
+    from .config import env_flag
+    from .context_budget import ContextBudgeter
+    from .deadline import budget_is_low, current_deadline, remaining_timeout
+    from .guidance_store import GuidanceStore
+    from .hedging import HEDGE_POLICY, run_hedged_async
+    from .io_loop import IO_LOOP
+    from .local_llm import LocalLLMBackend
+    from .model_router import MODEL_ROUTER
     from .observability import observe, record_exception
+    from .provider_health import PROVIDER_HEALTH, ProviderUnavailable
+    from .rate_limit import PROVIDER_LIMITER, estimate_call_tokens
+    from .script_templates import SUMMARY_MAX_CHARS, ScriptTemplateStore, call_script_slots
+    from .semantic_cache import SemanticCache
 else:  # pragma: no cover
     current_dir = os.path.dirname(os.path.abspath(__file__))
     if current_dir not in sys.path:
         sys.path.insert(0, current_dir)
+    from cancellation import RequestCancelled, raise_if_cancelled
+    from condition_notes import ConditionNotesCache
+    from config import env_flag
+    from context_budget import ContextBudgeter
+    from deadline import budget_is_low, current_deadline, remaining_timeout
+    from guidance_store import GuidanceStore
+    from hedging import HEDGE_POLICY, run_hedged_async
+    from io_loop import IO_LOOP
+    from local_llm import LocalLLMBackend
+    from model_router import MODEL_ROUTER
     from observability import observe, record_exception
+    from provider_health import PROVIDER_HEALTH, ProviderUnavailable
+    from rate_limit import PROVIDER_LIMITER, estimate_call_tokens
+    from script_templates import SUMMARY_MAX_CHARS, ScriptTemplateStore, call_script_slots
+    from semantic_cache import SemanticCache
 
 
 ENV_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), ".env")
 load_dotenv(dotenv_path=ENV_PATH, override=True)
 
 
+# Upper bound for a single provider call; capped further by the request deadline.
+LLM_CALL_TIMEOUT_SEC = 30.0
+
+# How long guidance generation waits on medical-condition web lookups; capped further
+# by the request deadline. Slower lookups still land in the condition-notes cache.
+WEB_FALLBACK_CUTOFF_SEC = 2.5
+
+# Static guidance served whenever no model output is available (timeouts, load shedding).
+EMERGENCY_FALLBACK_GUIDANCE = (
+    "สถานการณ์นี้เป็นเหตุฉุกเฉิน\n"
+    "1. ประเมินความปลอดภัยของพื้นที่\n"
+    "2. โทร 1669 ทันที\n"
+    "3. ปฐมพยาบาลตามอาการเท่าที่ปลอดภัย\n"
+    "4. เฝ้าระวังอาการจนกว่าทีมแพทย์มาถึง"
+)
+NONCRITICAL_FALLBACK_GUIDANCE = (
+    "สถานการณ์นี้เป็นเหตุฉุกเฉิน\n"
+    "1. ตั้งสติและประเมินความปลอดภัยของพื้นที่\n"
+    "2. โทร 1669 หากอาการแย่ลงหรือไม่มั่นใจ\n"
+    "3. ปฐมพยาบาลตามอาการอย่างปลอดภัย\n"
+    "4. เฝ้าระวังอาการและไปพบแพทย์โดยเร็ว"
+)
+
+
 def _normalize_text(value: Any) -> str:
     return str(value or "").strip()
 
@@ -80,6 +139,17 @@ def _extract_json_block(text: str) -> str | None:
     return raw[start : end + 1]
 
 
+def _parse_json_strict(text: str) -> dict[str, Any] | None:
+    block = _extract_json_block(text)
+    if not block:
+        return None
+    try:
+        payload = json.loads(block)
+    except Exception:
+        return None
+    return payload if isinstance(payload, dict) else None
+
+
 def _parse_json_fallback(text: str, default: dict[str, Any]) -> dict[str, Any]:
     block = _extract_json_block(text)
     if not block:
@@ -95,6 +165,30 @@ def _parse_json_fallback(text: str, default: dict[str, Any]) -> dict[str, Any]:
         return default
 
 
+def _deadline_expired() -> bool:
+    deadline = current_deadline()
+    return deadline is not None and deadline.expired()
+
+
+def _cut_short_by_deadline(call_timeout: float) -> bool:
+    """
+    True when a call failed because the request's own deadline capped its timeout and then
+    ran out; the provider was not at fault, so health and routing skip it.
+    """
+
+    return call_timeout < LLM_CALL_TIMEOUT_SEC and _deadline_expired()
+
+
+def _run_sync(coro: Coroutine[Any, Any, Any]) -> Any:
+    """
+    Blocking entry points (worker threads, offline build scripts) run the async
+    implementation on the shared I/O loop and wait for it. Never call this from a
+    coroutine on that loop: it would wait on itself.
+    """
+
+    return IO_LOOP.submit(coro).result()
+
+
 def _canonical_model_name(model_name: str) -> str:
     name = _normalize_text(model_name)
     if not name:
@@ -121,10 +215,208 @@ def _model_candidates(model_name: str) -> list[str]:
     return [canonical]
 
 
+def _model_pool(env_name: str, primary: str) -> list[str]:
+    """
+    Router candidates for a model setting, most preferred first: `<env_name>_CANDIDATES`
+    (comma-separated), else the configured model followed by MODEL_ROUTER_FALLBACK if
+    that is set. With neither, only the configured model is used; MODEL_ROUTER=0 pins
+    every agent to its configured model.
+    """
+
+    if not env_flag("MODEL_ROUTER", True):
+        return [_canonical_model_name(primary)]
+    raw = _normalize_text(os.getenv(f"{env_name}_CANDIDATES"))
+    names = raw.split(",") if raw else [primary, os.getenv("MODEL_ROUTER_FALLBACK", "")]
+    pool: list[str] = []
+    for name in names:
+        if _normalize_text(name):
+            canonical = _canonical_model_name(name)
+            if canonical not in pool:
+                pool.append(canonical)
+    return pool or [_canonical_model_name(primary)]
+
+
+_JSON_ESCAPES = {
+    '"': '"',
+    "\\": "\\",
+    "/": "/",
+    "b": "\b",
+    "f": "\f",
+    "n": "\n",
+    "r": "\r",
+    "t": "\t",
+}
+_GUIDANCE_KEY = re.compile(r'"guidance"\s*:\s*"')
+_STEP_BOUNDARY = re.compile(r"\s+(?=\d{1,2}[.)]\s)")
+# "[Protocol 1] <case name>" (local index) or "[Vertex Protocol 1] <title>\n- source=<uri>".
+_PROTOCOL_HEADER = re.compile(
+    r"^\[(?:Vertex )?Protocol \d+\] *(.*)$(?:\n- source=(\S+))?", re.MULTILINE
+)
+
+
+def _decode_partial_json_string(raw: str, start: int) -> tuple[str, bool]:
+    """Decode a JSON string value starting at `start`; returns (text so far, closed)."""
+
+    out: list[str] = []
+    i = start
+    n = len(raw)
+    while i < n:
+        char = raw[i]
+        if char == '"':
+            return "".join(out), True
+        if char == "\\":
+            if i + 1 >= n:
+                break
+            escape = raw[i + 1]
+            if escape == "u":
+                if i + 6 > n:
+                    break
+                try:
+                    out.append(chr(int(raw[i + 2 : i + 6], 16)))
+                except ValueError:
+                    out.append(raw[i : i + 6])
+                i += 6
+                continue
+            out.append(_JSON_ESCAPES.get(escape, escape))
+            i += 2
+            continue
+        out.append(char)
+        i += 1
+    return "".join(out), False
+
+
+def matched_protocols(rag_context: str) -> list[str]:
+    """Ids of the protocols in a retrieval context, best match first (source URI or title)."""
+
+    return [
+        _normalize_text(source or title)
+        for title, source in _PROTOCOL_HEADER.findall(str(rag_context or ""))
+    ]
+
+
+def split_guidance_steps(text: str) -> list[str]:
+    """Split guidance into lines, also breaking "1. ... 2. ..." written on one line."""
+
+    steps: list[str] = []
+    for line in str(text or "").split("\n"):
+        for part in _STEP_BOUNDARY.split(line):
+            part = part.strip()
+            if part:
+                steps.append(part)
+    return steps
+
+
+class GuidanceStreamParser:
+    """Incrementally pulls completed guidance steps out of a streaming JSON completion."""
+
+    def __init__(self) -> None:
+        self.raw = ""
+        self.guidance = ""
+        self.closed = False
+        self._value_start: int | None = None
+        self._emitted = 0
+
+    def feed(self, chunk: str) -> list[str]:
+        self.raw += str(chunk or "")
+        if self.closed:
+            return []
+        if self._value_start is None:
+            match = _GUIDANCE_KEY.search(self.raw)
+            if not match:
+                return []
+            self._value_start = match.end()
+        self.guidance, self.closed = _decode_partial_json_string(self.raw, self._value_start)
+        return self._take_steps(final=self.closed)
+
+    def close(self) -> list[str]:
+        """Flush the trailing step once the stream has ended."""
+
+        if self._value_start is None:
+            return []
+        return self._take_steps(final=True)
+
+    def _take_steps(self, final: bool) -> list[str]:
+        steps = split_guidance_steps(self.guidance)
+        # The last step may still be growing until the string closes.
+        ready = steps if final else steps[:-1]
+        fresh = ready[self._emitted :]
+        self._emitted = max(self._emitted, len(ready))
+        return fresh
+
+
+def _stream_openai_compatible(
+    client: Any,
+    provider: str,
+    model_name: str,
+    system_prompt: str,
+    user_prompt: str,
+    temperature: float,
+    max_tokens: int = 900,
+) -> Iterator[str]:
+    """Yield content deltas from an OpenAI-compatible chat completion stream."""
+
+    with PROVIDER_LIMITER.slot(provider, estimate_call_tokens(system_prompt, user_prompt)):
+        started = time.perf_counter()
+        try:
+            stream = client.chat.completions.create(
+                model=model_name,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_prompt},
+                ],
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stream=True,
+                timeout=remaining_timeout(LLM_CALL_TIMEOUT_SEC),
+            )
+            for chunk in stream:
+                choices = getattr(chunk, "choices", None) or []
+                if not choices:
+                    continue
+                text = getattr(getattr(choices[0], "delta", None), "content", None) or ""
+                if text:
+                    yield text
+        except Exception as exc:
+            PROVIDER_HEALTH.record_failure(provider, model_name, exc)
+            raise
+        PROVIDER_HEALTH.record_success(provider, model_name, time.perf_counter() - started)
+
+
+_SHARED_CLIENTS: dict[tuple[str, ...], Any] = {}
+_SHARED_CLIENTS_LOCK = threading.Lock()
+_VERTEX_INITIALIZED: set[tuple[str, str]] = set()
+
+# GenerativeModel objects kept per GeminiJSONAgent, keyed by (model, system prompt hash).
+VERTEX_MODEL_CACHE_SIZE = 64
+
+
+def _shared_client(key: tuple[str, ...], factory: Callable[[], Any]) -> Any:
+    """One SDK client (and its HTTP connection pool) per credential, shared by all agents."""
+
+    with _SHARED_CLIENTS_LOCK:
+        client = _SHARED_CLIENTS.get(key)
+        if client is None:
+            client = factory()
+            _SHARED_CLIENTS[key] = client
+        return client
+
+
+def _init_vertex_once(project: str, location: str) -> None:
+    with _SHARED_CLIENTS_LOCK:
+        if (project, location) in _VERTEX_INITIALIZED:
+            return
+        vertexai.init(project=project, location=location)
+        _VERTEX_INITIALIZED.add((project, location))
+
+
 class GeminiJSONAgent:
     def __init__(self) -> None:
         self.api_key = _normalize_text(os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY"))
-        self.client = genai.Client(api_key=self.api_key) if self.api_key and genai else None
+        self.client = (
+            _shared_client(("genai", self.api_key), lambda: genai.Client(api_key=self.api_key))
+            if self.api_key and genai
+            else None
+        )
         self.vertex_project = _normalize_text(os.getenv("GOOGLE_CLOUD_PROJECT"))
         self.vertex_location = _normalize_text(
             os.getenv("VERTEX_RAG_LOCATION") or os.getenv("VERTEX_LOCATION") or "us-central1"
@@ -132,10 +424,49 @@ class GeminiJSONAgent:
         self.vertex_enabled = False
         if vertexai and GenerativeModel and self.vertex_project:
             try:
-                vertexai.init(project=self.vertex_project, location=self.vertex_location)
+                _init_vertex_once(self.vertex_project, self.vertex_location)
                 self.vertex_enabled = True
             except Exception as exc:
                 record_exception(exc)
+        self._models: OrderedDict[tuple[str, str], Any] = OrderedDict()
+        self._models_lock = threading.Lock()
+        self._routes: dict[str, list[tuple[str, str]]] = {}
+
+    def route(self, model_name: str) -> list[tuple[str, str]]:
+        """
+        (provider, model) attempts for a requested model, computed once. Providers that
+        were not configured at startup are left out instead of failing on every call.
+        """
+
+        cached = self._routes.get(model_name)
+        if cached is not None:
+            return cached
+        providers = []
+        if self.vertex_enabled and GenerativeModel is not None and GenerationConfig is not None:
+            providers.append("vertex")
+        if self.client is not None and types is not None:
+            providers.append("genai")
+        route = [
+            (provider, candidate)
+            for provider in providers
+            for candidate in _model_candidates(model_name)
+        ]
+        self._routes[model_name] = route
+        return route
+
+    def _vertex_model(self, model_name: str, system_prompt: str) -> Any:
+        key = (model_name, hashlib.sha1(system_prompt.encode("utf-8")).hexdigest())
+        with self._models_lock:
+            model = self._models.get(key)
+            if model is not None:
+                self._models.move_to_end(key)
+                return model
+        model = GenerativeModel(model_name=model_name, system_instruction=[system_prompt])
+        with self._models_lock:
+            self._models[key] = model
+            while len(self._models) > VERTEX_MODEL_CACHE_SIZE:
+                self._models.popitem(last=False)
+        return model
 
     @staticmethod
     def _response_text(response: Any) -> str:
@@ -152,8 +483,34 @@ class GeminiJSONAgent:
                     return maybe
         return _normalize_text(str(response))
 
+    @staticmethod
+    def _vertex_config(temperature: float) -> Any:
+        return GenerationConfig(
+            temperature=temperature,
+            max_output_tokens=2048,
+            response_mime_type="application/json",
+        )
+
+    @staticmethod
+    def _genai_config(system_prompt: str, temperature: float) -> Any:
+        return types.GenerateContentConfig(
+            system_instruction=system_prompt,
+            temperature=temperature,
+            response_mime_type="application/json",
+            max_output_tokens=2048,
+            http_options=types.HttpOptions(
+                timeout=int(remaining_timeout(LLM_CALL_TIMEOUT_SEC) * 1000)
+            ),
+        )
+
+    def _async_provider_calls(self) -> dict[str, Callable[..., Awaitable[str]]]:
+        return {
+            "vertex": self._generate_json_with_vertex_async,
+            "genai": self._generate_json_with_google_genai_async,
+        }
+
     @observe()
-    def _generate_json_with_vertex(
+    async def _generate_json_with_vertex_async(
         self,
         model_name: str,
         system_prompt: str,
@@ -163,22 +520,14 @@ class GeminiJSONAgent:
         if not self.vertex_enabled or GenerativeModel is None or GenerationConfig is None:
             raise RuntimeError("Vertex AI Gemini SDK is not available")
 
-        model = GenerativeModel(
-            model_name=model_name,
-            system_instruction=[system_prompt],
-        )
-        response = model.generate_content(
-            user_prompt,
-            generation_config=GenerationConfig(
-                temperature=temperature,
-                max_output_tokens=2048,
-                response_mime_type="application/json",
-            ),
+        model = self._vertex_model(model_name, system_prompt)
+        response = await model.generate_content_async(
+            user_prompt, generation_config=self._vertex_config(temperature)
         )
         return self._response_text(response)
 
     @observe()
-    def _generate_json_with_google_genai(
+    async def _generate_json_with_google_genai_async(
         self,
         model_name: str,
         system_prompt: str,
@@ -188,19 +537,13 @@ class GeminiJSONAgent:
         if self.client is None or types is None:
             raise RuntimeError("google-genai client is unavailable")
 
-        response = self.client.models.generate_content(
+        response = await self.client.aio.models.generate_content(
             model=model_name,
             contents=user_prompt,
-            config=types.GenerateContentConfig(
-                system_instruction=system_prompt,
-                temperature=temperature,
-                response_mime_type="application/json",
-                max_output_tokens=2048,
-            ),
+            config=self._genai_config(system_prompt, temperature),
         )
         return self._response_text(response)
 
-    @observe()
     def generate_json(
         self,
         model_name: str,
@@ -209,39 +552,296 @@ class GeminiJSONAgent:
         default: dict[str, Any],
         temperature: float = 0.1,
     ) -> dict[str, Any]:
-        # Primary path: Vertex AI SDK call (auto-instrumented by VertexAIInstrumentor).
-        for candidate_model in _model_candidates(model_name):
+        return _run_sync(
+            self.generate_json_async(model_name, system_prompt, user_prompt, default, temperature)
+        )
+
+    @observe()
+    async def generate_json_async(
+        self,
+        model_name: str,
+        system_prompt: str,
+        user_prompt: str,
+        default: dict[str, Any],
+        temperature: float = 0.1,
+    ) -> dict[str, Any]:
+        """One JSON completion on the SDKs' async clients; awaiting it holds no thread."""
+
+        # Vertex AI SDK first (auto-instrumented by VertexAIInstrumentor), then the
+        # google-genai API client.
+        # Sick providers are reordered or skipped by their circuit breaker.
+        for provider, candidate_model in PROVIDER_HEALTH.order(self.route(model_name)):
+            raise_if_cancelled()
+            if _deadline_expired():
+                return dict(default)
+            if not PROVIDER_HEALTH.allow(provider, candidate_model):
+                continue
             try:
-                text = self._generate_json_with_vertex(
-                    model_name=candidate_model,
-                    system_prompt=system_prompt,
-                    user_prompt=user_prompt,
-                    temperature=temperature,
+                text = await self._call_provider_async(
+                    provider, candidate_model, system_prompt, user_prompt, temperature
                 )
-                return _parse_json_fallback(text, default)
             except Exception as exc:
                 record_exception(exc)
+                continue
+            return _parse_json_fallback(text, default)
+        return dict(default)
 
-        # Fallback path: existing google-genai API client.
-        for candidate_model in _model_candidates(model_name):
+    async def _call_provider_async(
+        self,
+        provider: str,
+        model_name: str,
+        system_prompt: str,
+        user_prompt: str,
+        temperature: float,
+    ) -> str:
+        """One provider attempt; feeds provider health and the hedging latency histograms."""
+
+        # Waiting for quota is not the provider's fault: RateLimited skips health.
+        # Cancellation (a caller giving up) is a BaseException and says nothing about the
+        # provider, so it is not recorded as a failure.
+        async with PROVIDER_LIMITER.slot_async(
+            provider, estimate_call_tokens(system_prompt, user_prompt)
+        ):
+            started = time.perf_counter()
+            call_timeout = remaining_timeout(LLM_CALL_TIMEOUT_SEC)
             try:
-                text = self._generate_json_with_google_genai(
-                    model_name=candidate_model,
-                    system_prompt=system_prompt,
-                    user_prompt=user_prompt,
-                    temperature=temperature,
+                text = await asyncio.wait_for(
+                    self._async_provider_calls()[provider](
+                        model_name=model_name,
+                        system_prompt=system_prompt,
+                        user_prompt=user_prompt,
+                        temperature=temperature,
+                    ),
+                    timeout=call_timeout,
                 )
-                return _parse_json_fallback(text, default)
             except Exception as exc:
+                if _cut_short_by_deadline(call_timeout):
+                    PROVIDER_HEALTH.record_inconclusive(provider, model_name)
+                else:
+                    PROVIDER_HEALTH.record_failure(provider, model_name, exc)
+                    MODEL_ROUTER.observe(
+                        provider, model_name, time.perf_counter() - started, ok=False
+                    )
+                raise
+        elapsed = time.perf_counter() - started
+        PROVIDER_HEALTH.record_success(provider, model_name, elapsed)
+        HEDGE_POLICY.observe(f"{provider}:{model_name}", elapsed)
+        MODEL_ROUTER.observe(provider, model_name, elapsed, ok=True)
+        return text
+
+    def hedge_attempts_async(
+        self,
+        model_name: str,
+        system_prompt: str,
+        user_prompt: str,
+        temperature: float,
+    ) -> list[tuple[str, Callable[[], Awaitable[str]]]]:
+        """One attempt per healthy provider; candidates of one provider share its failures."""
+
+        attempts: list[tuple[str, Callable[[], Awaitable[str]]]] = []
+        seen: set[str] = set()
+        for provider, candidate_model in PROVIDER_HEALTH.order(self.route(model_name)):
+            if provider in seen:
+                continue
+            seen.add(provider)
+
+            async def attempt(
+                provider: str = provider, candidate_model: str = candidate_model
+            ) -> str:
+                if not PROVIDER_HEALTH.allow(provider, candidate_model):
+                    raise ProviderUnavailable(f"{provider}:{candidate_model} circuit is open")
+                return await self._call_provider_async(
+                    provider, candidate_model, system_prompt, user_prompt, temperature
+                )
+
+            attempts.append((f"{provider}:{candidate_model}", attempt))
+        return attempts
+
+    def _stream_calls(self) -> dict[str, Callable[..., Iterator[str]]]:
+        return {
+            "vertex": self._stream_with_vertex,
+            "genai": self._stream_with_google_genai,
+        }
+
+    @staticmethod
+    def _chunk_text(chunk: Any) -> str:
+        try:
+            text = getattr(chunk, "text", "") or ""
+        except Exception:
+            # Vertex raises on .text for chunks without text parts (e.g. finish chunk).
+            text = ""
+        if text:
+            return str(text)
+        for candidate in getattr(chunk, "candidates", None) or []:
+            parts = getattr(getattr(candidate, "content", None), "parts", None) or []
+            pieces = [str(getattr(part, "text", "") or "") for part in parts]
+            if any(pieces):
+                return "".join(pieces)
+        return ""
+
+    def _stream_with_vertex(
+        self,
+        model_name: str,
+        system_prompt: str,
+        user_prompt: str,
+        temperature: float,
+    ) -> Iterator[str]:
+        if not self.vertex_enabled or GenerativeModel is None or GenerationConfig is None:
+            raise RuntimeError("Vertex AI Gemini SDK is not available")
+        model = self._vertex_model(model_name, system_prompt)
+        responses = model.generate_content(
+            user_prompt,
+            generation_config=GenerationConfig(
+                temperature=temperature,
+                max_output_tokens=2048,
+                response_mime_type="application/json",
+            ),
+            stream=True,
+        )
+        for response in responses:
+            yield self._chunk_text(response)
+
+    def _stream_with_google_genai(
+        self,
+        model_name: str,
+        system_prompt: str,
+        user_prompt: str,
+        temperature: float,
+    ) -> Iterator[str]:
+        if self.client is None or types is None:
+            raise RuntimeError("google-genai client is unavailable")
+        responses = self.client.models.generate_content_stream(
+            model=model_name,
+            contents=user_prompt,
+            config=types.GenerateContentConfig(
+                system_instruction=system_prompt,
+                temperature=temperature,
+                response_mime_type="application/json",
+                max_output_tokens=2048,
+                http_options=types.HttpOptions(
+                    timeout=int(remaining_timeout(LLM_CALL_TIMEOUT_SEC) * 1000)
+                ),
+            ),
+        )
+        for response in responses:
+            yield self._chunk_text(response)
+
+    def stream_json_text(
+        self,
+        model_name: str,
+        system_prompt: str,
+        user_prompt: str,
+        temperature: float = 0.1,
+    ) -> Iterator[str]:
+        """
+        Yield raw JSON text chunks as the model produces them. Falls over to the next
+        provider only while nothing has been yielded; a stream that breaks mid-way
+        re-raises so the caller can keep what it already has.
+        """
+
+        calls = self._stream_calls()
+        for provider, candidate_model in PROVIDER_HEALTH.order(self.route(model_name)):
+            raise_if_cancelled()
+            if _deadline_expired():
+                return
+            if not PROVIDER_HEALTH.allow(provider, candidate_model):
+                continue
+            started = time.perf_counter()
+            yielded = False
+            try:
+                with PROVIDER_LIMITER.slot(
+                    provider, estimate_call_tokens(system_prompt, user_prompt)
+                ):
+                    for chunk in calls[provider](
+                        model_name=candidate_model,
+                        system_prompt=system_prompt,
+                        user_prompt=user_prompt,
+                        temperature=temperature,
+                    ):
+                        if chunk:
+                            yielded = True
+                            yield chunk
+            except ProviderUnavailable as exc:
                 record_exception(exc)
-        return dict(default)
+                continue
+            except Exception as exc:
+                PROVIDER_HEALTH.record_failure(provider, candidate_model, exc)
+                MODEL_ROUTER.observe(
+                    provider, candidate_model, time.perf_counter() - started, ok=False
+                )
+                record_exception(exc)
+                if yielded:
+                    raise
+                continue
+            elapsed = time.perf_counter() - started
+            PROVIDER_HEALTH.record_success(provider, candidate_model, elapsed)
+            MODEL_ROUTER.observe(provider, candidate_model, elapsed, ok=True)
+            return
+
+    def generate_json_hedged(
+        self,
+        model_name: str,
+        system_prompt: str,
+        user_prompt: str,
+        default: dict[str, Any],
+        temperature: float = 0.1,
+        extra_attempts: list[tuple[str, Callable[[], Awaitable[str]]]] | None = None,
+    ) -> dict[str, Any]:
+        return _run_sync(
+            self.generate_json_hedged_async(
+                model_name, system_prompt, user_prompt, default, temperature, extra_attempts
+            )
+        )
+
+    @observe()
+    async def generate_json_hedged_async(
+        self,
+        model_name: str,
+        system_prompt: str,
+        user_prompt: str,
+        default: dict[str, Any],
+        temperature: float = 0.1,
+        extra_attempts: list[tuple[str, Callable[[], Awaitable[str]]]] | None = None,
+    ) -> dict[str, Any]:
+        """
+        Hedged variant of generate_json: if the primary provider has not produced valid
+        JSON within its percentile-based delay, the same prompt goes to the next provider
+        and the first valid answer wins.
+        """
+
+        attempts = self.hedge_attempts_async(model_name, system_prompt, user_prompt, temperature)
+        attempts += extra_attempts or []
+        if len(attempts) < 2:
+            return await self.generate_json_async(
+                model_name=model_name,
+                system_prompt=system_prompt,
+                user_prompt=user_prompt,
+                default=default,
+                temperature=temperature,
+            )
+        raise_if_cancelled()
+        winner = await run_hedged_async(
+            attempts,
+            delay_sec=HEDGE_POLICY.delay_for(attempts[0][0]),
+            is_valid=lambda text: _parse_json_strict(text) is not None,
+            timeout=remaining_timeout(LLM_CALL_TIMEOUT_SEC),
+        )
+        if winner is None:
+            return dict(default)
+        return _parse_json_fallback(winner[1], default)
 
 
 class OpenAIJSONAgent:
     def __init__(self) -> None:
         self.api_key = _normalize_text(os.getenv("OPENAI_API_KEY") or os.getenv("OPENAI_KEY"))
-        self.enabled = bool(self.api_key and OpenAI is not None)
-        self.client = OpenAI(api_key=self.api_key) if self.enabled and OpenAI else None
+        self.enabled = bool(self.api_key and AsyncOpenAI is not None)
+        self.async_client = (
+            _shared_client(
+                ("openai-async", self.api_key), lambda: AsyncOpenAI(api_key=self.api_key)
+            )
+            if self.enabled
+            else None
+        )
 
     @staticmethod
     def _response_text(response: Any) -> str:
@@ -250,50 +850,71 @@ class OpenAIJSONAgent:
             return text
         return _normalize_text(str(response))
 
+    @staticmethod
+    def _responses_request(model_name: str, system_prompt: str, user_prompt: str) -> dict[str, Any]:
+        return {
+            "model": model_name,
+            "reasoning": {"effort": "minimal"},
+            "input": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+            "timeout": remaining_timeout(LLM_CALL_TIMEOUT_SEC),
+        }
+
+    @staticmethod
+    def _chat_request(model_name: str, system_prompt: str, user_prompt: str) -> dict[str, Any]:
+        return {
+            "model": model_name,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+            "response_format": {"type": "json_object"},
+            "timeout": remaining_timeout(LLM_CALL_TIMEOUT_SEC),
+        }
+
+    @staticmethod
+    def _chat_text(chat: Any) -> str:
+        if getattr(chat, "choices", None):
+            message = chat.choices[0].message
+            text = _normalize_text(getattr(message, "content", ""))
+            if text:
+                return text
+        return _normalize_text(str(chat))
+
     @observe()
-    def _generate_json_with_responses(
+    async def _generate_json_with_responses_async(
         self,
         model_name: str,
         system_prompt: str,
         user_prompt: str,
     ) -> str:
-        if not self.enabled or self.client is None:
-            raise RuntimeError("OpenAI client is unavailable")
-        response = self.client.responses.create(
-            model=model_name,
-            reasoning={"effort": "minimal"},
-            input=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ],
+        if self.async_client is None:
+            raise RuntimeError("OpenAI async client is unavailable")
+        response = await self.async_client.responses.create(
+            **self._responses_request(model_name, system_prompt, user_prompt)
         )
         return self._response_text(response)
 
     @observe()
-    def _generate_json_with_chat_completions(
+    async def _generate_json_with_chat_completions_async(
         self,
         model_name: str,
         system_prompt: str,
         user_prompt: str,
     ) -> str:
-        if not self.enabled or self.client is None:
-            raise RuntimeError("OpenAI client is unavailable")
-        chat = self.client.chat.completions.create(
-            model=model_name,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ],
-            response_format={"type": "json_object"},
+        if self.async_client is None:
+            raise RuntimeError("OpenAI async client is unavailable")
+        chat = await self.async_client.chat.completions.create(
+            **self._chat_request(model_name, system_prompt, user_prompt)
         )
-        if getattr(chat, "choices", None):
-            message = chat.choices[0].message
-            text = _normalize_text(getattr(message, "content", ""))
-            if text:
-                return text
-        return _normalize_text(str(chat))
+        return self._chat_text(chat)
+
+    @staticmethod
+    def _route(model_name: str) -> list[tuple[str, str]]:
+        return [("openai-responses", model_name), ("openai-chat", model_name)]
 
-    @observe()
     def generate_json(
         self,
         model_name: str,
@@ -301,30 +922,53 @@ class OpenAIJSONAgent:
         user_prompt: str,
         default: dict[str, Any],
         temperature: float = 0.0,
+    ) -> dict[str, Any]:
+        return _run_sync(
+            self.generate_json_async(model_name, system_prompt, user_prompt, default, temperature)
+        )
+
+    @observe()
+    async def generate_json_async(
+        self,
+        model_name: str,
+        system_prompt: str,
+        user_prompt: str,
+        default: dict[str, Any],
+        temperature: float = 0.0,
     ) -> dict[str, Any]:
         del temperature
-        if not self.enabled or self.client is None:
+        if self.async_client is None:
             return dict(default)
 
-        try:
-            text = self._generate_json_with_responses(
-                model_name=model_name,
-                system_prompt=system_prompt,
-                user_prompt=user_prompt,
-            )
-            return _parse_json_fallback(text, default)
-        except Exception as exc:
-            record_exception(exc)
-
-        try:
-            text = self._generate_json_with_chat_completions(
-                model_name=model_name,
-                system_prompt=system_prompt,
-                user_prompt=user_prompt,
-            )
+        calls = {
+            "openai-responses": self._generate_json_with_responses_async,
+            "openai-chat": self._generate_json_with_chat_completions_async,
+        }
+        for provider, _ in PROVIDER_HEALTH.order(self._route(model_name)):
+            raise_if_cancelled()
+            if _deadline_expired():
+                return dict(default)
+            if not PROVIDER_HEALTH.allow(provider, model_name):
+                continue
+            started = time.perf_counter()
+            try:
+                async with PROVIDER_LIMITER.slot_async(
+                    provider, estimate_call_tokens(system_prompt, user_prompt)
+                ):
+                    text = await calls[provider](
+                        model_name=model_name,
+                        system_prompt=system_prompt,
+                        user_prompt=user_prompt,
+                    )
+            except ProviderUnavailable as exc:
+                record_exception(exc)
+                continue
+            except Exception as exc:
+                PROVIDER_HEALTH.record_failure(provider, model_name, exc)
+                record_exception(exc)
+                continue
+            PROVIDER_HEALTH.record_success(provider, model_name, time.perf_counter() - started)
             return _parse_json_fallback(text, default)
-        except Exception as exc:
-            record_exception(exc)
         return dict(default)
 
 
@@ -334,9 +978,10 @@ class TriageAgent:
     def __init__(self, llm: GeminiJSONAgent) -> None:
         self.llm = llm
         self.model_name = _normalize_text(os.getenv("TRIAGE_MODEL")) or "gemini-2.5-flash"
+        self.model_candidates = _model_pool("TRIAGE_MODEL", self.model_name)
 
-    @observe()
-    def run(self, scenario: str) -> dict[str, Any]:
+    @staticmethod
+    def _prompts() -> tuple[dict[str, Any], str]:
         default = {
             "is_emergency": True,
             "severity": "moderate",
@@ -349,7 +994,11 @@ class TriageAgent:
             "severity (critical|moderate|none), facility_type (hospital|clinic|none), "
             "reason_th (Thai)."
         )
-        user_prompt = (
+        return default, system_prompt
+
+    @staticmethod
+    def _user_prompt(scenario: str) -> str:
+        return (
             f"Scenario: {scenario}\n"
             "Rules:\n"
             "- If clearly non-emergency daily issue => is_emergency=false,"
@@ -358,13 +1007,9 @@ class TriageAgent:
             "- If emergency but not immediately life-threatening => moderate + clinic\n"
             "Output JSON only."
         )
-        out = self.llm.generate_json(
-            model_name=self.model_name,
-            system_prompt=system_prompt,
-            user_prompt=user_prompt,
-            default=default,
-            temperature=0.0,
-        )
+
+    @staticmethod
+    def _finalize(out: dict[str, Any], default: dict[str, Any]) -> dict[str, Any]:
         out["is_emergency"] = bool(out.get("is_emergency", True))
         sev = _normalize_text(out.get("severity", "moderate")).lower()
         out["severity"] = sev if sev in {"critical", "moderate", "none"} else "moderate"
@@ -373,6 +1018,30 @@ class TriageAgent:
         out["reason_th"] = _normalize_text(out.get("reason_th")) or default["reason_th"]
         return out
 
+    def run(self, scenario: str, severity_hint: str = "") -> dict[str, Any]:
+        return _run_sync(self.run_async(scenario, severity_hint))
+
+    @observe()
+    async def run_async(self, scenario: str, severity_hint: str = "") -> dict[str, Any]:
+        """`severity_hint` is a cheap provisional severity; it only decides hedging."""
+
+        default, system_prompt = self._prompts()
+        generate = (
+            self.llm.generate_json_hedged_async
+            if HEDGE_POLICY.enabled_for(severity_hint)
+            else self.llm.generate_json_async
+        )
+        out = await generate(
+            model_name=MODEL_ROUTER.choose(
+                "triage", self.model_candidates, critical=severity_hint == "critical"
+            ),
+            system_prompt=system_prompt,
+            user_prompt=self._user_prompt(scenario),
+            default=default,
+            temperature=0.0,
+        )
+        return self._finalize(out, default)
+
 
 class GuidanceAgent:
     """GuidanceAgent: model switch by severity + RAG context."""
@@ -386,57 +1055,38 @@ class GuidanceAgent:
         self.moderate_model = (
             _normalize_text(os.getenv("GUIDANCE_MODERATE_MODEL")) or default_guidance_model
         )
+        self.critical_candidates = _model_pool("GUIDANCE_CRITICAL_MODEL", self.critical_model)
+        self.moderate_candidates = _model_pool("GUIDANCE_MODERATE_MODEL", self.moderate_model)
         self.deepseek_model = _normalize_text(os.getenv("DEEPSEEK_FAST_MODEL")) or "deepseek-chat"
+        self.store = GuidanceStore()
+        self.cache = SemanticCache()
+        self.condition_notes = ConditionNotesCache()
+        self.context_budget = ContextBudgeter()
+        self.local_llm = LocalLLMBackend()
         self.deepseek_key = _normalize_text(os.getenv("DEEPSEEK_KEY"))
         self.deepseek_client = None
         if self.deepseek_key and OpenAI is not None:
             try:
-                self.deepseek_client = OpenAI(
-                    api_key=self.deepseek_key, base_url="https://api.deepseek.com"
+                self.deepseek_client = _shared_client(
+                    ("deepseek", self.deepseek_key),
+                    lambda: OpenAI(api_key=self.deepseek_key, base_url="https://api.deepseek.com"),
                 )
-            except Exception as exc:
-                record_exception(exc)
-
-    @staticmethod
-    def _clean_rag_snippets(rag_context: str, max_snippets: int = 6, max_chars: int = 1600) -> str:
-        text = _normalize_text(rag_context)
-        if not text:
-            return ""
-        chunks = re.split(r"\n\s*\n", text)
-        snippets = []
-        seen = set()
-        for chunk in chunks:
-            lines = []
-            for line in chunk.splitlines():
-                ln = _normalize_text(line)
-                if not ln:
-                    continue
-                lower = ln.lower()
-                if lower.startswith("[protocol") or lower.startswith("[vertex protocol"):
-                    continue
-                if lower.startswith("- keywords:"):
-                    continue
-                if lower.startswith("- severity:") or lower.startswith("- facility:"):
-                    continue
-                if lower.startswith("- source="):
-                    continue
-                ln = re.sub(r"\s+", " ", ln)
-                lines.append(ln)
-            cleaned = " ".join(lines).strip()
-            if len(cleaned) < 20:
-                continue
-            key = cleaned.lower()
-            if key in seen:
-                continue
-            seen.add(key)
-            snippets.append(cleaned)
-            if len(snippets) >= max_snippets:
-                break
+            except Exception as exc:
+                record_exception(exc)
+        self.deepseek_async_client = None
+        if self.deepseek_key and AsyncOpenAI is not None:
+            try:
+                self.deepseek_async_client = _shared_client(
+                    ("deepseek-async", self.deepseek_key),
+                    lambda: AsyncOpenAI(
+                        api_key=self.deepseek_key, base_url="https://api.deepseek.com"
+                    ),
+                )
+            except Exception as exc:
+                record_exception(exc)
 
-        merged = "\n".join(f"- {s}" for s in snippets)
-        if len(merged) > max_chars:
-            merged = merged[:max_chars].rsplit(" ", 1)[0].strip()
-        return merged
+    def _budgeted_context(self, scenario: str, rag_context: str, model_name: str) -> str:
+        return self.context_budget.pack(scenario, rag_context, model_name)["text"]
 
     @staticmethod
     def _normalize_medical_entries(medical_context: dict[str, Any] | None) -> list[dict[str, Any]]:
@@ -543,7 +1193,7 @@ class GuidanceAgent:
                     "no_html": 1,
                     "skip_disambig": 1,
                 },
-                timeout=6,
+                timeout=remaining_timeout(6.0),
             )
             response.raise_for_status()
             payload = response.json() if response.content else {}
@@ -569,15 +1219,29 @@ class GuidanceAgent:
 
     def _build_web_fallback_context(
         self, rag_context: str, medical_context: dict[str, Any] | None
+    ) -> tuple[str, list[str]]:
+        return _run_sync(self._build_web_fallback_context_async(rag_context, medical_context))
+
+    async def _build_web_fallback_context_async(
+        self, rag_context: str, medical_context: dict[str, Any] | None
     ) -> tuple[str, list[str]]:
         triggered = self._find_unaddressed_conditions(rag_context, medical_context)
         if not triggered:
             return "", []
-        summaries: list[str] = []
-        for condition in triggered:
-            summary = self._search_condition_guidance(condition)
-            if summary:
-                summaries.append(f"- {condition}: {summary}")
+        if budget_is_low():
+            # Web lookups would eat the remaining budget before the LLM even starts.
+            return "", triggered
+        raise_if_cancelled()
+        notes = await self.condition_notes.fetch_many_async(
+            triggered,
+            self._search_condition_guidance,
+            cutoff_sec=remaining_timeout(WEB_FALLBACK_CUTOFF_SEC),
+        )
+        return self._format_web_fallback(triggered, notes)
+
+    @staticmethod
+    def _format_web_fallback(triggered: list[str], notes: dict[str, str]) -> tuple[str, list[str]]:
+        summaries = [f"- {condition}: {summary}" for condition, summary in notes.items()]
         if not summaries:
             return "", triggered
         print(f"[medical_web_fallback] triggered_conditions={triggered}")
@@ -587,27 +1251,16 @@ class GuidanceAgent:
             triggered,
         )
 
-    @observe()
-    def _run_noncritical_deepseek(
+    def _deepseek_prompts(
         self,
         scenario: str,
         rag_context: str,
         medical_context: dict[str, Any] | None = None,
-    ) -> dict[str, Any]:
-        default = {
-            "guidance": (
-                "สถานการณ์นี้เป็นเหตุฉุกเฉิน\n"
-                "1. ตั้งสติและประเมินความปลอดภัยของพื้นที่\n"
-                "2. โทร 1669 หากอาการแย่ลงหรือไม่มั่นใจ\n"
-                "3. ปฐมพยาบาลตามอาการอย่างปลอดภัย\n"
-                "4. เฝ้าระวังอาการและไปพบแพทย์โดยเร็ว"
-            ),
-            "facility_type": "clinic",
-        }
-        if self.deepseek_client is None:
-            return dict(default)
-
-        snippets = self._clean_rag_snippets(rag_context)
+        web_context: tuple[str, list[str]] = ("", []),
+        model_name: str | None = None,
+    ) -> tuple[dict[str, Any], str, str]:
+        default = {"guidance": NONCRITICAL_FALLBACK_GUIDANCE, "facility_type": "clinic"}
+        snippets = self._budgeted_context(scenario, rag_context, model_name or self.deepseek_model)
         system_prompt = (
             "You are a Thai emergency first-aid assistant. "
             "Use retrieved medical snippets as the highest-priority source. "
@@ -618,7 +1271,7 @@ class GuidanceAgent:
             "and never fabricate advice."
         )
         medical_prompt = self._format_medical_context_prompt(medical_context)
-        web_context_prompt, _ = self._build_web_fallback_context(rag_context, medical_context)
+        web_context_prompt, _ = web_context
         user_prompt = f"Scenario: {scenario}\n\nRetrieved contexts (cleaned):\n{snippets}\n\n"
         if medical_prompt:
             user_prompt += f"{medical_prompt}\n\n"
@@ -632,41 +1285,125 @@ class GuidanceAgent:
             "- Prefer facility_type='clinic' unless clearly severe.\n"
             "- Output JSON only."
         )
+        return default, system_prompt, user_prompt
+
+    @observe()
+    async def _run_noncritical_local_async(
+        self,
+        scenario: str,
+        rag_context: str,
+        medical_context: dict[str, Any] | None = None,
+    ) -> dict[str, Any]:
+        """Guidance from the self-hosted model, or {} so the caller tries the next provider."""
+
+        web_context = await self._build_web_fallback_context_async(rag_context, medical_context)
+        _, system_prompt, user_prompt = self._deepseek_prompts(
+            scenario,
+            rag_context,
+            medical_context,
+            model_name=self.local_llm.model,
+            web_context=web_context,
+        )
         try:
-            resp = self.deepseek_client.chat.completions.create(
-                model=self.deepseek_model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt},
-                ],
-                temperature=0.1,
-                max_tokens=900,
+            content = await self.local_llm.complete_async(
+                system_prompt, user_prompt, temperature=0.1
             )
-            content = ""
-            if getattr(resp, "choices", None):
-                content = _normalize_text(resp.choices[0].message.content)
-            return _parse_json_fallback(content, default)
         except Exception as exc:
             record_exception(exc)
-            return dict(default)
+            return {}
+        out = _parse_json_fallback(content, {})
+        return out if _normalize_text(out.get("guidance")) else {}
 
     @observe()
-    def run(
+    async def _run_noncritical_deepseek_async(
         self,
         scenario: str,
-        severity: str,
         rag_context: str,
         medical_context: dict[str, Any] | None = None,
     ) -> dict[str, Any]:
-        model_name = self.critical_model if severity == "critical" else self.moderate_model
+        web_context = await self._build_web_fallback_context_async(rag_context, medical_context)
+        default, system_prompt, user_prompt = self._deepseek_prompts(
+            scenario, rag_context, medical_context, web_context=web_context
+        )
+        try:
+            content = await self._deepseek_complete_async(
+                system_prompt, user_prompt, temperature=0.1
+            )
+        except Exception as exc:
+            record_exception(exc)
+            return dict(default)
+        return _parse_json_fallback(content, default)
+
+    async def _deepseek_complete_async(
+        self, system_prompt: str, user_prompt: str, temperature: float = 0.1
+    ) -> str:
+        if self.deepseek_async_client is None:
+            raise ProviderUnavailable("DeepSeek async client is unavailable")
+        async with PROVIDER_LIMITER.slot_async(
+            "deepseek", estimate_call_tokens(system_prompt, user_prompt)
+        ):
+            started = time.perf_counter()
+            try:
+                resp = await self.deepseek_async_client.chat.completions.create(
+                    **self._deepseek_request(system_prompt, user_prompt, temperature)
+                )
+            except Exception as exc:
+                PROVIDER_HEALTH.record_failure("deepseek", self.deepseek_model, exc)
+                raise
+        return self._deepseek_text(resp, time.perf_counter() - started)
+
+    def _deepseek_request(
+        self, system_prompt: str, user_prompt: str, temperature: float
+    ) -> dict[str, Any]:
+        return {
+            "model": self.deepseek_model,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+            "temperature": temperature,
+            "max_tokens": 900,
+            "timeout": remaining_timeout(LLM_CALL_TIMEOUT_SEC),
+        }
+
+    def _deepseek_text(self, resp: Any, elapsed: float) -> str:
+        PROVIDER_HEALTH.record_success("deepseek", self.deepseek_model, elapsed)
+        HEDGE_POLICY.observe(f"deepseek:{self.deepseek_model}", elapsed)
+        if getattr(resp, "choices", None):
+            return _normalize_text(resp.choices[0].message.content)
+        return ""
+
+    def _deepseek_hedge_attempt_async(
+        self, system_prompt: str, user_prompt: str
+    ) -> list[tuple[str, Callable[[], Awaitable[str]]]]:
+        """DeepSeek as the last-resort hedge for Gemini, when configured and healthy."""
+
+        if self.deepseek_async_client is None:
+            return []
+
+        async def attempt() -> str:
+            if not PROVIDER_HEALTH.allow("deepseek", self.deepseek_model):
+                raise ProviderUnavailable("deepseek circuit is open")
+            return await self._deepseek_complete_async(system_prompt, user_prompt, temperature=0.15)
+
+        return [(f"deepseek:{self.deepseek_model}", attempt)]
+
+    def _gemini_prompts(
+        self,
+        scenario: str,
+        severity: str,
+        rag_context: str,
+        medical_context: dict[str, Any] | None = None,
+        web_context: tuple[str, list[str]] = ("", []),
+    ) -> tuple[str, dict[str, Any], str, str]:
+        if severity == "critical":
+            model_name = MODEL_ROUTER.choose(
+                "guidance_critical", self.critical_candidates, critical=True
+            )
+        else:
+            model_name = MODEL_ROUTER.choose("guidance_moderate", self.moderate_candidates)
         default = {
-            "guidance": (
-                "สถานการณ์นี้เป็นเหตุฉุกเฉิน\n"
-                "1. ประเมินความปลอดภัยของพื้นที่\n"
-                "2. โทร 1669 ทันที\n"
-                "3. ปฐมพยาบาลตามอาการเท่าที่ปลอดภัย\n"
-                "4. เฝ้าระวังอาการจนกว่าทีมแพทย์มาถึง"
-            ),
+            "guidance": EMERGENCY_FALLBACK_GUIDANCE,
             "facility_type": "hospital" if severity == "critical" else "clinic",
         }
         system_prompt = (
@@ -678,11 +1415,12 @@ class GuidanceAgent:
             "flag contraindications explicitly, and never fabricate advice."
         )
         medical_prompt = self._format_medical_context_prompt(medical_context)
-        web_context_prompt, _ = self._build_web_fallback_context(rag_context, medical_context)
+        web_context_prompt, _ = web_context
+        protocol_context = self._budgeted_context(scenario, rag_context, model_name)
         user_prompt = (
             f"Scenario: {scenario}\n"
             f"Severity: {severity}\n"
-            f"Retrieved medical protocol context:\n{rag_context}\n\n"
+            f"Retrieved medical protocol context:\n{protocol_context}\n\n"
         )
         if medical_prompt:
             user_prompt += f"{medical_prompt}\n\n"
@@ -698,29 +1436,323 @@ class GuidanceAgent:
             "mention the contraindication explicitly\n"
             "Output JSON only."
         )
+        return model_name, default, system_prompt, user_prompt
+
+    def _use_local(self, severity: str) -> bool:
+        # The self-hosted fine-tuned model takes non-critical traffic when configured;
+        # its open circuit, or an unusable answer, hands the request to DeepSeek/Gemini.
+        return (
+            severity != "critical"
+            and self.local_llm.enabled
+            and PROVIDER_HEALTH.allow("local", self.local_llm.model)
+        )
+
+    def _use_deepseek(self, severity: str) -> bool:
         # Moderate/non-critical: prefer DeepSeek when configured; otherwise Gemini
         # (same as critical).
         # Without this, missing DEEPSEEK_KEY caused only the static Thai default (generic 4 lines).
-        if severity != "critical" and self.deepseek_client is not None:
-            out = self._run_noncritical_deepseek(
-                scenario=scenario,
-                rag_context=rag_context,
-                medical_context=medical_context,
+        # A sick DeepSeek (open circuit) routes the moderate path to Gemini instead.
+        return (
+            severity != "critical"
+            and self.deepseek_client is not None
+            and PROVIDER_HEALTH.allow("deepseek", self.deepseek_model)
+        )
+
+    @staticmethod
+    def _finalize(out: dict[str, Any], default: dict[str, Any]) -> dict[str, Any]:
+        out["guidance"] = _normalize_text(out.get("guidance")) or default["guidance"]
+        facility = _normalize_text(out.get("facility_type", default["facility_type"])).lower()
+        out["facility_type"] = (
+            facility if facility in {"hospital", "clinic", "none"} else default["facility_type"]
+        )
+        return out
+
+    @staticmethod
+    def _cache_namespace(
+        severity: str, rag_context: str, medical_context: dict[str, Any] | None
+    ) -> tuple[str, str, str]:
+        conditions = sorted(GuidanceAgent._extract_relevant_conditions(medical_context))
+        fingerprint = hashlib.sha1("\n".join(conditions).encode("utf-8")).hexdigest()
+        # Near-duplicates share guidance when retrieval's best match is the same protocol;
+        # the exact context text (and the lower-ranked matches) shift with the wording.
+        protocols = matched_protocols(rag_context)
+        return severity, fingerprint, protocols[0] if protocols else ""
+
+    def _remember(
+        self, scenario: str, namespace: tuple[str, str, str], out: dict[str, Any]
+    ) -> None:
+        # Static fallbacks mean generation failed; the next request should retry it.
+        if out.get("guidance") not in (EMERGENCY_FALLBACK_GUIDANCE, NONCRITICAL_FALLBACK_GUIDANCE):
+            self.cache.put(scenario, namespace, dict(out))
+
+    def run(
+        self,
+        scenario: str,
+        severity: str,
+        rag_context: str,
+        medical_context: dict[str, Any] | None = None,
+    ) -> dict[str, Any]:
+        return _run_sync(self.run_async(scenario, severity, rag_context, medical_context))
+
+    @observe()
+    async def run_async(
+        self,
+        scenario: str,
+        severity: str,
+        rag_context: str,
+        medical_context: dict[str, Any] | None = None,
+    ) -> dict[str, Any]:
+        namespace = self._cache_namespace(severity, rag_context, medical_context)
+        cached = self.cache.get(scenario, namespace)
+        if cached is not None:
+            return dict(cached)
+        out = await self._generate_async(scenario, severity, rag_context, medical_context)
+        self._remember(scenario, namespace, out)
+        return out
+
+    async def _generate_async(
+        self,
+        scenario: str,
+        severity: str,
+        rag_context: str,
+        medical_context: dict[str, Any] | None = None,
+    ) -> dict[str, Any]:
+        noncritical_default = {
+            "guidance": NONCRITICAL_FALLBACK_GUIDANCE,
+            "facility_type": "clinic",
+        }
+        if self._use_local(severity):
+            out = await self._run_noncritical_local_async(scenario, rag_context, medical_context)
+            if out:
+                return self._finalize(out, noncritical_default)
+        if self._use_deepseek(severity):
+            out = await self._run_noncritical_deepseek_async(scenario, rag_context, medical_context)
+            return self._finalize(out, noncritical_default)
+        web_context = await self._build_web_fallback_context_async(rag_context, medical_context)
+        model_name, default, system_prompt, user_prompt = self._gemini_prompts(
+            scenario, severity, rag_context, medical_context, web_context=web_context
+        )
+        if HEDGE_POLICY.enabled_for(severity):
+            out = await self.llm.generate_json_hedged_async(
+                model_name=model_name,
+                system_prompt=system_prompt,
+                user_prompt=user_prompt,
+                default=default,
+                temperature=0.15,
+                extra_attempts=self._deepseek_hedge_attempt_async(system_prompt, user_prompt),
             )
         else:
-            out = self.llm.generate_json(
+            out = await self.llm.generate_json_async(
                 model_name=model_name,
                 system_prompt=system_prompt,
                 user_prompt=user_prompt,
                 default=default,
                 temperature=0.15,
             )
-        out["guidance"] = _normalize_text(out.get("guidance")) or default["guidance"]
-        facility = _normalize_text(out.get("facility_type", default["facility_type"])).lower()
-        out["facility_type"] = (
-            facility if facility in {"hospital", "clinic", "none"} else default["facility_type"]
+        return self._finalize(out, default)
+
+    def materialized(
+        self, protocol_match: dict[str, Any] | None, match_score: float, severity: str
+    ) -> dict[str, Any] | None:
+        """Pre-generated guidance for a confidently matched protocol; no LLM call."""
+
+        return self.store.lookup(protocol_match, match_score, severity)
+
+    def _fused_prompts(self, scenario: str, rag_context: str) -> tuple[bool, str, str, str]:
+        """(use DeepSeek, Gemini model, system prompt, user prompt) for the fused call."""
+
+        system_prompt = (
+            "You are the ByStander emergency triage and first-aid assistant (Thai). "
+            "Return strict JSON only with fields: is_emergency (bool), "
+            "severity (critical|moderate|none), facility_type (hospital|clinic|none), "
+            "reason_th (Thai), guidance (Thai). "
+            "Use retrieved protocol snippets as the highest-priority source and "
+            "never fabricate advice."
+        )
+        use_deepseek = self._use_deepseek("moderate")
+        model_name = MODEL_ROUTER.choose("guidance_moderate", self.moderate_candidates)
+        snippets = self._budgeted_context(
+            scenario, rag_context, self.deepseek_model if use_deepseek else model_name
+        )
+        user_prompt = (
+            f"Scenario: {scenario}\n\n"
+            f"Retrieved contexts (cleaned):\n{snippets}\n\n"
+            "Rules:\n"
+            "- If clearly non-emergency daily issue => is_emergency=false, severity=none, "
+            "facility_type=none, guidance empty\n"
+            "- If life-threatening => severity=critical, facility_type=hospital\n"
+            "- If emergency but not immediately life-threatening => moderate + clinic\n"
+            "- guidance: concise numbered Thai steps readable by a layperson; "
+            "if symptoms escalate, explicitly instruct to call 1669\n"
+            "Output JSON only."
+        )
+        return use_deepseek, model_name, system_prompt, user_prompt
+
+    @staticmethod
+    def _fused_result(out: dict[str, Any]) -> dict[str, Any]:
+        severity = _normalize_text(out.get("severity")).lower()
+        if severity not in {"critical", "moderate", "none"}:
+            return {}
+        guidance = _normalize_text(out.get("guidance"))
+        if severity != "none" and not guidance:
+            return {}
+        facility = _normalize_text(out.get("facility_type")).lower()
+        if facility not in {"hospital", "clinic", "none"}:
+            facility = {"critical": "hospital", "moderate": "clinic"}.get(severity, "none")
+        return {
+            "is_emergency": bool(out.get("is_emergency", severity != "none"))
+            and severity != "none",
+            "severity": severity,
+            "facility_type": facility,
+            "reason_th": _normalize_text(out.get("reason_th")),
+            "guidance": guidance,
+        }
+
+    def run_fused(self, scenario: str, rag_context: str) -> dict[str, Any]:
+        return _run_sync(self.run_fused_async(scenario, rag_context))
+
+    @observe()
+    async def run_fused_async(self, scenario: str, rag_context: str) -> dict[str, Any]:
+        """
+        Triage and guidance in one call for likely non-critical reports. Returns {} when
+        the output is unusable so the caller falls back to the two-stage path.
+        """
+
+        use_deepseek, model_name, system_prompt, user_prompt = self._fused_prompts(
+            scenario, rag_context
+        )
+        out: dict[str, Any] = {}
+        if use_deepseek:
+            try:
+                content = await self._deepseek_complete_async(
+                    system_prompt, user_prompt, temperature=0.1
+                )
+                out = _parse_json_fallback(content, {})
+            except Exception as exc:
+                record_exception(exc)
+        if not out:
+            out = await self.llm.generate_json_async(
+                model_name=model_name,
+                system_prompt=system_prompt,
+                user_prompt=user_prompt,
+                default={},
+                temperature=0.1,
+            )
+        return self._fused_result(out)
+
+    def stream(
+        self,
+        scenario: str,
+        severity: str,
+        rag_context: str,
+        medical_context: dict[str, Any] | None = None,
+    ) -> Iterator[dict[str, Any]]:
+        """
+        Streaming variant of `run`: yields {"type": "step", "index", "text"} as each
+        guidance line completes in the partial JSON, then {"type": "final", ...} with
+        the same validated fields `run` returns. If streaming fails before any step was
+        produced, the blocking call answers instead (no hedging on this path).
+        """
+
+        namespace = self._cache_namespace(severity, rag_context, medical_context)
+        cached = self.cache.get(scenario, namespace)
+        if cached is not None:
+            for index, step in enumerate(split_guidance_steps(cached["guidance"]), start=1):
+                yield {"type": "step", "index": index, "text": step}
+            yield {"type": "final", **cached}
+            return
+        if self._use_local(severity):
+            # No token streaming from the batched local backend; its answer arrives whole.
+            out = _run_sync(
+                self._run_noncritical_local_async(scenario, rag_context, medical_context)
+            )
+            if out:
+                default = {"guidance": NONCRITICAL_FALLBACK_GUIDANCE, "facility_type": "clinic"}
+                out = self._finalize(out, default)
+                for index, step in enumerate(split_guidance_steps(out["guidance"]), start=1):
+                    yield {"type": "step", "index": index, "text": step}
+                self._remember(scenario, namespace, out)
+                yield {"type": "final", **out}
+                return
+        web_context = self._build_web_fallback_context(rag_context, medical_context)
+        if self._use_deepseek(severity):
+            default, system_prompt, user_prompt = self._deepseek_prompts(
+                scenario, rag_context, medical_context, web_context=web_context
+            )
+            chunks = self._deepseek_stream(system_prompt, user_prompt, temperature=0.1)
+
+            def blocking() -> dict[str, Any]:
+                text = _run_sync(
+                    self._deepseek_complete_async(system_prompt, user_prompt, temperature=0.1)
+                )
+                return _parse_json_fallback(text, default)
+
+        else:
+            model_name, default, system_prompt, user_prompt = self._gemini_prompts(
+                scenario, severity, rag_context, medical_context, web_context=web_context
+            )
+            chunks = self.llm.stream_json_text(
+                model_name=model_name,
+                system_prompt=system_prompt,
+                user_prompt=user_prompt,
+                temperature=0.15,
+            )
+
+            def blocking() -> dict[str, Any]:
+                return self.llm.generate_json(
+                    model_name=model_name,
+                    system_prompt=system_prompt,
+                    user_prompt=user_prompt,
+                    default=default,
+                    temperature=0.15,
+                )
+
+        parser = GuidanceStreamParser()
+        index = 0
+        try:
+            for chunk in chunks:
+                raise_if_cancelled()
+                for step in parser.feed(chunk):
+                    index += 1
+                    yield {"type": "step", "index": index, "text": step}
+        except RequestCancelled:
+            raise
+        except Exception as exc:
+            record_exception(exc)
+        steps = parser.close()
+        if index == 0 and not steps:
+            # Nothing usable was streamed (provider error, or no guidance field).
+            try:
+                out = blocking()
+            except Exception as exc:
+                record_exception(exc)
+                out = dict(default)
+            out = self._finalize(out, default)
+            steps = split_guidance_steps(out["guidance"])
+        else:
+            out = _parse_json_fallback(parser.raw, {})
+            # A stream cut short still keeps the steps already on screen.
+            out.setdefault("guidance", parser.guidance)
+            out = self._finalize(out, default)
+        for step in steps:
+            index += 1
+            yield {"type": "step", "index": index, "text": step}
+        self._remember(scenario, namespace, out)
+        yield {"type": "final", **out}
+
+    def _deepseek_stream(
+        self, system_prompt: str, user_prompt: str, temperature: float = 0.1
+    ) -> Iterator[str]:
+        if self.deepseek_client is None:
+            raise ProviderUnavailable("DeepSeek client is unavailable")
+        yield from _stream_openai_compatible(
+            self.deepseek_client,
+            provider="deepseek",
+            model_name=self.deepseek_model,
+            system_prompt=system_prompt,
+            user_prompt=user_prompt,
+            temperature=temperature,
         )
-        return out
 
 
 class ScriptAgent:
@@ -729,12 +1761,65 @@ class ScriptAgent:
     def __init__(self, llm: GeminiJSONAgent) -> None:
         self.llm = llm
         self.model_name = _normalize_text(os.getenv("SCRIPT_MODEL")) or "gemini-2.5-flash"
+        self.model_candidates = _model_pool("SCRIPT_MODEL", self.model_name)
+        self.templates = ScriptTemplateStore()
 
     @staticmethod
     def _format_medical_history(history: list[str] | None) -> str:
         items = [_normalize_text(x) for x in (history or []) if _normalize_text(x)]
         return ", ".join(items)
 
+    def template_for(
+        self, protocol_match: dict[str, Any] | None, match_score: float, severity: str
+    ) -> str | None:
+        """Pre-generated script template for a confidently matched protocol; no LLM call."""
+
+        return self.templates.lookup(protocol_match, match_score, severity)
+
+    def fill_template(
+        self,
+        template: str,
+        scenario_summary: str,
+        user_profile: dict[str, Any],
+        location_context: str = "",
+        caller_profile: dict[str, Any] | None = None,
+        patient_relationship: str = "",
+        patient_medical_history: list[str] | None = None,
+    ) -> str:
+        slots = call_script_slots(
+            scenario_summary,
+            user_profile,
+            location_context,
+            caller_profile,
+            patient_relationship,
+            patient_medical_history,
+        )
+        return self.templates.render(template, slots)
+
+    @staticmethod
+    def summary_needed(scenario: str) -> bool:
+        return len(_normalize_text(scenario)) > SUMMARY_MAX_CHARS
+
+    @observe()
+    async def summarize_scenario_async(self, scenario: str) -> str:
+        """One spoken sentence for the operator, for the {scenario} slot of a template."""
+
+        scenario = _normalize_text(scenario)
+        default = {"summary": scenario[:SUMMARY_MAX_CHARS]}
+        out = await self.llm.generate_json_async(
+            model_name=MODEL_ROUTER.choose("script", self.model_candidates),
+            system_prompt=(
+                "You summarize emergency reports in Thai for an emergency operator. "
+                "Write one short spoken sentence: what happened and the patient's main "
+                "symptoms. Never add details that are not in the report. "
+                "Output JSON only with key: summary."
+            ),
+            user_prompt=f"Report: {scenario}",
+            default=default,
+            temperature=0.0,
+        )
+        return _normalize_text(out.get("summary")) or default["summary"]
+
     def _build_user_prompt(
         self,
         scenario: str,
@@ -794,20 +1879,19 @@ class ScriptAgent:
             "- Keep it short, urgent, and easy to read out loud."
         )
 
-    @observe()
-    def run(
+    def _prompts(
         self,
         scenario: str,
         guidance: str,
         user_profile: dict[str, Any],
-        location_context: str = "",
-        latitude: float | None = None,
-        longitude: float | None = None,
-        caller_profile: dict[str, Any] | None = None,
-        patient_relationship: str = "",
-        patient_pronoun: str = "",
-        patient_medical_history: list[str] | None = None,
-    ) -> str:
+        location_context: str,
+        latitude: float | None,
+        longitude: float | None,
+        caller_profile: dict[str, Any] | None,
+        patient_relationship: str,
+        patient_pronoun: str,
+        patient_medical_history: list[str] | None,
+    ) -> tuple[dict[str, Any], str, str]:
         default = {
             "call_script": (
                 "1) ตั้งสติ และโทรแจ้ง 1669\n"
@@ -861,8 +1945,64 @@ class ScriptAgent:
             patient_pronoun=patient_pronoun,
             patient_medical_history=patient_medical_history,
         )
-        out = self.llm.generate_json(
-            model_name=self.model_name,
+        return default, system_prompt, user_prompt
+
+    def run(
+        self,
+        scenario: str,
+        guidance: str,
+        user_profile: dict[str, Any],
+        location_context: str = "",
+        latitude: float | None = None,
+        longitude: float | None = None,
+        caller_profile: dict[str, Any] | None = None,
+        patient_relationship: str = "",
+        patient_pronoun: str = "",
+        patient_medical_history: list[str] | None = None,
+    ) -> str:
+        return _run_sync(
+            self.run_async(
+                scenario,
+                guidance,
+                user_profile,
+                location_context,
+                latitude,
+                longitude,
+                caller_profile,
+                patient_relationship,
+                patient_pronoun,
+                patient_medical_history,
+            )
+        )
+
+    @observe()
+    async def run_async(
+        self,
+        scenario: str,
+        guidance: str,
+        user_profile: dict[str, Any],
+        location_context: str = "",
+        latitude: float | None = None,
+        longitude: float | None = None,
+        caller_profile: dict[str, Any] | None = None,
+        patient_relationship: str = "",
+        patient_pronoun: str = "",
+        patient_medical_history: list[str] | None = None,
+    ) -> str:
+        default, system_prompt, user_prompt = self._prompts(
+            scenario,
+            guidance,
+            user_profile,
+            location_context,
+            latitude,
+            longitude,
+            caller_profile,
+            patient_relationship,
+            patient_pronoun,
+            patient_medical_history,
+        )
+        out = await self.llm.generate_json_async(
+            model_name=MODEL_ROUTER.choose("script", self.model_candidates),
             system_prompt=system_prompt,
             user_prompt=user_prompt,
             default=default,
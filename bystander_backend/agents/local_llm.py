@@ -0,0 +1,280 @@
+import asyncio
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Any
+
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+except Exception:  # pragma: no cover
+    requests = None
+    HTTPAdapter = None
+
+if __package__:
+    from .config import env_float
+    from .deadline import remaining_timeout
+    from .provider_health import PROVIDER_HEALTH, ProviderUnavailable
+else:  # pragma: no cover
+    from config import env_float
+    from deadline import remaining_timeout
+    from provider_health import PROVIDER_HEALTH, ProviderUnavailable
+
+PROVIDER = "local"
+DEFAULT_MODEL = "bystander-typhoon2-1b"
+# Prompt format the model was fine-tuned on (ml/finetuning/finetune.py).
+LLAMA3_STOP = "<|eot_id|>"
+
+
+def render_llama3_chat(system_prompt: str, user_prompt: str) -> str:
+    return (
+        "<|begin_of_text|><|start_header_id|>system<|end_header_id|>\n\n"
+        f"{system_prompt}<|eot_id|><|start_header_id|>user<|end_header_id|>\n\n"
+        f"{user_prompt}<|eot_id|><|start_header_id|>assistant<|end_header_id|>\n\n"
+    )
+
+
+class _Pending:
+    __slots__ = ("system_prompt", "user_prompt", "temperature", "max_tokens", "timeout", "future")
+
+    def __init__(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        temperature: float,
+        max_tokens: int,
+        timeout: float,
+    ) -> None:
+        self.system_prompt = system_prompt
+        self.user_prompt = user_prompt
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.timeout = timeout
+        self.future: Future = Future()
+
+
+class LocalLLMBackend:
+    """
+    Client for a self-hosted OpenAI-compatible server (llama.cpp `llama-server`, vLLM)
+    serving the fine-tuned Typhoon model, used for non-critical guidance.
+
+    Enabled by LOCAL_LLM_BASE_URL. Concurrent calls are micro-batched: the first call
+    waits up to LOCAL_LLM_BATCH_WINDOW_MS for others, and up to LOCAL_LLM_MAX_BATCH
+    prompts with the same sampling settings go out as one /v1/completions request
+    (prompt list, rendered with the Llama 3 chat template the model was trained on).
+    Up to LOCAL_LLM_POOL_SIZE batches run at once over a pooled keep-alive session.
+    LOCAL_LLM_TEMPLATE=server sends unbatched /v1/chat/completions instead, for
+    servers that apply their own chat template.
+    """
+
+    def __init__(
+        self,
+        base_url: str | None = None,
+        model: str | None = None,
+        max_batch: int | None = None,
+        batch_window_ms: float | None = None,
+        pool_size: int | None = None,
+        template: str | None = None,
+        call_timeout_sec: float | None = None,
+    ) -> None:
+        self.base_url = (
+            (base_url if base_url is not None else str(os.getenv("LOCAL_LLM_BASE_URL") or ""))
+            .strip()
+            .rstrip("/")
+        )
+        if self.base_url.endswith("/v1"):
+            self.base_url = self.base_url[: -len("/v1")]
+        self.model = model or str(os.getenv("LOCAL_LLM_MODEL") or "").strip() or DEFAULT_MODEL
+        self.template = (
+            template or str(os.getenv("LOCAL_LLM_TEMPLATE") or "").strip().lower() or "llama3"
+        )
+        self.max_batch = max(
+            1, int(max_batch if max_batch is not None else env_float("LOCAL_LLM_MAX_BATCH", 8))
+        )
+        if self.template != "llama3":
+            self.max_batch = 1
+        self.batch_window_sec = (
+            batch_window_ms
+            if batch_window_ms is not None
+            else env_float("LOCAL_LLM_BATCH_WINDOW_MS", 10.0)
+        ) / 1000.0
+        self.pool_size = max(
+            1, int(pool_size if pool_size is not None else env_float("LOCAL_LLM_POOL_SIZE", 4))
+        )
+        self.call_timeout_sec = (
+            call_timeout_sec
+            if call_timeout_sec is not None
+            else env_float("LOCAL_LLM_TIMEOUT_SEC", 20.0)
+        )
+        self.enabled = bool(self.base_url) and requests is not None
+        self._lock = threading.Lock()
+        self._queue: queue.Queue[_Pending] = queue.Queue()
+        self._session: Any = None
+        self._executor: ThreadPoolExecutor | None = None
+        self._dispatcher: threading.Thread | None = None
+        self._requests = 0
+        self._batches = 0
+        self._batched_prompts = 0
+        self._max_batch_seen = 0
+        self._failures = 0
+
+    def _start_locked(self) -> None:
+        if self._dispatcher is not None:
+            return
+        session = requests.Session()
+        # One keep-alive connection per concurrent batch.
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        self._session = session
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.pool_size, thread_name_prefix="bystander-local-llm"
+        )
+        self._dispatcher = threading.Thread(
+            target=self._dispatch_loop, name="bystander-local-llm-batcher", daemon=True
+        )
+        self._dispatcher.start()
+
+    def complete(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        temperature: float = 0.1,
+        max_tokens: int = 700,
+    ) -> str:
+        """Completion text for one chat turn; raises on failure or timeout."""
+
+        pending = self._enqueue(system_prompt, user_prompt, temperature, max_tokens)
+        try:
+            return pending.future.result(timeout=pending.timeout)
+        except FutureTimeout as exc:
+            # Still batched if not yet sent; the server result is then dropped.
+            pending.future.cancel()
+            raise TimeoutError(f"local LLM did not answer within {pending.timeout:.1f}s") from exc
+
+    async def complete_async(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        temperature: float = 0.1,
+        max_tokens: int = 700,
+    ) -> str:
+        pending = self._enqueue(system_prompt, user_prompt, temperature, max_tokens)
+        # A cancelled or timed-out waiter cancels the future, dropping it from its batch
+        # if that has not been sent yet.
+        return await asyncio.wait_for(asyncio.wrap_future(pending.future), pending.timeout)
+
+    def _enqueue(
+        self, system_prompt: str, user_prompt: str, temperature: float, max_tokens: int
+    ) -> _Pending:
+        if not self.enabled:
+            raise ProviderUnavailable("local LLM is not configured")
+        timeout = remaining_timeout(self.call_timeout_sec)
+        pending = _Pending(system_prompt, user_prompt, temperature, max_tokens, timeout)
+        with self._lock:
+            self._start_locked()
+            self._requests += 1
+        self._queue.put(pending)
+        return pending
+
+    def _dispatch_loop(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            closes_at = time.monotonic() + self.batch_window_sec
+            while len(batch) < self.max_batch:
+                left = closes_at - time.monotonic()
+                if left <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=left))
+                except queue.Empty:
+                    break
+            groups: dict[tuple[float, int], list[_Pending]] = {}
+            for pending in batch:
+                if pending.future.set_running_or_notify_cancel():
+                    groups.setdefault((pending.temperature, pending.max_tokens), []).append(pending)
+            for group in groups.values():
+                self._executor.submit(self._send, group)
+
+    def _send(self, group: list[_Pending]) -> None:
+        started = time.perf_counter()
+        try:
+            texts = self._post(group)
+        except Exception as exc:
+            PROVIDER_HEALTH.record_failure(PROVIDER, self.model, exc)
+            with self._lock:
+                self._failures += 1
+            for pending in group:
+                pending.future.set_exception(exc)
+            return
+        PROVIDER_HEALTH.record_success(PROVIDER, self.model, time.perf_counter() - started)
+        with self._lock:
+            self._batches += 1
+            self._batched_prompts += len(group)
+            self._max_batch_seen = max(self._max_batch_seen, len(group))
+        for pending, text in zip(group, texts, strict=True):
+            pending.future.set_result(text)
+
+    def _post(self, group: list[_Pending]) -> list[str]:
+        first = group[0]
+        timeout = max(pending.timeout for pending in group)
+        if self.template != "llama3":
+            body: dict[str, Any] = {
+                "model": self.model,
+                "messages": [
+                    {"role": "system", "content": first.system_prompt},
+                    {"role": "user", "content": first.user_prompt},
+                ],
+                "temperature": first.temperature,
+                "max_tokens": first.max_tokens,
+            }
+            resp = self._session.post(
+                f"{self.base_url}/v1/chat/completions", json=body, timeout=timeout
+            )
+            resp.raise_for_status()
+            choices = resp.json().get("choices") or []
+            message = (choices[0].get("message") or {}) if choices else {}
+            return [str(message.get("content") or "").strip()]
+
+        prompts = [render_llama3_chat(p.system_prompt, p.user_prompt) for p in group]
+        body = {
+            "model": self.model,
+            "prompt": prompts if len(prompts) > 1 else prompts[0],
+            "temperature": first.temperature,
+            "max_tokens": first.max_tokens,
+            "stop": [LLAMA3_STOP],
+        }
+        resp = self._session.post(f"{self.base_url}/v1/completions", json=body, timeout=timeout)
+        resp.raise_for_status()
+        choices = resp.json().get("choices") or []
+        if len(choices) != len(prompts):
+            raise ValueError(
+                f"local LLM returned {len(choices)} choices for {len(prompts)} prompts"
+            )
+        texts = [""] * len(prompts)
+        for position, choice in enumerate(choices):
+            index = choice.get("index")
+            index = index if isinstance(index, int) and 0 <= index < len(prompts) else position
+            texts[index] = str(choice.get("text") or "").strip()
+        return texts
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "model": self.model,
+                "template": self.template,
+                "max_batch": self.max_batch,
+                "pool_size": self.pool_size,
+                "requests": self._requests,
+                "batches": self._batches,
+                "failures": self._failures,
+                "avg_batch": (
+                    round(self._batched_prompts / self._batches, 2) if self._batches else 0.0
+                ),
+                "max_batch_seen": self._max_batch_seen,
+                "queued": self._queue.qsize(),
+            }
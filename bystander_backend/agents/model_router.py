@@ -0,0 +1,189 @@
+import math
+import threading
+import time
+from collections import deque
+from typing import Any
+
+if __package__:
+    from .config import env_float
+    from .deadline import current_deadline
+else:  # pragma: no cover
+    from config import env_float
+    from deadline import current_deadline
+
+
+# Latency a model must keep (p95, seconds) to stay the preferred choice of a tier.
+TIER_SLO_SEC = {
+    "triage": 4.0,
+    "guidance_critical": 6.0,
+    "guidance_moderate": 8.0,
+    "script": 8.0,
+}
+
+
+def _percentile(ordered: list[float], q: float) -> float:
+    rank = max(1, math.ceil((q / 100.0) * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class _ModelStats:
+    __slots__ = ("samples",)
+
+    def __init__(self, window: int) -> None:
+        # (monotonic time, latency seconds, ok)
+        self.samples: deque[tuple[float, float, bool]] = deque(maxlen=window)
+
+    def recent(self, now: float, horizon_sec: float) -> list[tuple[float, float, bool]]:
+        while self.samples and now - self.samples[0][0] > horizon_sec:
+            self.samples.popleft()
+        return list(self.samples)
+
+
+class ModelRouter:
+    """
+    Picks the model for each LLM call from a tier's candidate list (most preferred
+    first) using rolling latency and error rates of recent calls.
+
+    A tier sticks with its current model while that model is healthy: error rate
+    under MODEL_ROUTER_MAX_ERROR_RATE and p95 within the tier's SLO. When it
+    degrades, the tier moves to the first healthy candidate; it only moves back up
+    the list after MODEL_ROUTER_STICKY_SEC, so one good or bad sample does not flap
+    it. Samples older than MODEL_ROUTER_HORIZON_SEC are forgotten, which turns a
+    model that has been routed around back into "unknown" and so eligible again.
+    Per call, a model whose expected latency (p95 for critical, p50 otherwise) does
+    not fit the request's remaining deadline gives way to the fastest healthy one.
+    """
+
+    def __init__(
+        self,
+        window: int = 128,
+        horizon_sec: float | None = None,
+        min_samples: int | None = None,
+        max_error_rate: float | None = None,
+        sticky_sec: float | None = None,
+        slo_sec: dict[str, float] | None = None,
+    ) -> None:
+        self.window = window
+        self.horizon_sec = (
+            horizon_sec if horizon_sec is not None else env_float("MODEL_ROUTER_HORIZON_SEC", 120.0)
+        )
+        self.min_samples = int(
+            min_samples if min_samples is not None else env_float("MODEL_ROUTER_MIN_SAMPLES", 5)
+        )
+        self.max_error_rate = (
+            max_error_rate
+            if max_error_rate is not None
+            else env_float("MODEL_ROUTER_MAX_ERROR_RATE", 0.3)
+        )
+        self.sticky_sec = (
+            sticky_sec if sticky_sec is not None else env_float("MODEL_ROUTER_STICKY_SEC", 60.0)
+        )
+        self.slo_sec = dict(TIER_SLO_SEC)
+        self.slo_sec.update(slo_sec or {})
+        self._lock = threading.Lock()
+        self._models: dict[str, _ModelStats] = {}
+        self._providers: dict[tuple[str, str], _ModelStats] = {}
+        self._current: dict[str, tuple[str, float]] = {}
+        self._switches: dict[str, int] = {}
+        self._deadline_overrides = 0
+
+    def observe(self, provider: str, model: str, seconds: float, ok: bool) -> None:
+        sample = (time.monotonic(), max(0.0, float(seconds)), bool(ok))
+        with self._lock:
+            for stats_map, key in ((self._models, model), (self._providers, (provider, model))):
+                stats = stats_map.get(key)
+                if stats is None:
+                    stats = _ModelStats(self.window)
+                    stats_map[key] = stats
+                stats.samples.append(sample)
+
+    def _summary_locked(self, stats: _ModelStats | None, now: float) -> dict[str, Any]:
+        samples = stats.recent(now, self.horizon_sec) if stats is not None else []
+        latencies = sorted(latency for _, latency, ok in samples if ok)
+        errors = sum(1 for _, _, ok in samples if not ok)
+        return {
+            "samples": len(samples),
+            "error_rate": errors / len(samples) if samples else 0.0,
+            "p50": _percentile(latencies, 50) if latencies else None,
+            "p95": _percentile(latencies, 95) if latencies else None,
+        }
+
+    def _healthy(self, summary: dict[str, Any], tier: str) -> bool:
+        if summary["samples"] < self.min_samples:
+            return True
+        if summary["error_rate"] > self.max_error_rate:
+            return False
+        p95 = summary["p95"]
+        return p95 is None or p95 <= self.slo_sec.get(tier, 8.0)
+
+    def choose(self, tier: str, candidates: list[str], critical: bool = False) -> str:
+        if len(candidates) <= 1:
+            return candidates[0] if candidates else ""
+        now = time.monotonic()
+        with self._lock:
+            summaries = {
+                model: self._summary_locked(self._models.get(model), now) for model in candidates
+            }
+            healthy = [model for model in candidates if self._healthy(summaries[model], tier)]
+            current, since = self._current.get(tier, (candidates[0], now))
+            if current not in candidates:
+                current, since = candidates[0], now
+            chosen = current
+            if current not in healthy:
+                chosen = (
+                    healthy[0]
+                    if healthy
+                    else min(candidates, key=lambda model: summaries[model]["error_rate"])
+                )
+            elif healthy[0] != current and now - since >= self.sticky_sec:
+                chosen = healthy[0]
+            if chosen != current:
+                self._switches[tier] = self._switches.get(tier, 0) + 1
+                since = now
+            self._current[tier] = (chosen, since)
+
+            deadline = current_deadline()
+            if deadline is None:
+                return chosen
+            budget = deadline.remaining()
+            key = "p95" if critical else "p50"
+
+            def expected(model: str) -> float:
+                value = summaries[model][key]
+                return value if value is not None else 0.0
+
+            if expected(chosen) <= budget:
+                return chosen
+            # Only models with measured latency qualify; an unknown one may be slower.
+            measured = [model for model in healthy if summaries[model][key] is not None]
+            fitting = [model for model in measured if expected(model) <= budget]
+            faster = min(fitting or measured or [chosen], key=expected)
+            if faster != chosen:
+                self._deadline_overrides += 1
+            return faster
+
+    def snapshot(self) -> dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+
+            def fmt(summary: dict[str, Any]) -> dict[str, Any]:
+                return {
+                    "samples": summary["samples"],
+                    "error_rate": round(summary["error_rate"], 3),
+                    "p50_ms": round(summary["p50"] * 1000, 1) if summary["p50"] else None,
+                    "p95_ms": round(summary["p95"] * 1000, 1) if summary["p95"] else None,
+                }
+
+            return {
+                "current": {tier: model for tier, (model, _) in self._current.items()},
+                "switches": dict(self._switches),
+                "deadline_overrides": self._deadline_overrides,
+                "models": {
+                    f"{provider}:{model}": fmt(self._summary_locked(stats, now))
+                    for (provider, model), stats in self._providers.items()
+                },
+            }
+
+
+# Shared by every agent so a degraded model is routed around by all of them at once.
+MODEL_ROUTER = ModelRouter()
@@ -0,0 +1,219 @@
+import threading
+import time
+from collections import deque
+from typing import Any
+
+if __package__:
+    from .config import env_float
+else:  # pragma: no cover
+    from config import env_float
+
+
+class ProviderUnavailable(RuntimeError):
+    """Raised instead of calling a provider whose circuit is open."""
+
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class _Circuit:
+    __slots__ = (
+        "outcomes",
+        "state",
+        "opened_at",
+        "probe_in_flight",
+        "probe_started",
+        "consecutive_failures",
+        "successes",
+        "failures",
+        "skipped",
+        "last_error",
+        "avg_latency_sec",
+    )
+
+    def __init__(self, window: int) -> None:
+        self.outcomes: deque[bool] = deque(maxlen=window)
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.probe_started = 0.0
+        self.consecutive_failures = 0
+        self.successes = 0
+        self.failures = 0
+        self.skipped = 0
+        self.last_error = ""
+        self.avg_latency_sec: float | None = None
+
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return sum(1 for ok in self.outcomes if not ok) / len(self.outcomes)
+
+
+class ProviderHealth:
+    """
+    Error rates and circuit breakers per (provider, model), shared by every LLM agent in
+    the worker.
+
+    A circuit opens after PROVIDER_CONSECUTIVE_FAILURES failures in a row, or when the
+    error rate over the last PROVIDER_HEALTH_WINDOW calls reaches PROVIDER_FAILURE_RATE.
+    Open circuits are skipped for PROVIDER_COOLDOWN_SEC, then one probe call is let
+    through (half-open): success closes the circuit, failure re-opens it.
+    """
+
+    def __init__(
+        self,
+        window: int | None = None,
+        failure_rate: float | None = None,
+        min_calls: int | None = None,
+        consecutive_failures: int | None = None,
+        cooldown_sec: float | None = None,
+    ) -> None:
+        self.window = int(window if window is not None else env_float("PROVIDER_HEALTH_WINDOW", 20))
+        self.failure_rate = float(
+            failure_rate if failure_rate is not None else env_float("PROVIDER_FAILURE_RATE", 0.5)
+        )
+        self.min_calls = int(
+            min_calls if min_calls is not None else env_float("PROVIDER_MIN_CALLS", 5)
+        )
+        self.consecutive_failures = int(
+            consecutive_failures
+            if consecutive_failures is not None
+            else env_float("PROVIDER_CONSECUTIVE_FAILURES", 3)
+        )
+        self.cooldown_sec = float(
+            cooldown_sec if cooldown_sec is not None else env_float("PROVIDER_COOLDOWN_SEC", 30.0)
+        )
+        self._lock = threading.Lock()
+        self._circuits: dict[tuple[str, str], _Circuit] = {}
+
+    def _circuit_locked(self, provider: str, model: str) -> _Circuit:
+        key = (provider, model)
+        circuit = self._circuits.get(key)
+        if circuit is None:
+            circuit = _Circuit(max(1, self.window))
+            self._circuits[key] = circuit
+        return circuit
+
+    def _refresh_locked(self, circuit: _Circuit, now: float) -> str:
+        if circuit.state == OPEN and now - circuit.opened_at >= self.cooldown_sec:
+            circuit.state = HALF_OPEN
+            circuit.probe_in_flight = False
+        if (
+            circuit.state == HALF_OPEN
+            and circuit.probe_in_flight
+            and now - circuit.probe_started >= self.cooldown_sec
+        ):
+            # The probe never reported back (e.g. its request was cancelled).
+            circuit.probe_in_flight = False
+        return circuit.state
+
+    def allow(self, provider: str, model: str) -> bool:
+        """Claim an attempt; a half-open circuit lets exactly one probe through."""
+
+        with self._lock:
+            circuit = self._circuit_locked(provider, model)
+            now = time.monotonic()
+            state = self._refresh_locked(circuit, now)
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not circuit.probe_in_flight:
+                circuit.probe_in_flight = True
+                circuit.probe_started = now
+                return True
+            circuit.skipped += 1
+            return False
+
+    def order(self, route: list[tuple[str, str]]) -> list[tuple[str, str]]:
+        """
+        Reorder a (provider, model) route: healthy circuits first in their configured
+        order, then circuits due for a probe; open ones are dropped. When every circuit
+        is open, the one that opened first is made due for a probe rather than giving up.
+        Callers still claim each attempt with `allow`.
+        """
+
+        now = time.monotonic()
+        healthy: list[tuple[str, str]] = []
+        probes: list[tuple[str, str]] = []
+        with self._lock:
+            circuits = [(item, self._circuit_locked(*item)) for item in route]
+            for item, circuit in circuits:
+                state = self._refresh_locked(circuit, now)
+                if state == CLOSED:
+                    healthy.append(item)
+                elif state == HALF_OPEN and not circuit.probe_in_flight:
+                    probes.append(item)
+            if healthy or probes or not circuits:
+                return healthy + probes
+            item, circuit = min(circuits, key=lambda pair: pair[1].opened_at)
+            if circuit.state == OPEN:
+                circuit.state = HALF_OPEN
+                circuit.probe_in_flight = False
+            return [item]
+
+    def record_success(self, provider: str, model: str, latency_sec: float | None = None) -> None:
+        with self._lock:
+            circuit = self._circuit_locked(provider, model)
+            if circuit.state != CLOSED:
+                # Recovered: start a fresh window instead of re-tripping on old errors.
+                circuit.outcomes.clear()
+            circuit.outcomes.append(True)
+            circuit.successes += 1
+            circuit.consecutive_failures = 0
+            circuit.state = CLOSED
+            circuit.probe_in_flight = False
+            if latency_sec is not None:
+                circuit.avg_latency_sec = (
+                    latency_sec
+                    if circuit.avg_latency_sec is None
+                    else 0.8 * circuit.avg_latency_sec + 0.2 * latency_sec
+                )
+
+    def record_inconclusive(self, provider: str, model: str) -> None:
+        """An attempt the caller cut short: frees a half-open probe without scoring it."""
+
+        with self._lock:
+            self._circuit_locked(provider, model).probe_in_flight = False
+
+    def record_failure(self, provider: str, model: str, error: Any = None) -> None:
+        with self._lock:
+            circuit = self._circuit_locked(provider, model)
+            circuit.outcomes.append(False)
+            circuit.failures += 1
+            circuit.consecutive_failures += 1
+            circuit.probe_in_flight = False
+            if error is not None:
+                circuit.last_error = str(error)[:200]
+            tripped = circuit.consecutive_failures >= self.consecutive_failures or (
+                len(circuit.outcomes) >= self.min_calls
+                and circuit.error_rate() >= self.failure_rate
+            )
+            if circuit.state == HALF_OPEN or tripped:
+                circuit.state = OPEN
+                circuit.opened_at = time.monotonic()
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                f"{provider}:{model}": {
+                    "state": circuit.state,
+                    "error_rate": round(circuit.error_rate(), 3),
+                    "window": len(circuit.outcomes),
+                    "successes": circuit.successes,
+                    "failures": circuit.failures,
+                    "skipped": circuit.skipped,
+                    "avg_latency_ms": (
+                        round(circuit.avg_latency_sec * 1000.0, 1)
+                        if circuit.avg_latency_sec is not None
+                        else None
+                    ),
+                    "last_error": circuit.last_error,
+                }
+                for (provider, model), circuit in self._circuits.items()
+            }
+
+
+# Shared by Gemini, OpenAI and DeepSeek callers so every agent sees the same health.
+PROVIDER_HEALTH = ProviderHealth()
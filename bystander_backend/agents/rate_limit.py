@@ -0,0 +1,358 @@
+import asyncio
+import contextlib
+import random
+import threading
+import time
+from collections.abc import AsyncIterator, Iterator
+from typing import Any
+
+if __package__:
+    from .config import env_float
+    from .context_budget import estimate_tokens
+    from .deadline import current_deadline
+    from .provider_health import ProviderUnavailable
+else:  # pragma: no cover
+    from config import env_float
+    from context_budget import estimate_tokens
+    from deadline import current_deadline
+    from provider_health import ProviderUnavailable
+
+
+REQUEST = "request"
+BACKGROUND = "background"
+
+# Provider labels used by the agents, grouped by the quota they draw from.
+QUOTAS = {
+    "vertex": "gemini",
+    "genai": "gemini",
+    "openai-responses": "openai",
+    "openai-chat": "openai",
+    "deepseek": "deepseek",
+}
+
+# Output tokens charged up front per call, on top of the estimated prompt.
+OUTPUT_TOKENS_ESTIMATE = 600
+
+# How often an async caller re-checks a quota it is waiting on for a free slot.
+ASYNC_POLL_SEC = 0.05
+
+
+def quota_for(provider: str) -> str:
+    return QUOTAS.get(provider, provider)
+
+
+def estimate_call_tokens(*prompts: str) -> int:
+    return sum(estimate_tokens(str(prompt or "")) for prompt in prompts) + OUTPUT_TOKENS_ESTIMATE
+
+
+def is_rate_limit_error(exc: BaseException) -> bool:
+    for attr in ("status_code", "code", "status"):
+        if str(getattr(exc, attr, "") or "") in {"429", "RESOURCE_EXHAUSTED"}:
+            return True
+    response = getattr(exc, "response", None)
+    if str(getattr(response, "status_code", "") or "") == "429":
+        return True
+    text = str(exc).lower()
+    return "429" in text or "resource_exhausted" in text or "rate limit" in text
+
+
+def _retry_after(exc: BaseException) -> float | None:
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        value = float(headers.get("retry-after"))
+    except Exception:
+        return None
+    return value if value >= 0 else None
+
+
+class RateLimited(ProviderUnavailable):
+    """Raised instead of calling a provider whose quota has no room before the deadline."""
+
+
+class _Bucket:
+    __slots__ = ("rate", "capacity", "level", "updated")
+
+    def __init__(self, per_minute: float) -> None:
+        self.rate = per_minute / 60.0
+        self.capacity = per_minute
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_for(self, amount: float, floor: float) -> float:
+        """Seconds until `amount` can be taken while leaving `floor`; 0 if now."""
+
+        if self.rate <= 0:
+            return 0.0
+        need = min(amount + floor, self.capacity)
+        if self.level >= need:
+            return 0.0
+        return (need - self.level) / self.rate
+
+
+class _Quota:
+    __slots__ = (
+        "requests",
+        "tokens",
+        "concurrency",
+        "cond",
+        "in_flight",
+        "waiting_request",
+        "blocked_until",
+        "throttles_in_row",
+        "granted",
+        "rejected",
+        "throttled",
+    )
+
+    def __init__(self, rpm: float, tpm: float, concurrency: int) -> None:
+        self.requests = _Bucket(rpm)
+        self.tokens = _Bucket(tpm)
+        self.concurrency = max(1, concurrency)
+        self.cond = threading.Condition()
+        self.in_flight = 0
+        self.waiting_request = 0
+        self.blocked_until = 0.0
+        self.throttles_in_row = 0
+        self.granted = {REQUEST: 0, BACKGROUND: 0}
+        self.rejected = {REQUEST: 0, BACKGROUND: 0}
+        self.throttled = 0
+
+
+class ProviderLimiter:
+    """
+    Client-side quota shared by every LLM caller in the worker, per provider quota
+    (gemini / openai / deepseek).
+
+    Each quota has a request and a token bucket (RATE_LIMIT_<QUOTA>_RPM / _TPM per
+    minute; 0 = unlimited) and a cap on calls in flight (_CONCURRENCY). Request-path
+    calls go first: background (judge) calls wait while any request-path call is
+    waiting, and may not dip into the last RATE_LIMIT_RESERVE share of any limit.
+    A 429 blocks the quota for the provider's Retry-After, or a full-jitter
+    exponential backoff (RATE_LIMIT_BACKOFF_BASE_SEC .. _MAX_SEC) without one.
+    Request-path calls wait at most RATE_LIMIT_MAX_WAIT_SEC (and never past the
+    request deadline) before RateLimited sends them to the next provider.
+    """
+
+    def __init__(
+        self,
+        limits: dict[str, tuple[float, float, int]] | None = None,
+        reserve: float | None = None,
+        backoff_base_sec: float | None = None,
+        backoff_max_sec: float | None = None,
+        max_wait_sec: float | None = None,
+        background_max_wait_sec: float = 120.0,
+    ) -> None:
+        self.limits = dict(limits or {})
+        self.reserve = reserve if reserve is not None else env_float("RATE_LIMIT_RESERVE", 0.2)
+        self.backoff_base_sec = (
+            backoff_base_sec
+            if backoff_base_sec is not None
+            else env_float("RATE_LIMIT_BACKOFF_BASE_SEC", 0.5)
+        )
+        self.backoff_max_sec = (
+            backoff_max_sec
+            if backoff_max_sec is not None
+            else env_float("RATE_LIMIT_BACKOFF_MAX_SEC", 20.0)
+        )
+        self.max_wait_sec = (
+            max_wait_sec if max_wait_sec is not None else env_float("RATE_LIMIT_MAX_WAIT_SEC", 2.0)
+        )
+        self.background_max_wait_sec = background_max_wait_sec
+        self._lock = threading.Lock()
+        self._quotas: dict[str, _Quota] = {}
+
+    def _limits_for(self, quota: str) -> tuple[float, float, int]:
+        if quota in self.limits:
+            return self.limits[quota]
+        prefix = f"RATE_LIMIT_{quota.upper()}"
+        return (
+            env_float(f"{prefix}_RPM", 0.0),
+            env_float(f"{prefix}_TPM", 0.0),
+            int(env_float(f"{prefix}_CONCURRENCY", 16)),
+        )
+
+    def _quota(self, quota: str) -> _Quota:
+        with self._lock:
+            state = self._quotas.get(quota)
+            if state is None:
+                state = _Quota(*self._limits_for(quota))
+                self._quotas[quota] = state
+            return state
+
+    def _wait_locked(
+        self, state: _Quota, tokens: int, priority: str, now: float
+    ) -> tuple[float, bool]:
+        """
+        (seconds to wait before this call may start, whether that wait is exact);
+        slot and priority waits are open-ended and end early on release.
+        """
+
+        if state.blocked_until > now:
+            return state.blocked_until - now, True
+        background = priority == BACKGROUND
+        if background and state.waiting_request:
+            return 1.0, False
+        slots = state.concurrency
+        if background and slots > 1:
+            slots = max(1, int(slots * (1.0 - self.reserve)))
+        if state.in_flight >= slots:
+            return 1.0, False
+        waits = []
+        for bucket, amount in ((state.requests, 1.0), (state.tokens, float(tokens))):
+            bucket.refill(now)
+            floor = bucket.capacity * self.reserve if background else 0.0
+            waits.append(bucket.wait_for(amount, floor))
+        return max(waits), True
+
+    def _max_wait(self, priority: str) -> float:
+        if priority == BACKGROUND:
+            return self.background_max_wait_sec
+        wait = self.max_wait_sec
+        deadline = current_deadline()
+        if deadline is not None:
+            wait = min(wait, deadline.remaining())
+        return max(0.0, wait)
+
+    def acquire(self, provider: str, tokens: int, priority: str = REQUEST) -> None:
+        quota = quota_for(provider)
+        state = self._quota(quota)
+        give_up_at = time.monotonic() + self._max_wait(priority)
+        with state.cond:
+            if priority == REQUEST:
+                state.waiting_request += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait, exact = self._wait_locked(state, tokens, priority, now)
+                    if wait == 0.0:
+                        break
+                    left = give_up_at - now
+                    if left <= 0 or (exact and wait > left):
+                        state.rejected[priority] += 1
+                        raise RateLimited(f"{quota} quota has no room for this call in time")
+                    state.cond.wait(min(wait, left))
+            finally:
+                if priority == REQUEST:
+                    state.waiting_request -= 1
+                    state.cond.notify_all()
+            self._grant_locked(state, tokens, priority)
+
+    async def acquire_async(self, provider: str, tokens: int, priority: str = REQUEST) -> None:
+        """`acquire` for coroutines: waits by sleeping on the loop, not on a thread."""
+
+        quota = quota_for(provider)
+        state = self._quota(quota)
+        give_up_at = time.monotonic() + self._max_wait(priority)
+        if priority == REQUEST:
+            with state.cond:
+                state.waiting_request += 1
+        try:
+            while True:
+                with state.cond:
+                    now = time.monotonic()
+                    wait, exact = self._wait_locked(state, tokens, priority, now)
+                    if wait == 0.0:
+                        self._grant_locked(state, tokens, priority)
+                        return
+                    left = give_up_at - now
+                    if left <= 0 or (exact and wait > left):
+                        state.rejected[priority] += 1
+                        raise RateLimited(f"{quota} quota has no room for this call in time")
+                # Open-ended waits end on another caller's release; poll for it.
+                await asyncio.sleep(min(wait if exact else ASYNC_POLL_SEC, left))
+        finally:
+            if priority == REQUEST:
+                with state.cond:
+                    state.waiting_request -= 1
+                    state.cond.notify_all()
+
+    @staticmethod
+    def _grant_locked(state: _Quota, tokens: int, priority: str) -> None:
+        if state.requests.rate > 0:
+            state.requests.level -= 1.0
+        if state.tokens.rate > 0:
+            state.tokens.level -= min(float(tokens), state.tokens.capacity)
+        state.in_flight += 1
+        state.granted[priority] += 1
+
+    def release(self, provider: str, exc: BaseException | None = None) -> None:
+        state = self._quota(quota_for(provider))
+        with state.cond:
+            state.in_flight = max(0, state.in_flight - 1)
+            if exc is not None and is_rate_limit_error(exc):
+                state.throttled += 1
+                state.throttles_in_row += 1
+                delay = _retry_after(exc)
+                if delay is None:
+                    ceiling = min(
+                        self.backoff_max_sec,
+                        self.backoff_base_sec * (2 ** (state.throttles_in_row - 1)),
+                    )
+                    delay = random.uniform(0.0, ceiling)
+                state.blocked_until = max(state.blocked_until, time.monotonic() + delay)
+            elif exc is None:
+                state.throttles_in_row = 0
+            state.cond.notify_all()
+
+    @contextlib.contextmanager
+    def slot(self, provider: str, tokens: int, priority: str = REQUEST) -> Iterator[None]:
+        """Hold one call's worth of `provider`'s quota for the duration of the block."""
+
+        self.acquire(provider, tokens, priority)
+        try:
+            yield
+        except BaseException as exc:
+            self.release(provider, exc)
+            raise
+        self.release(provider)
+
+    @contextlib.asynccontextmanager
+    async def slot_async(
+        self, provider: str, tokens: int, priority: str = REQUEST
+    ) -> AsyncIterator[None]:
+        await self.acquire_async(provider, tokens, priority)
+        try:
+            yield
+        except BaseException as exc:
+            self.release(provider, exc)
+            raise
+        self.release(provider)
+
+    def waiting(self) -> int:
+        """Request-priority calls currently waiting for a slot, across all quotas."""
+
+        with self._lock:
+            quotas = list(self._quotas.values())
+        total = 0
+        for state in quotas:
+            with state.cond:
+                total += state.waiting_request
+        return total
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            quotas = dict(self._quotas)
+        out = {}
+        now = time.monotonic()
+        for quota, state in quotas.items():
+            with state.cond:
+                out[quota] = {
+                    "rpm": state.requests.capacity,
+                    "tpm": state.tokens.capacity,
+                    "concurrency": state.concurrency,
+                    "in_flight": state.in_flight,
+                    "waiting": state.waiting_request,
+                    "blocked_for_sec": round(max(0.0, state.blocked_until - now), 3),
+                    "granted": dict(state.granted),
+                    "rejected": dict(state.rejected),
+                    "throttled": state.throttled,
+                }
+        return out
+
+
+# Shared by Gemini, OpenAI, DeepSeek and the judge so bursts are paced against one quota.
+PROVIDER_LIMITER = ProviderLimiter()
@@ -0,0 +1,124 @@
+import threading
+import time
+from typing import Any
+
+if __package__:
+    from .config import env_flag, env_float
+else:  # pragma: no cover
+    from config import env_flag, env_float
+
+
+def _bigrams(text: str, limit: int = 1500) -> set[str]:
+    # Character bigrams: word-free (Thai has no spaces) and cheap enough to build
+    # for a dozen chunks per request.
+    text = " ".join(str(text or "").lower().split())[:limit]
+    return {text[i : i + 2] for i in range(len(text) - 1)}
+
+
+class _Protocol:
+    __slots__ = ("names", "keywords")
+
+    def __init__(self, row: dict[str, str]) -> None:
+        self.names = [
+            name.lower() for name in (row.get("case_name_th"), row.get("case_name_en")) if name
+        ]
+        self.keywords = [
+            kw.strip().lower() for kw in str(row.get("keywords") or "").split(",") if kw.strip()
+        ]
+
+    def match_score(self, query: str) -> int:
+        # Same weights as ProtocolRetriever._score_row, without the severity bonus.
+        score = 5 if self.names and self.names[0] in query else 0
+        score += sum(3 for name in self.names[1:] if name in query)
+        return score + sum(2 for kw in self.keywords if kw in query)
+
+
+class ProtocolReranker:
+    """
+    Local rerank of Vertex RAG chunks before prompt assembly.
+
+    A chunk scores by character-bigram coverage of the scenario, plus a bonus when it
+    names (or shares keywords with) the CSV protocols the scenario itself matches,
+    plus a small prior for Vertex's own order. ProtocolRetriever fetches
+    VERTEX_RERANK_FETCH_K chunks and keeps the best top_k. VERTEX_RERANK=0 disables it.
+    """
+
+    def __init__(
+        self,
+        rows: list[dict[str, str]],
+        fetch_k: int | None = None,
+        enabled: bool | None = None,
+    ) -> None:
+        self.protocols = [_Protocol(row) for row in rows if row.get("case_name_th")]
+        self.fetch_k = max(
+            1,
+            int(fetch_k if fetch_k is not None else env_float("VERTEX_RERANK_FETCH_K", 10)),
+        )
+        if enabled is None:
+            enabled = env_flag("VERTEX_RERANK", True)
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._reranked = 0
+        self._chunks_in = 0
+        self._chunks_out = 0
+        self._total_ms = 0.0
+
+    def _matched_protocols(self, query: str) -> list[tuple[float, _Protocol]]:
+        scored = [(protocol.match_score(query), protocol) for protocol in self.protocols]
+        scored = [item for item in scored if item[0] > 0]
+        if not scored:
+            return []
+        scored.sort(key=lambda item: item[0], reverse=True)
+        top = scored[0][0]
+        return [(score / top, protocol) for score, protocol in scored[:3]]
+
+    def score(
+        self, query_grams: set[str], matched: list[tuple[float, _Protocol]], doc: dict[str, str]
+    ) -> float:
+        text = f"{doc.get('title') or ''}\n{doc.get('body') or ''}"
+        lexical = len(query_grams & _bigrams(text)) / len(query_grams) if query_grams else 0.0
+        lower = text.lower()
+        bonus = 0.0
+        for weight, protocol in matched:
+            name_hit = any(name in lower for name in protocol.names)
+            keyword_share = (
+                sum(1 for kw in protocol.keywords if kw in lower) / len(protocol.keywords)
+                if protocol.keywords
+                else 0.0
+            )
+            bonus = max(bonus, weight * (0.5 * name_hit + 0.3 * keyword_share))
+        return lexical + bonus
+
+    def rerank(self, query: str, docs: list[dict[str, str]], keep: int) -> list[dict[str, str]]:
+        """The best `keep` docs, best first. Docs are returned unchanged."""
+
+        if not self.enabled or len(docs) <= 1:
+            return docs[:keep]
+        started = time.perf_counter()
+        lowered = " ".join(str(query or "").lower().split())
+        query_grams = _bigrams(lowered)
+        matched = self._matched_protocols(lowered)
+        ranked = sorted(
+            enumerate(docs),
+            key=lambda item: self.score(query_grams, matched, item[1]) + 0.05 / (1 + item[0]),
+            reverse=True,
+        )
+        out = [doc for _, doc in ranked[:keep]]
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self._reranked += 1
+            self._chunks_in += len(docs)
+            self._chunks_out += len(out)
+            self._total_ms += elapsed_ms
+        return out
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "fetch_k": self.fetch_k,
+                "reranked": self._reranked,
+                "chunks_in": self._chunks_in,
+                "chunks_out": self._chunks_out,
+                "avg_ms": round(self._total_ms / self._reranked, 3) if self._reranked else 0.0,
+            }
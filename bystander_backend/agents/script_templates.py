@@ -0,0 +1,231 @@
+import datetime
+import json
+import os
+import re
+import string
+import threading
+from typing import Any
+
+if __package__:
+    from .config import env_float
+    from .guidance_store import STORE_SEVERITIES, entry_key, protocol_fingerprint
+else:  # pragma: no cover
+    from config import env_float
+    from guidance_store import STORE_SEVERITIES, entry_key, protocol_fingerprint
+
+DEFAULT_TEMPLATE_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "script_templates.json"
+)
+TEMPLATE_FORMAT = 1
+# Every slot must appear in a template; nothing else may be in braces.
+TEMPLATE_SLOTS = ("scenario", "location", "patient", "medical_history", "caller")
+
+_NUMBERED_LINE = re.compile(r"^\s*\d{1,2}[.)]\s", re.MULTILINE)
+_LOCATION_PREFIXES = {
+    "ที่อยู่จากแผนที่:": "address",
+    "จุดสังเกตใกล้เคียง:": "landmarks",
+    "สถานพยาบาลใกล้เคียง:": "facilities",
+}
+_GENDERS = {"male": "ชาย", "m": "ชาย", "ชาย": "ชาย", "female": "หญิง", "f": "หญิง", "หญิง": "หญิง"}
+
+
+# Reports up to this long go into a template as written; longer ones are summarized.
+SUMMARY_MAX_CHARS = int(env_float("SCRIPT_SUMMARY_MAX_CHARS", 160))
+
+
+def _normalize_text(value: Any) -> str:
+    return str(value or "").strip()
+
+
+def validate_template(template: str) -> list[str]:
+    """Problems that disqualify a generated template from being filled and served."""
+
+    text = _normalize_text(template)
+    problems = []
+    try:
+        fields = [field for _, field, _, _ in string.Formatter().parse(text) if field is not None]
+    except ValueError as exc:
+        return [f"unparseable template: {exc}"]
+    unknown = sorted({field for field in fields if field not in TEMPLATE_SLOTS})
+    if unknown:
+        problems.append(f"unknown slots {unknown}")
+    missing = [slot for slot in TEMPLATE_SLOTS if slot not in fields]
+    if missing:
+        problems.append(f"missing slots {missing}")
+    if len(_NUMBERED_LINE.findall(text)) < 9:
+        problems.append("fewer than nine numbered protocol steps")
+    if "1669" not in text:
+        problems.append("template must tell the caller to dial 1669")
+    if len(text) > 2500:
+        problems.append("template too long")
+    return problems
+
+
+def _age_years(birthdate: Any, today: datetime.date | None = None) -> int | None:
+    if isinstance(birthdate, datetime.datetime):
+        born = birthdate.date()
+    elif isinstance(birthdate, datetime.date):
+        born = birthdate
+    else:
+        try:
+            born = datetime.date.fromisoformat(_normalize_text(birthdate)[:10])
+        except ValueError:
+            return None
+    if born.year > 2400:
+        # Buddhist-era year.
+        born = born.replace(year=born.year - 543)
+    today = today or datetime.date.today()
+    age = today.year - born.year - ((today.month, today.day) < (born.month, born.day))
+    return age if 0 <= age < 130 else None
+
+
+def _location_slot(location_context: str) -> str:
+    found: dict[str, str] = {}
+    for line in _normalize_text(location_context).split("\n"):
+        line = line.strip()
+        for prefix, name in _LOCATION_PREFIXES.items():
+            if line.startswith(prefix):
+                found[name] = line[len(prefix) :].strip()
+    # Coordinates in the context are for the system only and never read out.
+    parts = []
+    if found.get("address"):
+        parts.append(found["address"])
+    if found.get("landmarks"):
+        parts.append(f"ใกล้ {found['landmarks']}")
+    elif found.get("facilities"):
+        parts.append(f"ใกล้ {found['facilities']}")
+    if not parts:
+        return "ยังไม่ทราบที่อยู่แน่ชัด จะแจ้งจุดสังเกตใกล้เคียงเพิ่มเติม"
+    return " ".join(parts)
+
+
+def _patient_slot(profile: dict[str, Any], relationship: str) -> str:
+    parts = []
+    if relationship:
+        parts.append(f"ผู้ป่วยเป็น{relationship}ของผู้แจ้ง")
+    gender = _GENDERS.get(_normalize_text(profile.get("gender")).lower())
+    parts.append(f"เพศ{gender}" if gender else "ยังไม่ทราบเพศ")
+    age = _age_years(profile.get("birthdate"))
+    parts.append(f"อายุประมาณ {age} ปี" if age is not None else "ยังไม่ทราบอายุ")
+    parts.append("ผู้ป่วย 1 คน")
+    return " ".join(parts)
+
+
+def _caller_slot(profile: dict[str, Any]) -> str:
+    name = " ".join(
+        part
+        for part in (
+            _normalize_text(profile.get("firstName")),
+            _normalize_text(profile.get("lastName")),
+        )
+        if part
+    )
+    phone = _normalize_text(profile.get("phone"))
+    if not name and not phone:
+        return "ผู้แจ้งจะแจ้งชื่อและเบอร์โทรศัพท์ให้เจ้าหน้าที่"
+    return " ".join(
+        part
+        for part in (f"ชื่อ {name}" if name else "", f"เบอร์โทรศัพท์ {phone}" if phone else "")
+        if part
+    )
+
+
+def call_script_slots(
+    scenario_summary: str,
+    user_profile: dict[str, Any],
+    location_context: str,
+    caller_profile: dict[str, Any] | None,
+    patient_relationship: str,
+    patient_medical_history: list[str] | None,
+) -> dict[str, str]:
+    """Slot values for a template; unknown details are said to be not yet known."""
+
+    history = ", ".join(
+        item for item in (_normalize_text(x) for x in patient_medical_history or []) if item
+    )
+    return {
+        "scenario": _normalize_text(scenario_summary),
+        "location": _location_slot(location_context),
+        "patient": _patient_slot(user_profile or {}, _normalize_text(patient_relationship)),
+        "medical_history": (f"ผู้ป่วยมีประวัติ {history}" if history else "ยังไม่ทราบโรคประจำตัวของผู้ป่วย"),
+        # Without a separate caller profile the patient is reporting for themselves.
+        "caller": _caller_slot(caller_profile or user_profile or {}),
+    }
+
+
+class ScriptTemplateStore:
+    """
+    Call-script templates pre-generated offline for every protocol row × severity by
+    ml/script_templates/build_script_templates.py. Each is the nine-step operator
+    script for that protocol with {scenario}, {location}, {patient}, {medical_history}
+    and {caller} slots, filled per request without an LLM. Like the guidance store,
+    an entry is only used while its protocol row is unchanged and the match clears
+    SCRIPT_TEMPLATE_MIN_SCORE.
+    """
+
+    def __init__(self, path: str | None = None, min_score: float | None = None) -> None:
+        self.path = (
+            path
+            if path is not None
+            else str(os.getenv("SCRIPT_TEMPLATE_PATH") or DEFAULT_TEMPLATE_PATH)
+        )
+        self.min_score = (
+            min_score if min_score is not None else env_float("SCRIPT_TEMPLATE_MIN_SCORE", 5.0)
+        )
+        self.version = ""
+        self.entries: dict[str, dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._stale = 0
+        self._load()
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as exc:
+            print(f"[script_templates] disabled: {exc}")
+            return
+        if int(data.get("format") or 0) != TEMPLATE_FORMAT:
+            print(f"[script_templates] unsupported format: {data.get('format')}")
+            return
+        self.version = str(data.get("version") or "")
+        for key, entry in (data.get("entries") or {}).items():
+            if not validate_template(entry.get("template")):
+                self.entries[key] = entry
+
+    def lookup(self, match: dict[str, Any] | None, score: float, severity: str) -> str | None:
+        """Template for a confident protocol match, or None."""
+
+        if not self.entries or match is None or severity not in STORE_SEVERITIES:
+            return None
+        entry = self.entries.get(entry_key(match, severity)) if score >= self.min_score else None
+        stale = entry is not None and entry.get("protocol_sha1") != protocol_fingerprint(match)
+        with self._lock:
+            if entry is None:
+                self._misses += 1
+            elif stale:
+                self._stale += 1
+            else:
+                self._hits += 1
+        if entry is None or stale:
+            return None
+        return entry["template"]
+
+    @staticmethod
+    def render(template: str, slots: dict[str, str]) -> str:
+        return template.format_map(slots).strip()
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "version": self.version,
+                "entries": len(self.entries),
+                "min_score": self.min_score,
+                "hits": self._hits,
+                "misses": self._misses,
+                "stale": self._stale,
+            }
@@ -0,0 +1,197 @@
+import itertools
+import re
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from typing import Any
+
+if __package__:
+    from .config import env_float
+    from .singleflight import normalize_scenario_key
+    from .triage_classifier import featurize
+else:  # pragma: no cover
+    from config import env_float
+    from singleflight import normalize_scenario_key
+    from triage_classifier import featurize
+
+
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)?")
+_ENGLISH_NEGATION = re.compile(r"\b(?:not|no|never|without|cannot|none)\b|n't\b")
+_THAI_NEGATIONS = ("ไม่", "มิได้", "ห้าม", "ปราศจาก")
+_THAI_NUMBER_WORDS = (
+    "หนึ่ง",
+    "สอง",
+    "สาม",
+    "สี่",
+    "ห้า",
+    "หก",
+    "เจ็ด",
+    "แปด",
+    "เก้า",
+    "สิบ",
+    "ยี่สิบ",
+    "ร้อย",
+    "พัน",
+    "ครึ่ง",
+)
+
+
+def ngram_embedding(text: str) -> dict[int, float]:
+    """Default local embedding: L2-normalised hashed character 2-4 grams."""
+
+    return featurize(normalize_scenario_key(text), 1 << 15, (2, 4))
+
+
+def meaning_guard(text: str) -> tuple[Any, ...]:
+    """
+    Numbers and negations a near-duplicate must share exactly. Adding or dropping one
+    barely moves the n-gram vector ("ไอได้" / "ไอไม่ได้", "2 เม็ด" / "20 เม็ด") but
+    flips the meaning; a false mismatch only costs a generation.
+    """
+
+    key = normalize_scenario_key(text)
+    return (
+        tuple(_NUMBER.findall(key)),
+        tuple(_ENGLISH_NEGATION.findall(key)),
+        tuple(key.count(word) for word in _THAI_NEGATIONS),
+        tuple(key.count(word) for word in _THAI_NUMBER_WORDS),
+    )
+
+
+class _Entry:
+    __slots__ = ("namespace", "guard", "vector", "value", "expires_at", "hits")
+
+    def __init__(
+        self,
+        namespace: Hashable,
+        guard: tuple[Any, ...],
+        vector: dict[int, float],
+        value: Any,
+        expires_at: float,
+    ) -> None:
+        self.namespace = namespace
+        self.guard = guard
+        self.vector = vector
+        self.value = value
+        self.expires_at = expires_at
+        self.hits = 0
+
+
+class SemanticCache:
+    """
+    Nearest-neighbour response cache over sparse unit vectors.
+
+    A lookup returns the most similar live entry in the same namespace (e.g. severity,
+    a medical-context fingerprint and the retrieved protocols) when its cosine
+    similarity reaches `threshold` and it has the same meaning_guard(): lexical
+    similarity alone cannot tell "is breathing" from "is not breathing". Candidates
+    come from an inverted index over vector buckets, so a lookup only touches entries
+    sharing at least one feature. Entries expire after `ttl_sec` and the least
+    recently used one is evicted beyond `max_entries`.
+    """
+
+    def __init__(
+        self,
+        threshold: float | None = None,
+        max_entries: int | None = None,
+        ttl_sec: float | None = None,
+        embed: Callable[[str], dict[int, float]] = ngram_embedding,
+    ) -> None:
+        self.threshold = (
+            threshold if threshold is not None else env_float("GUIDANCE_CACHE_THRESHOLD", 0.9)
+        )
+        self.max_entries = max(
+            1,
+            int(
+                max_entries
+                if max_entries is not None
+                else env_float("GUIDANCE_CACHE_MAX_ENTRIES", 512)
+            ),
+        )
+        self.ttl_sec = float(
+            ttl_sec if ttl_sec is not None else env_float("GUIDANCE_CACHE_TTL_SEC", 3600.0)
+        )
+        self.embed = embed
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[int, _Entry] = OrderedDict()
+        self._postings: dict[int, set[int]] = {}
+        self._ids = itertools.count()
+        self._hits = 0
+        self._misses = 0
+        self._guarded = 0
+
+    def _remove_locked(self, entry_id: int) -> None:
+        entry = self._entries.pop(entry_id, None)
+        if entry is None:
+            return
+        for bucket in entry.vector:
+            ids = self._postings.get(bucket)
+            if ids is not None:
+                ids.discard(entry_id)
+                if not ids:
+                    del self._postings[bucket]
+
+    def get(self, text: str, namespace: Hashable) -> Any:
+        vector = self.embed(text)
+        if not vector or self.threshold > 1.0:
+            return None
+        guard = meaning_guard(text)
+        now = time.monotonic()
+        with self._lock:
+            scores: dict[int, float] = {}
+            for bucket, weight in vector.items():
+                for entry_id in self._postings.get(bucket, ()):
+                    scores[entry_id] = (
+                        scores.get(entry_id, 0.0)
+                        + weight * (self._entries[entry_id].vector[bucket])
+                    )
+            best_id = None
+            best_score = self.threshold
+            for entry_id, score in scores.items():
+                entry = self._entries[entry_id]
+                if entry.expires_at <= now:
+                    self._remove_locked(entry_id)
+                    continue
+                if entry.namespace != namespace or score < best_score:
+                    continue
+                if entry.guard != guard:
+                    self._guarded += 1
+                    continue
+                best_id, best_score = entry_id, score
+            if best_id is None:
+                self._misses += 1
+                return None
+            entry = self._entries[best_id]
+            entry.hits += 1
+            self._entries.move_to_end(best_id)
+            self._hits += 1
+            return entry.value
+
+    def put(self, text: str, namespace: Hashable, value: Any) -> None:
+        vector = self.embed(text)
+        if not vector:
+            return
+        with self._lock:
+            entry_id = next(self._ids)
+            self._entries[entry_id] = _Entry(
+                namespace, meaning_guard(text), vector, value, time.monotonic() + self.ttl_sec
+            )
+            for bucket in vector:
+                self._postings.setdefault(bucket, set()).add(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._remove_locked(next(iter(self._entries)))
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            top = sorted(self._entries.values(), key=lambda entry: entry.hits, reverse=True)
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "threshold": self.threshold,
+                "ttl_sec": self.ttl_sec,
+                "hits": self._hits,
+                "misses": self._misses,
+                "guarded": self._guarded,
+                "top_entry_hits": [entry.hits for entry in top[:5]],
+            }
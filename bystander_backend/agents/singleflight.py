@@ -0,0 +1,134 @@
+import asyncio
+import re
+import threading
+from collections.abc import Callable, Hashable
+from concurrent.futures import Future
+from typing import Any
+
+if __package__:
+    from .cancellation import CancelToken
+else:  # pragma: no cover
+    from cancellation import CancelToken
+
+_SCENARIO_NOISE = re.compile(r"[\s!?.,;:…\"'()\[\]\-]+")
+
+
+def normalize_scenario_key(scenario: str) -> str:
+    """
+    Collapse case, whitespace and punctuation so near-identical reports share a key.
+    Thai combining vowels/tone marks are kept: stripping them would merge different words.
+    """
+
+    return _SCENARIO_NOISE.sub(" ", str(scenario or "").lower()).strip()
+
+
+def location_tile(
+    latitude: float | None, longitude: float | None, tile_deg: float = 0.01
+) -> tuple[int, int] | None:
+    """Coarse grid cell (~1.1 km at the default size) used to group nearby callers."""
+
+    if latitude is None or longitude is None or tile_deg <= 0:
+        return None
+    return (int(latitude // tile_deg), int(longitude // tile_deg))
+
+
+class SingleFlight:
+    """
+    In-flight request coalescing shared by every thread (and event loop) in a worker.
+
+    The first caller for a key starts the work; identical concurrent callers attach to
+    the same concurrent.futures.Future. The key is forgotten as soon as the work
+    finishes, so results are never served stale. Each execution gets its own cancel
+    token, fired only once every attached caller has abandoned it.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._inflight: dict[Hashable, _Flight] = {}
+        self._started = 0
+        self._shared = 0
+        self._abandoned = 0
+
+    def submit(self, key: Hashable, start: Callable[[CancelToken], Future]) -> tuple[Future, bool]:
+        """Return (future, shared). `start` is only invoked when no call is in flight."""
+
+        with self._lock:
+            flight = self._inflight.get(key)
+            if flight is not None and not flight.future.done():
+                flight.waiters += 1
+                self._shared += 1
+                return flight.future, True
+            token = CancelToken()
+            flight = _Flight(start(token), token)
+            self._inflight[key] = flight
+            self._started += 1
+        flight.future.add_done_callback(lambda done, k=key: self._forget(k, done))
+        return flight.future, False
+
+    def abandon(self, key: Hashable, future: Future) -> None:
+        """A caller stopped waiting; cancel the work once nobody is left waiting."""
+
+        with self._lock:
+            flight = self._inflight.get(key)
+            if flight is None or flight.future is not future:
+                return
+            flight.waiters -= 1
+            if flight.waiters > 0:
+                return
+            del self._inflight[key]
+            self._abandoned += 1
+        flight.token.cancel("abandoned")
+        future.cancel()
+
+    def _forget(self, key: Hashable, future: Future) -> None:
+        with self._lock:
+            flight = self._inflight.get(key)
+            if flight is not None and flight.future is future:
+                del self._inflight[key]
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "in_flight": len(self._inflight),
+                "started": self._started,
+                "shared": self._shared,
+                "abandoned": self._abandoned,
+            }
+
+
+class _Flight:
+    __slots__ = ("future", "token", "waiters")
+
+    def __init__(self, future: Future, token: CancelToken) -> None:
+        self.future = future
+        self.token = token
+        self.waiters = 1
+
+
+def await_shared(future: Future) -> "asyncio.Future[Any]":
+    """
+    Await a shared concurrent future from the current loop without letting a waiter's
+    cancellation (e.g. its own timeout) cancel the work for the other waiters.
+    """
+
+    loop = asyncio.get_running_loop()
+    waiter: asyncio.Future[Any] = loop.create_future()
+
+    def _copy_state(done: Future) -> None:
+        if waiter.done():
+            return
+        if done.cancelled():
+            waiter.cancel()
+            return
+        exc = done.exception()
+        if exc is not None:
+            waiter.set_exception(exc)
+        else:
+            waiter.set_result(done.result())
+
+    def _on_done(done: Future) -> None:
+        if not loop.is_closed():
+            loop.call_soon_threadsafe(_copy_state, done)
+
+    future.add_done_callback(_on_done)
+    return waiter
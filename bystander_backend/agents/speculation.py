@@ -0,0 +1,121 @@
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from concurrent.futures import Future
+from typing import Any
+
+if __package__:
+    from .config import env_float
+else:  # pragma: no cover
+    from config import env_float
+
+
+class _Speculation:
+    __slots__ = ("future", "expires_at")
+
+    def __init__(self, future: Future, expires_at: float) -> None:
+        self.future = future
+        self.expires_at = expires_at
+
+
+class SpeculationStore:
+    """
+    Results computed ahead of the request a client is expected to make next, keyed by
+    the inputs they were computed from. Each result is handed out once, to the first
+    request whose inputs produce the same key.
+
+    Speculation is bounded so it stays cheap to drop: at most SPECULATION_MAX_IN_FLIGHT
+    run at once (further offers are skipped), each runs under a SPECULATION_BUDGET_SEC
+    deadline, and one still unclaimed after SPECULATION_TTL_SEC is discarded, cancelling
+    it if it is still running.
+    """
+
+    def __init__(
+        self,
+        ttl_sec: float | None = None,
+        max_in_flight: int | None = None,
+        budget_sec: float | None = None,
+    ) -> None:
+        self.ttl_sec = float(
+            ttl_sec if ttl_sec is not None else env_float("SPECULATION_TTL_SEC", 120.0)
+        )
+        self.max_in_flight = max(
+            0,
+            int(
+                max_in_flight
+                if max_in_flight is not None
+                else env_float("SPECULATION_MAX_IN_FLIGHT", 8.0)
+            ),
+        )
+        self.budget_sec = float(
+            budget_sec if budget_sec is not None else env_float("SPECULATION_BUDGET_SEC", 20.0)
+        )
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[Hashable, _Speculation] = OrderedDict()
+        self._started = 0
+        self._skipped = 0
+        self._hits = 0
+        self._misses = 0
+        self._expired = 0
+
+    def _purge_locked(self, now: float) -> list[Future]:
+        expired = [key for key, entry in self._entries.items() if entry.expires_at <= now]
+        dropped = []
+        for key in expired:
+            dropped.append(self._entries.pop(key).future)
+        self._expired += len(expired)
+        return dropped
+
+    def _in_flight_locked(self) -> int:
+        return sum(1 for entry in self._entries.values() if not entry.future.done())
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return self._in_flight_locked()
+
+    def offer(self, key: Hashable, launch: Callable[[], Future]) -> bool:
+        """Start `launch()` for `key` unless it is already speculated or over budget."""
+
+        now = time.monotonic()
+        with self._lock:
+            dropped = self._purge_locked(now)
+            if key in self._entries or self._in_flight_locked() >= self.max_in_flight:
+                self._skipped += 1
+                launched = False
+            else:
+                self._entries[key] = _Speculation(launch(), now + self.ttl_sec)
+                self._started += 1
+                launched = True
+        for future in dropped:
+            future.cancel()
+        return launched
+
+    def claim(self, key: Hashable) -> Future | None:
+        """The speculation for `key` (finished or still running), removed from the store."""
+
+        with self._lock:
+            dropped = self._purge_locked(time.monotonic())
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+        for future in dropped:
+            future.cancel()
+        return entry.future if entry is not None else None
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "in_flight": self._in_flight_locked(),
+                "max_in_flight": self.max_in_flight,
+                "budget_sec": self.budget_sec,
+                "ttl_sec": self.ttl_sec,
+                "started": self._started,
+                "skipped": self._skipped,
+                "hits": self._hits,
+                "misses": self._misses,
+                "expired": self._expired,
+            }
@@ -0,0 +1,359 @@
+import json
+import math
+import os
+import random
+import re
+import threading
+import zlib
+from collections.abc import Iterable
+from typing import Any
+
+if __package__:
+    from .config import env_flag, env_float
+else:  # pragma: no cover
+    from config import env_flag, env_float
+
+SEVERITIES = ("critical", "moderate", "none")
+FACILITIES = ("hospital", "clinic", "none")
+DEFAULT_MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "triage_model.json")
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def featurize(text: str, dim: int, ngram_range: tuple[int, int] = (2, 4)) -> dict[int, float]:
+    """
+    Hashed character n-grams, L2-normalised. Characters rather than words because Thai
+    is written without spaces; crc32 keeps bucket ids stable across processes.
+    """
+
+    normalized = " " + _WHITESPACE.sub(" ", str(text or "").lower()).strip() + " "
+    counts: dict[int, float] = {}
+    low, high = ngram_range
+    for n in range(low, high + 1):
+        for start in range(0, max(0, len(normalized) - n + 1)):
+            gram = normalized[start : start + n]
+            if gram.isspace():
+                continue
+            bucket = zlib.crc32(f"{n}:{gram}".encode()) % dim
+            counts[bucket] = counts.get(bucket, 0.0) + 1.0
+    norm = math.sqrt(sum(value * value for value in counts.values()))
+    if norm <= 0:
+        return {}
+    return {bucket: value / norm for bucket, value in counts.items()}
+
+
+def _softmax(scores: list[float]) -> list[float]:
+    top = max(scores)
+    exps = [math.exp(score - top) for score in scores]
+    total = sum(exps)
+    return [value / total for value in exps]
+
+
+# Softmax temperatures tried by `calibrate`; above 1 flattens over-confident scores.
+CALIBRATION_TEMPERATURES = tuple(round(0.5 + 0.1 * step, 1) for step in range(46))
+
+
+class _LinearHead:
+    """Sparse multinomial logistic regression over hashed features."""
+
+    def __init__(
+        self,
+        labels: tuple[str, ...],
+        weights: dict[int, list[float]],
+        bias: list[float],
+        temperature: float = 1.0,
+    ):
+        self.labels = labels
+        self.weights = weights
+        self.bias = bias
+        self.temperature = temperature
+
+    def scores(self, features: dict[int, float]) -> list[float]:
+        scores = list(self.bias)
+        for bucket, value in features.items():
+            row = self.weights.get(bucket)
+            if row is None:
+                continue
+            for index, weight in enumerate(row):
+                scores[index] += weight * value
+        return scores
+
+    def probabilities(self, features: dict[int, float]) -> list[float]:
+        return _softmax([score / self.temperature for score in self.scores(features)])
+
+    def calibrate(self, samples: list[tuple[dict[int, float], int]]) -> float:
+        """Temperature minimising log loss on held-out `samples` (temperature scaling)."""
+
+        if not samples:
+            return self.temperature
+        scored = [(self.scores(features), target) for features, target in samples]
+
+        def log_loss(temperature: float) -> float:
+            return -sum(
+                math.log(max(_softmax([s / temperature for s in scores])[target], 1e-12))
+                for scores, target in scored
+            )
+
+        self.temperature = min(CALIBRATION_TEMPERATURES, key=log_loss)
+        return self.temperature
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "labels": list(self.labels),
+            "temperature": self.temperature,
+            "bias": [round(value, 5) for value in self.bias],
+            "weights": {
+                str(bucket): [round(value, 3) for value in row]
+                for bucket, row in sorted(self.weights.items())
+                if any(abs(value) >= 5e-3 for value in row)
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "_LinearHead":
+        return cls(
+            tuple(data["labels"]),
+            {int(bucket): [float(v) for v in row] for bucket, row in data["weights"].items()},
+            [float(v) for v in data["bias"]],
+            float(data.get("temperature") or 1.0),
+        )
+
+    @classmethod
+    def fit(
+        cls,
+        samples: list[tuple[dict[int, float], int]],
+        labels: tuple[str, ...],
+        epochs: int,
+        learning_rate: float,
+        l2: float,
+        seed: int,
+    ) -> "_LinearHead":
+        weights: dict[int, list[float]] = {}
+        bias = [0.0] * len(labels)
+        order = list(range(len(samples)))
+        rng = random.Random(seed)
+        for epoch in range(epochs):
+            rng.shuffle(order)
+            rate = learning_rate / (1.0 + 0.1 * epoch)
+            head = cls(labels, weights, bias)
+            for sample_index in order:
+                features, target = samples[sample_index]
+                probs = head.probabilities(features)
+                grads = [p - (1.0 if i == target else 0.0) for i, p in enumerate(probs)]
+                for i, grad in enumerate(grads):
+                    bias[i] -= rate * grad
+                for bucket, value in features.items():
+                    row = weights.setdefault(bucket, [0.0] * len(labels))
+                    for i, grad in enumerate(grads):
+                        row[i] -= rate * (grad * value + l2 * row[i])
+        return cls(labels, weights, bias)
+
+
+def _encode(
+    samples: Iterable[tuple[str, str, str]], dim: int, ngram_range: tuple[int, int]
+) -> tuple[list[tuple[dict[int, float], int]], list[tuple[dict[int, float], int]]]:
+    """(text, severity, facility_type) triples as (features, label index) per head."""
+
+    severity_samples: list[tuple[dict[int, float], int]] = []
+    facility_samples: list[tuple[dict[int, float], int]] = []
+    for text, severity, facility_type in samples:
+        features = featurize(text, dim, ngram_range)
+        if not features:
+            continue
+        if severity in SEVERITIES:
+            severity_samples.append((features, SEVERITIES.index(severity)))
+        if facility_type in FACILITIES:
+            facility_samples.append((features, FACILITIES.index(facility_type)))
+    return severity_samples, facility_samples
+
+
+class TriageClassifier:
+    """
+    Local severity / facility_type classifier trained offline by
+    ml/triage_classifier/train_triage_classifier.py. Prediction is a sparse dot
+    product over a few hundred hashed n-grams, well under a millisecond.
+    """
+
+    def __init__(
+        self,
+        severity_head: _LinearHead,
+        facility_head: _LinearHead,
+        dim: int,
+        ngram_range: tuple[int, int] = (2, 4),
+        metadata: dict[str, Any] | None = None,
+    ) -> None:
+        self.severity_head = severity_head
+        self.facility_head = facility_head
+        self.dim = dim
+        self.ngram_range = ngram_range
+        self.metadata = metadata or {}
+
+    def predict(self, scenario: str) -> dict[str, Any]:
+        features = featurize(scenario, self.dim, self.ngram_range)
+        severity_probs = self.severity_head.probabilities(features)
+        facility_probs = self.facility_head.probabilities(features)
+        severity_index = max(range(len(severity_probs)), key=severity_probs.__getitem__)
+        facility_index = max(range(len(facility_probs)), key=facility_probs.__getitem__)
+        severity = self.severity_head.labels[severity_index]
+        return {
+            "severity": severity,
+            "facility_type": self.facility_head.labels[facility_index],
+            "is_emergency": severity != "none",
+            "confidence": severity_probs[severity_index] if features else 0.0,
+            "facility_confidence": facility_probs[facility_index] if features else 0.0,
+        }
+
+    def calibrate(self, samples: Iterable[tuple[str, str, str]]) -> dict[str, float]:
+        """
+        Fit both heads' softmax temperatures on held-out (text, severity, facility_type)
+        triples, so `confidence` tracks how often a prediction is right.
+        """
+
+        severity_samples, facility_samples = _encode(samples, self.dim, self.ngram_range)
+        return {
+            "severity": self.severity_head.calibrate(severity_samples),
+            "facility_type": self.facility_head.calibrate(facility_samples),
+        }
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "version": 1,
+            "dim": self.dim,
+            "ngram_range": list(self.ngram_range),
+            "metadata": self.metadata,
+            "severity": self.severity_head.to_dict(),
+            "facility_type": self.facility_head.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "TriageClassifier":
+        return cls(
+            severity_head=_LinearHead.from_dict(data["severity"]),
+            facility_head=_LinearHead.from_dict(data["facility_type"]),
+            dim=int(data["dim"]),
+            ngram_range=tuple(data.get("ngram_range") or (2, 4)),
+            metadata=data.get("metadata") or {},
+        )
+
+    def save(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, path: str) -> "TriageClassifier":
+        with open(path, encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+    @classmethod
+    def fit(
+        cls,
+        samples: Iterable[tuple[str, str, str]],
+        dim: int = 1 << 15,
+        ngram_range: tuple[int, int] = (2, 4),
+        epochs: int = 20,
+        learning_rate: float = 0.5,
+        l2: float = 1e-5,
+        seed: int = 13,
+        metadata: dict[str, Any] | None = None,
+    ) -> "TriageClassifier":
+        """Train on (text, severity, facility_type) triples."""
+
+        severity_samples, facility_samples = _encode(samples, dim, ngram_range)
+        return cls(
+            severity_head=_LinearHead.fit(
+                severity_samples, SEVERITIES, epochs, learning_rate, l2, seed
+            ),
+            facility_head=_LinearHead.fit(
+                facility_samples, FACILITIES, epochs, learning_rate, l2, seed
+            ),
+            dim=dim,
+            ngram_range=ngram_range,
+            metadata=metadata,
+        )
+
+
+class TriageFastPath:
+    """
+    Decides when the local classifier may answer triage on its own.
+
+    Only critical predictions at or above TRIAGE_FASTPATH_CONFIDENCE skip the LLM:
+    under-triage is the costly mistake, so moderate/none predictions always defer.
+    TRIAGE_MODEL_PATH points at the model artifact; a missing or unreadable artifact
+    disables the fast path.
+    """
+
+    def __init__(
+        self,
+        model_path: str | None = None,
+        confidence: float | None = None,
+        enabled: bool | None = None,
+    ) -> None:
+        self.model_path = (
+            model_path
+            if model_path is not None
+            else str(os.getenv("TRIAGE_MODEL_PATH") or DEFAULT_MODEL_PATH)
+        )
+        self.confidence = (
+            confidence if confidence is not None else env_float("TRIAGE_FASTPATH_CONFIDENCE", 0.85)
+        )
+        if enabled is None:
+            enabled = env_flag("TRIAGE_FASTPATH", True)
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._classifier: TriageClassifier | None = None
+        self._loaded = False
+        self._load_error = ""
+        self._accepted = 0
+        self._deferred = 0
+
+    @property
+    def classifier(self) -> TriageClassifier | None:
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    try:
+                        self._classifier = TriageClassifier.load(self.model_path)
+                    except Exception as exc:
+                        self._load_error = str(exc)[:200]
+                        print(f"[triage_classifier] disabled: {exc}")
+                    self._loaded = True
+        return self._classifier
+
+    def predict(self, scenario: str) -> dict[str, Any] | None:
+        classifier = self.classifier
+        if classifier is None:
+            return None
+        try:
+            return classifier.predict(scenario)
+        except Exception as exc:
+            print(f"[triage_classifier] predict failed: {exc}")
+            return None
+
+    def accepts(self, prediction: dict[str, Any] | None) -> bool:
+        """True when the prediction is confident enough to stand in for LLM triage."""
+
+        accepted = (
+            self.enabled
+            and prediction is not None
+            and prediction.get("severity") == "critical"
+            and float(prediction.get("confidence") or 0.0) >= self.confidence
+        )
+        with self._lock:
+            if accepted:
+                self._accepted += 1
+            else:
+                self._deferred += 1
+        return accepted
+
+    def snapshot(self) -> dict[str, Any]:
+        classifier = self._classifier
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "loaded": classifier is not None,
+                "load_error": self._load_error,
+                "confidence": self.confidence,
+                "accepted": self._accepted,
+                "deferred": self._deferred,
+                "trained_on": (classifier.metadata.get("trained_on") if classifier else None),
+            }
@@ -0,0 +1,83 @@
+import os
+import unittest
+from unittest.mock import patch
+
+from bystander_backend.agents.admission import AdmissionController, queued_ms_from_header
+
+
+class AdmissionControllerTests(unittest.TestCase):
+    def test_sheds_when_in_flight_limit_reached(self):
+        controller = AdmissionController(max_in_flight=2, max_queue_wait_ms=60000, capacity=4)
+        self.assertTrue(controller.try_acquire())
+        self.assertTrue(controller.try_acquire())
+        self.assertFalse(controller.try_acquire())
+        controller.release(1.0)
+        self.assertTrue(controller.try_acquire())
+        self.assertEqual(controller.snapshot()["shed"], 1)
+
+    def test_sheds_when_estimated_queue_wait_too_long(self):
+        controller = AdmissionController(max_in_flight=100, max_queue_wait_ms=5000, capacity=1)
+        self.assertTrue(controller.try_acquire())
+        controller.release(20.0)
+        self.assertTrue(controller.try_acquire())
+        # One workflow already holds the only slot; the next would wait ~avg duration.
+        self.assertGreater(controller.estimated_queue_wait_ms(), 5000)
+        self.assertFalse(controller.try_acquire())
+
+    def test_spare_slots_leave_room_for_workflows(self):
+        controller = AdmissionController(max_in_flight=10, max_queue_wait_ms=60000, capacity=3)
+        self.assertTrue(controller.try_acquire_spare())
+        self.assertTrue(controller.try_acquire())
+        self.assertFalse(controller.try_acquire_spare())
+        controller.release(0.0)
+        self.assertTrue(controller.try_acquire_spare())
+        snapshot = controller.snapshot()
+        self.assertEqual((snapshot["spare_refused"], snapshot["avg_duration_ms"]), (1, 6000.0))
+
+    def test_production_defaults_shed_on_upstream_backlog(self):
+        env = {
+            k: v
+            for k, v in os.environ.items()
+            if not k.startswith("ADMISSION_") and k != "GUNICORN_THREADS"
+        }
+        backlog = [0]
+        with patch.dict(os.environ, env, clear=True):
+            controller = AdmissionController(backlog=lambda: backlog[0])
+        self.assertEqual((controller.capacity, controller.max_in_flight), (4, 8))
+        # gthread: never more workflows than the 4 threads, and alone they never shed.
+        for _ in range(4):
+            self.assertTrue(controller.try_acquire())
+        for _ in range(4):
+            controller.release(0.0)
+
+        # Refinements, speculative scripts and calls queued for a provider slot pile up
+        # behind the threads; with 3 workflows running that is 8 units of LLM work.
+        backlog[0] = 5
+        for _ in range(3):
+            self.assertTrue(controller.try_acquire())
+        self.assertFalse(controller.try_acquire())
+        self.assertEqual(controller.snapshot()["backlog"], 5)
+
+        # A slow upstream stretches the estimate until a smaller backlog sheds too.
+        for _ in range(3):
+            controller.release(0.0)
+        backlog[0] = 0
+        for _ in range(8):
+            self.assertTrue(controller.try_acquire())
+            controller.release(30.0)
+        backlog[0] = 2
+        for _ in range(3):
+            self.assertTrue(controller.try_acquire())
+        self.assertGreater(controller.estimated_queue_wait_ms(), 8000)
+        self.assertFalse(controller.try_acquire())
+
+    def test_upstream_queue_time_counts_against_budget(self):
+        controller = AdmissionController(max_in_flight=10, max_queue_wait_ms=1000, capacity=4)
+        self.assertFalse(controller.try_acquire(queued_ms=1500))
+        self.assertAlmostEqual(queued_ms_from_header("t=100.0", now=101.0), 1000.0)
+        self.assertAlmostEqual(queued_ms_from_header("1700000000000", now=1700000001.0), 1000.0)
+        self.assertEqual(queued_ms_from_header(None), 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -30,6 +30,17 @@ class _StubWorkflow:
     async def run_async(self, data):
         return {"route": "general_info", "is_emergency": False}
 
+    async def stream_async(self, data, emit):
+        emit({"type": "triage", "severity": "critical"})
+        emit({"type": "step", "index": 1, "text": "1. โทร 1669"})
+        return {"route": "emergency_guidance", "guidance": "1. โทร 1669"}
+
+    def run_degraded(self, data):
+        return {"route": "emergency_guidance", "is_emergency": True, "degraded": True}
+
+    def generate_call_script_degraded(self, data):
+        return {"call_script": "static script", "degraded": True}
+
     async def find_facilities_async(self, data):
         latitude = data.get("latitude")
         longitude = data.get("longitude")
@@ -106,6 +117,75 @@ class AgentAppTests(unittest.TestCase):
         self.assertEqual(data["call_script"], "test call script")
         self.assertEqual(data["used_medical_history"], ["asthma"])
 
+    def test_agent_workflow_stream_sends_server_sent_events(self):
+        resp = self.client.post("/agent_workflow_stream", json={"scenario": "test"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.mimetype.startswith("text/event-stream"))
+        body = resp.get_data(as_text=True)
+        events = [
+            line[len("event: ") :] for line in body.splitlines() if line.startswith("event: ")
+        ]
+        self.assertEqual(events, ["triage", "step", "final"])
+        self.assertIn('"guidance": "1. โทร 1669"', body)
+
+    def test_agent_workflow_stream_requires_scenario(self):
+        resp = self.client.post("/agent_workflow_stream", json={})
+        self.assertEqual(resp.status_code, 400)
+
+    def test_agent_workflow_sheds_load_with_degraded_response(self):
+        from bystander_backend.agents.admission import AdmissionController
+
+        with patch(
+            "bystander_backend.agents.app.admission",
+            new=AdmissionController(max_in_flight=0, max_queue_wait_ms=0, capacity=1),
+        ):
+            resp = self.client.post("/agent_workflow", json={"scenario": "test"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.get_json()["degraded"])
+
+    def test_agent_workflow_replays_response_for_same_idempotency_key(self):
+        from bystander_backend.agents.idempotency import IdempotencyStore
+
+        calls = []
+        stub = _StubWorkflow()
+
+        async def counting_run_async(data):
+            calls.append(data)
+            return {"route": "emergency_guidance", "run": len(calls)}
+
+        stub.run_async = counting_run_async
+        headers = {"Idempotency-Key": "retry-1"}
+        with (
+            patch("bystander_backend.agents.app.workflow", new=stub),
+            patch("bystander_backend.agents.app.idempotency", new=IdempotencyStore()),
+        ):
+            first = self.client.post("/agent_workflow", json={"scenario": "a"}, headers=headers)
+            retry = self.client.post("/agent_workflow", json={"scenario": "a"}, headers=headers)
+            changed = self.client.post("/agent_workflow", json={"scenario": "b"}, headers=headers)
+        self.assertEqual(retry.get_json(), first.get_json())
+        self.assertEqual(changed.get_json()["run"], 2)
+        self.assertEqual(len(calls), 2)
+
+    def test_guidance_session_long_poll_needs_a_spare_slot(self):
+        from bystander_backend.agents.admission import AdmissionController
+        from bystander_backend.agents.guidance_sessions import GuidanceSessions
+
+        stub = _StubWorkflow()
+        stub.guidance_sessions = GuidanceSessions(sqlite_path="")
+        session_id = stub.guidance_sessions.open()
+        with (
+            patch("bystander_backend.agents.app.workflow", new=stub),
+            patch(
+                "bystander_backend.agents.app.admission",
+                new=AdmissionController(max_in_flight=10, max_queue_wait_ms=0, capacity=1),
+            ),
+        ):
+            resp = self.client.get(f"/guidance_session/{session_id}?wait=5")
+            missing = self.client.get("/guidance_session/unknown")
+        self.assertEqual(resp.get_json()["status"], "pending")
+        self.assertEqual(resp.headers["Retry-After"], "1")
+        self.assertEqual(missing.status_code, 404)
+
 
 if __name__ == "__main__":
     unittest.main()
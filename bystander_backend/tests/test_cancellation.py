@@ -0,0 +1,81 @@
+import asyncio
+import socket
+import threading
+import time
+import unittest
+
+from bystander_backend.agents.agents import ByStanderWorkflow
+from bystander_backend.agents.cancellation import (
+    CancellationRegistry,
+    CancelToken,
+    RequestCancelled,
+    run_cancellable,
+    socket_disconnect_probe,
+)
+
+
+class CancellationTests(unittest.TestCase):
+    def test_registering_same_key_supersedes_previous_request(self):
+        registry = CancellationRegistry()
+        first = registry.register(("agent_workflow", "abc"))
+        second = registry.register(("agent_workflow", "abc"))
+        other = registry.register(("call_script", "abc"))
+
+        self.assertTrue(first.cancelled)
+        self.assertEqual(first.reason, "superseded")
+        self.assertFalse(second.cancelled)
+        self.assertFalse(other.cancelled)
+        registry.unregister(("agent_workflow", "abc"), first)
+        self.assertEqual(registry.snapshot()["active"], 2)
+
+    @unittest.skipUnless(hasattr(socket, "MSG_DONTWAIT"), "needs MSG_DONTWAIT")
+    def test_socket_probe_detects_closed_peer(self):
+        server, client = socket.socketpair()
+        try:
+            probe = socket_disconnect_probe(server)
+            self.assertFalse(probe())
+            client.close()
+            self.assertTrue(probe())
+        finally:
+            server.close()
+
+    def test_cancel_stops_workflow_and_blocking_checkpoints(self):
+        workflow = ByStanderWorkflow()
+        workflow.stage_timeouts.enabled = False
+        calls = []
+
+        def slow_search(**_kwargs):
+            calls.append("search")
+            time.sleep(0.2)
+            return {"results": []}
+
+        workflow.map_agent._nearby_search = slow_search
+        workflow.map_agent._build_query_plan = lambda *_args: (
+            [{"radius": 1000, "type": "hospital", "keyword": "k"}] * 5
+        )
+        token = CancelToken()
+        threading.Timer(0.1, token.cancel, args=("superseded",)).start()
+
+        started = time.perf_counter()
+        with self.assertRaises(RequestCancelled):
+            asyncio.run(
+                run_cancellable(
+                    workflow.find_facilities_async(
+                        {
+                            "scenario": "เจ็บหน้าอก",
+                            "severity": "critical",
+                            "latitude": 13.75,
+                            "longitude": 100.5,
+                        }
+                    ),
+                    token,
+                )
+            )
+        self.assertLess(time.perf_counter() - started, 0.4)
+        # The in-flight search finishes, but no further Maps calls are issued.
+        time.sleep(0.3)
+        self.assertEqual(len(calls), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
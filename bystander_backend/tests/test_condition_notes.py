@@ -0,0 +1,104 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from bystander_backend.agents.condition_notes import ConditionNotesCache
+from bystander_backend.agents.llm_agent import GuidanceAgent
+
+
+class _SlowSearch:
+    def __init__(self, delays):
+        self.delays = delays
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def __call__(self, condition):
+        with self._lock:
+            self.calls.append(condition)
+        time.sleep(self.delays.get(condition, 0.0))
+        return f"notes for {condition}"
+
+
+class ConditionNotesCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.seed_path = os.path.join(self.tmp.name, "seeds.json")
+
+    def _cache(self, **kwargs):
+        kwargs.setdefault("seed_path", self.seed_path)
+        kwargs.setdefault("sqlite_path", "")
+        return ConditionNotesCache(**kwargs)
+
+    def test_seeds_sqlite_and_empty_ttl(self):
+        with open(self.seed_path, "w", encoding="utf-8") as f:
+            json.dump({"notes": {"Asthma": "use the inhaler"}}, f)
+        sqlite_path = os.path.join(self.tmp.name, "notes.sqlite3")
+        cache = self._cache(sqlite_path=sqlite_path, empty_ttl_sec=0.01)
+        self.assertEqual(cache.get(" asthma "), "use the inhaler")
+        self.assertIsNone(cache.get("epilepsy"))
+
+        cache.put("Epilepsy", "protect the head")
+        cache.put("rare thing", "")
+        self.assertEqual(cache.get("rare thing"), "")
+        time.sleep(0.02)
+        self.assertIsNone(cache.get("rare thing"))
+        # A fresh process sharing the database sees earlier lookups.
+        self.assertEqual(self._cache(sqlite_path=sqlite_path).get("epilepsy"), "protect the head")
+
+    def test_fetch_many_runs_misses_concurrently(self):
+        cache = self._cache()
+        cache.put("asthma", "cached")
+        search = _SlowSearch({"diabetes": 0.2, "epilepsy": 0.2, "hemophilia": 0.2})
+        started = time.monotonic()
+        notes = cache.fetch_many(
+            ["asthma", "diabetes", "epilepsy", "hemophilia"], search, cutoff_sec=2.0
+        )
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertEqual(list(notes), ["asthma", "diabetes", "epilepsy", "hemophilia"])
+        self.assertEqual(notes["asthma"], "cached")
+        self.assertEqual(sorted(search.calls), ["diabetes", "epilepsy", "hemophilia"])
+
+        # Second request is answered entirely from the cache.
+        self.assertEqual(
+            cache.fetch_many(["diabetes"], search, cutoff_sec=2.0),
+            {"diabetes": "notes for diabetes"},
+        )
+        self.assertEqual(len(search.calls), 3)
+
+    def test_cutoff_returns_ready_notes_and_stragglers_fill_cache(self):
+        cache = self._cache()
+        search = _SlowSearch({"slow": 0.3})
+        started = time.monotonic()
+        notes = cache.fetch_many(["fast", "slow"], search, cutoff_sec=0.1)
+        self.assertLess(time.monotonic() - started, 0.25)
+        self.assertEqual(notes, {"fast": "notes for fast"})
+        self.assertEqual(cache.snapshot()["late"], 1)
+
+        # A concurrent request joins the in-flight lookup instead of starting another.
+        self.assertEqual(
+            cache.fetch_many(["slow"], search, cutoff_sec=1.0), {"slow": "notes for slow"}
+        )
+        self.assertEqual(search.calls.count("slow"), 1)
+        self.assertEqual(cache.get("slow"), "notes for slow")
+
+
+class GuidanceWebFallbackTests(unittest.TestCase):
+    def test_prompt_lists_notes_for_unaddressed_conditions(self):
+        agent = GuidanceAgent(llm=None)
+        agent.condition_notes = ConditionNotesCache(seed_path="", sqlite_path="")
+        agent._search_condition_guidance = _SlowSearch({})
+        medical_context = {"individuals": [{"name": "A", "conditions": ["Asthma", "Diabetes"]}]}
+        prompt, triggered = agent._build_web_fallback_context(
+            "[Protocol 1] asthma attack", medical_context
+        )
+        self.assertEqual(triggered, ["Diabetes"])
+        self.assertIn("- Diabetes: notes for Diabetes", prompt)
+        self.assertNotIn("Asthma:", prompt)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,27 @@
+import os
+import unittest
+from unittest.mock import patch
+
+from bystander_backend.agents.config import env_flag, env_float, parse_flag
+
+
+class ConfigTests(unittest.TestCase):
+    def test_env_float_falls_back_on_missing_or_bad_values(self):
+        with patch.dict(os.environ, {"X_FLOAT": "2.5", "X_BAD": "fast"}):
+            self.assertEqual(env_float("X_FLOAT", 1.0), 2.5)
+            self.assertEqual(env_float("X_BAD", 1.0), 1.0)
+            self.assertEqual(env_float("X_MISSING", 1.0), 1.0)
+
+    def test_flags_accept_both_spellings_and_keep_the_default_otherwise(self):
+        with patch.dict(os.environ, {"X_ON": " Yes ", "X_OFF": "off", "X_ODD": "maybe"}):
+            self.assertTrue(env_flag("X_ON", False))
+            self.assertFalse(env_flag("X_OFF", True))
+            self.assertTrue(env_flag("X_ODD", True))
+            self.assertFalse(env_flag("X_MISSING", False))
+        self.assertTrue(parse_flag(1, False))
+        self.assertFalse(parse_flag(False, True))
+        self.assertTrue(parse_flag(None, True))
+
+
+if __name__ == "__main__":
+    unittest.main()
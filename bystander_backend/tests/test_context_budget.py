@@ -0,0 +1,59 @@
+import os
+import unittest
+from unittest.mock import patch
+
+from bystander_backend.agents.context_budget import (
+    ContextBudgeter,
+    estimate_tokens,
+    split_snippets,
+)
+
+RAG_CONTEXT = (
+    "[Protocol 1] ผึ้งต่อย\n"
+    "- Keywords: ผึ้ง, ต่อย\n"
+    "- Guidance: 1. ดึงเหล็กในออก 2. ล้างแผลด้วยสบู่และน้ำ 3. ประคบเย็น\n"
+    "- Severity: moderate\n"
+    "- Facility: clinic\n\n"
+    "[Protocol 2] แผลไฟไหม้\n"
+    "- Keywords: ไฟไหม้\n"
+    "- Guidance: 1. ราดน้ำเย็นที่แผลอย่างน้อย 20 นาที 2. ห้ามทายาสีฟัน\n"
+    "- Severity: moderate\n"
+    "- Facility: clinic\n\n"
+    "[Vertex Protocol 3] Bee sting\n"
+    "- source=gs://protocols/bee.pdf\n"
+    "1. ดึงเหล็กในออก 2. ล้างแผลด้วยสบู่และน้ำ 3. ประคบเย็น"
+)
+
+
+class ContextBudgetTests(unittest.TestCase):
+    def test_split_snippets_drops_metadata_and_keeps_titles(self):
+        snippets = split_snippets(RAG_CONTEXT)
+        self.assertEqual(len(snippets), 3)
+        self.assertTrue(snippets[0].startswith("ผึ้งต่อย: 1. ดึงเหล็กในออก"))
+        self.assertNotIn("Keywords", "".join(snippets))
+        self.assertNotIn("gs://", "".join(snippets))
+
+    def test_pack_dedups_ranks_and_reports_savings(self):
+        budgeter = ContextBudgeter(default_budget=1000, dedup_threshold=0.85)
+        packed = budgeter.pack("โดนไฟไหม้ที่แขน", RAG_CONTEXT, "some-model")
+        lines = packed["text"].splitlines()
+        self.assertEqual(packed["duplicates"], 1)
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[0].startswith("- แผลไฟไหม้:"))
+        self.assertLess(packed["tokens_after"], packed["tokens_before"])
+        self.assertEqual(
+            budgeter.snapshot()["tokens_saved"], packed["tokens_before"] - packed["tokens_after"]
+        )
+
+    def test_pack_respects_per_model_budget(self):
+        budgeter = ContextBudgeter(default_budget=1000)
+        with patch.dict(os.environ, {"CONTEXT_TOKEN_BUDGET_TINY_MODEL_1": "30"}):
+            packed = budgeter.pack("ผึ้งต่อย", RAG_CONTEXT, "tiny-model.1")
+        self.assertEqual(packed["budget"], 30)
+        self.assertEqual(packed["snippets"], 1)
+        self.assertLessEqual(estimate_tokens(packed["text"]), 30)
+        self.assertTrue(packed["text"].startswith("- ผึ้งต่อย:"))
+
+
+if __name__ == "__main__":
+    unittest.main()
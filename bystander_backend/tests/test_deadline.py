@@ -0,0 +1,56 @@
+import asyncio
+import time
+import unittest
+
+from bystander_backend.agents.agents import ByStanderWorkflow
+from bystander_backend.agents.deadline import (
+    Deadline,
+    budget_is_low,
+    current_deadline,
+    remaining_timeout,
+    use_deadline,
+)
+
+
+class DeadlineTests(unittest.TestCase):
+    def test_header_budget_is_capped_by_endpoint_default(self):
+        deadline = Deadline.for_endpoint("find_facilities", "999999")
+        self.assertLessEqual(deadline.timeout_sec, 12.0)
+        self.assertAlmostEqual(Deadline.for_endpoint("find_facilities", "1500").timeout_sec, 1.5)
+        self.assertGreater(Deadline.for_endpoint("agent_workflow", "garbage").timeout_sec, 0)
+
+    def test_stage_budget_is_min_of_stage_and_remaining(self):
+        deadline = Deadline(2.0)
+        self.assertLessEqual(deadline.budget(10.0), 2.0)
+        self.assertEqual(deadline.budget(0.5), 0.5)
+
+    def test_downstream_timeouts_follow_active_deadline(self):
+        self.assertIsNone(current_deadline())
+        self.assertEqual(remaining_timeout(10.0), 10.0)
+        with use_deadline(Deadline(1.0)):
+            self.assertLessEqual(remaining_timeout(10.0), 1.0)
+            self.assertTrue(budget_is_low(threshold=3.0))
+        self.assertIsNone(current_deadline())
+
+    def test_slow_stage_is_cut_at_deadline_without_joining_thread(self):
+        workflow = ByStanderWorkflow()
+
+        def slow_stage():
+            time.sleep(1.0)
+            return "late"
+
+        async def run():
+            return await workflow._run_blocking_with_timeout(
+                slow_stage, timeout=15.0, default="fallback"
+            )
+
+        started = time.perf_counter()
+        with use_deadline(Deadline(0.2)):
+            result = asyncio.run(run())
+        elapsed = time.perf_counter() - started
+        self.assertEqual(result, "fallback")
+        self.assertLess(elapsed, 0.6)
+
+
+if __name__ == "__main__":
+    unittest.main()
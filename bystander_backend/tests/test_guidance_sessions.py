@@ -0,0 +1,172 @@
+import asyncio
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from bystander_backend.agents import agents as agents_module
+from bystander_backend.agents.agents import ByStanderWorkflow, _protocol_guidance
+from bystander_backend.agents.guidance_sessions import GuidanceSessions
+
+CARDIAC_ARREST = "มีคนหมดสติ ไม่หายใจ หัวใจวาย ต้องปั๊มหัวใจ"
+CRITICAL_TRIAGE = {
+    "is_emergency": True,
+    "severity": "critical",
+    "facility_type": "hospital",
+    "reason_th": "",
+}
+
+
+class GuidanceSessionsTests(unittest.TestCase):
+    def test_pending_until_completed_and_long_poll_wakes_up(self):
+        sessions = GuidanceSessions()
+        session_id = sessions.open()
+        self.assertEqual(sessions.get(session_id)["status"], "pending")
+        threading.Timer(0.05, sessions.complete, (session_id, {"guidance": "1. a"})).start()
+        state = sessions.get(session_id, wait_sec=2)
+        self.assertEqual(state["status"], "ready")
+        self.assertEqual(state["result"], {"guidance": "1. a"})
+        self.assertIsNone(sessions.get("unknown"))
+
+    def test_failed_and_expired_sessions(self):
+        sessions = GuidanceSessions(ttl_sec=0.05)
+        session_id = sessions.open()
+        sessions.fail(session_id, "no model")
+        self.assertEqual(sessions.get(session_id)["error"], "no model")
+        time.sleep(0.06)
+        self.assertIsNone(sessions.get(session_id))
+        self.assertEqual(sessions.snapshot()["failed"], 1)
+
+    def test_session_is_visible_to_another_worker(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        path = os.path.join(tmp.name, "sessions.sqlite3")
+        answering, polled = GuidanceSessions(sqlite_path=path), GuidanceSessions(sqlite_path=path)
+        session_id = answering.open()
+        self.assertEqual(polled.get(session_id)["status"], "pending")
+        threading.Timer(0.05, answering.complete, (session_id, {"guidance": "1. a"})).start()
+        state = polled.get(session_id, wait_sec=2)
+        self.assertEqual((state["status"], state["result"]), ("ready", {"guidance": "1. a"}))
+        failed_id = answering.open()
+        answering.fail(failed_id, "no model")
+        self.assertEqual(polled.get(failed_id)["error"], "no model")
+        # Memory-only sessions stay on the worker that opened them.
+        self.assertIsNone(GuidanceSessions(sqlite_path="").get(session_id))
+
+    def test_protocol_guidance_is_renumbered_and_calls_1669(self):
+        text = _protocol_guidance({"instructions": "1. เรียกผู้ป่วย 2. กดหน้าอก"})
+        self.assertTrue(text.startswith("1. เรียกผู้ป่วย\n2. กดหน้าอก\n3. "))
+        self.assertIn("1669", text)
+
+
+class InstantCriticalAnswerTests(unittest.IsolatedAsyncioTestCase):
+    def _workflow(self, guidance):
+        workflow = ByStanderWorkflow()
+
+        async def triage(_scenario):
+            return dict(CRITICAL_TRIAGE)
+
+        async def rag(_scenario, _severity):
+            return {"source": "none", "count": 0}, "context"
+
+        workflow._triage_async = triage
+        workflow._retrieve_rag_async = rag
+        workflow.guidance_agent.run_async = guidance
+        return workflow
+
+    async def test_critical_report_is_answered_before_llm_guidance(self):
+        release = threading.Event()
+
+        async def slow_guidance(*_args, **_kwargs):
+            await asyncio.to_thread(release.wait, 5)
+            return {"guidance": "1. ปั๊มหัวใจ\n2. โทร 1669", "facility_type": "hospital"}
+
+        workflow = self._workflow(slow_guidance)
+        started = time.perf_counter()
+        response = await workflow.run_async({"scenario": CARDIAC_ARREST, "instant_answer": True})
+        self.assertLess(time.perf_counter() - started, 1.0)
+        self.assertEqual(response["guidance_source"], "protocol")
+        self.assertTrue(response["guidance"].startswith("1. "))
+        self.assertIn("1669", response["guidance"])
+
+        session_id = response["guidance_session"]
+        self.assertEqual(workflow.guidance_sessions.get(session_id)["status"], "pending")
+        release.set()
+        state = await asyncio.to_thread(workflow.guidance_sessions.get, session_id, 5)
+        self.assertEqual(state["status"], "ready")
+        self.assertEqual(state["result"]["guidance"], "1. ปั๊มหัวใจ\n2. โทร 1669")
+        self.assertEqual(state["result"]["guidance_source"], "llm")
+
+    async def test_failed_refinement_leaves_protocol_answer_standing(self):
+        async def broken_guidance(*_args, **_kwargs):
+            return {
+                "guidance": agents_module.EMERGENCY_FALLBACK_GUIDANCE,
+                "facility_type": "hospital",
+            }
+
+        workflow = self._workflow(broken_guidance)
+        response = await workflow.run_async({"scenario": CARDIAC_ARREST, "instant_answer": True})
+        state = await asyncio.to_thread(
+            workflow.guidance_sessions.get, response["guidance_session"], 5
+        )
+        self.assertEqual(state["status"], "failed")
+
+    async def test_instant_answer_is_opt_in_and_needs_a_protocol_match(self):
+        async def guidance(*_args, **_kwargs):
+            return {"guidance": "1. llm\n2. โทร 1669", "facility_type": "hospital"}
+
+        workflow = self._workflow(guidance)
+        response = await workflow.run_async({"scenario": CARDIAC_ARREST})
+        self.assertEqual(response["guidance"], "1. llm\n2. โทร 1669")
+        self.assertNotIn("guidance_session", response)
+        unmatched = await workflow.run_async({"scenario": "zzzz", "instant_answer": True})
+        self.assertEqual(unmatched["guidance"], "1. llm\n2. โทร 1669")
+
+    async def test_keyword_only_matches_take_the_normal_path(self):
+        async def guidance(*_args, **_kwargs):
+            return {"guidance": "1. llm\n2. โทร 1669", "facility_type": "hospital"}
+
+        workflow = self._workflow(guidance)
+        # Their best keyword matches are the lightning and (mild) tear-gas protocols.
+        for scenario in ("พ่อล้มลงหมดสติ หัวใจหยุดเต้น", "เพื่อนแพ้ถั่ว ปากบวม หายใจลำบาก"):
+            response = await workflow.run_async({"scenario": scenario, "instant_answer": True})
+            self.assertEqual(response["guidance"], "1. llm\n2. โทร 1669")
+            self.assertNotIn("guidance_session", response)
+
+    async def test_refinement_does_not_submit_a_second_judge_job(self):
+        async def guidance(*_args, **_kwargs):
+            return {"guidance": "1. ปั๊มหัวใจ\n2. โทร 1669", "facility_type": "hospital"}
+
+        workflow = self._workflow(guidance)
+        judged = []
+        workflow.judge_service.submit = judged.append
+        response = await workflow.run_async({"scenario": CARDIAC_ARREST, "instant_answer": True})
+        state = await asyncio.to_thread(
+            workflow.guidance_sessions.get, response["guidance_session"], 5
+        )
+        self.assertEqual(state["status"], "ready")
+        self.assertEqual(len(judged), 1)
+
+    async def test_stream_emits_protocol_steps_before_llm_guidance(self):
+        async def guidance(*_args, **_kwargs):
+            return {}
+
+        workflow = self._workflow(guidance)
+
+        def stream(*_args, **_kwargs):
+            yield {"type": "step", "index": 1, "text": "1. llm"}
+            yield {"type": "final", "guidance": "1. llm", "facility_type": "hospital"}
+
+        workflow.guidance_agent.stream = stream
+        events = []
+        result = await workflow.stream_async(
+            {"scenario": CARDIAC_ARREST, "instant_answer": "1"}, events.append
+        )
+        self.assertEqual([event["type"] for event in events], ["triage", "instant", "step"])
+        self.assertIn("1669", events[1]["guidance"])
+        self.assertEqual(result["guidance"], "1. llm")
+
+
+if __name__ == "__main__":
+    unittest.main()
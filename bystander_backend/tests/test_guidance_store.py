@@ -0,0 +1,85 @@
+import json
+import os
+import tempfile
+import unittest
+
+from bystander_backend.agents.agents import ByStanderWorkflow
+from bystander_backend.agents.guidance_store import (
+    STORE_FORMAT,
+    GuidanceStore,
+    entry_key,
+    protocol_fingerprint,
+    validate_guidance,
+)
+
+_ROW = {
+    "case_name_th": "หัวใจหยุดเต้นเฉียบพลัน",
+    "case_name_en": "cardiac arrest",
+    "keywords": "ไม่หายใจ, CPR",
+    "instructions": "โทร 1669 และเริ่ม CPR",
+    "severity": "critical",
+    "facility_type": "hospital",
+}
+_GUIDANCE = "สถานการณ์นี้เป็นเหตุฉุกเฉิน\n1. โทร 1669 ทันที\n2. เริ่ม CPR"
+
+
+class GuidanceStoreTests(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "store.json")
+        entries = {
+            entry_key(_ROW, "critical"): {
+                "guidance": _GUIDANCE,
+                "facility_type": "hospital",
+                "protocol_sha1": protocol_fingerprint(_ROW),
+            },
+            # Fails validation (no numbered steps): never loaded.
+            entry_key(_ROW, "moderate"): {
+                "guidance": "x",
+                "facility_type": "clinic",
+                "protocol_sha1": protocol_fingerprint(_ROW),
+            },
+        }
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump({"format": STORE_FORMAT, "version": "v1", "entries": entries}, f)
+
+    def test_validate_guidance(self):
+        self.assertEqual(validate_guidance(_GUIDANCE, "hospital", "critical"), [])
+        self.assertTrue(validate_guidance("1. กดแผล\n2. พัก", "hospital", "critical"))
+        self.assertTrue(validate_guidance("พักผ่อน", "clinic", "moderate"))
+
+    def test_lookup_requires_confident_and_current_match(self):
+        store = GuidanceStore(self.path, min_score=5)
+        self.assertEqual(store.snapshot()["entries"], 1)
+        self.assertEqual(store.lookup(_ROW, 7, "critical")["guidance"], _GUIDANCE)
+        self.assertIsNone(store.lookup(_ROW, 2, "critical"))
+        self.assertIsNone(store.lookup(_ROW, 7, "moderate"))
+        edited = dict(_ROW, instructions="โทร 1669")
+        self.assertIsNone(store.lookup(edited, 7, "critical"))
+        snapshot = store.snapshot()
+        self.assertEqual((snapshot["hits"], snapshot["stale"]), (1, 1))
+
+    def test_workflow_serves_stored_guidance_without_generation(self):
+        workflow = ByStanderWorkflow()
+        workflow.retriever.rows = [_ROW]
+        workflow.guidance_agent.store = GuidanceStore(self.path, min_score=5)
+
+        def should_not_run(*_args, **_kwargs):
+            raise AssertionError("stored guidance must not call the LLM")
+
+        workflow.guidance_agent.run = should_not_run
+        workflow.guidance_agent.run_async = should_not_run
+        prepared = {
+            "scenario": "หัวใจหยุดเต้นเฉียบพลัน ไม่หายใจ",
+            "severity": "critical",
+            "guidance_key": ("guidance",),
+        }
+        self.assertEqual(workflow._materialized_guidance(prepared)["guidance"], _GUIDANCE)
+        # Personalized requests are always generated.
+        prepared["guidance_key"] = None
+        self.assertIsNone(workflow._materialized_guidance(prepared))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+import asyncio
+import time
+import unittest
+from unittest.mock import patch
+
+from bystander_backend.agents import llm_agent
+from bystander_backend.agents.hedging import HedgePolicy, run_hedged
+from bystander_backend.agents.llm_agent import GeminiJSONAgent, GuidanceAgent
+from bystander_backend.agents.provider_health import ProviderHealth
+
+
+def _slow(value, delay):
+    def attempt():
+        time.sleep(delay)
+        return value
+
+    return attempt
+
+
+class RunHedgedTests(unittest.TestCase):
+    def test_backup_wins_when_primary_is_slow(self):
+        policy = HedgePolicy(severities={"critical"})
+        started = time.perf_counter()
+        winner = run_hedged(
+            [("vertex", _slow('{"a": 1}', 0.5)), ("genai", _slow('{"a": 2}', 0.05))],
+            delay_sec=0.05,
+            is_valid=lambda text: text.startswith("{"),
+            timeout=2.0,
+            policy=policy,
+        )
+        self.assertEqual(winner, ("genai", '{"a": 2}'))
+        self.assertLess(time.perf_counter() - started, 0.3)
+        self.assertEqual(policy.snapshot()["backup_wins"], 1)
+
+    def test_fast_primary_never_fires_backup(self):
+        policy = HedgePolicy(severities={"critical"})
+        calls = []
+
+        def backup():
+            calls.append("backup")
+            return "{}"
+
+        winner = run_hedged(
+            [("vertex", _slow("{}", 0.01)), ("genai", backup)],
+            delay_sec=0.5,
+            is_valid=lambda text: True,
+            timeout=2.0,
+            policy=policy,
+        )
+        self.assertEqual(winner[0], "vertex")
+        self.assertEqual(calls, [])
+
+    def test_invalid_or_failed_primary_fires_backup_immediately(self):
+        def broken():
+            raise RuntimeError("503")
+
+        started = time.perf_counter()
+        winner = run_hedged(
+            [("vertex", broken), ("genai", _slow('{"ok": true}', 0.01))],
+            delay_sec=5.0,
+            is_valid=lambda text: True,
+            timeout=2.0,
+            policy=HedgePolicy(severities={"critical"}),
+        )
+        self.assertEqual(winner[0], "genai")
+        self.assertLess(time.perf_counter() - started, 1.0)
+
+    def test_delay_follows_observed_percentile(self):
+        policy = HedgePolicy(
+            severities={"critical"},
+            percentile=90,
+            default_delay_sec=3.0,
+            min_delay_sec=0.1,
+            max_delay_sec=8.0,
+            min_samples=5,
+        )
+        self.assertEqual(policy.delay_for("vertex:m"), 3.0)
+        for value in (0.2, 0.3, 0.4, 0.5, 1.0):
+            policy.observe("vertex:m", value)
+        self.assertEqual(policy.delay_for("vertex:m"), 1.0)
+        self.assertFalse(policy.enabled_for("moderate"))
+
+
+class GuidanceHedgingTests(unittest.TestCase):
+    def test_critical_guidance_hedges_to_secondary_provider(self):
+        llm = GeminiJSONAgent()
+        llm.vertex_enabled = True
+        llm.client = object()
+        llm._routes.clear()
+
+        async def slow_vertex(**_kwargs):
+            await asyncio.sleep(0.5)
+            return '{"guidance": "vertex", "facility_type": "hospital"}'
+
+        async def fast_genai(**_kwargs):
+            return '{"guidance": "genai", "facility_type": "hospital"}'
+
+        llm._generate_json_with_vertex_async = slow_vertex
+        llm._generate_json_with_google_genai_async = fast_genai
+        policy = HedgePolicy(severities={"critical"}, default_delay_sec=0.05, min_samples=100)
+        with (
+            patch.object(llm_agent, "PROVIDER_HEALTH", ProviderHealth()),
+            patch.object(llm_agent, "HEDGE_POLICY", policy),
+            patch.object(llm_agent, "GenerativeModel", object),
+            patch.object(llm_agent, "GenerationConfig", object),
+            patch.object(llm_agent, "types", object()),
+        ):
+            agent = GuidanceAgent(llm)
+            agent.deepseek_async_client = None
+            started = time.perf_counter()
+            out = agent.run("หมดสติ", "critical", "ctx")
+        self.assertEqual(out["guidance"], "genai")
+        self.assertLess(time.perf_counter() - started, 0.4)
+
+
+if __name__ == "__main__":
+    unittest.main()
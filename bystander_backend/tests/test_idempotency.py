@@ -0,0 +1,86 @@
+import os
+import tempfile
+import threading
+import unittest
+
+from bystander_backend.agents.idempotency import (
+    IdempotencyInProgress,
+    IdempotencyStore,
+    payload_fingerprint,
+)
+
+
+class IdempotencyStoreTests(unittest.TestCase):
+    def test_retry_attaches_to_running_request_then_replays(self):
+        store = IdempotencyStore(ttl_sec=60, max_entries=8, sqlite_path="")
+        fp = payload_fingerprint({"scenario": "x"})
+        future, owner = store.begin("agent_workflow:k", fp)
+        self.assertTrue(owner)
+
+        attached, owner = store.begin("agent_workflow:k", fp)
+        self.assertFalse(owner)
+        self.assertIs(attached, future)
+        self.assertEqual(store.followers("agent_workflow:k", future), 1)
+        with self.assertRaises(IdempotencyInProgress):
+            store.wait("agent_workflow:k", attached, 0.01)
+
+        threading.Timer(0.05, store.complete, args=("agent_workflow:k", future, {"ok": 1})).start()
+        self.assertEqual(store.wait("agent_workflow:k", attached, 1.0), {"ok": 1})
+        replay, owner = store.begin("agent_workflow:k", fp)
+        self.assertFalse(owner)
+        self.assertEqual(replay.result(), {"ok": 1})
+
+    def test_follower_that_gives_up_is_counted_off(self):
+        store = IdempotencyStore(ttl_sec=60, max_entries=8, sqlite_path="")
+        future, _ = store.begin("k", "fp")
+        first, _ = store.begin("k", "fp")
+        second, _ = store.begin("k", "fp")
+        self.assertEqual(store.followers("k", future), 2)
+
+        with self.assertRaises(IdempotencyInProgress):
+            store.wait("k", first, 0.01)
+        self.assertEqual(store.followers("k", future), 1)
+        with self.assertRaises(IdempotencyInProgress):
+            store.wait("k", second, 0.0)
+        # Nobody is waiting any more, so the owner may be cancelled on disconnect again.
+        self.assertEqual(store.followers("k", future), 0)
+
+    def test_different_payload_or_failure_starts_over(self):
+        store = IdempotencyStore(ttl_sec=60, max_entries=8, sqlite_path="")
+        future, _ = store.begin("k", payload_fingerprint({"a": 1}))
+        store.complete("k", future, {"ok": 1})
+        _, owner = store.begin("k", payload_fingerprint({"a": 2}))
+        self.assertTrue(owner)
+
+        failed, _ = store.begin("f", "fp")
+        store.fail("f", failed, RuntimeError("boom"))
+        _, owner = store.begin("f", "fp")
+        self.assertTrue(owner)
+
+    def test_degraded_results_are_not_cached_and_store_is_bounded(self):
+        store = IdempotencyStore(ttl_sec=60, max_entries=2, sqlite_path="")
+        future, _ = store.begin("d", "fp")
+        store.complete("d", future, {"degraded": True}, cache=False)
+        _, owner = store.begin("d", "fp")
+        self.assertTrue(owner)
+
+        for key in ("a", "b", "c"):
+            done, _ = store.begin(key, "fp")
+            store.complete(key, done, {})
+        self.assertLessEqual(store.snapshot()["entries"], 2)
+
+    def test_sqlite_backend_replays_across_stores(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "idem.sqlite")
+            first = IdempotencyStore(ttl_sec=60, sqlite_path=path)
+            future, _ = first.begin("k", "fp")
+            first.complete("k", future, {"guidance": "ok"})
+
+            other_worker = IdempotencyStore(ttl_sec=60, sqlite_path=path)
+            replay, owner = other_worker.begin("k", "fp")
+            self.assertFalse(owner)
+            self.assertEqual(replay.result(), {"guidance": "ok"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,131 @@
+import asyncio
+import threading
+import time
+import unittest
+
+from bystander_backend.agents.agents import ByStanderWorkflow
+from bystander_backend.agents.deadline import Deadline, current_deadline, use_deadline
+from bystander_backend.agents.hedging import HedgePolicy, run_hedged_async
+from bystander_backend.agents.io_loop import IOLoop
+from bystander_backend.agents.llm_agent import GeminiJSONAgent
+from bystander_backend.agents.rate_limit import ProviderLimiter, RateLimited
+
+
+class IOLoopTests(unittest.TestCase):
+    def test_runs_on_one_thread_in_the_callers_context(self):
+        loop = IOLoop(name="test-io-loop")
+
+        async def probe():
+            await asyncio.sleep(0.01)
+            return threading.current_thread().name, current_deadline()
+
+        deadline = Deadline(5.0)
+        with use_deadline(deadline):
+            futures = [loop.submit(probe()) for _ in range(20)]
+        results = [future.result(timeout=2) for future in futures]
+        self.assertEqual({name for name, _ in results}, {"test-io-loop"})
+        self.assertTrue(all(seen is deadline for _, seen in results))
+        self.assertEqual(loop.snapshot()["in_flight"], 0)
+
+    def test_cancelling_the_future_cancels_the_coroutine(self):
+        loop = IOLoop(name="test-io-loop-cancel")
+        cancelled = threading.Event()
+
+        async def slow():
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        future = loop.submit(slow())
+        time.sleep(0.05)
+        future.cancel()
+        self.assertTrue(cancelled.wait(1))
+
+    def test_workflow_timeout_cancels_the_llm_call(self):
+        workflow = ByStanderWorkflow()
+        cancelled = threading.Event()
+
+        async def hanging_triage(_scenario, **_kwargs):
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        async def run():
+            with use_deadline(Deadline(0.3)):
+                return await workflow._run_llm_with_timeout(
+                    hanging_triage, "x", timeout=5.0, default="fallback"
+                )
+
+        self.assertEqual(asyncio.run(run()), "fallback")
+        self.assertTrue(cancelled.wait(1))
+
+
+class AsyncClientPathTests(unittest.TestCase):
+    def test_hedged_async_cancels_the_losing_attempt(self):
+        async def main():
+            cancelled = asyncio.Event()
+
+            async def slow():
+                try:
+                    await asyncio.sleep(2)
+                except asyncio.CancelledError:
+                    cancelled.set()
+                    raise
+                return '{"a": 1}'
+
+            async def fast():
+                await asyncio.sleep(0.02)
+                return '{"a": 2}'
+
+            winner = await run_hedged_async(
+                [("vertex", slow), ("genai", fast)],
+                delay_sec=0.05,
+                is_valid=lambda text: text.startswith("{"),
+                timeout=2.0,
+                policy=HedgePolicy(severities={"critical"}),
+            )
+            await asyncio.sleep(0)
+            return winner, cancelled.is_set()
+
+        winner, cancelled = asyncio.run(main())
+        self.assertEqual(winner, ("genai", '{"a": 2}'))
+        self.assertTrue(cancelled)
+
+    def test_async_limiter_waits_without_a_thread_and_rejects_in_time(self):
+        limiter = ProviderLimiter(limits={"openai": (0, 0, 1)}, max_wait_sec=0.2)
+
+        async def main():
+            await limiter.acquire_async("openai-chat", tokens=10)
+            asyncio.get_running_loop().call_later(0.05, limiter.release, "openai-chat")
+            async with limiter.slot_async("openai-responses", tokens=10):
+                pass
+            await limiter.acquire_async("openai-chat", tokens=10)
+            with self.assertRaises(RateLimited):
+                await limiter.acquire_async("openai-chat", tokens=10)
+
+        asyncio.run(main())
+        self.assertEqual(limiter.snapshot()["openai"]["rejected"]["request"], 1)
+
+    def test_gemini_generate_json_async_falls_over_to_next_provider(self):
+        agent = GeminiJSONAgent()
+        agent.route = lambda model_name: [("vertex", "m-async"), ("genai", "m-async")]
+
+        async def broken(**_kwargs):
+            raise RuntimeError("503")
+
+        async def works(**_kwargs):
+            return '{"severity": "critical"}'
+
+        agent._async_provider_calls = lambda: {"vertex": broken, "genai": works}
+        out = asyncio.run(
+            agent.generate_json_async("m-async", "sys", "user", default={"severity": "none"})
+        )
+        self.assertEqual(out, {"severity": "critical"})
+
+
+if __name__ == "__main__":
+    unittest.main()
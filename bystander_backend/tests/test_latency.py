@@ -0,0 +1,68 @@
+import time
+import unittest
+
+from bystander_backend.agents.agents import ByStanderWorkflow
+from bystander_backend.agents.latency import AdaptiveTimeouts, LatencyHistogram
+
+
+class LatencyHistogramTests(unittest.TestCase):
+    def test_percentiles_use_rolling_window(self):
+        histogram = LatencyHistogram(window=4)
+        for value in [10.0, 0.1, 0.2, 0.3, 0.4]:
+            histogram.observe(value)
+        self.assertEqual(len(histogram), 4)
+        self.assertEqual(histogram.percentile(99), 0.4)
+        self.assertEqual(histogram.percentile(50), 0.2)
+
+
+class AdaptiveTimeoutsTests(unittest.TestCase):
+    def test_uses_default_until_enough_samples(self):
+        timeouts = AdaptiveTimeouts({"profile": (0.8, 0.3, 3.0)}, factor=2.0, min_samples=3)
+        timeouts.observe("profile", 0.05)
+        self.assertEqual(timeouts.timeout_for("profile"), 0.8)
+
+    def test_timeout_tracks_p99_and_is_clamped(self):
+        timeouts = AdaptiveTimeouts({"profile": (0.8, 0.3, 3.0)}, factor=2.0, min_samples=3)
+        for value in [0.5, 0.6, 0.9]:
+            timeouts.observe("profile", value)
+        self.assertAlmostEqual(timeouts.timeout_for("profile"), 1.8)
+
+        fast = AdaptiveTimeouts({"profile": (0.8, 0.3, 3.0)}, factor=2.0, min_samples=3)
+        for _ in range(3):
+            fast.observe("profile", 0.01)
+        self.assertEqual(fast.timeout_for("profile"), 0.3)
+
+        slow = AdaptiveTimeouts({"profile": (0.8, 0.3, 3.0)}, factor=2.0, min_samples=3)
+        for _ in range(3):
+            slow.observe("profile", 5.0, timed_out=True)
+        self.assertEqual(slow.timeout_for("profile"), 3.0)
+        self.assertEqual(slow.snapshot()["stages"]["profile"]["timeouts"], 3)
+
+
+class WorkflowStageTimeoutTests(unittest.IsolatedAsyncioTestCase):
+    async def test_stage_calls_feed_histogram(self):
+        workflow = ByStanderWorkflow()
+        result = await workflow._run_blocking_with_timeout(
+            lambda: "ok", default="fallback", stage="profile"
+        )
+        self.assertEqual(result, "ok")
+        self.assertEqual(len(workflow.stage_timeouts.histogram("profile")), 1)
+
+    async def test_stage_timeout_records_censored_sample(self):
+        workflow = ByStanderWorkflow()
+        workflow.stage_timeouts = AdaptiveTimeouts({"profile": (0.05, 0.05, 1.0)}, min_samples=5)
+
+        def slow():
+            time.sleep(0.3)
+            return "late"
+
+        result = await workflow._run_blocking_with_timeout(
+            slow, default="fallback", stage="profile"
+        )
+        self.assertEqual(result, "fallback")
+        snapshot = workflow.stage_timeouts.snapshot()["stages"]["profile"]
+        self.assertEqual(snapshot["timeouts"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
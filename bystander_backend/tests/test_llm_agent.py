@@ -0,0 +1,156 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+
+from bystander_backend.agents import llm_agent
+from bystander_backend.agents.deadline import Deadline, use_deadline
+from bystander_backend.agents.llm_agent import (
+    GeminiJSONAgent,
+    GuidanceAgent,
+    GuidanceStreamParser,
+    split_guidance_steps,
+)
+from bystander_backend.agents.model_router import ModelRouter
+from bystander_backend.agents.provider_health import ProviderHealth
+
+
+class _FakeResponse:
+    text = '{"severity": "critical"}'
+
+
+class _FakeModel:
+    created = 0
+
+    def __init__(self, model_name, system_instruction):
+        type(self).created += 1
+        self.model_name = model_name
+
+    async def generate_content_async(self, user_prompt, generation_config=None):
+        return _FakeResponse()
+
+
+class GeminiJSONAgentTests(unittest.TestCase):
+    def _vertex_agent(self):
+        agent = GeminiJSONAgent()
+        agent.client = None
+        agent.vertex_enabled = True
+        agent._routes.clear()
+        return agent
+
+    def test_route_skips_unconfigured_providers(self):
+        agent = GeminiJSONAgent()
+        agent.client = None
+        agent.vertex_enabled = False
+        agent._routes.clear()
+        self.assertEqual(agent.route("gemini-2.5-flash"), [])
+        self.assertEqual(agent.generate_json("gemini-2.5-flash", "s", "u", {"x": 1}), {"x": 1})
+
+    def test_vertex_models_are_cached_per_model_and_system_prompt(self):
+        _FakeModel.created = 0
+        with (
+            patch.object(llm_agent, "GenerativeModel", _FakeModel),
+            patch.object(llm_agent, "GenerationConfig", lambda **kwargs: kwargs),
+        ):
+            agent = self._vertex_agent()
+            self.assertEqual(agent.route("gemini-2.5-flash"), [("vertex", "gemini-2.5-flash")])
+            for _ in range(3):
+                result = agent.generate_json("gemini-2.5-flash", "system", "user", {})
+            agent.generate_json("gemini-2.5-flash", "other system", "user", {})
+        self.assertEqual(result["severity"], "critical")
+        self.assertEqual(_FakeModel.created, 2)
+
+    def test_timeout_from_request_deadline_is_not_held_against_the_provider(self):
+        async def slow_vertex(**_kwargs):
+            await asyncio.sleep(1.0)
+            return "{}"
+
+        async def call(agent):
+            with use_deadline(Deadline(0.05)):
+                await agent._call_provider_async("vertex", "m", "s", "u", 0.1)
+
+        health = ProviderHealth()
+        router = ModelRouter()
+        agent = self._vertex_agent()
+        with (
+            patch.object(llm_agent, "PROVIDER_HEALTH", health),
+            patch.object(llm_agent, "MODEL_ROUTER", router),
+            patch.object(agent, "_async_provider_calls", lambda: {"vertex": slow_vertex}),
+        ):
+            with self.assertRaises(asyncio.TimeoutError):
+                asyncio.run(call(agent))
+            self.assertEqual(health.snapshot().get("vertex:m", {}).get("failures", 0), 0)
+            self.assertEqual(router.snapshot()["models"], {})
+
+            # The provider's own timeout, with time left on the request, still counts.
+            with (
+                patch.object(llm_agent, "LLM_CALL_TIMEOUT_SEC", 0.05),
+                self.assertRaises(asyncio.TimeoutError),
+            ):
+                asyncio.run(agent._call_provider_async("vertex", "m", "s", "u", 0.1))
+            self.assertEqual(health.snapshot()["vertex:m"]["failures"], 1)
+
+
+class _StreamingLLM:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.blocking_calls = 0
+
+    def stream_json_text(self, **_kwargs):
+        yield from self.chunks
+
+    def generate_json(self, default, **_kwargs):
+        self.blocking_calls += 1
+        return {"guidance": "1. blocking", "facility_type": "clinic"}
+
+
+class GuidanceStreamTests(unittest.TestCase):
+    def test_parser_emits_steps_as_lines_complete(self):
+        parser = GuidanceStreamParser()
+        self.assertEqual(parser.feed('{"guid'), [])
+        self.assertEqual(
+            parser.feed('ance": "1. \\u0e42\\u0e17\\u0e23 1669\\n2. '), ["1. โทร 1669"]
+        )
+        self.assertEqual(parser.feed("กดหน้าอก 3. รอ"), ["2. กดหน้าอก"])
+        self.assertEqual(
+            parser.feed('ทีม\\"แพทย์\\"", "facility_type": "hospital"}'), ['3. รอทีม"แพทย์"']
+        )
+        self.assertEqual(parser.close(), [])
+        self.assertTrue(parser.closed)
+
+    def test_split_guidance_steps_breaks_inline_numbering(self):
+        self.assertEqual(
+            split_guidance_steps("สถานการณ์นี้เป็นเหตุฉุกเฉิน\n1. a 2) b\n\n3. c"),
+            ["สถานการณ์นี้เป็นเหตุฉุกเฉิน", "1. a", "2) b", "3. c"],
+        )
+
+    def _agent(self, chunks):
+        llm = _StreamingLLM(chunks)
+        agent = GuidanceAgent(llm)
+        agent.deepseek_client = None
+        agent._build_web_fallback_context = lambda *_args: ("", [])
+        return agent, llm
+
+    def test_stream_yields_steps_then_validated_final(self):
+        agent, llm = self._agent(['{"guidance": "1. a\\n2', '. b", "facility_type": "spaceship"}'])
+        events = list(agent.stream("เจ็บหน้าอก", "critical", "ctx"))
+        self.assertEqual([e["text"] for e in events if e["type"] == "step"], ["1. a", "2. b"])
+        final = events[-1]
+        self.assertEqual(final["type"], "final")
+        self.assertEqual(final["guidance"], "1. a\n2. b")
+        self.assertEqual(final["facility_type"], "hospital")
+        self.assertEqual(llm.blocking_calls, 0)
+
+    def test_stream_falls_back_to_blocking_call_when_nothing_streams(self):
+        def broken():
+            raise RuntimeError("stream failed")
+            yield ""
+
+        agent, llm = self._agent(broken())
+        events = list(agent.stream("แผลถลอก", "moderate", "ctx"))
+        self.assertEqual(events[0], {"type": "step", "index": 1, "text": "1. blocking"})
+        self.assertEqual(events[-1]["facility_type"], "clinic")
+        self.assertEqual(llm.blocking_calls, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,142 @@
+import json
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from bystander_backend.agents.llm_agent import GuidanceAgent
+from bystander_backend.agents.local_llm import LocalLLMBackend, render_llama3_chat
+from bystander_backend.agents.provider_health import PROVIDER_HEALTH
+
+
+class _StubServer:
+    """OpenAI-compatible /v1/completions that echoes each prompt's scenario back."""
+
+    def __init__(self, status=200, answer=None):
+        self.bodies = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                stub.bodies.append(body)
+                time.sleep(0.05)
+                prompts = body["prompt"] if isinstance(body["prompt"], list) else [body["prompt"]]
+                choices = [
+                    {
+                        "index": i,
+                        "text": answer
+                        if answer is not None
+                        else json.dumps({"guidance": prompt.split("Scenario: ")[1][:8]}),
+                    }
+                    for i, prompt in enumerate(prompts)
+                ]
+                data = json.dumps({"choices": choices[::-1]}).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/v1"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class LocalLLMBackendTests(unittest.TestCase):
+    def _server(self, **kwargs):
+        server = _StubServer(**kwargs)
+        self.addCleanup(server.close)
+        return server
+
+    def test_concurrent_calls_share_one_batched_completion(self):
+        server = self._server()
+        backend = LocalLLMBackend(
+            base_url=server.url, model="stub-batch", max_batch=8, batch_window_ms=50
+        )
+        scenarios = [f"case-{i:03d}" for i in range(4)]
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            texts = list(pool.map(lambda s: backend.complete("sys", f"Scenario: {s}"), scenarios))
+        # Choices come back out of order; each caller still gets its own answer.
+        self.assertEqual([json.loads(t)["guidance"] for t in texts], scenarios)
+        self.assertEqual(len(server.bodies), 1)
+        self.assertEqual(len(server.bodies[0]["prompt"]), 4)
+        self.assertEqual(server.bodies[0]["stop"], ["<|eot_id|>"])
+        self.assertEqual(backend.snapshot()["max_batch_seen"], 4)
+        self.assertTrue(
+            server.bodies[0]["prompt"][0].endswith(
+                "<|start_header_id|>assistant<|end_header_id|>\n\n"
+            )
+        )
+        self.assertIn("<|start_header_id|>system", render_llama3_chat("s", "u"))
+
+    def test_server_error_raises_and_counts_against_the_circuit(self):
+        server = self._server(status=500)
+        backend = LocalLLMBackend(base_url=server.url, model="stub-broken", max_batch=1)
+        with self.assertRaises(requests.HTTPError):
+            backend.complete("sys", "Scenario: x")
+        self.assertEqual(backend.snapshot()["failures"], 1)
+        self.assertEqual(PROVIDER_HEALTH.snapshot()["local:stub-broken"]["failures"], 1)
+
+    def test_unconfigured_backend_is_disabled(self):
+        self.assertFalse(LocalLLMBackend(base_url="").enabled)
+
+
+class _GeminiOnly:
+    def __init__(self):
+        self.calls = 0
+
+    async def generate_json_async(self, default, **_kwargs):
+        self.calls += 1
+        return {"guidance": "1. gemini", "facility_type": "clinic"}
+
+    async def generate_json_hedged_async(self, default, **kwargs):
+        kwargs.pop("extra_attempts", None)
+        return await self.generate_json_async(default, **kwargs)
+
+
+async def _no_web_context(*_args):
+    return "", []
+
+
+class GuidanceLocalPathTests(unittest.TestCase):
+    def _agent(self, server, model):
+        llm = _GeminiOnly()
+        agent = GuidanceAgent(llm)
+        agent.deepseek_client = None
+        agent._build_web_fallback_context_async = _no_web_context
+        agent.local_llm = LocalLLMBackend(base_url=server.url, model=model, max_batch=1)
+        return agent, llm
+
+    def test_moderate_guidance_is_served_locally(self):
+        server = _StubServer(answer='{"guidance": "1. local", "severity": "mild"}')
+        self.addCleanup(server.close)
+        agent, llm = self._agent(server, "stub-guidance")
+        out = agent.run("แผลถลอกที่เข่า", "moderate", "ctx")
+        self.assertEqual(out["guidance"], "1. local")
+        self.assertEqual(out["facility_type"], "clinic")
+        self.assertEqual(llm.calls, 0)
+        # Critical reports never go to the local model.
+        agent.run("หมดสติ ไม่หายใจ", "critical", "ctx")
+        self.assertEqual(llm.calls, 1)
+        self.assertEqual(len(server.bodies), 1)
+
+    def test_unusable_local_answer_falls_back_to_hosted_model(self):
+        server = _StubServer(answer="not json")
+        self.addCleanup(server.close)
+        agent, llm = self._agent(server, "stub-garbage")
+        out = agent.run("ข้อเท้าพลิก", "moderate", "ctx")
+        self.assertEqual(out["guidance"], "1. gemini")
+        self.assertEqual(llm.calls, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import os
+import unittest
+from unittest.mock import patch
+
+from bystander_backend.agents.deadline import Deadline, use_deadline
+from bystander_backend.agents.llm_agent import _model_pool
+from bystander_backend.agents.model_router import ModelRouter
+
+CANDIDATES = ["gemini-2.5-flash", "gemini-2.0-flash"]
+
+
+def _router(**kwargs):
+    kwargs.setdefault("min_samples", 3)
+    kwargs.setdefault("max_error_rate", 0.3)
+    kwargs.setdefault("sticky_sec", 60.0)
+    kwargs.setdefault("horizon_sec", 120.0)
+    return ModelRouter(slo_sec={"guidance_critical": 6.0}, **kwargs)
+
+
+class ModelRouterTests(unittest.TestCase):
+    def test_prefers_first_candidate_until_it_degrades(self):
+        router = _router()
+        self.assertEqual(router.choose("guidance_critical", CANDIDATES), "gemini-2.5-flash")
+        for _ in range(3):
+            router.observe("vertex", "gemini-2.5-flash", 9.0, ok=True)
+        self.assertEqual(router.choose("guidance_critical", CANDIDATES), "gemini-2.0-flash")
+        self.assertEqual(router.snapshot()["switches"], {"guidance_critical": 1})
+
+    def test_errors_shift_traffic_and_stickiness_prevents_flapping(self):
+        router = _router()
+        for _ in range(3):
+            router.observe("vertex", "gemini-2.5-flash", 1.0, ok=False)
+        self.assertEqual(router.choose("guidance_critical", CANDIDATES), "gemini-2.0-flash")
+        # The primary looks fine again, but the tier only moves back after sticky_sec.
+        for _ in range(20):
+            router.observe("vertex", "gemini-2.5-flash", 1.0, ok=True)
+        self.assertEqual(router.choose("guidance_critical", CANDIDATES), "gemini-2.0-flash")
+        router.sticky_sec = 0.0
+        self.assertEqual(router.choose("guidance_critical", CANDIDATES), "gemini-2.5-flash")
+
+    def test_per_call_deadline_picks_model_that_fits(self):
+        router = _router()
+        for _ in range(3):
+            router.observe("vertex", "gemini-2.5-flash", 4.0, ok=True)
+            router.observe("vertex", "gemini-2.0-flash", 1.0, ok=True)
+        with use_deadline(Deadline(2.0)):
+            self.assertEqual(
+                router.choose("guidance_critical", CANDIDATES, critical=True), "gemini-2.0-flash"
+            )
+        self.assertEqual(router.choose("guidance_critical", CANDIDATES), "gemini-2.5-flash")
+        self.assertEqual(router.snapshot()["deadline_overrides"], 1)
+
+    def test_model_pool_from_env(self):
+        with patch.dict(
+            os.environ, {"SCRIPT_MODEL_CANDIDATES": "gemini-2.5-pro, gemini-2.5-flash"}
+        ):
+            self.assertEqual(
+                _model_pool("SCRIPT_MODEL", "gemini-2.5-flash"),
+                ["gemini-2.5-pro", "gemini-2.5-flash"],
+            )
+        with patch.dict(os.environ, {"MODEL_ROUTER": "0"}):
+            self.assertEqual(_model_pool("SCRIPT_MODEL", "gemini-2.5-flash"), ["gemini-2.5-flash"])
+
+    def test_model_pool_adds_no_model_that_was_not_configured(self):
+        with patch.dict(os.environ):
+            os.environ.pop("SCRIPT_MODEL_CANDIDATES", None)
+            os.environ.pop("MODEL_ROUTER_FALLBACK", None)
+            self.assertEqual(_model_pool("SCRIPT_MODEL", "gemini-2.5-flash"), ["gemini-2.5-flash"])
+            os.environ["MODEL_ROUTER_FALLBACK"] = "gemini-2.0-flash"
+            self.assertEqual(
+                _model_pool("SCRIPT_MODEL", "gemini-2.5-flash"),
+                ["gemini-2.5-flash", "gemini-2.0-flash"],
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import unittest
+from unittest.mock import patch
+
+from bystander_backend.agents import llm_agent
+from bystander_backend.agents.llm_agent import GeminiJSONAgent
+from bystander_backend.agents.provider_health import ProviderHealth
+
+
+class ProviderHealthTests(unittest.TestCase):
+    def _health(self, **kwargs):
+        options = {
+            "window": 10,
+            "failure_rate": 0.5,
+            "min_calls": 4,
+            "consecutive_failures": 2,
+            "cooldown_sec": 30.0,
+        }
+        options.update(kwargs)
+        return ProviderHealth(**options)
+
+    def test_consecutive_failures_open_circuit_and_reorder_route(self):
+        health = self._health()
+        route = [("vertex", "m"), ("genai", "m")]
+        health.record_failure("vertex", "m", RuntimeError("503"))
+        self.assertEqual(health.order(route), route)
+        health.record_failure("vertex", "m", RuntimeError("503"))
+
+        self.assertEqual(health.order(route), [("genai", "m")])
+        self.assertFalse(health.allow("vertex", "m"))
+        snapshot = health.snapshot()["vertex:m"]
+        self.assertEqual(snapshot["state"], "open")
+        self.assertEqual(snapshot["last_error"], "503")
+
+    def test_half_open_probe_closes_on_success(self):
+        health = self._health(cooldown_sec=0.0)
+        health.record_failure("vertex", "m")
+        health.record_failure("vertex", "m")
+        self.assertEqual(health.order([("vertex", "m"), ("genai", "m")])[-1], ("vertex", "m"))
+        self.assertTrue(health.allow("vertex", "m"))
+        health.record_success("vertex", "m", 0.2)
+        self.assertEqual(health.snapshot()["vertex:m"]["state"], "closed")
+        self.assertEqual(health.snapshot()["vertex:m"]["error_rate"], 0.0)
+
+    def test_all_open_still_tries_oldest_circuit(self):
+        health = self._health()
+        for provider in ("vertex", "genai"):
+            health.record_failure(provider, "m")
+            health.record_failure(provider, "m")
+        route = health.order([("vertex", "m"), ("genai", "m")])
+        self.assertEqual(route, [("vertex", "m")])
+        self.assertTrue(health.allow("vertex", "m"))
+
+
+class GeminiRoutingTests(unittest.TestCase):
+    def test_generate_json_skips_failing_vertex_after_circuit_opens(self):
+        health = ProviderHealth(window=10, min_calls=4, consecutive_failures=2, cooldown_sec=60)
+        agent = GeminiJSONAgent()
+        agent.vertex_enabled = True
+        agent.client = object()
+        calls = []
+
+        async def failing_vertex(**_kwargs):
+            calls.append("vertex")
+            raise RuntimeError("vertex down")
+
+        async def genai(**_kwargs):
+            calls.append("genai")
+            return '{"ok": true}'
+
+        agent._generate_json_with_vertex_async = failing_vertex
+        agent._generate_json_with_google_genai_async = genai
+        with (
+            patch.object(llm_agent, "PROVIDER_HEALTH", health),
+            patch.object(llm_agent, "GenerativeModel", object),
+            patch.object(llm_agent, "GenerationConfig", object),
+            patch.object(llm_agent, "types", object()),
+        ):
+            agent._routes.clear()
+            for _ in range(3):
+                self.assertTrue(agent.generate_json("gemini-2.5-flash", "s", "u", {})["ok"])
+        self.assertEqual(calls, ["vertex", "genai", "vertex", "genai", "genai"])
+
+
+if __name__ == "__main__":
+    unittest.main()
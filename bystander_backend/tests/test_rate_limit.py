@@ -0,0 +1,95 @@
+import threading
+import time
+import types
+import unittest
+
+from bystander_backend.agents.rate_limit import (
+    BACKGROUND,
+    REQUEST,
+    ProviderLimiter,
+    RateLimited,
+    is_rate_limit_error,
+    quota_for,
+)
+
+
+class _TooManyRequests(Exception):
+    def __init__(self, retry_after=None):
+        super().__init__("Error code: 429 - rate limit reached")
+        self.status_code = 429
+        headers = {"retry-after": str(retry_after)} if retry_after is not None else {}
+        self.response = types.SimpleNamespace(status_code=429, headers=headers)
+
+
+class ProviderLimiterTests(unittest.TestCase):
+    def test_quota_grouping_and_429_detection(self):
+        self.assertEqual(quota_for("vertex"), quota_for("genai"))
+        self.assertEqual(quota_for("openai-chat"), "openai")
+        self.assertTrue(is_rate_limit_error(_TooManyRequests()))
+        self.assertTrue(is_rate_limit_error(Exception("429 RESOURCE_EXHAUSTED")))
+        self.assertFalse(is_rate_limit_error(TimeoutError("read timed out")))
+
+    def test_request_bucket_rejects_when_no_room_before_deadline(self):
+        limiter = ProviderLimiter(limits={"gemini": (3, 0, 8)}, max_wait_sec=0.2)
+        for _ in range(3):
+            with limiter.slot("vertex", tokens=100):
+                pass
+        started = time.monotonic()
+        with self.assertRaises(RateLimited):
+            limiter.acquire("genai", tokens=100)
+        # The bucket needs ~20 s to refill, so there is no point waiting.
+        self.assertLess(time.monotonic() - started, 0.1)
+        self.assertEqual(limiter.snapshot()["gemini"]["rejected"][REQUEST], 1)
+
+    def test_429_blocks_quota_for_retry_after(self):
+        limiter = ProviderLimiter(limits={"openai": (0, 0, 8)}, max_wait_sec=1.0)
+        with self.assertRaises(_TooManyRequests), limiter.slot("openai-chat", tokens=10):
+            raise _TooManyRequests(retry_after=0.2)
+        started = time.monotonic()
+        with limiter.slot("openai-responses", tokens=10):
+            pass
+        self.assertGreaterEqual(time.monotonic() - started, 0.15)
+        self.assertEqual(limiter.snapshot()["openai"]["throttled"], 1)
+
+    def test_429_without_retry_after_uses_jittered_backoff(self):
+        limiter = ProviderLimiter(
+            limits={"deepseek": (0, 0, 8)}, backoff_base_sec=0.1, backoff_max_sec=0.1
+        )
+        limiter.acquire("deepseek", tokens=10)
+        limiter.release("deepseek", _TooManyRequests())
+        blocked = limiter.snapshot()["deepseek"]["blocked_for_sec"]
+        self.assertLessEqual(blocked, 0.1)
+
+    def test_request_path_preempts_waiting_background_calls(self):
+        limiter = ProviderLimiter(limits={"openai": (0, 0, 1)}, max_wait_sec=2.0)
+        limiter.acquire("openai-chat", tokens=10)
+        order = []
+
+        def call(priority):
+            with limiter.slot("openai-chat", tokens=10, priority=priority):
+                order.append(priority)
+
+        background = threading.Thread(target=call, args=(BACKGROUND,))
+        background.start()
+        time.sleep(0.05)
+        request = threading.Thread(target=call, args=(REQUEST,))
+        request.start()
+        time.sleep(0.05)
+        limiter.release("openai-chat")
+        request.join(2)
+        background.join(3)
+        self.assertEqual(order, [REQUEST, BACKGROUND])
+
+    def test_background_keeps_out_of_reserved_share(self):
+        limiter = ProviderLimiter(limits={"openai": (0, 0, 5)}, reserve=0.2)
+        limiter.background_max_wait_sec = 0.05
+        for _ in range(4):
+            limiter.acquire("openai-chat", tokens=10, priority=BACKGROUND)
+        with self.assertRaises(RateLimited):
+            limiter.acquire("openai-chat", tokens=10, priority=BACKGROUND)
+        limiter.acquire("openai-chat", tokens=10, priority=REQUEST)
+        self.assertEqual(limiter.snapshot()["openai"]["in_flight"], 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import time
+import types
+import unittest
+from unittest.mock import patch
+
+from bystander_backend.agents import agents as agents_module
+from bystander_backend.agents.agents import ProtocolRetriever
+from bystander_backend.agents.reranker import ProtocolReranker
+
+ROWS = [
+    {
+        "case_name_th": "หัวใจหยุดเต้นเฉียบพลัน",
+        "case_name_en": "cardiac arrest",
+        "keywords": "ไม่หายใจ, CPR, หมดสติ",
+    },
+    {
+        "case_name_th": "ผึ้งต่อย",
+        "case_name_en": "bee sting",
+        "keywords": "ผึ้ง, ต่อย, เหล็กใน",
+    },
+]
+
+DOCS = [
+    {"title": "Insect bites", "body": "ผึ้งต่อย ให้ดึงเหล็กในออกและประคบเย็น " * 10, "meta": ""},
+    {"title": "Burns", "body": "แผลไฟไหม้ ราดน้ำเย็น 20 นาที " * 10, "meta": ""},
+    {
+        "title": "Cardiac arrest",
+        "body": "ผู้ป่วยหมดสติไม่หายใจ โทร 1669 แล้วเริ่ม CPR กดหน้าอก 100-120 ครั้งต่อนาที " * 10,
+        "meta": "",
+    },
+]
+
+
+class ProtocolRerankerTests(unittest.TestCase):
+    def test_rerank_prefers_chunks_matching_scenario_protocol(self):
+        reranker = ProtocolReranker(ROWS, enabled=True)
+        kept = reranker.rerank("พ่อหมดสติ ไม่หายใจ ทำ CPR ยังไง", DOCS, keep=2)
+        self.assertEqual(kept[0]["title"], "Cardiac arrest")
+        self.assertEqual(len(kept), 2)
+        self.assertEqual(reranker.snapshot()["chunks_in"], 3)
+
+    def test_disabled_keeps_vertex_order(self):
+        reranker = ProtocolReranker(ROWS, enabled=False)
+        kept = reranker.rerank("พ่อหมดสติ ไม่หายใจ", DOCS, keep=1)
+        self.assertEqual(kept, DOCS[:1])
+
+    def test_rerank_of_wide_top_k_is_fast(self):
+        rows = ROWS * 64
+        docs = [dict(doc, body=doc["body"] * 3) for doc in DOCS * 4]
+        reranker = ProtocolReranker(rows, enabled=True)
+        started = time.perf_counter()
+        for _ in range(20):
+            reranker.rerank("พ่อหมดสติ ไม่หายใจ ทำ CPR ยังไง", docs, keep=3)
+        self.assertLess((time.perf_counter() - started) / 20, 0.005)
+
+    def test_search_vertex_over_fetches_and_keeps_top_k(self):
+        contexts = [
+            types.SimpleNamespace(text=doc["body"], title=doc["title"], source_uri="")
+            for doc in DOCS
+        ]
+        calls = []
+
+        def retrieval_query(**kwargs):
+            calls.append(kwargs)
+            return types.SimpleNamespace(contexts=types.SimpleNamespace(contexts=contexts))
+
+        fake_rag = types.SimpleNamespace(
+            retrieval_query=retrieval_query,
+            RagResource=lambda **kwargs: kwargs,
+            RagRetrievalConfig=lambda **kwargs: kwargs,
+            Filter=lambda **kwargs: kwargs,
+        )
+        retriever = ProtocolRetriever(csv_path="/nonexistent.csv")
+        retriever.reranker = ProtocolReranker(ROWS, fetch_k=10, enabled=True)
+        retriever.rag_initialized = True
+        retriever.rag_corpus_resource = "projects/p/locations/l/ragCorpora/c"
+        with patch.object(agents_module, "rag", fake_rag):
+            docs = retriever._search_vertex("พ่อหมดสติ ไม่หายใจ", severity="critical", top_k=1)
+        self.assertEqual(calls[0]["rag_retrieval_config"]["top_k"], 10)
+        self.assertEqual([doc["title"] for doc in docs], ["Cardiac arrest"])
+        self.assertEqual(retriever.last_vertex_attempts[-1]["fetched"], 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,179 @@
+import datetime
+import json
+import os
+import tempfile
+import unittest
+
+from bystander_backend.agents.agents import CALL_SCRIPT_FALLBACK, ByStanderWorkflow
+from bystander_backend.agents.guidance_store import entry_key, protocol_fingerprint
+from bystander_backend.agents.script_templates import (
+    TEMPLATE_FORMAT,
+    ScriptTemplateStore,
+    _age_years,
+    call_script_slots,
+    validate_template,
+)
+
+_ROW = {
+    "case_name_th": "หัวใจหยุดเต้นเฉียบพลัน",
+    "case_name_en": "cardiac arrest",
+    "keywords": "ไม่หายใจ, CPR",
+    "instructions": "โทร 1669 และเริ่ม CPR",
+    "severity": "critical",
+    "facility_type": "hospital",
+}
+_TEMPLATE = (
+    "1) โทร 1669 แจ้งเหตุหัวใจหยุดเต้น\n"
+    "2) {scenario}\n"
+    "3) สถานที่: {location}\n"
+    "4) {patient} ไม่หายใจ\n"
+    "5) ผู้ป่วยไม่รู้สึกตัว\n"
+    "6) {medical_history}\n"
+    "7) ผู้แจ้ง {caller}\n"
+    "8) กำลังทำ CPR\n"
+    "9) รอทีมกู้ชีพ"
+)
+_LOCATION = (
+    "ที่อยู่จากแผนที่: 99 ถนนพระราม 4 กรุงเทพฯ\n"
+    "พิกัดสำหรับระบบ (ไม่ต้องอ่านให้เจ้าหน้าที่): 13.730000, 100.530000\n"
+    "จุดสังเกตใกล้เคียง: สวนลุมพินี, MRT สีลม"
+)
+
+
+class ScriptTemplateTests(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "templates.json")
+        entries = {
+            entry_key(_ROW, "critical"): {
+                "template": _TEMPLATE,
+                "protocol_sha1": protocol_fingerprint(_ROW),
+            },
+            # Unknown slot: never loaded.
+            entry_key(_ROW, "moderate"): {
+                "template": _TEMPLATE + " {pronoun}",
+                "protocol_sha1": protocol_fingerprint(_ROW),
+            },
+        }
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump({"format": TEMPLATE_FORMAT, "version": "v1", "entries": entries}, f)
+
+    def test_validate_template(self):
+        self.assertEqual(validate_template(_TEMPLATE), [])
+        self.assertTrue(validate_template(_TEMPLATE.replace("{caller}", "")))
+        self.assertTrue(validate_template(_TEMPLATE.replace("{location}", "{location.x}")))
+        self.assertTrue(validate_template("1) {scenario"))
+
+    def test_lookup_and_fill(self):
+        store = ScriptTemplateStore(self.path, min_score=5)
+        self.assertEqual(store.snapshot()["entries"], 1)
+        self.assertIsNone(store.lookup(_ROW, 2, "critical"))
+        self.assertIsNone(store.lookup(dict(_ROW, instructions="CPR"), 7, "critical"))
+        slots = call_script_slots(
+            "พ่อหมดสติในห้องนั่งเล่น",
+            {"gender": "male", "birthdate": "1960-01-01", "firstName": "สมชาย"},
+            _LOCATION,
+            {"firstName": "สมหญิง", "lastName": "ใจดี", "phone": "0812345678"},
+            "พ่อ",
+            ["เบาหวาน", "แพ้เพนิซิลลิน"],
+        )
+        script = store.render(store.lookup(_ROW, 7, "critical"), slots)
+        self.assertIn("99 ถนนพระราม 4 กรุงเทพฯ ใกล้ สวนลุมพินี", script)
+        self.assertNotIn("13.73", script)
+        self.assertIn("ผู้ป่วยเป็นพ่อของผู้แจ้ง เพศชาย อายุประมาณ", script)
+        self.assertIn("ผู้ป่วยมีประวัติ เบาหวาน, แพ้เพนิซิลลิน", script)
+        self.assertIn("ชื่อ สมหญิง ใจดี เบอร์โทรศัพท์ 0812345678", script)
+
+    def test_unknown_details_are_said_to_be_unknown(self):
+        slots = call_script_slots("ล้มหมดสติ", {}, "", None, "", [])
+        self.assertIn("ยังไม่ทราบที่อยู่", slots["location"])
+        self.assertIn("ยังไม่ทราบอายุ", slots["patient"])
+        self.assertIn("ยังไม่ทราบโรคประจำตัว", slots["medical_history"])
+        self.assertEqual(_age_years("2543-06-01", today=datetime.date(2026, 10, 19)), 26)
+
+
+class WorkflowTemplateTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        ScriptTemplateTests.setUp(self)
+
+    def _workflow(self):
+        workflow = ByStanderWorkflow()
+        workflow.retriever.rows = [_ROW]
+        workflow.script_agent.templates = ScriptTemplateStore(self.path, min_score=5)
+
+        async def should_not_run(*_args, **_kwargs):
+            raise AssertionError("a templated script must not call the script LLM")
+
+        workflow.script_agent.run_async = should_not_run
+        return workflow
+
+    def _payload(self, scenario):
+        return {
+            "scenario": scenario,
+            "guidance": "1. โทร 1669",
+            "severity": "critical",
+            "facility_type": "hospital",
+            "is_emergency": True,
+        }
+
+    async def test_call_script_is_filled_from_template(self):
+        workflow = self._workflow()
+        result = await workflow.generate_call_script_async(
+            self._payload("หัวใจหยุดเต้นเฉียบพลัน ไม่หายใจ")
+        )
+        self.assertEqual(result["script_source"], "template")
+        self.assertIn("2) หัวใจหยุดเต้นเฉียบพลัน ไม่หายใจ\n", result["call_script"])
+
+    async def test_long_report_is_summarized_for_the_scenario_slot(self):
+        workflow = self._workflow()
+
+        async def summarize(_scenario):
+            return "ชายสูงอายุหมดสติ ไม่หายใจ"
+
+        workflow.script_agent.summarize_scenario_async = summarize
+        scenario = "หัวใจหยุดเต้นเฉียบพลัน ไม่หายใจ " + "รายละเอียดเพิ่มเติม " * 20
+        result = await workflow.generate_call_script_async(self._payload(scenario))
+        self.assertIn("2) ชายสูงอายุหมดสติ ไม่หายใจ\n", result["call_script"])
+
+    async def test_low_confidence_match_uses_the_llm(self):
+        workflow = self._workflow()
+
+        async def llm_script(*_args, **_kwargs):
+            return "1) llm"
+
+        workflow.script_agent.run_async = llm_script
+        result = await workflow.generate_call_script_async(self._payload("ไม่หายใจ"))
+        self.assertEqual((result["script_source"], result["call_script"]), ("llm", "1) llm"))
+
+    async def test_empty_template_fill_is_credited_to_the_llm(self):
+        workflow = self._workflow()
+        workflow.script_agent.fill_template = lambda *_args, **_kwargs: ""
+
+        async def llm_script(*_args, **_kwargs):
+            return "1) llm"
+
+        workflow.script_agent.run_async = llm_script
+        result = await workflow.generate_call_script_async(
+            self._payload("หัวใจหยุดเต้นเฉียบพลัน ไม่หายใจ")
+        )
+        self.assertEqual((result["script_source"], result["call_script"]), ("llm", "1) llm"))
+
+    async def test_static_fallback_is_reported_as_fallback(self):
+        workflow = self._workflow()
+        workflow.script_agent.fill_template = lambda *_args, **_kwargs: ""
+
+        async def empty_script(*_args, **_kwargs):
+            return ""
+
+        workflow.script_agent.run_async = empty_script
+        for scenario in ("หัวใจหยุดเต้นเฉียบพลัน ไม่หายใจ", "ไม่หายใจ"):
+            result = await workflow.generate_call_script_async(self._payload(scenario))
+            self.assertEqual(
+                (result["script_source"], result["call_script"]),
+                ("fallback", CALL_SCRIPT_FALLBACK),
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
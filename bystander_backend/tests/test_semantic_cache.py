@@ -0,0 +1,109 @@
+import time
+import unittest
+
+from bystander_backend.agents.llm_agent import GuidanceAgent, matched_protocols
+from bystander_backend.agents.semantic_cache import SemanticCache
+
+
+class SemanticCacheTests(unittest.TestCase):
+    def test_near_duplicate_hits_within_namespace_only(self):
+        cache = SemanticCache(threshold=0.7, max_entries=8, ttl_sec=60)
+        cache.put("พ่อหมดสติ ไม่หายใจ ช่วยด้วย!!", ("critical", "x"), {"guidance": "cpr"})
+        self.assertEqual(cache.get("พ่อหมดสติไม่หายใจ ช่วยด้วย", ("critical", "x")), {"guidance": "cpr"})
+        self.assertIsNone(cache.get("พ่อหมดสติไม่หายใจ ช่วยด้วย", ("moderate", "x")))
+        self.assertIsNone(cache.get("โดนผึ้งต่อยที่แขน บวมแดง", ("critical", "x")))
+        snapshot = cache.snapshot()
+        self.assertEqual((snapshot["hits"], snapshot["misses"]), (1, 2))
+        self.assertEqual(snapshot["top_entry_hits"], [1])
+
+    def test_negation_and_dose_changes_miss_the_cache(self):
+        # Each pair scores 0.86-0.92 on the n-gram embedding, above this threshold.
+        cache = SemanticCache(threshold=0.7, max_entries=8, ttl_sec=60)
+        pairs = [
+            ("ลูกสำลักอาหาร ไอได้", "ลูกสำลักอาหาร ไอไม่ได้"),
+            ("กินยาพาราไป 20 เม็ด", "กินยาพาราไป 2 เม็ด"),
+            ("กินยาพาราไปสองเม็ด", "กินยาพาราไปสิบเม็ด"),
+            ("my dad collapsed and is not breathing", "my dad collapsed and is breathing"),
+        ]
+        for cached, asked in pairs:
+            cache.put(cached, cached, cached)
+            self.assertIsNone(cache.get(asked, cached), asked)
+            self.assertEqual(cache.get(cached + "!!", cached), cached)
+        self.assertEqual(cache.snapshot()["guarded"], 4)
+
+    def test_lru_and_ttl_eviction(self):
+        cache = SemanticCache(threshold=0.9, max_entries=2, ttl_sec=60)
+        cache.put("แผลถลอกที่เข่า", "ns", 1)
+        cache.put("มีดบาดนิ้ว", "ns", 2)
+        self.assertEqual(cache.get("แผลถลอกที่เข่า", "ns"), 1)
+        cache.put("ผึ้งต่อย", "ns", 3)
+        # "มีดบาดนิ้ว" was least recently used.
+        self.assertIsNone(cache.get("มีดบาดนิ้ว", "ns"))
+        self.assertEqual(cache.get("แผลถลอกที่เข่า", "ns"), 1)
+
+        expiring = SemanticCache(threshold=0.9, max_entries=2, ttl_sec=0.01)
+        expiring.put("ผึ้งต่อย", "ns", 3)
+        time.sleep(0.02)
+        self.assertIsNone(expiring.get("ผึ้งต่อย", "ns"))
+        self.assertEqual(expiring.snapshot()["entries"], 0)
+
+
+class _CountingLlm:
+    def __init__(self):
+        self.calls = 0
+
+    async def generate_json_async(self, **kwargs):
+        self.calls += 1
+        return {"guidance": "1. โทร 1669\n2. เริ่ม CPR", "facility_type": "hospital"}
+
+    generate_json_hedged_async = generate_json_async
+
+
+async def _no_web_context(*_args):
+    return "", []
+
+
+class GuidanceCacheTests(unittest.TestCase):
+    def test_guidance_run_consults_cache_before_llm(self):
+        llm = _CountingLlm()
+        agent = GuidanceAgent(llm)
+        agent.deepseek_client = None
+        agent._build_web_fallback_context_async = _no_web_context
+        cpr = "[Protocol 1] หัวใจหยุดเต้นเฉียบพลัน\n- Guidance: ปั๊มหัวใจ"
+        first = agent.run("พ่อหมดสติ ไม่หายใจ", "critical", cpr)
+        # Retrieval for the rewording ranks other protocols below the same best match.
+        second = agent.run(
+            "พ่อหมดสติ  ไม่หายใจ!!",
+            "critical",
+            cpr + "\n\n[Protocol 2] จมน้ำ (หมดสติ)\n- Guidance: เป่าปาก",
+        )
+        self.assertEqual(first, second)
+        self.assertEqual(llm.calls, 1)
+        # A different best-matching protocol, or a flipped negation, generate afresh.
+        agent.run("พ่อหมดสติ ไม่หายใจ", "critical", "[Protocol 1] ฟ้าผ่า\n- Guidance: x")
+        agent.run("พ่อหมดสติ หายใจ", "critical", cpr)
+        self.assertEqual(llm.calls, 3)
+        # A relevant condition changes the namespace.
+        agent.run(
+            "พ่อหมดสติไม่หายใจ",
+            "critical",
+            cpr,
+            medical_context={"individuals": [{"uid": "u", "conditions": ["asthma"]}]},
+        )
+        self.assertEqual(llm.calls, 4)
+
+    def test_protocol_ids_come_from_context_headers(self):
+        context = (
+            "[Vertex Protocol 1] CPR\n- source=gs://protocols/cpr.pdf\nbody\n\n"
+            "[Vertex Protocol 2] Vertex RAG Protocol\nbody\n\n"
+            "[Protocol 3] ฟ้าผ่า\n- Keywords: โดนฟ้าผ่า"
+        )
+        self.assertEqual(
+            matched_protocols(context),
+            ["gs://protocols/cpr.pdf", "Vertex RAG Protocol", "ฟ้าผ่า"],
+        )
+        self.assertEqual(matched_protocols("ไม่มีบริบทจากฐานข้อมูลโปรโตคอล"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,148 @@
+import asyncio
+import threading
+import time
+import unittest
+from concurrent.futures import Future
+
+from bystander_backend.agents.agents import ByStanderWorkflow
+from bystander_backend.agents.singleflight import (
+    SingleFlight,
+    location_tile,
+    normalize_scenario_key,
+)
+
+
+class SingleFlightTests(unittest.TestCase):
+    def test_normalize_scenario_key_ignores_case_spacing_and_punctuation(self):
+        self.assertEqual(
+            normalize_scenario_key("  Chest PAIN!! "), normalize_scenario_key("chest pain")
+        )
+        self.assertNotEqual(normalize_scenario_key("เจ็บหน้าอก"), normalize_scenario_key("เจ็บหนาอก"))
+
+    def test_location_tile_groups_nearby_points(self):
+        self.assertEqual(location_tile(13.7501, 100.5002), location_tile(13.7549, 100.5049))
+        self.assertNotEqual(location_tile(13.75, 100.50), location_tile(13.78, 100.50))
+        self.assertIsNone(location_tile(None, 100.5))
+
+    def test_forgets_key_once_work_finishes(self):
+        flight = SingleFlight()
+        first = Future()
+        future, shared = flight.submit("k", lambda _token: first)
+        self.assertFalse(shared)
+        again, shared = flight.submit("k", lambda _token: Future())
+        self.assertIs(again, first)
+        self.assertTrue(shared)
+        first.set_result(1)
+        fresh, shared = flight.submit("k", lambda _token: Future())
+        self.assertIsNot(fresh, first)
+        self.assertFalse(shared)
+
+
+class WorkflowCoalescingTests(unittest.TestCase):
+    def test_identical_triage_shares_one_call_across_event_loops(self):
+        workflow = ByStanderWorkflow()
+        calls = []
+
+        async def slow_triage(scenario, **_kwargs):
+            calls.append(scenario)
+            await asyncio.sleep(0.2)
+            return {"is_emergency": True, "severity": "critical", "facility_type": "hospital"}
+
+        workflow.triage_agent.run_async = slow_triage
+        results = []
+
+        def worker(text):
+            results.append(asyncio.run(workflow._triage_async(text)))
+
+        threads = [
+            threading.Thread(target=worker, args=(text,))
+            for text in ("Chest pain!", "chest  pain", "CHEST PAIN")
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual([r["severity"] for r in results], ["critical"] * 3)
+        # Each caller owns its result.
+        self.assertIsNot(results[0], results[1])
+
+    def test_facility_search_is_shared_but_ranked_per_caller(self):
+        workflow = ByStanderWorkflow()
+        searches = []
+
+        def slow_search(*args):
+            searches.append(args)
+            time.sleep(0.2)
+            place = {"place_id": "p1", "name": "Clinic", "latitude": 13.76, "longitude": 100.5}
+            return {"facilities": [place], "total": 1}
+
+        workflow.map_agent.find_candidates = slow_search
+        workflow.map_agent._estimate_route_eta_minutes = lambda *_args: {}
+        workflow.map_agent._minimum_selection_score = lambda _severity: float("-inf")
+        results = {}
+
+        def worker(latitude):
+            results[latitude] = asyncio.run(
+                workflow._facilities_async(
+                    "แผลถลอก", "moderate", "clinic", latitude, 100.5, stage="facilities"
+                )
+            )
+
+        # Both points fall in the same ~1.1 km tile, about 0.8 km apart.
+        threads = [threading.Thread(target=worker, args=(lat,)) for lat in (13.7501, 13.7574)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(searches), 1)
+        self.assertAlmostEqual(results[13.7501][0]["distance_km"], 1.1, delta=0.05)
+        self.assertAlmostEqual(results[13.7574][0]["distance_km"], 0.29, delta=0.05)
+
+    def test_personalized_guidance_is_not_coalesced(self):
+        workflow = ByStanderWorkflow()
+        calls = []
+
+        async def slow_guidance(scenario, severity, rag_context, medical_context=None):
+            calls.append(medical_context)
+            await asyncio.sleep(0.2)
+            return {"guidance": "1. โทร 1669", "facility_type": "hospital"}
+
+        async def fake_triage(_scenario):
+            return {"is_emergency": True, "severity": "critical", "facility_type": "hospital"}
+
+        async def fake_rag(_scenario, _severity):
+            return {"source": "none", "count": 0}, "ctx"
+
+        workflow.guidance_agent.run_async = slow_guidance
+        workflow._triage_async = fake_triage
+        workflow._retrieve_rag_async = fake_rag
+        workflow.judge_service.submit = lambda _payload: None
+
+        def worker(payload):
+            asyncio.run(workflow.run_async(payload))
+
+        payloads = [
+            {"scenario": "หมดสติ"},
+            {"scenario": "หมดสติ"},
+            {
+                "scenario": "หมดสติ",
+                "medical_context": {
+                    "individuals": [{"name": "Amy", "is_target": True, "conditions": ["เบาหวาน"]}]
+                },
+            },
+        ]
+        threads = [threading.Thread(target=worker, args=(p,)) for p in payloads]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # Two anonymous callers share one call; the personalized one gets its own.
+        self.assertEqual(len(calls), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+import asyncio
+import threading
+import time
+import unittest
+from concurrent.futures import Future
+from unittest.mock import patch
+
+from bystander_backend.agents import agents as agents_module
+from bystander_backend.agents.agents import ByStanderWorkflow
+from bystander_backend.agents.speculation import SpeculationStore
+
+
+def _done(value):
+    future = Future()
+    future.set_result(value)
+    return future
+
+
+class SpeculationStoreTests(unittest.TestCase):
+    def test_result_is_claimed_once(self):
+        store = SpeculationStore()
+        self.assertTrue(store.offer("k", lambda: _done({"call_script": "x"})))
+        self.assertFalse(store.offer("k", lambda: _done({})))
+        self.assertEqual(store.claim("k").result(), {"call_script": "x"})
+        self.assertIsNone(store.claim("k"))
+        snapshot = store.snapshot()
+        self.assertEqual((snapshot["hits"], snapshot["misses"], snapshot["skipped"]), (1, 1, 1))
+
+    def test_in_flight_budget_and_expiry_drop_work(self):
+        store = SpeculationStore(ttl_sec=0.05, max_in_flight=1)
+        running = Future()
+        self.assertTrue(store.offer("a", lambda: running))
+        self.assertFalse(store.offer("b", lambda: Future()))
+        time.sleep(0.06)
+        self.assertIsNone(store.claim("a"))
+        self.assertTrue(running.cancelled())
+        self.assertEqual(store.snapshot()["expired"], 1)
+
+
+class SpeculativeCallScriptTests(unittest.IsolatedAsyncioTestCase):
+    def _workflow(self):
+        workflow = ByStanderWorkflow()
+        workflow.script_calls = []
+
+        async def workflow_result(_payload):
+            return {
+                "route": "emergency_guidance",
+                "is_emergency": True,
+                "severity": "moderate",
+                "facility_type": "clinic",
+                "guidance": "1. กดห้ามเลือด\n2. โทร 1669",
+            }
+
+        async def script(*args, **_kwargs):
+            workflow.script_calls.append(args)
+            await asyncio.sleep(0.05)
+            return "1) speculated"
+
+        workflow._workflow_async = workflow_result
+        workflow.script_agent.run_async = script
+        return workflow
+
+    def _payload(self, **extra):
+        return {"scenario": "มีดบาดมือ เลือดออก", "caller_user_id": "u1", **extra}
+
+    async def test_call_script_is_served_from_the_speculation(self):
+        workflow = self._workflow()
+        with patch.object(agents_module, "SPECULATIVE_CALL_SCRIPT", True):
+            response = await workflow.run_async(self._payload())
+        self.assertEqual(workflow.speculation.snapshot()["started"], 1)
+        # The app sends back what it showed, with moderate reported as "mild".
+        request = self._payload(
+            guidance=response["guidance"], severity="mild", facility_type="clinic"
+        )
+        result = await workflow.generate_call_script_async(request)
+        self.assertEqual(result["call_script"], "1) speculated")
+        self.assertEqual(len(workflow.script_calls), 1)
+        self.assertEqual(workflow.speculation.snapshot()["hits"], 1)
+
+    async def test_changed_inputs_generate_afresh(self):
+        workflow = self._workflow()
+        with patch.object(agents_module, "SPECULATIVE_CALL_SCRIPT", True):
+            response = await workflow.run_async(self._payload())
+        request = self._payload(
+            guidance=response["guidance"],
+            severity="moderate",
+            facility_type="clinic",
+            latitude=13.75,
+            longitude=100.5,
+        )
+        result = await workflow.generate_call_script_async(request)
+        self.assertEqual(result["call_script"], "1) speculated")
+        self.assertEqual(len(workflow.script_calls), 2)
+        self.assertEqual(workflow.speculation.snapshot()["misses"], 1)
+
+    async def test_script_without_guidance_does_not_speculate_another(self):
+        workflow = self._workflow()
+        with patch.object(agents_module, "SPECULATIVE_CALL_SCRIPT", True):
+            result = await workflow.generate_call_script_async(self._payload())
+        self.assertEqual(result["call_script"], "1) speculated")
+        self.assertEqual(len(workflow.script_calls), 1)
+        self.assertEqual(workflow.speculation.snapshot()["started"], 0)
+
+    async def test_speculation_is_off_by_default_and_outlives_the_request(self):
+        workflow = self._workflow()
+        await workflow.run_async(self._payload())
+        self.assertEqual(workflow.speculation.snapshot()["started"], 0)
+
+        finished = threading.Event()
+        with patch.object(agents_module, "SPECULATIVE_CALL_SCRIPT", True):
+            # Like the HTTP layer: the request's own loop ends right after responding.
+            await asyncio.to_thread(asyncio.run, workflow.run_async(self._payload()))
+        key = next(iter(workflow.speculation._entries))
+        workflow.speculation._entries[key].future.add_done_callback(lambda _: finished.set())
+        self.assertTrue(await asyncio.to_thread(finished.wait, 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
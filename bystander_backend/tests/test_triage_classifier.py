@@ -0,0 +1,127 @@
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+
+from bystander_backend.agents.agents import ByStanderWorkflow
+from bystander_backend.agents.triage_classifier import (
+    DEFAULT_MODEL_PATH,
+    TriageClassifier,
+    TriageFastPath,
+)
+
+_SAMPLES = [
+    ("หมดสติ ไม่หายใจ", "critical", "hospital"),
+    ("หัวใจหยุดเต้น ปั๊มหัวใจ", "critical", "hospital"),
+    ("เลือดออกมาก หยุดไม่อยู่", "critical", "hospital"),
+    ("แผลถลอกเล็กน้อย", "moderate", "clinic"),
+    ("มีดบาดนิ้วนิดหน่อย", "moderate", "clinic"),
+    ("ผื่นคันเล็กน้อย", "moderate", "clinic"),
+    ("อยากรู้วิธีดูแลสุขภาพ", "none", "none"),
+]
+
+
+class TriageClassifierTests(unittest.TestCase):
+    def test_fit_predict_and_round_trip(self):
+        model = TriageClassifier.fit(_SAMPLES * 5, dim=1 << 12, epochs=10)
+        self.assertEqual(model.predict("คนหมดสติไม่หายใจ")["severity"], "critical")
+        self.assertEqual(model.predict("แผลถลอกที่เข่า")["facility_type"], "clinic")
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "model.json")
+            model.save(path)
+            loaded = TriageClassifier.load(path)
+        expected = model.predict("หมดสติ")["confidence"]
+        self.assertAlmostEqual(loaded.predict("หมดสติ")["confidence"], expected, places=2)
+        self.assertEqual(model.predict("")["confidence"], 0.0)
+
+    def test_calibration_softens_overconfident_heads(self):
+        model = TriageClassifier.fit(_SAMPLES * 5, dim=1 << 12, epochs=10)
+        before = model.predict("หมดสติ")["confidence"]
+        # Held out: half of these contradict what the model learned.
+        held_out = [
+            ("หมดสติ", "critical", "hospital"),
+            ("หมดสติ ไม่หายใจ", "moderate", "clinic"),
+            ("แผลถลอก", "moderate", "clinic"),
+            ("แผลถลอก", "critical", "hospital"),
+        ]
+        temperatures = model.calibrate(held_out)
+        self.assertGreater(temperatures["severity"], 1.0)
+        self.assertLess(model.predict("หมดสติ")["confidence"], before)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "model.json")
+            model.save(path)
+            self.assertEqual(
+                TriageClassifier.load(path).severity_head.temperature, temperatures["severity"]
+            )
+
+    @unittest.skipUnless(os.path.exists(DEFAULT_MODEL_PATH), "trained model not present")
+    def test_shipped_model_tells_chitchat_from_choking(self):
+        classifier = TriageFastPath(model_path=DEFAULT_MODEL_PATH).classifier
+        for text in ("พรุ่งนี้ไปเที่ยวไหนดี", "ช่วงปีใหม่ไปเที่ยวที่ไหนดี"):
+            prediction = classifier.predict(text)
+            self.assertEqual(prediction["severity"], "none", text)
+            self.assertFalse(prediction["is_emergency"])
+        for text in ("เด็กสำลักอาหาร", "ลูกสำลักขนม หายใจไม่ออก"):
+            self.assertEqual(classifier.predict(text)["severity"], "critical", text)
+
+    @unittest.skipUnless(os.path.exists(DEFAULT_MODEL_PATH), "trained model not present")
+    def test_shipped_model_is_fast(self):
+        classifier = TriageFastPath(model_path=DEFAULT_MODEL_PATH).classifier
+        self.assertIsNotNone(classifier)
+        started = time.perf_counter()
+        for _ in range(100):
+            classifier.predict("มีคนหมดสติไม่หายใจอยู่ข้างถนน ช่วยด้วย")
+        self.assertLess((time.perf_counter() - started) / 100, 0.005)
+
+    def test_fast_path_accepts_only_confident_critical(self):
+        fastpath = TriageFastPath(model_path="/nonexistent", confidence=0.8, enabled=True)
+        self.assertIsNone(fastpath.predict("x"))
+        self.assertFalse(fastpath.accepts({"severity": "critical", "confidence": 0.7}))
+        self.assertFalse(fastpath.accepts({"severity": "moderate", "confidence": 0.99}))
+        self.assertTrue(fastpath.accepts({"severity": "critical", "confidence": 0.9}))
+        self.assertEqual(fastpath.snapshot()["accepted"], 1)
+
+    def test_workflow_skips_llm_triage_for_confident_critical(self):
+        workflow = ByStanderWorkflow()
+        calls = []
+
+        async def record_only(*args, **_kwargs):
+            calls.append(args)
+            return {}
+
+        workflow.triage_agent.run_async = record_only
+        workflow.triage_fastpath = TriageFastPath(model_path="/nonexistent", confidence=0.8)
+        workflow.triage_fastpath.predict = lambda _scenario: {
+            "severity": "critical",
+            "facility_type": "hospital",
+            "confidence": 0.95,
+        }
+        triage = asyncio.run(workflow._triage_async("หมดสติไม่หายใจ"))
+        self.assertEqual(triage["severity"], "critical")
+        self.assertEqual(triage["triage_source"], "local")
+        self.assertEqual(calls, [])
+
+        workflow.triage_fastpath.predict = lambda _scenario: {
+            "severity": "moderate",
+            "facility_type": "clinic",
+            "confidence": 0.95,
+        }
+
+        async def llm_triage(*args, **_kwargs):
+            calls.append(args)
+            return {
+                "is_emergency": True,
+                "severity": "moderate",
+                "facility_type": "clinic",
+                "reason_th": "llm",
+            }
+
+        workflow.triage_agent.run_async = llm_triage
+        triage = asyncio.run(workflow._triage_async("แผลถลอก"))
+        self.assertEqual(triage["reason_th"], "llm")
+        self.assertEqual(len(calls), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,9 @@
+import asyncio
 import time
 import unittest
+from unittest.mock import patch
 
+from bystander_backend.agents import agents as agents_module
 from bystander_backend.agents.agents import ByStanderWorkflow
 from bystander_backend.agents.llm_agent import GuidanceAgent, ScriptAgent
 
@@ -28,11 +31,11 @@ class WorkflowLatencyTests(unittest.IsolatedAsyncioTestCase):
 
         def slow_facilities(*_args, **_kwargs):
             time.sleep(0.2)
-            return []
+            return {"facilities": [], "total": 0}
 
         workflow.profile_service.get_user_profile = slow_profile
         workflow.profile_service.get_medical_network = slow_network
-        workflow.map_agent.run = slow_facilities
+        workflow.map_agent.find_candidates = slow_facilities
 
         started = time.perf_counter()
         result = await workflow._prime_support_context(
@@ -73,7 +76,7 @@ class WorkflowLatencyTests(unittest.IsolatedAsyncioTestCase):
             )
         )
 
-        def guidance_run(
+        async def guidance_run(
             scenario,
             severity,
             rag_context,
@@ -84,7 +87,7 @@ class WorkflowLatencyTests(unittest.IsolatedAsyncioTestCase):
                 "facility_type": "clinic",
             }
 
-        workflow.guidance_agent.run = guidance_run
+        workflow.guidance_agent.run_async = guidance_run
 
         async def should_not_run(*args, **kwargs):
             raise AssertionError("_prime_support_context should not run without medical history")
@@ -111,6 +114,141 @@ class WorkflowLatencyTests(unittest.IsolatedAsyncioTestCase):
         )
         self.assertEqual(result["guidance"], "test guidance")
 
+    async def _speculation_workflow(
+        self, triage_severity, speculate_facilities=True, searches=None
+    ):
+        workflow = ByStanderWorkflow()
+        workflow._speculative_severity = lambda _scenario: "moderate"
+        rag_calls = []
+
+        async def slow_triage(_scenario):
+            await asyncio.sleep(0.2)
+            return {"is_emergency": True, "severity": triage_severity, "reason_th": ""}
+
+        async def slow_rag(_scenario, severity):
+            rag_calls.append(severity)
+            await asyncio.sleep(0.2)
+            return {"source": "csv", "count": 1}, f"context:{severity}"
+
+        workflow._triage_async = slow_triage
+        workflow._retrieve_rag_async = slow_rag
+        workflow.map_agent.find_candidates = lambda *args: (
+            (searches if searches is not None else []).append(args)
+            or {"facilities": [], "total": 0}
+        )
+        workflow.map_agent.rank_facilities = lambda *_args: [{"name": "Clinic"}]
+        workflow.guidance_agent.run_async = lambda scenario, severity, rag, medical_context=None: (
+            WorkflowLatencyTests._awaitable({"guidance": rag, "facility_type": "clinic"})
+        )
+        started = time.perf_counter()
+        with patch.object(agents_module, "SPECULATIVE_FACILITY_SEARCH", speculate_facilities):
+            result = await workflow.run_async(
+                {"scenario": "แผลถลอก", "latitude": 13.75, "longitude": 100.5}
+            )
+        return result, rag_calls, time.perf_counter() - started
+
+    async def test_run_async_overlaps_retrieval_with_triage(self):
+        result, rag_calls, elapsed = await self._speculation_workflow("moderate")
+        self.assertEqual(rag_calls, ["moderate"])
+        self.assertEqual(result["guidance"], "context:moderate")
+        self.assertEqual(result["facilities"], [{"name": "Clinic"}])
+        self.assertLess(elapsed, 0.35)
+
+    async def test_speculative_facility_search_is_off_by_default(self):
+        searches = []
+        result, _, _ = await self._speculation_workflow(
+            "moderate", speculate_facilities=False, searches=searches
+        )
+        self.assertEqual((result["facilities"], searches), ([], []))
+
+    async def test_run_async_requeries_when_triage_changes_severity(self):
+        result, rag_calls, _ = await self._speculation_workflow("critical")
+        self.assertEqual(rag_calls, ["moderate", "critical"])
+        self.assertEqual(result["guidance"], "context:critical")
+        # The speculative clinic search is out of scope for a critical case.
+        self.assertEqual(result["facilities"], [])
+
+    def _fused_workflow(self, fused):
+        workflow = ByStanderWorkflow()
+        workflow.triage_fastpath.predict = lambda _scenario: {
+            "severity": "moderate",
+            "facility_type": "clinic",
+            "confidence": 0.9,
+        }
+        workflow.guidance_agent.run_fused_async = lambda scenario, rag_context: (
+            WorkflowLatencyTests._awaitable(dict(fused))
+        )
+        calls = []
+
+        async def triage_run(*_args, **_kwargs):
+            raise AssertionError("fused mode must not call TriageAgent")
+
+        async def guidance_run(scenario, severity, rag_context, medical_context=None):
+            calls.append(severity)
+            return {"guidance": "critical guidance", "facility_type": "hospital"}
+
+        workflow.triage_agent.run_async = triage_run
+        workflow.guidance_agent.run_async = guidance_run
+        return workflow, calls
+
+    async def test_fused_mode_answers_moderate_in_one_call(self):
+        workflow, calls = self._fused_workflow(
+            {
+                "is_emergency": True,
+                "severity": "moderate",
+                "facility_type": "clinic",
+                "reason_th": "แผลเล็ก",
+                "guidance": "1. ล้างแผล",
+            }
+        )
+        with patch.object(agents_module, "FUSED_TRIAGE_GUIDANCE", True):
+            result = await workflow.run_async({"scenario": "แผลถลอก"})
+        self.assertEqual(result["guidance"], "1. ล้างแผล")
+        self.assertEqual(result["severity"], "moderate")
+        self.assertEqual(result["triage_reason"], "แผลเล็ก")
+        self.assertEqual(calls, [])
+
+    async def test_fused_mode_escalates_critical_to_two_stage_guidance(self):
+        workflow, calls = self._fused_workflow(
+            {
+                "is_emergency": True,
+                "severity": "critical",
+                "facility_type": "hospital",
+                "reason_th": "",
+                "guidance": "1. x",
+            }
+        )
+        with patch.object(agents_module, "FUSED_TRIAGE_GUIDANCE", True):
+            result = await workflow.run_async({"scenario": "แผลถลอก"})
+        self.assertEqual(calls, ["critical"])
+        self.assertEqual(result["guidance"], "critical guidance")
+
+    async def test_run_degraded_uses_local_protocol_without_llm(self):
+        workflow = ByStanderWorkflow()
+        workflow.retriever.rows = [
+            {
+                "case_name_th": "หัวใจหยุดเต้นเฉียบพลัน",
+                "case_name_en": "cardiac arrest",
+                "keywords": "ไม่หายใจ, CPR",
+                "instructions": "โทร 1669 และเริ่ม CPR",
+                "severity": "critical",
+                "facility_type": "hospital",
+            }
+        ]
+
+        def should_not_run(*args, **kwargs):
+            raise AssertionError("degraded path must not call the LLM")
+
+        workflow.triage_agent.run = should_not_run
+        workflow.triage_agent.run_async = should_not_run
+        workflow.guidance_agent.run = should_not_run
+        workflow.guidance_agent.run_async = should_not_run
+        result = workflow.run_degraded({"scenario": "คนหมดสติ ไม่หายใจ"})
+        self.assertTrue(result["degraded"])
+        self.assertEqual(result["severity"], "critical")
+        self.assertIn("1669", result["guidance"])
+        self.assertIn("เริ่ม CPR", result["protocol_context"])
+
     @staticmethod
     async def _awaitable(value):
         return value
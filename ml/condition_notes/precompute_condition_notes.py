@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Precompute web notes for common medical conditions into the seed file read by the
+backend's condition-notes cache, so the guidance web fallback rarely waits on a
+live lookup.
+
+    python ml/condition_notes/precompute_condition_notes.py
+    python ml/condition_notes/precompute_condition_notes.py --conditions conditions.txt
+
+--conditions takes one condition per line (blank lines and # comments ignored).
+Notes already in the seed file are kept unless --force is given; conditions the
+search has nothing for are reported and left out.
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[2]
+AGENTS_DIR = ROOT_DIR / "bystander_backend" / "agents"
+if str(AGENTS_DIR) not in sys.path:
+    sys.path.insert(0, str(AGENTS_DIR))
+
+from condition_notes import DEFAULT_SEED_PATH, condition_key  # noqa: E402
+from llm_agent import GeminiJSONAgent, GuidanceAgent  # noqa: E402
+
+COMMON_CONDITIONS = (
+    "asthma",
+    "diabetes",
+    "type 1 diabetes",
+    "type 2 diabetes",
+    "hypertension",
+    "coronary artery disease",
+    "heart failure",
+    "atrial fibrillation",
+    "pacemaker",
+    "epilepsy",
+    "stroke",
+    "COPD",
+    "chronic kidney disease",
+    "hemophilia",
+    "anticoagulant therapy",
+    "sickle cell disease",
+    "pregnancy",
+    "peanut allergy",
+    "shellfish allergy",
+    "bee sting allergy",
+    "penicillin allergy",
+    "latex allergy",
+    "anaphylaxis",
+    "G6PD deficiency",
+    "thalassemia",
+    "dementia",
+    "autism",
+    "osteoporosis",
+)
+
+
+def load_conditions(path: Path | None) -> list[str]:
+    if path is None:
+        return list(COMMON_CONDITIONS)
+    out = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        line = line.strip()
+        if line and not line.startswith("#"):
+            out.append(line)
+    return out
+
+
+def load_existing(path: Path) -> dict:
+    if not path.exists():
+        return {}
+    try:
+        return json.loads(path.read_text(encoding="utf-8")).get("notes") or {}
+    except Exception as exc:
+        print(f"ignoring unreadable seed file {path}: {exc}")
+        return {}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Precompute medical-condition web notes")
+    parser.add_argument("--conditions", type=Path, default=None)
+    parser.add_argument("--out", "-o", type=Path, default=Path(DEFAULT_SEED_PATH))
+    parser.add_argument("--force", action="store_true", help="re-fetch every condition")
+    parser.add_argument("--delay", type=float, default=1.0, help="seconds between lookups")
+    args = parser.parse_args()
+
+    existing = {} if args.force else load_existing(args.out)
+    agent = GuidanceAgent(GeminiJSONAgent())
+
+    notes = {}
+    reused = 0
+    missing = []
+    for condition in load_conditions(args.conditions):
+        key = condition_key(condition)
+        if key in notes:
+            continue
+        if existing.get(key):
+            notes[key] = existing[key]
+            reused += 1
+            continue
+        summary = agent._search_condition_guidance(condition)
+        if summary:
+            notes[key] = summary
+        else:
+            missing.append(condition)
+        time.sleep(max(0.0, args.delay))
+
+    seeds = {
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "notes": dict(sorted(notes.items())),
+    }
+    args.out.write_text(json.dumps(seeds, ensure_ascii=False, indent=1), encoding="utf-8")
+    print(f"wrote {args.out}: {len(notes)} conditions ({reused} reused)")
+    if missing:
+        print(f"no notes found for: {', '.join(missing)}")
+
+
+if __name__ == "__main__":
+    main()
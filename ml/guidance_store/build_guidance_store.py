@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Pre-generate guidance for every protocol row × severity into the backend's
+materialized guidance store.
+
+    python ml/guidance_store/build_guidance_store.py --version 2026-10-19
+
+Entries whose protocol row is unchanged are reused from the existing store unless
+--force is given. Answers failing validation are reported and left out, so those
+cases keep using live generation.
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[2]
+AGENTS_DIR = ROOT_DIR / "bystander_backend" / "agents"
+if str(AGENTS_DIR) not in sys.path:
+    sys.path.insert(0, str(AGENTS_DIR))
+
+from guidance_store import (  # noqa: E402
+    DEFAULT_STORE_PATH,
+    STORE_FORMAT,
+    STORE_SEVERITIES,
+    entry_key,
+    protocol_fingerprint,
+    validate_guidance,
+)
+from llm_agent import (  # noqa: E402
+    EMERGENCY_FALLBACK_GUIDANCE,
+    NONCRITICAL_FALLBACK_GUIDANCE,
+    GeminiJSONAgent,
+    GuidanceAgent,
+)
+
+from agents import ProtocolRetriever  # noqa: E402
+
+DEFAULT_INSTRUCTIONS_CSV = ROOT_DIR / "ml" / "finetuning" / "instructions_raw_final.csv"
+
+
+def protocol_context(row: dict) -> str:
+    # Same layout as ProtocolRetriever.retrieve_local so prompts match live traffic.
+    return (
+        f"[Protocol 1] {row['case_name_th']}\n"
+        f"- Keywords: {row['keywords']}\n"
+        f"- Guidance: {row['instructions']}\n"
+        f"- Severity: {row['severity']}\n"
+        f"- Facility: {row['facility_type']}"
+    )
+
+
+def load_existing(path: Path) -> dict:
+    if not path.exists():
+        return {}
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except Exception as exc:
+        print(f"ignoring unreadable store {path}: {exc}")
+        return {}
+    if int(data.get("format") or 0) != STORE_FORMAT:
+        return {}
+    return data.get("entries") or {}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build the materialized guidance store")
+    parser.add_argument("--instructions", type=Path, default=DEFAULT_INSTRUCTIONS_CSV)
+    parser.add_argument("--out", "-o", type=Path, default=Path(DEFAULT_STORE_PATH))
+    parser.add_argument("--version", default=time.strftime("%Y%m%d-%H%M%S", time.gmtime()))
+    parser.add_argument("--force", action="store_true", help="regenerate every entry")
+    parser.add_argument("--limit", type=int, default=0, help="only the first N rows")
+    args = parser.parse_args()
+
+    rows = [row for row in ProtocolRetriever(str(args.instructions)).rows if row["case_name_th"]]
+    if args.limit:
+        rows = rows[: args.limit]
+    existing = {} if args.force else load_existing(args.out)
+    agent = GuidanceAgent(GeminiJSONAgent())
+
+    entries = {}
+    rejected = 0
+    reused = 0
+    for row in rows:
+        fingerprint = protocol_fingerprint(row)
+        scenario = f"{row['case_name_th']} ({row['keywords']})"
+        for severity in STORE_SEVERITIES:
+            key = entry_key(row, severity)
+            previous = existing.get(key)
+            if previous and previous.get("protocol_sha1") == fingerprint:
+                entries[key] = previous
+                reused += 1
+                continue
+            result = agent.run(scenario, severity, protocol_context(row), medical_context=None)
+            problems = validate_guidance(
+                result.get("guidance"), result.get("facility_type"), severity
+            )
+            if result.get("guidance") in (
+                EMERGENCY_FALLBACK_GUIDANCE,
+                NONCRITICAL_FALLBACK_GUIDANCE,
+            ):
+                # The LLM failed and run() fell back to the static answer.
+                problems.append("static fallback guidance")
+            if problems:
+                rejected += 1
+                print(f"rejected {key}: {', '.join(problems)}")
+                continue
+            entries[key] = {
+                "guidance": result["guidance"],
+                "facility_type": result["facility_type"],
+                "protocol_sha1": fingerprint,
+                "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            }
+
+    store = {
+        "format": STORE_FORMAT,
+        "version": args.version,
+        "source": args.instructions.name,
+        "models": {"critical": agent.critical_model, "moderate": agent.moderate_model},
+        "entries": entries,
+    }
+    args.out.write_text(json.dumps(store, ensure_ascii=False, indent=1), encoding="utf-8")
+    print(
+        f"wrote {args.out}: {len(entries)} entries "
+        f"({reused} reused, {rejected} rejected) version={args.version}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for the backend's local guidance backend (LocalLLMBackend)
+against an OpenAI-compatible server, comparing micro-batch sizes under load.
+
+Against the fine-tuned GGUF served on CPU (finetune.py --save-gguf), e.g.:
+
+    llama-server -m outputs/gguf_q4_k_m/unsloth.Q4_K_M.gguf --port 8080 -np 8 -cb
+    python ml/local_llm/benchmark_local_llm.py --base-url http://127.0.0.1:8080
+
+Without --base-url a stub server is started in-process. Like one CPU-bound model
+instance it serves one call at a time, each taking --stub-call-ms plus
+--stub-prompt-ms per prompt, so batching pays off the way a batched forward pass
+does. Prints one row per (batch size, concurrency) with requests/s, latency
+p50/p95 and prompts per call.
+"""
+
+import argparse
+import json
+import math
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[2]
+AGENTS_DIR = ROOT_DIR / "bystander_backend" / "agents"
+if str(AGENTS_DIR) not in sys.path:
+    sys.path.insert(0, str(AGENTS_DIR))
+
+from local_llm import LocalLLMBackend  # noqa: E402
+
+SYSTEM_PROMPT = (
+    "You are a Thai emergency first-aid assistant. "
+    'Return strict JSON only: {"guidance":"...","facility_type":"hospital|clinic|none"}.'
+)
+SCENARIOS = (
+    "มีคนถูกมีดบาดนิ้ว เลือดออกไม่หยุด",
+    "เด็กมีไข้สูงและตัวร้อนมาก",
+    "มีคนข้อเท้าพลิกขณะวิ่ง",
+    "ผู้สูงอายุหกล้มในห้องน้ำ ลุกไม่ได้",
+    "มีคนโดนน้ำร้อนลวกที่แขน",
+    "มีคนถูกผึ้งต่อยที่มือ บวมแดง",
+)
+STUB_ANSWER = json.dumps(
+    {
+        "guidance": "1. ล้างแผลด้วยน้ำสะอาด 2. กดห้ามเลือด 3. หากอาการแย่ลงโทร 1669",
+        "facility_type": "clinic",
+    },
+    ensure_ascii=False,
+)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--base-url", default="", help="Server to benchmark; stub if empty.")
+    parser.add_argument("--model", default="", help="Model name sent to the server.")
+    parser.add_argument("--requests", type=int, default=64, help="Requests per row.")
+    parser.add_argument("--concurrency", default="1,4,16", help="Comma-separated levels.")
+    parser.add_argument("--batch-sizes", default="1,4,8", help="Comma-separated max batch sizes.")
+    parser.add_argument("--batch-window-ms", type=float, default=10.0)
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--max-tokens", type=int, default=300)
+    parser.add_argument("--stub-call-ms", type=float, default=200.0)
+    parser.add_argument("--stub-prompt-ms", type=float, default=25.0)
+    parser.add_argument("--out", default="", help="Optional JSON file for the results.")
+    return parser.parse_args()
+
+
+def start_stub_server(call_ms: float, prompt_ms: float) -> ThreadingHTTPServer:
+    compute = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self) -> None:  # noqa: N802
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)))
+            if self.path.endswith("/chat/completions"):
+                with compute:
+                    time.sleep((call_ms + prompt_ms) / 1000.0)
+                payload = {"choices": [{"index": 0, "message": {"content": STUB_ANSWER}}]}
+            else:
+                prompts = body.get("prompt")
+                prompts = prompts if isinstance(prompts, list) else [prompts]
+                with compute:
+                    time.sleep((call_ms + prompt_ms * len(prompts)) / 1000.0)
+                payload = {
+                    "choices": [{"index": i, "text": STUB_ANSWER} for i in range(len(prompts))]
+                }
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args) -> None:
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    rank = max(1, math.ceil((q / 100.0) * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def run_row(args: argparse.Namespace, base_url: str, batch: int, concurrency: int) -> dict:
+    backend = LocalLLMBackend(
+        base_url=base_url,
+        model=args.model or None,
+        max_batch=batch,
+        batch_window_ms=args.batch_window_ms,
+        pool_size=args.pool_size,
+        call_timeout_sec=120.0,
+    )
+    latencies: list[float] = []
+    errors = 0
+    lock = threading.Lock()
+
+    def one(i: int) -> None:
+        nonlocal errors
+        started = time.perf_counter()
+        try:
+            backend.complete(
+                SYSTEM_PROMPT,
+                f"Scenario: {SCENARIOS[i % len(SCENARIOS)]}",
+                max_tokens=args.max_tokens,
+            )
+        except Exception as exc:
+            with lock:
+                errors += 1
+            print(f"[WARN] request {i} failed: {exc}")
+            return
+        with lock:
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(args.requests)))
+    wall = time.perf_counter() - started
+    snap = backend.snapshot()
+    return {
+        "batch": batch,
+        "concurrency": concurrency,
+        "requests": args.requests,
+        "errors": errors,
+        "wall_sec": round(wall, 3),
+        "req_per_sec": round(len(latencies) / wall, 2) if wall else 0.0,
+        "p50_ms": round(statistics.median(latencies) * 1000, 1) if latencies else None,
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1) if latencies else None,
+        "server_calls": snap["batches"],
+        "avg_batch": snap["avg_batch"],
+    }
+
+
+def main() -> int:
+    args = parse_args()
+    server = None
+    base_url = args.base_url
+    if not base_url:
+        server = start_stub_server(args.stub_call_ms, args.stub_prompt_ms)
+        base_url = f"http://127.0.0.1:{server.server_address[1]}"
+        print(
+            f"stub server at {base_url} "
+            f"({args.stub_call_ms:.0f} ms/call + {args.stub_prompt_ms:.0f} ms/prompt)"
+        )
+
+    rows = []
+    print(
+        f"{'batch':>5} {'conc':>5} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'calls':>6} "
+        f"{'avg batch':>9} {'errors':>6}"
+    )
+    for batch in [int(x) for x in args.batch_sizes.split(",") if x.strip()]:
+        for concurrency in [int(x) for x in args.concurrency.split(",") if x.strip()]:
+            row = run_row(args, base_url, batch, concurrency)
+            rows.append(row)
+            print(
+                f"{row['batch']:>5} {row['concurrency']:>5} {row['req_per_sec']:>8} "
+                f"{row['p50_ms']!s:>8} {row['p95_ms']!s:>8} {row['server_calls']:>6} "
+                f"{row['avg_batch']:>9} {row['errors']:>6}"
+            )
+
+    if server is not None:
+        server.shutdown()
+    if args.out:
+        Path(args.out).write_text(json.dumps(rows, indent=2), encoding="utf-8")
+        print(f"Saved: {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Pre-generate a call-script template for every protocol row × severity into the
+backend's script template store.
+
+    python ml/script_templates/build_script_templates.py --version 2026-10-19
+
+Each template is the nine-step operator script for the protocol with {scenario},
+{location}, {patient}, {medical_history} and {caller} slots that /call_script fills
+per request. Entries whose protocol row is unchanged are reused from the existing
+store unless --force is given. Templates failing validation are reported and left
+out, so those cases keep using live generation.
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[2]
+AGENTS_DIR = ROOT_DIR / "bystander_backend" / "agents"
+if str(AGENTS_DIR) not in sys.path:
+    sys.path.insert(0, str(AGENTS_DIR))
+
+from guidance_store import STORE_SEVERITIES, entry_key, protocol_fingerprint  # noqa: E402
+from llm_agent import GeminiJSONAgent, ScriptAgent  # noqa: E402
+from script_templates import (  # noqa: E402
+    DEFAULT_TEMPLATE_PATH,
+    TEMPLATE_FORMAT,
+    TEMPLATE_SLOTS,
+    validate_template,
+)
+
+from agents import ProtocolRetriever  # noqa: E402
+
+DEFAULT_INSTRUCTIONS_CSV = ROOT_DIR / "ml" / "finetuning" / "instructions_raw_final.csv"
+
+SYSTEM_PROMPT = (
+    "You are ScriptAgent for emergency operator call assistance in Thai. "
+    "Write a reusable speaking-script template for one emergency protocol, following "
+    "this exact call protocol in order, one numbered line per step:\n"
+    "1) ตั้งสติ และโทรแจ้ง 1669\n"
+    "2) ให้ข้อมูลว่าเกิดเหตุอะไร\n"
+    "3) บอกสถานที่เกิดเหตุให้ชัดเจน\n"
+    "4) บอกเพศ อายุ อาการ จำนวน\n"
+    "5) บอกระดับความรู้สึกตัว\n"
+    "6) บอกความเสี่ยงที่อาจเกิดซ้ำ\n"
+    "7) บอกชื่อผู้แจ้ง + เบอร์โทรศัพท์\n"
+    "8) ช่วยเหลือเบื้องต้น\n"
+    "9) รอทีมกู้ชีพมารับเพื่อนำส่งโรงพยาบาล\n"
+    "Per-call details are filled in later through placeholders. Use each of these "
+    "placeholders exactly once, written exactly as shown, and no other curly braces:\n"
+    "{scenario} = one sentence describing what happened, in the caller's words\n"
+    "{location} = address and nearby landmarks\n"
+    "{patient} = relationship, sex, age and number of patients\n"
+    "{medical_history} = the patient's known conditions, or that they are unknown\n"
+    "{caller} = the caller's name and phone number\n"
+    "Everything else must be specific to the protocol: the consciousness check, the "
+    "risks to report and the first aid being given. Keep it short, urgent and easy to "
+    "read out loud. Output JSON only with key: call_script."
+)
+
+
+def user_prompt(row: dict, severity: str) -> str:
+    return (
+        f"Protocol: {row['case_name_th']} ({row['case_name_en']})\n"
+        f"Severity: {severity}\n"
+        f"Keywords: {row['keywords']}\n"
+        f"First-aid instructions:\n{row['instructions']}\n"
+    )
+
+
+def load_existing(path: Path) -> dict:
+    if not path.exists():
+        return {}
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except Exception as exc:
+        print(f"ignoring unreadable store {path}: {exc}")
+        return {}
+    if int(data.get("format") or 0) != TEMPLATE_FORMAT:
+        return {}
+    return data.get("entries") or {}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build the call-script template store")
+    parser.add_argument("--instructions", type=Path, default=DEFAULT_INSTRUCTIONS_CSV)
+    parser.add_argument("--out", "-o", type=Path, default=Path(DEFAULT_TEMPLATE_PATH))
+    parser.add_argument("--version", default=time.strftime("%Y%m%d-%H%M%S", time.gmtime()))
+    parser.add_argument("--force", action="store_true", help="regenerate every entry")
+    parser.add_argument("--limit", type=int, default=0, help="only the first N rows")
+    args = parser.parse_args()
+
+    rows = [row for row in ProtocolRetriever(str(args.instructions)).rows if row["case_name_th"]]
+    if args.limit:
+        rows = rows[: args.limit]
+    existing = {} if args.force else load_existing(args.out)
+    llm = GeminiJSONAgent()
+    model_name = ScriptAgent(llm).model_name
+
+    entries = {}
+    rejected = 0
+    reused = 0
+    for row in rows:
+        fingerprint = protocol_fingerprint(row)
+        for severity in STORE_SEVERITIES:
+            key = entry_key(row, severity)
+            previous = existing.get(key)
+            if previous and previous.get("protocol_sha1") == fingerprint:
+                entries[key] = previous
+                reused += 1
+                continue
+            out = llm.generate_json(
+                model_name=model_name,
+                system_prompt=SYSTEM_PROMPT,
+                user_prompt=user_prompt(row, severity),
+                default={"call_script": ""},
+                temperature=0.2,
+            )
+            template = str(out.get("call_script") or "").strip()
+            problems = validate_template(template)
+            if problems:
+                rejected += 1
+                print(f"rejected {key}: {', '.join(problems)}")
+                continue
+            entries[key] = {
+                "template": template,
+                "protocol_sha1": fingerprint,
+                "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            }
+
+    store = {
+        "format": TEMPLATE_FORMAT,
+        "version": args.version,
+        "source": args.instructions.name,
+        "model": model_name,
+        "slots": list(TEMPLATE_SLOTS),
+        "entries": entries,
+    }
+    args.out.write_text(json.dumps(store, ensure_ascii=False, indent=1), encoding="utf-8")
+    print(
+        f"wrote {args.out}: {len(entries)} entries "
+        f"({reused} reused, {rejected} rejected) version={args.version}"
+    )
+
+
+if __name__ == "__main__":
+    main()
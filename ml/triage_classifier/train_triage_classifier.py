@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Train the local triage classifier used by the backend fast path.
+
+    python ml/triage_classifier/train_triage_classifier.py
+
+Samples come from the protocol sheet (case names, keyword lists), the labelled
+scenario prompts and extra_samples.csv (non-emergency chit-chat labelled "none", which
+the other two sources lack, and choking reports). Topics are held out by group to
+report accuracy and fast-path precision and to fit the softmax temperatures; the final
+model is refit on everything, keeps those temperatures and is written as JSON.
+"""
+
+import argparse
+import csv
+import random
+import sys
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[2]
+AGENTS_DIR = ROOT_DIR / "bystander_backend" / "agents"
+if str(AGENTS_DIR) not in sys.path:
+    sys.path.insert(0, str(AGENTS_DIR))
+
+from triage_classifier import TriageClassifier  # noqa: E402
+
+DEFAULT_INSTRUCTIONS_CSV = ROOT_DIR / "ml" / "finetuning" / "instructions_raw_final.csv"
+DEFAULT_PROMPTS_CSV = ROOT_DIR / "generated_prompts.csv"
+DEFAULT_EXTRA_CSV = Path(__file__).resolve().parent / "extra_samples.csv"
+DEFAULT_OUTPUT = AGENTS_DIR / "triage_model.json"
+SEVERITY_MAP = {
+    "critical": "critical",
+    "moderate": "moderate",
+    "mild": "moderate",
+    "no need": "none",
+    "none": "none",
+}
+FACILITY_MAP = {
+    "hospital": "hospital",
+    "clinic": "clinic",
+    # Ambiguous rows go to the safer facility.
+    "hospital, clinic": "hospital",
+    "none": "none",
+    "not emergency": "none",
+}
+FACILITY_BY_SEVERITY = {"critical": "hospital", "moderate": "clinic", "none": "none"}
+# Protocol rows the sheet files as mild but a bystander report of is life-threatening:
+# a blocked airway. Matched on the Thai case name prefix.
+CRITICAL_CASE_PREFIXES = ("อาหารติดคอ",)
+
+
+def _clean(value) -> str:
+    return str(value or "").strip()
+
+
+def load_protocol_samples(path: Path) -> list[tuple[str, str, str, str]]:
+    """(group, text, severity, facility_type) from case names and keyword lists."""
+
+    samples = []
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        for row in csv.DictReader(f):
+            severity = SEVERITY_MAP.get(_clean(row.get("severity")).lower())
+            if severity is None:
+                continue
+            facility = FACILITY_MAP.get(
+                _clean(row.get("facility_type")).lower(), FACILITY_BY_SEVERITY[severity]
+            )
+            if _clean(row.get("Case Name (TH)")).startswith(CRITICAL_CASE_PREFIXES):
+                severity, facility = "critical", "hospital"
+            group = f"protocol:{_clean(row.get('Case Name (EN)'))}"
+            keywords = [k.strip() for k in _clean(row.get("Keywords")).split(",") if k.strip()]
+            texts = [_clean(row.get("Case Name (TH)")), _clean(row.get("Case Name (EN)"))]
+            texts += keywords
+            texts.append(" ".join(keywords))
+            for text in texts:
+                if text:
+                    samples.append((group, text, severity, facility))
+    return samples
+
+
+def load_prompt_samples(path: Path) -> list[tuple[str, str, str, str]]:
+    samples = []
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        for row in csv.DictReader(f):
+            severity = SEVERITY_MAP.get(_clean(row.get("severity")).lower())
+            text = _clean(row.get("prompt_text"))
+            if severity is None or not text:
+                continue
+            group = f"prompt:{_clean(row.get('scenario_topic'))}"
+            samples.append((group, text, severity, FACILITY_BY_SEVERITY[severity]))
+    return samples
+
+
+def load_extra_samples(path: Path) -> list[tuple[str, str, str, str]]:
+    samples = []
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        for row in csv.DictReader(f):
+            severity = _clean(row.get("severity")).lower()
+            text = _clean(row.get("text"))
+            if severity not in FACILITY_BY_SEVERITY or not text:
+                continue
+            facility = _clean(row.get("facility_type")).lower() or FACILITY_BY_SEVERITY[severity]
+            samples.append((f"extra:{_clean(row.get('group'))}", text, severity, facility))
+    return samples
+
+
+def evaluate(model: TriageClassifier, samples, threshold: float) -> dict:
+    correct = 0
+    confidence = 0.0
+    fast = 0
+    fast_correct = 0
+    for _, text, severity, _ in samples:
+        prediction = model.predict(text)
+        correct += prediction["severity"] == severity
+        confidence += prediction["confidence"]
+        if prediction["severity"] == "critical" and prediction["confidence"] >= threshold:
+            fast += 1
+            fast_correct += severity == "critical"
+    total = max(1, len(samples))
+    critical = max(1, sum(1 for sample in samples if sample[2] == "critical"))
+    return {
+        "samples": len(samples),
+        "accuracy": round(correct / total, 3),
+        # Close to accuracy when confidences are calibrated.
+        "mean_confidence": round(confidence / total, 3),
+        "fast_path_rate_on_critical": round(fast_correct / critical, 3),
+        "fast_path_precision": round(fast_correct / fast, 3) if fast else None,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Train the local triage classifier")
+    parser.add_argument("--instructions", type=Path, default=DEFAULT_INSTRUCTIONS_CSV)
+    parser.add_argument("--prompts", type=Path, default=DEFAULT_PROMPTS_CSV)
+    parser.add_argument("--extra", type=Path, default=DEFAULT_EXTRA_CSV)
+    parser.add_argument("--out", "-o", type=Path, default=DEFAULT_OUTPUT)
+    parser.add_argument("--dim", type=int, default=1 << 15)
+    parser.add_argument("--epochs", type=int, default=20)
+    parser.add_argument("--holdout", type=float, default=0.2, help="fraction of topics")
+    parser.add_argument("--threshold", type=float, default=0.85)
+    parser.add_argument("--seed", type=int, default=13)
+    args = parser.parse_args()
+
+    protocol = load_protocol_samples(args.instructions)
+    prompts = load_prompt_samples(args.prompts)
+    extra = load_extra_samples(args.extra)
+    print(f"protocol samples={len(protocol)} prompt samples={len(prompts)} extra={len(extra)}")
+
+    topics = sorted({group for group, *_ in prompts + extra})
+    random.Random(args.seed).shuffle(topics)
+    held_out = set(topics[: int(len(topics) * args.holdout)])
+    train = protocol + [s for s in prompts + extra if s[0] not in held_out]
+    test = [s for s in prompts + extra if s[0] in held_out]
+    temperatures = {}
+    if test:
+        model = TriageClassifier.fit(
+            ((text, sev, fac) for _, text, sev, fac in train),
+            dim=args.dim,
+            epochs=args.epochs,
+            seed=args.seed,
+        )
+        print(f"held-out topics={len(held_out)} raw", evaluate(model, test, args.threshold))
+        temperatures = model.calibrate((text, sev, fac) for _, text, sev, fac in test)
+        print(f"calibrated {temperatures}", evaluate(model, test, args.threshold))
+
+    model = TriageClassifier.fit(
+        ((text, sev, fac) for _, text, sev, fac in protocol + prompts + extra),
+        dim=args.dim,
+        epochs=args.epochs,
+        seed=args.seed,
+        metadata={
+            "trained_on": [args.instructions.name, args.prompts.name, args.extra.name],
+            "samples": len(protocol) + len(prompts) + len(extra),
+            "temperatures": temperatures,
+        },
+    )
+    # Refit on everything, so there is nothing left to calibrate on: keep the held-out fit.
+    model.severity_head.temperature = temperatures.get("severity", 1.0)
+    model.facility_head.temperature = temperatures.get("facility_type", 1.0)
+    model.save(str(args.out))
+    print(f"wrote {args.out} ({args.out.stat().st_size // 1024} KiB)")
+
+
+if __name__ == "__main__":
+    main()